@@ -0,0 +1,245 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+import numpy as np
+
+# --- Configuration ---
+# Decoded 16 kHz mono int16 PCM (<hash>.npy, half the size of float32; ~350 MB for a 3-hour episode) and
+# VAD speech spans (<hash>.vad.json) per source audio, keyed by the SHA-256 of the source file's contents
+AUDIO_CACHE_DIR = os.getenv("AUDIO_CACHE_DIR") or ".cache/audio"
+AUDIO_CACHE_MAX_BYTES = 10 * 1024 * 1024 * 1024  # least recently used entries are removed above this size
+SAMPLE_RATE = 16000
+HASH_CHUNK_SIZE = 1024 * 1024
+# Samples converted between int16 and float32 at a time, so a conversion never holds two full copies
+CONVERT_CHUNK = SAMPLE_RATE * 60
+
+def to_float32(pcm, out=None):
+    """
+    Converts int16 PCM (e.g. a slice of a cached memory map) to float32 in [-1, 1), the scale faster-whisper uses
+    """
+    if out is None:
+        out = np.empty(len(pcm), dtype=np.float32)
+    for start in range(0, len(pcm), CONVERT_CHUNK):
+        np.multiply(pcm[start:start + CONVERT_CHUNK], 1 / 32768, out=out[start:start + CONVERT_CHUNK], dtype=np.float32)
+    return out
+
+def to_int16(audio):
+    """
+    Converts float32 audio from faster-whisper's decoder back to int16 (lossless: it was decoded from 16-bit PCM)
+    """
+    out = np.empty(len(audio), dtype=np.int16)
+    for start in range(0, len(audio), CONVERT_CHUNK):
+        chunk = np.rint(audio[start:start + CONVERT_CHUNK] * 32768)
+        out[start:start + CONVERT_CHUNK] = np.clip(chunk, -32768, 32767)
+    return out
+
+def gather_spans(pcm, spans):
+    """
+    Float32 audio made of only the given spans ({"start", "end"} in samples) of int16 PCM, converted span
+    by span into one buffer; the rest of a memory-mapped file is never read
+    """
+    out = np.empty(sum(span["end"] - span["start"] for span in spans), dtype=np.float32)
+    position = 0
+    for span in spans:
+        chunk = pcm[span["start"]:span["end"]]
+        to_float32(chunk, out=out[position:position + len(chunk)])
+        position += len(chunk)
+    return out
+
+class AudioCache:
+    """
+    Decode-once PCM cache. load() returns a read-only int16 memory map of the decoded audio, so repeated
+    transcriptions of an episode (reruns, resumes, different decoding settings) skip the decoder;
+    convert the parts that are decoded with to_float32 / gather_spans.
+    Safe to share between threads and processes: entries are written to a temp file and renamed.
+    """
+    def __init__(self, directory=AUDIO_CACHE_DIR, max_bytes=AUDIO_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._hashes = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, path):
+        """
+        SHA-256 of the file contents, remembered per (path, size, mtime) so unchanged files are hashed once
+        """
+        st = os.stat(path)
+        memo_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+        with self._lock:
+            if memo_key in self._hashes:
+                return self._hashes[memo_key]
+
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        with self._lock:
+            self._hashes[memo_key] = digest
+        return digest
+
+    def _pcm_path(self, key):
+        return os.path.join(self.directory, key + ".npy")
+
+    def _spans_path(self, key):
+        return os.path.join(self.directory, key + ".vad.json")
+
+    def _touch(self, key):
+        # The modification time doubles as the last-access time for LRU eviction
+        try:
+            os.utime(self._pcm_path(key))
+        except OSError:
+            pass
+
+    def load(self, path):
+        """
+        Returns the decoded audio of path as a read-only int16 memory map, decoding it on a miss
+        (entries written as float32 by older versions are decoded again)
+        """
+        key = self.key(path)
+        pcm_path = self._pcm_path(key)
+        try:
+            audio = np.load(pcm_path, mmap_mode="r")
+            if audio.dtype == np.int16:
+                with self._lock:
+                    self.hits += 1
+                self._touch(key)
+                return audio
+        except (OSError, ValueError):
+            pass
+
+        from faster_whisper import decode_audio
+
+        with self._lock:
+            self.misses += 1
+        audio = to_int16(decode_audio(path, sampling_rate=SAMPLE_RATE))
+        tmp = f"{pcm_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, audio)
+        os.replace(tmp, pcm_path)
+        self.evict(keep=key)
+        return np.load(pcm_path, mmap_mode="r")
+
+    def speech_spans(self, path, vad_parameters=None):
+        """
+        VAD speech spans ({"start", "end"} in samples) of path, computed once per set of VAD parameters
+        """
+        key = self.key(path)
+        params_key = json.dumps(vad_parameters or {}, sort_keys=True)
+        spans_path = self._spans_path(key)
+        try:
+            with open(spans_path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            stored = {}
+        if params_key in stored:
+            return stored[params_key]
+
+        from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+        audio = to_float32(self.load(path))
+        spans = get_speech_timestamps(audio, VadOptions(**(vad_parameters or {})), sampling_rate=SAMPLE_RATE)
+        stored[params_key] = [{"start": int(s["start"]), "end": int(s["end"])} for s in spans]
+        tmp = f"{spans_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(stored, f)
+        os.replace(tmp, spans_path)
+        return stored[params_key]
+
+    def _entries(self):
+        """
+        Returns [(last_access, size, key)] for every cached PCM file
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".npy"):
+                continue
+            key = name[:-len(".npy")]
+            try:
+                st = os.stat(self._pcm_path(key))
+            except OSError:
+                continue
+            size = st.st_size
+            if os.path.exists(self._spans_path(key)):
+                size += os.path.getsize(self._spans_path(key))
+            entries.append((st.st_mtime, size, key))
+        return entries
+
+    def _remove(self, key):
+        for path in (self._pcm_path(key), self._spans_path(key)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def evict(self, keep=None):
+        """
+        Removes the least recently used entries until the cache fits in max_bytes (never the entry keep).
+        Returns the number of removed entries.
+        """
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, key in entries:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            # Open memory maps stay valid after the file is removed
+            self._remove(key)
+            total -= size
+            removed += 1
+        return removed
+
+    def clear(self):
+        for _, _, key in self._entries():
+            self._remove(key)
+
+    def stats(self):
+        entries = self._entries()
+        return {
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+# Cache shared within the process (created on first use)
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def get_default_cache():
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = AudioCache()
+    return _default_cache
+
+if __name__ == "__main__":
+    commands = ("stats", "evict", "clear", "warm")
+    if len(sys.argv) < 2 or sys.argv[1] not in commands:
+        print(f"Usage: python audio_cache.py <{'|'.join(commands)}> [audio files for warm]")
+        sys.exit(1)
+
+    cache = AudioCache()
+    if sys.argv[1] == "evict":
+        print(f"Removed {cache.evict()} entries")
+    elif sys.argv[1] == "clear":
+        cache.clear()
+        print("Cleared the audio cache")
+    elif sys.argv[1] == "warm":
+        import fwhisper
+
+        for path in sys.argv[2:]:
+            start = time.time()
+            audio = cache.load(path)
+            spans = cache.speech_spans(path, fwhisper.get_profile()["vad_parameters"])
+            print(f"{path}: {len(audio) / SAMPLE_RATE:.1f}s audio, {len(spans)} speech spans ({time.time() - start:.2f}s)")
+    stats = cache.stats()
+    print(f"Audio cache: {cache.directory} ({stats['entries']} entries, {stats['bytes'] / 1024 / 1024:.2f} MB)")
@@ -0,0 +1,92 @@
+"""
+比較每次重新解碼 + VAD 與使用音訊快取 (audio_cache.py) 的前處理時間
+
+產生一段合成的 mp3 (有聲段落與靜音交錯)，量測：
+- 直接以 faster-whisper 解碼與執行 VAD (沒有快取時每次轉錄都要做)
+- 第一次寫入快取 (解碼 + 存檔 + VAD)
+- 之後從快取讀取 (int16 memory map + 已存的 VAD 區段)，以及快取佔用的空間
+
+使用方式 (在專案根目錄執行):
+    python benchmarks/bench_audio_cache.py --minutes 30
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import av
+import numpy as np
+from faster_whisper import decode_audio
+from faster_whisper.vad import VadOptions, get_speech_timestamps
+import fwhisper
+from audio_cache import AudioCache, SAMPLE_RATE, to_float32
+
+def make_mp3(path, minutes, rate=44100):
+    """
+    產生 minutes 分鐘的 mp3：約 8 秒的調變聲音與 2 秒靜音交錯
+    """
+    rng = np.random.default_rng(0)
+    with av.open(path, "w") as container:
+        stream = container.add_stream("libmp3lame", rate=rate)
+        stream.layout = "mono"
+        for second in range(int(minutes * 60)):
+            t = np.arange(rate) / rate + second
+            if second % 10 < 8:
+                tone = np.sin(2 * np.pi * (180 + 60 * np.sin(2 * np.pi * 3 * t)) * t)
+                samples = (0.3 * tone + 0.05 * rng.standard_normal(rate)).astype(np.float32)
+            else:
+                samples = np.zeros(rate, dtype=np.float32)
+            frame = av.AudioFrame.from_ndarray(samples.reshape(1, -1), format="flt", layout="mono")
+            frame.sample_rate = rate
+            for packet in stream.encode(frame):
+                container.mux(packet)
+        for packet in stream.encode(None):
+            container.mux(packet)
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, default=30)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        mp3 = os.path.join(tmp, "episode.mp3")
+        make_mp3(mp3, args.minutes)
+        print(f"音檔: {args.minutes:g} 分鐘, {os.path.getsize(mp3) / 1024 / 1024:.1f} MB")
+
+        vad_options = VadOptions(**fwhisper.VAD_PARAMETERS)
+        audio, decode_time = timed(lambda: decode_audio(mp3, sampling_rate=SAMPLE_RATE))
+        spans, vad_time = timed(lambda: get_speech_timestamps(audio, vad_options))
+
+        cache = AudioCache(os.path.join(tmp, "cache"))
+        _, first_time = timed(lambda: (cache.load(mp3), cache.speech_spans(mp3, fwhisper.VAD_PARAMETERS)))
+        # 新的 AudioCache 物件 (沒有 process 內記住的雜湊值)，讀取時間包含計算檔案雜湊
+        cache = AudioCache(os.path.join(tmp, "cache"))
+        (cached_audio, cached_spans), cached_time = timed(
+            lambda: (cache.load(mp3), cache.speech_spans(mp3, fwhisper.VAD_PARAMETERS))
+        )
+
+        print()
+        print(f"解碼 + VAD (無快取): {decode_time + vad_time:7.2f} 秒 (解碼 {decode_time:.2f}, VAD {vad_time:.2f})")
+        print(f"    第一次寫入快取: {first_time:7.2f} 秒")
+        print(f"        從快取讀取: {cached_time:7.2f} 秒 (含計算檔案雜湊)")
+        print(f"Speedup: {(decode_time + vad_time) / cached_time:.1f}x")
+        print(f"快取大小: {cache.stats()['bytes'] / 1024 / 1024:.1f} MB (float32 為 {audio.nbytes / 1024 / 1024:.1f} MB)")
+
+        same = np.array_equal(to_float32(cached_audio), audio) and [
+            (s["start"], s["end"]) for s in cached_spans
+        ] == [(s["start"], s["end"]) for s in spans]
+        print(f"Same audio and speech spans: {same}")
+        if not same:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
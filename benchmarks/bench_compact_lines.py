@@ -0,0 +1,110 @@
+"""
+比較送給 LLM 校正的兩種格式：帶時間軸的原文與只有行號的文字行 (correct.py 的 COMPACT_LINES)
+
+產生假的逐字稿 (.txt 與 fwhisper.py 寫的 .segments.jsonl)，以假的 Gemini 伺服器執行 correct_transcript，
+比較送出的字數與片段數，並確認校正後的時間軸與原本完全相同。
+另外以一個會漏掉行的假回應測試行數不符時的處理 (該片段保留原文，其餘片段照常校正)。
+
+使用方式 (在專案根目錄執行):
+    python benchmarks/bench_compact_lines.py --lines 20000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import correct
+from fwhisper import segments_path
+from gemini_api import create_client
+from gemini_cache import ResponseCache
+from stand_ins import FakeGeminiServer, fake_reply
+
+SENTENCES = [
+    "今天我們來聊聊最近的經濟情勢",
+    "這個觀點其實很有意思",
+    "我覺得市場還會再觀察一段時間",
+    "好",
+    "對",
+    "我們先休息一下，馬上回來",
+]
+
+def write_transcript(path, lines, seed=0):
+    """
+    寫出 lines 行的逐字稿與對應的 .segments.jsonl (與 fwhisper.py 的輸出格式相同)
+    """
+    rng = random.Random(seed)
+    t = 0.0
+    with open(path, "w", encoding="utf-8") as txt, open(segments_path(path), "w", encoding="utf-8") as seg:
+        for _ in range(lines):
+            text = rng.choice(SENTENCES)
+            start, end = round(t, 2), round(t + 0.3 * len(text), 2)
+            txt.write(f"[{start:.2f}s -> {end:.2f}s] {text}\n")
+            seg.write(json.dumps({"start": start, "end": end, "text": text}, ensure_ascii=False) + "\n")
+            t = end + rng.uniform(0.1, 1.0)
+
+def timestamps(path):
+    with open(path, encoding="utf-8") as f:
+        return [line.split("] ", 1)[0] for line in f if line.strip()]
+
+def run(server, client, path, compact, tmp):
+    cache = ResponseCache(os.path.join(tmp, f"{os.path.basename(path)}.sqlite3"))
+    before = (server.requests, len(server.sent_chars))
+    start = time.perf_counter()
+    output = correct.correct_transcript(path, client=client, cache=cache, precorrect=False, compact=compact)
+    elapsed = time.perf_counter() - start
+    return output, server.requests - before[0], sum(server.sent_chars[before[1]:]), elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, default=20000)
+    parser.add_argument("--latency", type=float, default=0.2, help="假 Gemini 伺服器每個請求的延遲 (秒)")
+    args = parser.parse_args()
+
+    sent_chars = []
+    drop_line = {"enabled": False}
+
+    def reply(prompt):
+        sent_chars.append(len(prompt))
+        text = fake_reply(prompt)
+        if drop_line["enabled"] and "[1] " in text:
+            # 只弄壞第一個片段：漏掉一行
+            text = "\n".join(text.split("\n")[1:])
+        return text
+
+    with tempfile.TemporaryDirectory() as tmp, FakeGeminiServer(latency=args.latency, reply=reply) as server:
+        server.sent_chars = sent_chars
+        client = create_client(api_key="fake", base_url=server.url)
+
+        results = {}
+        for name, compact in (("帶時間軸", False), ("只送行號", True)):
+            path = os.path.join(tmp, f"{compact}.txt")
+            write_transcript(path, args.lines)
+            output, requests, chars, elapsed = run(server, client, path, compact, tmp)
+            same = timestamps(output) == timestamps(path)
+            results[name] = (requests, chars, elapsed, same)
+
+        path = os.path.join(tmp, "mangled.txt")
+        write_transcript(path, args.lines)
+        drop_line["enabled"] = True
+        output, _, _, _ = run(server, client, path, True, tmp)
+        with open(path, encoding="utf-8") as f, open(output, encoding="utf-8") as g:
+            mangled_ok = f.read() == g.read()
+
+    print()
+    for name, (requests, chars, elapsed, same) in results.items():
+        print(f"{name:>6}: {requests:4d} 個 LLM 請求, 送出 {chars:>9} 字 (約同等 token 數), {elapsed:6.2f} 秒, 時間軸相同: {same}")
+    (_, full, _, _), (_, compact, _, _) = results.values()
+    print(f"送出的字數減少 {100 * (1 - compact / full):.1f}%")
+    print(f"回應漏掉一行時保留原文且時間軸不變: {mangled_ok}")
+    if not all(same for *_, same in results.values()) or not mangled_ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+測試 correct.py 的並行校正：對本機的假 Gemini 伺服器注入延遲與 429/5xx 錯誤，
+比較循序與並行的處理時間，並確認輸出仍維持原本的片段順序。
+
+使用方式 (在專案根目錄執行):
+    python benchmarks/bench_correct.py --lines 3000 --chunk-size 5000 --latency 1.0 --error-rate 0.05 --rate-limit 3
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from stand_ins import FakeGeminiServer
+import correct
+import gemini_api
+from gemini_cache import ResponseCache
+
+def make_transcript(path, lines):
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(lines):
+            f.write(f"[{i * 5.0:.2f}s -> {i * 5.0 + 4.5:.2f}s] 第 {i} 行測試逐字稿內容\n")
+
+def run(file_path, client, max_concurrency, cache):
+    limiter = gemini_api.AdaptiveLimiter(max_concurrency)
+    start = time.time()
+    # 關閉本地 hotword 校正，讓每個片段都送給 LLM
+    output_file = correct.correct_transcript(file_path, client=client, limiter=limiter, cache=cache, precorrect=False, compact=False)
+    return time.time() - start, output_file, limiter
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, default=3000)
+    parser.add_argument("--chunk-size", type=int, default=5000, help="覆寫 correct.CHUNK_SIZE 以產生較多片段")
+    parser.add_argument("--latency", type=float, default=1.0, help="每個請求的延遲 (秒)")
+    parser.add_argument("--error-rate", type=float, default=0.05, help="隨機注入錯誤的機率")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--rate-limit", type=int, default=3, help="假伺服器允許的同時請求數，超過時回傳 429")
+    parser.add_argument("--concurrency", type=int, default=6)
+    args = parser.parse_args()
+
+    correct.CHUNK_SIZE = args.chunk_size
+    # 測試時縮短退避時間
+    gemini_api.RETRY_BASE_DELAY = 0.2
+    gemini_api.MAX_RETRIES = 10
+
+    with tempfile.TemporaryDirectory() as tmp, \
+         FakeGeminiServer(latency=args.latency, error_rate=args.error_rate, error_status=args.error_status,
+                          max_concurrent=args.rate_limit) as gemini:
+        client = gemini_api.create_client(api_key="benchmark", base_url=gemini.url)
+        results = {}
+        for mode, concurrency in (("serial", 1), ("concurrent", args.concurrency)):
+            path = os.path.join(tmp, f"{mode}.txt")
+            make_transcript(path, args.lines)
+            cache = ResponseCache(path=os.path.join(tmp, f"{mode}.sqlite3"))
+            elapsed, output_file, limiter = run(path, client, concurrency, cache)
+            if not output_file:
+                print(f"{mode}: 校正失敗")
+                sys.exit(1)
+            with open(path, encoding="utf-8") as f:
+                expected = f.read().split("\n")
+            with open(output_file, encoding="utf-8") as f:
+                actual = f.read().split("\n")
+            in_order = [l for l in expected if l] == [l for l in actual if l]
+            results[mode] = (elapsed, limiter, in_order)
+
+        print()
+        print(f"Chunks: {len(correct.split_text_by_lines(open(path, encoding='utf-8').read(), max_chars=args.chunk_size))}, "
+              f"requests: {gemini.requests}, rate limited: {gemini.rate_limited}, injected errors: {gemini.errors}")
+        for mode, (elapsed, limiter, in_order) in results.items():
+            print(f"{mode:>10}: {elapsed:.2f} s, throttles: {limiter.throttles}, "
+                  f"final limit: {limiter.limit}/{limiter.max_concurrency}, order preserved: {in_order}")
+        print(f"Speedup: {results['serial'][0] / results['concurrent'][0]:.2f}x")
+        if not all(in_order for _, _, in_order in results.values()):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
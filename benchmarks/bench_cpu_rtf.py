@@ -0,0 +1,69 @@
+"""
+量測 fwhisper.transcribe_file 在 CPU 上逐段解碼與批次解碼的即時倍率 (音訊秒數 / 實際耗時)，用來估算 CPU worker 的數量
+
+需要 faster-whisper 與一段有人聲的錄音 (VAD 會略過靜音或合成的音調)，第一次執行會從 Hugging Face Hub 下載模型。
+
+使用方式 (在專案根目錄執行):
+    python benchmarks/bench_cpu_rtf.py episode.mp3 --model tiny --threads 4 8 --batch-sizes 0 8 16
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+# 每次都從原始音檔解碼，量測的是完整的轉錄時間
+os.environ["WHISPER_AUDIO_CACHE"] = "0"
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import fwhisper
+
+SAMPLE_RATE = 16000
+
+def audio_seconds(path):
+    from faster_whisper import decode_audio
+
+    return len(decode_audio(path, sampling_rate=SAMPLE_RATE)) / SAMPLE_RATE
+
+def run(audio, model_size, threads, batch_size, num_workers, work_dir):
+    """
+    以指定設定載入模型並轉錄一次，回傳 transcribe_file 的耗時
+    """
+    model = fwhisper.load_model(model_size, device="cpu", cpu_threads=threads, num_workers=num_workers, batch_size=batch_size)
+    # 已有 .txt 的音檔會被 transcribe_file 跳過，每次都轉錄一份新的複本
+    target = os.path.join(work_dir, f"t{threads}_b{batch_size}{os.path.splitext(audio)[1]}")
+    shutil.copyfile(audio, target)
+
+    start = time.perf_counter()
+    fwhisper.transcribe_file(target, model)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("audio", help="有人聲的錄音檔 (mp3 / m4a / wav)")
+    parser.add_argument("--model", default="tiny")
+    parser.add_argument("--threads", type=int, nargs="+", default=[os.cpu_count() or 1], help="要測試的 cpu_threads")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[0, fwhisper.CPU_BATCH_SIZE], help="要測試的批次大小 (0 = 逐段解碼)")
+    parser.add_argument("--num-workers", type=int, default=fwhisper.NUM_WORKERS)
+    args = parser.parse_args()
+
+    duration = audio_seconds(args.audio)
+    print(f"音檔: {args.audio} ({duration:.1f} 秒), 模型 {args.model}, {os.cpu_count()} 個 CPU")
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for threads in args.threads:
+            for batch_size in args.batch_sizes:
+                elapsed = run(args.audio, args.model, threads, batch_size, args.num_workers, tmp)
+                results.append((threads, batch_size, elapsed))
+
+    print()
+    print(f"{'threads':>7} {'batch':>5} {'wall (s)':>9} {'RTF':>7}")
+    for threads, batch_size, elapsed in results:
+        print(f"{threads:>7} {batch_size or 1:>5} {elapsed:>9.2f} {duration / elapsed:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""
+驗證常駐模式 (podcast_daemon.py)：新單集發布後多久產生摘要、修改設定檔後不需重啟、停止時不會遺失工作
+
+以本機的假 RSS / 音檔伺服器、假的 Whisper 模型與假的 Gemini 伺服器執行 PodcastDaemon (輪詢間隔縮短成數秒)：
+1. 逐一在 RSS 中發布 --episodes 集新單集，量測從發布到摘要完成的時間
+2. 在設定檔中新增一個節目，量測從存檔到該節目的摘要完成的時間 (不重新啟動)
+3. 同時發布兩集後，在第一集轉錄到一半時停止：正在執行的階段會完成，尚未開始的工作留在工作帳本，
+   重新啟動後全部完成
+
+同時量測每次啟動 dl_podcast.py 的 import 時間 (排程執行時每次都要付出，另外還有載入 Whisper 模型的時間)。
+
+使用方式 (在專案根目錄執行):
+    python benchmarks/bench_daemon.py --interval 2 --episodes 3
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+# 假音檔無法解碼，不使用音訊快取
+os.environ["WHISPER_AUDIO_CACHE"] = "0"
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import dl_podcast
+import podcast_daemon
+import summarize
+from feed_state import FeedState
+from gemini_api import create_client
+from gemini_cache import ResponseCache
+from job_ledger import JobLedger
+from podcast_daemon import PodcastDaemon
+from stand_ins import FakeGeminiServer, FakeWhisperModel, FileServer, make_audio_files
+
+class CountingModel(FakeWhisperModel):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.calls = 0
+
+    def transcribe(self, audio, **kwargs):
+        with self._lock:
+            self.calls += 1
+        return super().transcribe(audio, **kwargs)
+
+class FakeFeed:
+    """
+    本機的假節目：publish() 在 RSS 最前面加上一集新單集 (以 os.replace 原子替換檔案)
+    """
+    def __init__(self, name, serve_dir, base_url):
+        self.name = name
+        self.serve_dir = serve_dir
+        self.base_url = base_url
+        self.path = os.path.join(serve_dir, f"{name}.xml")
+        self.items = []
+
+    @property
+    def url(self):
+        return f"{self.base_url}/{self.name}.xml"
+
+    def publish(self):
+        """
+        發布一集新單集，回傳標題
+        """
+        index = len(self.items)
+        audio = make_audio_files(self.serve_dir, 1, size=64 * 1024, prefix=f"{self.name}_{index:03d}_")[0]
+        title = f"{self.name} ep{index}"
+        self.items.insert(0,
+            f"<item><title>{title}</title><guid>{self.name}-{index}</guid>"
+            f"<enclosure url=\"{self.base_url}/{audio}\" type=\"audio/mpeg\"/></item>"
+        )
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(f"<?xml version='1.0'?><rss version='2.0'><channel><title>{self.name}</title>{''.join(self.items)}</channel></rss>")
+        os.replace(tmp, self.path)
+        return title
+
+    def summary_path(self, title):
+        return os.path.join("podcasts", dl_podcast.sanitize_filename(self.name), dl_podcast.sanitize_filename(title) + "_corrected_summary.md")
+
+def write_config(path, names, interval, jitter):
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"defaults": {"interval_minutes": interval / 60, "jitter": jitter}, "podcasts": names}, f, ensure_ascii=False)
+    os.replace(path + ".tmp", path)
+
+def wait_for(path, timeout):
+    """
+    等待檔案出現，回傳經過的秒數 (逾時回傳 None)
+    """
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if os.path.exists(path):
+            return time.perf_counter() - start
+        time.sleep(0.05)
+    return None
+
+def start_daemon(config_path, client, cache, model, state, ledger_path):
+    pipeline = dl_podcast.build_pipeline(client=client, get_model=lambda: model, cache=cache, state=state, ledger=JobLedger(ledger_path),
+                                         keep_results=podcast_daemon.KEEP_RESULTS).start()
+    daemon = PodcastDaemon(config_path, pipeline, state=state, ledger=JobLedger(ledger_path))
+    thread = threading.Thread(target=daemon.run, daemon=True)
+    thread.start()
+    return daemon, thread, pipeline
+
+def measure_startup():
+    """
+    每次執行 dl_podcast.py 時 import 模組的時間 (秒)
+    """
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", "import dl_podcast"], cwd=ROOT, capture_output=True)
+    return time.perf_counter() - start if result.returncode == 0 else None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--interval", type=float, default=2, help="輪詢間隔 (秒)")
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--episodes", type=int, default=3)
+    parser.add_argument("--transcribe-delay", type=float, default=0.5)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--verbose", action="store_true", help="印出常駐程式的輸出")
+    args = parser.parse_args()
+
+    podcast_daemon.CONFIG_CHECK_INTERVAL = 0.5
+    podcast_daemon.STARTUP_SPREAD = 0.5
+    summarize.PROMPT_TEMPLATE_PATH = os.path.join(ROOT, "prompt_template.md")
+    startup = measure_startup()
+    cwd = os.getcwd()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        serve_dir = os.path.join(tmp, "serve")
+        work_dir = os.path.join(tmp, "work")
+        os.makedirs(serve_dir)
+        os.makedirs(work_dir)
+        # 單集存在相對路徑 podcasts/ 之下
+        os.chdir(work_dir)
+        if not args.verbose:
+            devnull = open(os.devnull, "w")
+            real_stdout, sys.stdout = sys.stdout, devnull
+
+        try:
+            with FileServer(serve_dir) as files, FakeGeminiServer(latency=0.05) as gemini:
+                client = create_client(api_key="benchmark", base_url=gemini.url)
+                cache = ResponseCache(os.path.join(tmp, "cache.sqlite3"))
+                state = FeedState(os.path.join(tmp, "feeds.sqlite3"))
+                ledger_path = os.path.join(tmp, "jobs.sqlite3")
+                model = CountingModel(delay=args.transcribe_delay, num_segments=20)
+                show_a, show_b = FakeFeed("showA", serve_dir, files.url), FakeFeed("showB", serve_dir, files.url)
+                for feed in (show_a, show_b):
+                    # 以快取的搜尋結果取代 iTunes 搜尋
+                    state.set_feed_url(feed.name, feed.url, feed.name)
+                first_b = show_b.publish()
+
+                config_path = os.path.join(tmp, "podcasts.json")
+                write_config(config_path, [show_a.name], args.interval, args.jitter)
+                daemon, thread, pipeline = start_daemon(config_path, client, cache, model, state, ledger_path)
+
+                # 1. 發布新單集 -> 摘要完成
+                latencies = []
+                for _ in range(args.episodes):
+                    title = show_a.publish()
+                    latencies.append(wait_for(show_a.summary_path(title), args.timeout))
+
+                # 2. 修改設定檔，新增節目
+                write_config(config_path, [show_a.name, show_b.name], args.interval, args.jitter)
+                reload_latency = wait_for(show_b.summary_path(first_b), args.timeout)
+
+                # 3. 同時發布兩集，在轉錄進行中停止
+                calls = model.calls
+                pending = [(show_a, show_a.publish()), (show_b, show_b.publish())]
+                start = time.perf_counter()
+                while model.calls == calls and time.perf_counter() - start < args.timeout:
+                    time.sleep(0.01)
+                daemon.stop()
+                thread.join()
+                completed, failures = pipeline.close(drain=False)
+                discarded = len(pipeline.discarded)
+                # 停止時正在轉錄的單集應該已完成轉錄 (逐字稿以 .partial 寫入，完成後才改名)
+                transcribed = sum(os.path.exists(feed.summary_path(title).replace("_corrected_summary.md", ".txt")) for feed, title in pending)
+                left_in_ledger = len(JobLedger(ledger_path).resume_jobs())
+
+                # 重新啟動：帳本中未完成的單集會繼續處理
+                daemon, thread, pipeline = start_daemon(config_path, client, cache, model, state, ledger_path)
+                restarted = [wait_for(feed.summary_path(title), args.timeout) for feed, title in pending]
+                daemon.stop()
+                thread.join()
+                failures += pipeline.close(drain=False)[1]
+                polls = daemon.polls
+        finally:
+            os.chdir(cwd)
+            if not args.verbose:
+                sys.stdout = real_stdout
+                devnull.close()
+
+    print(f"輪詢間隔 {args.interval:g} 秒 (抖動 ±{args.jitter:.0%}), 轉錄 {args.transcribe_delay:g} 秒/集")
+    print("發布到摘要完成: " + ", ".join("逾時" if t is None else f"{t:.2f} 秒" for t in latencies))
+    print(f"修改設定檔到新節目的摘要完成: {'逾時' if reload_latency is None else f'{reload_latency:.2f} 秒'} (不重新啟動)")
+    print(f"轉錄中停止: 進行中的轉錄完成 {transcribed} 集, 捨棄 {discarded} 個尚未開始的工作, 帳本中留下 {left_in_ledger} 集未完成")
+    print("重新啟動後完成: " + ", ".join("逾時" if t is None else f"{t:.2f} 秒" for t in restarted) + f" (重新啟動後輪詢 {polls} 次)")
+    if startup is not None:
+        print(f"排程執行每次的 import 時間: {startup:.2f} 秒 (另加 Whisper 模型載入)，常駐模式只在啟動時付出一次")
+    ok = all(t is not None for t in latencies + restarted) and reload_latency is not None and not failures
+    ok = ok and transcribed >= 1 and left_in_ledger >= 1
+    print(f"所有單集完成、設定檔重新載入、停止時完成進行中的階段且沒有遺失工作: {ok}")
+    if not ok:
+        for stage_name, job, error in failures:
+            print(f"  [失敗] {stage_name}: {job['title']} ({error})")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+驗證單集去重索引 (episode_index.py)：重新上架或轉貼到其他 feed 的單集不會再轉錄與摘要
+
+以合成的 mp3 (類似語音的音調與音節起伏) 建立兩輪單集，第一輪正常處理：
+- A: 原始單集；D: 另一段無關的音訊
+第二輪：
+- B: 與 A 完全相同的檔案，出現在另一個 feed (以內容雜湊比對)
+- C: A 以不同位元率、取樣率、音量並在開頭多了兩秒靜音重新編碼 (以音訊指紋比對)
+- E: 與 A 同一個 feed、同一個 GUID，但標題改了 (以 GUID 比對，不會下載)
+- F: 新的無關單集 (應該正常處理，不能被誤判為重複)
+檢查第二輪只轉錄 F 一次、LLM 請求少於第一輪 (兩集)，且所有單集都有摘要
+
+使用方式 (在專案根目錄執行):
+    python benchmarks/bench_dedup.py --minutes 3
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+# 音訊快取與去重無關，關閉以免影響轉錄次數
+os.environ["WHISPER_AUDIO_CACHE"] = "0"
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import av
+import numpy as np
+import dl_podcast
+import episode_index
+import metrics
+from episode_index import EpisodeIndex
+from gemini_api import create_client
+from gemini_cache import ResponseCache
+from stand_ins import FakeGeminiServer, FakeWhisperModel, FileServer
+
+class CountingModel(FakeWhisperModel):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.calls = 0
+
+    def transcribe(self, audio, **kwargs):
+        with self._lock:
+            self.calls += 1
+        return super().transcribe(audio, **kwargs)
+
+def synth_speech(seed, minutes, rate=16000):
+    """
+    產生類似語音的訊號：每 0.25 秒換一組音高的多個音調，乘上音節般的起伏，加上少量雜訊
+    """
+    rng = np.random.default_rng(seed)
+    length = int(minutes * 60 * rate)
+    steps = -(-length // (rate // 4))
+    signal = np.zeros(length)
+    for _ in range(6):
+        freq = np.repeat(rng.uniform(150, 1800, size=steps), rate // 4)[:length]
+        signal += np.sin(np.cumsum(2 * np.pi * freq / rate)) * rng.uniform(0.2, 1.0)
+    t = np.arange(length) / rate
+    signal = signal * np.abs(np.sin(2 * np.pi * rng.uniform(2, 5) * t)) + 0.05 * rng.standard_normal(length)
+    return (signal / np.abs(signal).max() * 0.8).astype(np.float32), rate
+
+def write_mp3(path, samples, rate, bitrate=128000, out_rate=44100):
+    with av.open(path, "w") as container:
+        stream = container.add_stream("libmp3lame", rate=out_rate)
+        stream.bit_rate = bitrate
+        stream.layout = "mono"
+        resampler = av.AudioResampler(format=stream.format.name, layout="mono", rate=out_rate)
+        for i in range(0, len(samples), rate):
+            frame = av.AudioFrame.from_ndarray(samples[None, i:i + rate], format="flt", layout="mono")
+            frame.sample_rate = rate
+            for resampled in resampler.resample(frame):
+                for packet in stream.encode(resampled):
+                    container.mux(packet)
+        for packet in stream.encode(None):
+            container.mux(packet)
+
+def make_episodes(directory, minutes):
+    os.makedirs(directory, exist_ok=True)
+    original, rate = synth_speech(1, minutes)
+    write_mp3(os.path.join(directory, "a.mp3"), original, rate)
+    shutil.copy(os.path.join(directory, "a.mp3"), os.path.join(directory, "b.mp3"))
+    reencoded = np.concatenate([np.zeros(rate * 2, dtype=np.float32), original * 0.6])
+    write_mp3(os.path.join(directory, "c.mp3"), reencoded, rate, bitrate=48000, out_rate=22050)
+    for name, seed in (("d", 2), ("f", 3)):
+        write_mp3(os.path.join(directory, f"{name}.mp3"), *synth_speech(seed, minutes))
+
+def make_job(base_url, out_dir, feed, guid, audio, title):
+    return {
+        "feed_url": f"https://example.com/{feed}.xml",
+        "guid": guid,
+        "title": title,
+        "audio_url": f"{base_url}/{audio}",
+        "filename": os.path.join(out_dir, dl_podcast.sanitize_filename(title) + ".mp3"),
+        "progress": "[1/1]",
+        "podcast": feed,
+    }
+
+def run_round(jobs, client, cache, index, model):
+    pipeline = dl_podcast.build_pipeline(client=client, get_model=lambda: model, cache=cache, index=index).start()
+    for job in jobs:
+        pipeline.submit(job)
+    return pipeline.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, default=3, help="每集的長度 (分鐘)")
+    parser.add_argument("--verbose", action="store_true", help="印出處理管線的輸出")
+    args = parser.parse_args()
+
+    # summarize.py 以相對路徑讀取 prompt_template.md
+    os.chdir(ROOT)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        audio_dir = os.path.join(tmp, "audio")
+        out_dir = os.path.join(tmp, "podcasts")
+        os.makedirs(out_dir)
+        make_episodes(audio_dir, args.minutes)
+        metrics._default_metrics = metrics.Metrics(path=os.path.join(tmp, "metrics.jsonl"), textfile=None, enabled=True)
+        index = EpisodeIndex(os.path.join(tmp, "episodes.sqlite3"))
+        model = CountingModel(delay=0.1, num_segments=20)
+
+        with FileServer(audio_dir) as files, FakeGeminiServer(latency=0.02) as gemini:
+            client = create_client(api_key="benchmark", base_url=gemini.url)
+            rounds = [
+                ("第一輪", [
+                    make_job(files.url, out_dir, "feed1", "a", "a.mp3", "原始單集 A"),
+                    make_job(files.url, out_dir, "feed1", "d", "d.mp3", "無關單集 D"),
+                ]),
+                ("第二輪", [
+                    make_job(files.url, out_dir, "feed2", "b", "b.mp3", "轉貼 B"),
+                    make_job(files.url, out_dir, "feed3", "c", "c.mp3", "重新編碼 C"),
+                    make_job(files.url, out_dir, "feed1", "a", "a.mp3", "原始單集 A (重新上架)"),
+                    make_job(files.url, out_dir, "feed2", "f", "f.mp3", "新單集 F"),
+                ]),
+            ]
+            if not args.verbose:
+                devnull = open(os.devnull, "w")
+                real_stdout, sys.stdout = sys.stdout, devnull
+            results = []
+            try:
+                for name, jobs in rounds:
+                    before = (model.calls, gemini.requests, files.requests)
+                    start = time.perf_counter()
+                    # 每一輪使用空的回應快取，LLM 請求數反映實際重做的工作
+                    cache = ResponseCache(os.path.join(tmp, f"{name}.sqlite3"), bypass=True)
+                    completed, failures = run_round(jobs, client, cache, index, model)
+                    results.append((name, len(jobs), model.calls - before[0], gemini.requests - before[1],
+                                    files.requests - before[2], time.perf_counter() - start, failures))
+            finally:
+                if not args.verbose:
+                    sys.stdout = real_stdout
+                    devnull.close()
+
+        metrics._default_metrics.close()
+        dedup = [e for e in metrics.load_events(metrics._default_metrics.path) if e["event"] == "dedup"]
+        summaries = [job for _, jobs in rounds for job in jobs
+                     if os.path.exists(os.path.splitext(job["filename"])[0] + "_corrected_summary.md")]
+        stats = index.stats()
+        fingerprints = {name: episode_index.audio_fingerprint(os.path.join(audio_dir, f"{name}.mp3")) for name in "acd"}
+        start = time.perf_counter()
+        reencoded = episode_index.fingerprint_distance(fingerprints["a"][0], fingerprints["c"][0])
+        compare_time = time.perf_counter() - start
+        unrelated = episode_index.fingerprint_distance(fingerprints["a"][0], fingerprints["d"][0])
+        index.close()
+
+    print(f"每集 {args.minutes:g} 分鐘, 指紋取開頭 {episode_index.FINGERPRINT_SECONDS} 秒")
+    for name, count, transcribed, requests, downloads, elapsed, failures in results:
+        print(f"{name}: {count} 集, 轉錄 {transcribed} 次, LLM 請求 {requests} 次, 音檔請求 {downloads} 次, "
+              f"{elapsed:.2f} 秒, {len(failures)} 個失敗")
+    for event in dedup:
+        print(f"  去重: {event['method']}, 沿用 {event.get('linked')} 個檔案, 位元錯誤率 {event.get('distance')}")
+    print(f"指紋位元錯誤率: 重新編碼 {reencoded:.3f}, 無關音訊 {unrelated:.3f} (門檻 {episode_index.MATCH_THRESHOLD}, 比對 {compare_time * 1000:.1f} ms)")
+    print(f"索引: {stats}")
+
+    first, second = results
+    methods = sorted(e["method"] for e in dedup)
+    ok = not first[6] and not second[6] and len(summaries) == 6
+    ok = ok and first[2] == 2 and second[2] == 1 and second[3] < first[3]
+    ok = ok and methods == ["fingerprint", "sha256", "source"]
+    print(f"重複的單集沿用既有的逐字稿與摘要、新單集正常處理: {ok}")
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+測試 downloader.py：對本機檔案伺服器 (可切換是否支援 Range、限制每個連線的頻寬、中途斷線)
+比較單一連線與分段下載的速度，並確認中斷後能正確續傳、最終檔案與來源完全相同。
+
+使用方式 (在專案根目錄執行):
+    python benchmarks/bench_download.py --size-mb 48 --bandwidth-mb 8
+"""
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from stand_ins import FileServer, make_audio_files
+import downloader
+
+def sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def check(name, ok):
+    print(f"[{'OK' if ok else 'FAIL'}] {name}")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=48)
+    parser.add_argument("--bandwidth-mb", type=float, default=8.0, help="每個連線的頻寬上限 (MB/s)")
+    parser.add_argument("--segments", type=int, default=downloader.SEGMENTS)
+    args = parser.parse_args()
+
+    size = args.size_mb * 1024 * 1024
+    bandwidth = args.bandwidth_mb * 1024 * 1024
+    results = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        src_dir = os.path.join(tmp, "src")
+        name = make_audio_files(src_dir, 1, size=size)[0]
+        expected = sha256(os.path.join(src_dir, name))
+
+        def target(label):
+            return os.path.join(tmp, f"{label}.mp3")
+
+        timings = {}
+        with FileServer(src_dir, bandwidth=bandwidth) as server:
+            url = f"{server.url}/{name}"
+            for label, segments in (("single", 1), ("segmented", args.segments)):
+                start = time.time()
+                downloader.download_file(url, target(label), segments=segments)
+                timings[label] = time.time() - start
+                results.append(check(f"{label} download matches source", sha256(target(label)) == expected))
+
+            # 已完整存在的檔案不會重新下載
+            before = server.bytes_sent
+            # 只有探測用的 1 byte
+            results.append(check("complete file is skipped", downloader.download_file(url, target("segmented")) is False
+                                 and server.bytes_sent - before <= 1))
+
+            # 舊版留下的未完成檔案 (直接寫在最終檔名) 會改成 .part 續傳
+            legacy = target("legacy")
+            with open(os.path.join(src_dir, name), "rb") as src, open(legacy, "wb") as dst:
+                dst.write(src.read(size // 3))
+            before = server.bytes_sent
+            downloader.download_file(url, legacy)
+            results.append(check("legacy partial file resumed", sha256(legacy) == expected
+                                 and server.bytes_sent - before < size))
+
+        # 中途斷線後續傳：每段傳到一半就斷線，manifest 每 1 MB 記錄一次進度
+        downloader.MANIFEST_INTERVAL = 1024 * 1024
+        with FileServer(src_dir, fail_after=size // args.segments // 2) as server:
+            url = f"{server.url}/{name}"
+            interrupted = target("interrupted")
+            try:
+                downloader.download_file(url, interrupted, segments=args.segments)
+                results.append(check("interrupted download raises", False))
+            except Exception as e:
+                results.append(check(f"interrupted download raises ({type(e).__name__})", True))
+            results.append(check("no final file after interruption", not os.path.exists(interrupted)))
+            results.append(check("manifest kept for resume", os.path.exists(interrupted + ".part.json")))
+
+            server.fail_after = None
+            before = server.bytes_sent
+            downloader.download_file(url, interrupted, segments=args.segments)
+            resumed_bytes = server.bytes_sent - before
+            results.append(check(f"resume matches source (re-sent {resumed_bytes}/{size} bytes)",
+                                 sha256(interrupted) == expected and resumed_bytes < size))
+
+        # 不支援 Range 的伺服器：單一連線下載，且不會誤把 200 當成續傳
+        with FileServer(src_dir, support_range=False) as server:
+            url = f"{server.url}/{name}"
+            no_range = target("no_range")
+            with open(no_range + ".part", "wb") as f:
+                f.write(b"garbage")
+            downloader.download_file(url, no_range, segments=args.segments)
+            results.append(check("server without Range support", sha256(no_range) == expected))
+
+    print()
+    for label, elapsed in timings.items():
+        print(f"{label:>10}: {elapsed:.2f} s ({size / elapsed / 1024 / 1024:.1f} MB/s)")
+    print(f"Speedup: {timings['single'] / timings['segmented']:.2f}x")
+    if not all(results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
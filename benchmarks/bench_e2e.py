@@ -0,0 +1,310 @@
+"""
+端對端的離線 benchmark：搜尋 -> RSS -> 下載 -> 轉錄 -> 校正 -> 摘要，全部使用本機替身
+
+- 本機 HTTP 伺服器提供假的 RSS feed 與音檔 (--no-range 模擬不支援 Range 的 CDN，--bandwidth 限制頻寬)
+- 假的 Gemini 伺服器 (可設定延遲、錯誤率與錯誤代碼；校正請求 echo 輸入內容)
+- 轉錄使用假的模型 (--rtf 指定即時倍率)，或以 --transcriber tiny 在 CPU 上執行 faster-whisper tiny
+  (需要 --audio 指定一個真的音檔，並且能下載模型或已有快取)
+
+iTunes 搜尋由 FeedState 中預先寫入的搜尋結果取代，其餘流程與 dl_podcast.py 相同 (dl_podcast.discover_podcast +
+多階段管線 + 工作帳本)。結束後由量測記錄 (metrics.py) 與工作帳本整理出：
+- 端對端的吞吐量 (集數 / 小時、音檔小時數 / 小時) 與每集從發現到摘要完成的延遲 (p50 / p95 / 最大)
+- 每個階段的執行時間分布、Gemini 請求的延遲與重試次數、RSS 解析時間與下載速度
+
+結果存成 JSON (預設 benchmarks/results/e2e-<時間>.json)，以 --compare 與先前的結果比較。
+
+使用方式 (在專案根目錄執行):
+    python benchmarks/bench_e2e.py --shows 4 --episodes 3 --audio-minutes 30
+    python benchmarks/bench_e2e.py --llm-error-rate 0.1 --compare benchmarks/results/e2e-20260101-120000.json
+    python benchmarks/bench_e2e.py --transcriber tiny --audio sample.mp3 --shows 1 --episodes 2
+"""
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# 假音檔無法解碼，不使用音訊快取
+os.environ["WHISPER_AUDIO_CACHE"] = "0"
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import dl_podcast
+import metrics
+import summarize
+from feed_state import FeedState
+from gemini_api import create_client
+from gemini_cache import ResponseCache
+from job_ledger import JobLedger
+from stand_ins import FakeGeminiServer, FakeWhisperModel, FileServer, make_audio_files, make_feed
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+def percentiles(values):
+    if not values:
+        return None
+    values = sorted(values)
+    pick = lambda p: values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+    return {"n": len(values), "mean": round(statistics.mean(values), 4), "p50": pick(50), "p95": pick(95), "max": values[-1]}
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+def make_shows(serve_dir, base_url, shows, episodes, audio=None, audio_size=256 * 1024):
+    """
+    產生 shows 個節目，每個有 episodes 集；回傳 {節目名稱: feed 網址}
+    """
+    feeds = {}
+    for k in range(shows):
+        name = f"show{k:02d}"
+        if audio:
+            names = []
+            for i in range(episodes):
+                names.append(f"{name}_{i:03d}{os.path.splitext(audio)[1]}")
+                shutil.copyfile(audio, os.path.join(serve_dir, names[-1]))
+        else:
+            names = make_audio_files(serve_dir, episodes, size=audio_size, prefix=f"{name}_")
+        feeds[name] = make_feed(serve_dir, base_url, name, names)
+    return feeds
+
+def episode_latencies(ledger_path):
+    """
+    每一集從登記 (發現) 到最後一個階段完成的秒數，只計算所有階段都完成的單集
+    """
+    conn = sqlite3.connect(ledger_path)
+    rows = conn.execute("""
+        SELECT e.created, MAX(s.finished) FROM episodes e JOIN stages s ON s.episode_id = e.id
+        GROUP BY e.id HAVING SUM(s.status = 'done') = ?
+    """, (len(dl_podcast.STAGE_FILES),)).fetchall()
+    conn.close()
+    return [round(finished - created, 3) for created, finished in rows]
+
+def collect(events, wall, completed, failures, latencies, workers):
+    """
+    整理量測記錄
+    """
+    by_event = {}
+    for entry in events:
+        by_event.setdefault(entry["event"], []).append(entry)
+    audio_seconds = sum(e.get("audio_seconds", 0) for e in by_event.get("transcribe", []))
+
+    stages = {}
+    for entry in by_event.get("stage", []):
+        stages.setdefault(entry["stage"], []).append(entry)
+    stage_results = {}
+    for name, entries in stages.items():
+        done = [e["seconds"] for e in entries if not e.get("failed")]
+        stats = percentiles(done)
+        stage_results[name] = {
+            "runs": len(entries),
+            "failed": sum(1 for e in entries if e.get("failed")),
+            "seconds": stats,
+            "busy_seconds": round(sum(done), 3),
+            # 這個階段的 worker 全部忙碌時，每小時最多可以處理的集數
+            "capacity_per_hour": round(workers.get(name, 1) * 3600 / stats["mean"], 1) if stats and stats["mean"] > 0 else None,
+        }
+
+    requests = by_event.get("gemini_request", [])
+    downloads = by_event.get("download", [])
+    return {
+        "wall_seconds": round(wall, 3),
+        "episodes": completed,
+        "failures": failures,
+        "audio_hours": round(audio_seconds / 3600, 3),
+        "throughput": {
+            "episodes_per_hour": round(completed * 3600 / wall, 1),
+            "audio_hours_per_hour": round(audio_seconds / wall, 2),
+        },
+        "episode_latency": percentiles(latencies),
+        "stages": stage_results,
+        "gemini": {
+            "requests": len(requests),
+            "failed": sum(1 for e in requests if e.get("failed")),
+            "retries": sum(e.get("retries", 0) for e in requests),
+            "latency": percentiles([e["latency"] for e in requests if "latency" in e]),
+            "input_chars": sum(e.get("input_chars", 0) for e in requests),
+            "cache_hits": len(by_event.get("gemini_cache_hit", [])),
+        },
+        "feed_poll": percentiles([e["seconds"] for e in by_event.get("feed_poll", [])]),
+        "download_bytes_per_sec": percentiles([e["bytes_per_sec"] for e in downloads]),
+    }
+
+def flatten(result, prefix=""):
+    flat = {}
+    for key, value in result.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[prefix + key] = value
+    return flat
+
+# 與先前結果比較時列出的數值 (越小越好的會標示 "-")
+COMPARE_KEYS = [
+    ("throughput.episodes_per_hour", "+"),
+    ("throughput.audio_hours_per_hour", "+"),
+    ("episode_latency.p50", "-"),
+    ("episode_latency.p95", "-"),
+    ("stages.transcribe.seconds.p95", "-"),
+    ("stages.correct.seconds.p95", "-"),
+    ("stages.summarize.seconds.p95", "-"),
+    ("gemini.requests", "-"),
+    ("gemini.latency.p95", "-"),
+    ("failures", "-"),
+]
+
+def compare(old, new):
+    old_flat, new_flat = flatten(old["results"]), flatten(new["results"])
+    print(f"\n與 {old.get('label') or old.get('timestamp')} (commit {old.get('commit')}) 比較:")
+    for key, better in COMPARE_KEYS:
+        if key not in old_flat or key not in new_flat:
+            continue
+        before, after = old_flat[key], new_flat[key]
+        change = f"{100 * (after - before) / before:+.1f}%" if before else "-"
+        worse = (after < before) if better == "+" else (after > before)
+        print(f"  {key:<34} {before:>10.4g} -> {after:>10.4g}  {change:>8}{'  (變差)' if worse and before and abs(after - before) / before > 0.05 else ''}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shows", type=int, default=4)
+    parser.add_argument("--episodes", type=int, default=3, help="每個節目處理的集數")
+    parser.add_argument("--audio-minutes", type=float, default=30, help="假轉錄模型的每集長度 (分鐘)")
+    parser.add_argument("--rtf", type=float, default=0.002, help="假轉錄模型的即時倍率 (處理時間 / 音檔長度)")
+    parser.add_argument("--transcriber", choices=("stub", "tiny"), default="stub")
+    parser.add_argument("--audio", help="以這個真的音檔作為每一集的音訊 (--transcriber tiny 時必須指定)")
+    parser.add_argument("--audio-size", type=int, default=256 * 1024, help="假音檔的大小 (bytes)")
+    parser.add_argument("--no-range", action="store_true", help="音檔伺服器不支援 Range")
+    parser.add_argument("--download-latency", type=float, default=0.05)
+    parser.add_argument("--bandwidth", type=int, help="每個連線的頻寬上限 (bytes/sec)")
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--llm-per-char", type=float, default=1e-6, help="每個 prompt 字元增加的延遲 (秒)")
+    parser.add_argument("--llm-jitter", type=float, default=0.3, help="延遲的 lognormal 標準差")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-error-status", type=int, default=429)
+    parser.add_argument("--label", help="寫進結果的名稱 (例如分支或設定)")
+    parser.add_argument("--output", help="結果 JSON 的路徑 (預設 benchmarks/results/e2e-<時間>.json)")
+    parser.add_argument("--compare", help="與先前的結果 JSON 比較")
+    parser.add_argument("--verbose", action="store_true", help="印出管線的輸出")
+    args = parser.parse_args()
+    if args.transcriber == "tiny" and not args.audio:
+        parser.error("--transcriber tiny 需要 --audio")
+
+    summarize.PROMPT_TEMPLATE_PATH = os.path.join(ROOT, "prompt_template.md")
+    # 重試的退避時間縮短，讓注入的錯誤不會主導結果
+    import gemini_api
+    gemini_api.RETRY_BASE_DELAY = 0.2
+
+    if args.transcriber == "tiny":
+        import functools
+        import fwhisper
+        get_model = functools.lru_cache(maxsize=None)(lambda: fwhisper.load_model("tiny", device="cpu"))
+    else:
+        model = FakeWhisperModel(delay=args.audio_minutes * 60 * args.rtf, num_segments=max(1, int(args.audio_minutes * 12)))
+        get_model = lambda: model
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        serve_dir = os.path.join(tmp, "serve")
+        work_dir = os.path.join(tmp, "work")
+        os.makedirs(serve_dir)
+        os.makedirs(work_dir)
+        metrics_path = os.path.join(tmp, "metrics.jsonl")
+        # 這次執行的量測寫到暫存檔，不混進 .cache/metrics.jsonl
+        metrics._default_metrics = metrics.Metrics(path=metrics_path, textfile=None, enabled=True)
+        ledger_path = os.path.join(tmp, "jobs.sqlite3")
+
+        with FileServer(serve_dir, latency=args.download_latency, support_range=not args.no_range, bandwidth=args.bandwidth) as files, \
+             FakeGeminiServer(latency=args.llm_latency, per_char_latency=args.llm_per_char, jitter=args.llm_jitter,
+                              error_rate=args.llm_error_rate, error_status=args.llm_error_status) as gemini:
+            feeds = make_shows(serve_dir, files.url, args.shows, args.episodes, audio=args.audio, audio_size=args.audio_size)
+            state = FeedState(os.path.join(tmp, "feeds.sqlite3"))
+            for name, url in feeds.items():
+                # 以快取的搜尋結果取代 iTunes 搜尋
+                state.set_feed_url(name, url, name)
+            ledger = JobLedger(ledger_path)
+            cache = ResponseCache(os.path.join(tmp, "cache.sqlite3"))
+            client = create_client(api_key="benchmark", base_url=gemini.url)
+
+            # 單集以相對路徑 podcasts/ 儲存
+            os.chdir(work_dir)
+            if not args.verbose:
+                devnull = open(os.devnull, "w")
+                real_stdout, sys.stdout = sys.stdout, devnull
+            try:
+                start = time.perf_counter()
+                pipeline = dl_podcast.build_pipeline(client=client, get_model=get_model, cache=cache, state=state, ledger=ledger).start()
+                with ThreadPoolExecutor(max_workers=dl_podcast.FEED_WORKERS) as executor:
+                    futures = [
+                        executor.submit(dl_podcast.discover_podcast, name, num_episodes=args.episodes, pipeline=pipeline, state=state, ledger=ledger)
+                        for name in feeds
+                    ]
+                    for future in futures:
+                        future.result()
+                completed, failures = pipeline.close()
+                wall = time.perf_counter() - start
+                workers = {stage.name: stage.workers for stage in pipeline.stages}
+            finally:
+                os.chdir(cwd)
+                if not args.verbose:
+                    sys.stdout = real_stdout
+                    devnull.close()
+            server_requests = gemini.requests
+
+        metrics._default_metrics.close()
+        events = metrics.load_events(metrics_path)
+        results = collect(events, wall, len(completed), len(failures), episode_latencies(ledger_path), workers)
+        results["gemini"]["server_requests"] = server_requests
+
+    report = {
+        "label": args.label,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": git_commit(),
+        "config": vars(args),
+        "results": results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"e2e-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    total = args.shows * args.episodes
+    print(f"{args.shows} 個節目 x {args.episodes} 集, 轉錄: {args.transcriber}, 經過 {results['wall_seconds']:.2f} 秒")
+    print(f"完成 {results['episodes']}/{total} 集, {results['failures']} 個階段失敗")
+    print(f"吞吐量: {results['throughput']['episodes_per_hour']:.0f} 集/小時, "
+          f"{results['throughput']['audio_hours_per_hour']:.1f} 音檔小時/小時 ({results['audio_hours']:.2f} 小時的音檔)")
+    latency = results["episode_latency"]
+    if latency:
+        print(f"每集延遲 (發現 -> 摘要): p50 {latency['p50']:.2f} 秒, p95 {latency['p95']:.2f} 秒, 最大 {latency['max']:.2f} 秒")
+    print(f"\n{'階段':<10} {'次數':>6} {'失敗':>5} {'p50 (秒)':>10} {'p95 (秒)':>10} {'最大 (秒)':>10} {'容量 (集/小時)':>14}")
+    for name in workers:
+        stage = results["stages"].get(name)
+        if not stage or not stage["seconds"]:
+            continue
+        s = stage["seconds"]
+        print(f"{name:<10} {stage['runs']:>6} {stage['failed']:>5} {s['p50']:>10.3f} {s['p95']:>10.3f} {s['max']:>10.3f} {stage['capacity_per_hour'] or 0:>14.0f}")
+    g = results["gemini"]
+    if g["latency"]:
+        print(f"\nGemini: {g['requests']} 個請求 (伺服器收到 {g['server_requests']} 次), {g['retries']} 次重試, {g['failed']} 個失敗, "
+              f"延遲 p50 {g['latency']['p50']:.2f} 秒 / p95 {g['latency']['p95']:.2f} 秒")
+    if results["feed_poll"]:
+        print(f"RSS 輪詢: p50 {results['feed_poll']['p50'] * 1000:.0f} ms, p95 {results['feed_poll']['p95'] * 1000:.0f} ms")
+    print(f"\n結果已儲存: {output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(json.load(f), report)
+    if results["episodes"] != total:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
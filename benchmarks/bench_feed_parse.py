@@ -0,0 +1,102 @@
+"""
+比較 feedparser 與串流解析 (feed_stream.find_episodes) 在大型 RSS 上找出最新 N 集的時間與記憶體用量
+
+使用方式 (在專案根目錄執行):
+    python benchmarks/bench_feed_parse.py --items 5000 --match-every 50
+"""
+import argparse
+import io
+import os
+import sys
+import time
+import tracemalloc
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import feedparser
+from dl_podcast import select_episodes
+from feed_stream import find_episodes
+
+def make_feed(items, match_every, keyword, description_size=1500):
+    """
+    產生 items 集的 RSS，每 match_every 集有一集標題包含 keyword (最新的在最前面)
+    """
+    now = datetime(2025, 9, 1, 10, 0, tzinfo=timezone.utc)
+    description = "這是單集說明文字。" * (description_size // 9)
+    parts = [
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<rss version="2.0" xmlns:itunes="http://www.itunes.com/dtds/podcast-1.0.dtd">\n'
+        "<channel><title>Synthetic Podcast</title><link>https://example.com</link>\n"
+    ]
+    for i in range(items):
+        title = f"第 {items - i} 集 {keyword if i % match_every == match_every - 1 else '其他主題'}"
+        published = format_datetime(now - timedelta(days=i))
+        parts.append(
+            f"<item><title>{title}</title>"
+            f"<guid isPermaLink=\"false\">episode-{items - i}</guid>"
+            f"<pubDate>{published}</pubDate>"
+            f"<description><![CDATA[{description}]]></description>"
+            f"<itunes:title>{title}</itunes:title>"
+            f"<itunes:duration>3600</itunes:duration>"
+            f"<enclosure url=\"https://cdn.example.com/{items - i}.mp3\" type=\"audio/mpeg\" length=\"52428800\"/>"
+            f"</item>\n"
+        )
+    parts.append("</channel></rss>\n")
+    return "".join(parts).encode("utf-8")
+
+def measure(func):
+    """
+    分開量測時間與記憶體 (tracemalloc 會大幅拖慢 feedparser，不能同時計時)
+    """
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+def summarize(episodes):
+    return [
+        (ep.title, [(link.href, link.type) for link in ep.enclosures], tuple(ep.published_parsed)[:6])
+        for ep in episodes
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--match-every", type=int, default=50, help="每幾集出現一次符合關鍵字的單集")
+    parser.add_argument("--episodes", type=int, default=1, help="要找出的集數 (num_episodes)")
+    parser.add_argument("--keyword", default="經濟學人")
+    args = parser.parse_args()
+
+    data = make_feed(args.items, args.match_every, args.keyword)
+    print(f"Feed: {args.items} items, {len(data) / 1024 / 1024:.1f} MB")
+
+    def with_feedparser():
+        feed = feedparser.parse(data)
+        return select_episodes(feed.entries, args.episodes, keyword=args.keyword)
+
+    def with_stream():
+        selected, _, _ = find_episodes(io.BytesIO(data), args.episodes, keyword=args.keyword)
+        return selected
+
+    fp_result, fp_time, fp_peak = measure(with_feedparser)
+    st_result, st_time, st_peak = measure(with_stream)
+
+    print()
+    print(f"feedparser: {fp_time * 1000:8.1f} ms, peak {fp_peak / 1024 / 1024:6.1f} MB")
+    print(f"    stream: {st_time * 1000:8.1f} ms, peak {st_peak / 1024 / 1024:6.1f} MB")
+    print(f"Speedup: {fp_time / st_time:.1f}x")
+    same = summarize(fp_result) == summarize(st_result)
+    print(f"Same episodes: {same}")
+    if not same:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
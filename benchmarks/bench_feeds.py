@@ -0,0 +1,102 @@
+"""
+比較逐一處理節目與同時處理多個節目 (dl_podcast.discover_podcast) 的搜尋 + RSS 解析 + 下載時間
+
+使用本機的假 RSS / 檔案伺服器 (每個請求固定延遲)，不需要網路。只跑到下載階段，不做轉錄與 LLM。
+
+使用方式 (在專案根目錄執行):
+    python benchmarks/bench_feeds.py --feeds 20 --latency 0.2
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import dl_podcast
+import downloader
+from podcast_log import print_block
+from stand_ins import FileServer, make_audio_files
+
+def make_feeds(directory, base_url, feeds, episodes, audio_size):
+    """
+    產生 feeds 個 RSS，每個有 episodes 集，回傳各節目的名稱
+    """
+    names = []
+    for k in range(feeds):
+        name = f"show{k:03d}"
+        audio = make_audio_files(directory, episodes, audio_size, prefix=f"{name}_")
+        items = "".join(
+            f"<item><title>{name} ep{i}</title><guid>{name}-{i}</guid>"
+            f"<enclosure url=\"{base_url}/{os.path.basename(path)}\" type=\"audio/mpeg\"/></item>"
+            for i, path in enumerate(audio)
+        )
+        with open(os.path.join(directory, f"{name}.xml"), "w", encoding="utf-8") as f:
+            f.write(f"<?xml version='1.0'?><rss version='2.0'><channel><title>{name}</title>{items}</channel></rss>")
+        names.append(name)
+    return names
+
+def run(names, episodes, feed_workers, work_dir):
+    """
+    在 work_dir 中處理所有節目，回傳 (經過時間, 下載的集數, 失敗數, 各節目的輸出)
+    """
+    os.makedirs(work_dir)
+    cwd = os.getcwd()
+    os.chdir(work_dir)
+    try:
+        pipeline = dl_podcast.build_pipeline()
+        # 只保留下載階段
+        pipeline.stages = pipeline.stages[:1]
+        pipeline.start()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=feed_workers) as executor:
+            futures = [executor.submit(dl_podcast.discover_podcast, name, num_episodes=episodes, pipeline=pipeline) for name in names]
+            outputs = [future.result() for future in futures]
+        completed, failures = pipeline.close()
+        elapsed = time.perf_counter() - start
+    finally:
+        os.chdir(cwd)
+    return elapsed, len(completed), len(failures), outputs
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--feeds", type=int, default=20)
+    parser.add_argument("--episodes", type=int, default=2, help="每個節目下載的集數")
+    parser.add_argument("--latency", type=float, default=0.2, help="假伺服器每個請求的延遲 (秒)")
+    parser.add_argument("--audio-size", type=int, default=256 * 1024)
+    parser.add_argument("--workers", type=int, default=dl_podcast.FEED_WORKERS)
+    parser.add_argument("--per-host", type=int, default=downloader.MAX_CONNECTIONS,
+                        help="每個 host 的連線上限 (所有假節目都在同一個 host，預設放寬成全域上限來模擬不同 host)")
+    parser.add_argument("--verbose", action="store_true", help="印出每個節目的輸出")
+    args = parser.parse_args()
+
+    downloader.MAX_CONNECTIONS_PER_HOST = args.per_host
+
+    with tempfile.TemporaryDirectory() as tmp:
+        serve_dir = os.path.join(tmp, "serve")
+        os.makedirs(serve_dir)
+        with FileServer(serve_dir, latency=args.latency) as server:
+            names = make_feeds(serve_dir, server.url, args.feeds, args.episodes, args.audio_size)
+            # 以假伺服器上的 RSS 取代 iTunes 搜尋
+            dl_podcast.get_itunes_feed_url = lambda term, state=None: f"{server.url}/{term}.xml"
+
+            results = {}
+            for mode, workers in (("sequential", 1), ("concurrent", args.workers)):
+                elapsed, done, failed, outputs = run(names, args.episodes, workers, os.path.join(tmp, mode))
+                results[mode] = elapsed
+                print(f"{mode:>10}: {elapsed:6.2f} s, {done} 集下載完成, {failed} 個失敗")
+                if args.verbose:
+                    for text in outputs:
+                        print_block(text)
+                if done != args.feeds * args.episodes or failed:
+                    sys.exit(1)
+
+    print(f"Speedup: {results['sequential'] / results['concurrent']:.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+量測本地 hotword 校正 (hotwords.py) 的速度與省下的 LLM 校正量
+
+產生假的逐字稿與帶有 Whisper 信心值的 .segments.jsonl：每 --noisy-every 個片段有一個片段含有 hotword 同音錯字
+(例如「陳鳳心」、「好哥」) 與只對一半的人名，另一個片段有一行 Whisper 沒有信心，其他片段都是乾淨的。接著：
+- 量測不同長度的逐字稿的校正時間 (應與長度成正比)
+- 以假的 Gemini 伺服器執行 correct_transcript，比較有無本地校正時送出的片段數與字數
+  (本地改寫過、仍有疑似錯誤或信心不足的片段都會送出；假伺服器會原樣回傳內容，
+  「剩下的錯字」只反映本地校正的效果，兩個字的同音詞本來就交給 LLM)
+
+需要 pypinyin。使用方式 (在專案根目錄執行):
+    python benchmarks/bench_hotwords.py --lines 20000 --noisy-every 7
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import correct
+from gemini_api import create_client
+from gemini_cache import ResponseCache
+from hotwords import HotwordCorrector
+from stand_ins import FakeGeminiServer
+
+SENTENCES = [
+    "今天我們來聊聊最近的經濟情勢",
+    "這個觀點其實很有意思",
+    "我覺得市場還會再觀察一段時間",
+    "我們先休息一下，馬上回來",
+]
+TYPOS = ["陳鳳心", "好哥", "陳鳳新", "博樂"]
+
+def make_transcript(lines, noisy_every, chunk_lines, seed=0):
+    """
+    每 chunk_lines 行是一個片段：每 noisy_every 個片段的第一個含有錯字，第二個有一行信心不足
+    回傳 (文字稿, .segments.jsonl 的內容)
+    """
+    rng = random.Random(seed)
+    out = []
+    segments = []
+    previous = None
+    for i in range(lines):
+        previous = text = rng.choice([s for s in SENTENCES if s != previous])
+        chunk = i // chunk_lines
+        avg_logprob = -0.2
+        if chunk % noisy_every == 0:
+            if i % 9 == 0:
+                text = f"{rng.choice(TYPOS)}說{text}"
+            if i % chunk_lines == 1:
+                # 只對一半的人名，本地無法確定要怎麼改
+                text = f"陳風說{text}"
+        elif chunk % noisy_every == 1 and i % chunk_lines == 1:
+            avg_logprob = -1.2
+        out.append(f"[{i * 5.0:.2f}s -> {i * 5.0 + 4.5:.2f}s] {text}")
+        segments.append({"start": i * 5.0, "end": i * 5.0 + 4.5, "text": text,
+                         "avg_logprob": avg_logprob, "no_speech_prob": 0.01})
+    return "\n".join(out) + "\n", "".join(json.dumps(s, ensure_ascii=False) + "\n" for s in segments)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, default=20000)
+    parser.add_argument("--noisy-every", type=int, default=7, help="每幾個片段有一個需要 LLM 校正")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="覆寫 correct.CHUNK_SIZE 以產生較多片段")
+    parser.add_argument("--latency", type=float, default=0.2, help="假 Gemini 伺服器每個請求的延遲 (秒)")
+    args = parser.parse_args()
+
+    correct.CHUNK_SIZE = args.chunk_size
+    chunk_lines = args.chunk_size // 40
+
+    corrector = HotwordCorrector()
+    print("校正時間 (應與長度成正比):")
+    for lines in (args.lines // 10, args.lines, args.lines * 5):
+        text, _ = make_transcript(lines, args.noisy_every, chunk_lines)
+        start = time.perf_counter()
+        _, replacements = corrector.correct(text)
+        elapsed = time.perf_counter() - start
+        print(f"  {len(text):>9} 字: {elapsed * 1000:8.1f} ms ({len(text) / elapsed / 1e6:.2f} M 字/秒), 修正 {sum(replacements.values())} 處")
+
+    print()
+    text, segments = make_transcript(args.lines, args.noisy_every, chunk_lines)
+    with tempfile.TemporaryDirectory() as tmp, FakeGeminiServer(latency=args.latency) as server:
+        client = create_client(api_key="fake", base_url=server.url)
+        results = {}
+        for name, precorrect in (("只用 LLM", False), ("本地 + LLM", True)):
+            path = os.path.join(tmp, f"{precorrect}.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+            with open(correct.segments_path(path), "w", encoding="utf-8") as f:
+                f.write(segments)
+            cache = ResponseCache(os.path.join(tmp, f"{precorrect}.sqlite3"))
+            before = server.requests
+            start = time.perf_counter()
+            output = correct.correct_transcript(path, client=client, cache=cache, precorrect=precorrect)
+            elapsed = time.perf_counter() - start
+            with open(output, encoding="utf-8") as f:
+                corrected = f.read()
+            results[name] = (server.requests - before, elapsed, corrected)
+
+    print()
+    for name, (requests, elapsed, corrected) in results.items():
+        left = sum(corrected.count(typo) for typo in TYPOS)
+        print(f"{name:>8}: {requests:4d} 個 LLM 請求, {elapsed:6.2f} 秒, 剩下 {left} 個 hotword 錯字")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+驗證工作帳本 (job_ledger.py)：兩台「機器」同時處理同一批單集時不會重複工作
+
+以兩條各自使用獨立 JobLedger 連線 (同一個 SQLite 檔) 的處理管線模擬兩台機器，同時把所有單集送進管線，
+其中有標題相同的不同單集。接著檢查：
+- 每一集只被轉錄一次、每個 LLM 片段只被送出一次 (由先認領到的機器處理)
+- 標題相同的單集使用不同的檔名
+- 重新執行時所有階段都直接沿用 (不轉錄、不呼叫 LLM)
+- 修改一份文字稿後，只有該集的校正與摘要會重做
+
+使用方式 (在專案根目錄執行):
+    python benchmarks/bench_ledger.py --episodes 8
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# 假音檔無法解碼，不使用音訊快取
+os.environ["WHISPER_AUDIO_CACHE"] = "0"
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from stand_ins import FakeGeminiServer, FakeWhisperModel, FileServer, make_audio_files
+import dl_podcast
+from gemini_api import create_client
+from gemini_cache import ResponseCache
+from job_ledger import JobLedger
+
+class CountingModel(FakeWhisperModel):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.calls = 0
+
+    def transcribe(self, audio, **kwargs):
+        with self._lock:
+            self.calls += 1
+        return super().transcribe(audio, **kwargs)
+
+def register(ledger, server_url, names, out_dir):
+    """
+    登記所有單集；每兩集使用相同的標題
+    """
+    jobs = []
+    for i, name in enumerate(names):
+        title = f"同名單集 {i // 2}"
+        filename = os.path.join(out_dir, dl_podcast.sanitize_filename(title) + ".mp3")
+        audio_url = f"{server_url}/{name}"
+        episode_id, filename = ledger.add_episode("https://example.com/feed", f"guid-{i}", audio_url, title, filename)
+        jobs.append({
+            "episode_id": episode_id, "title": title, "audio_url": audio_url,
+            "filename": filename, "progress": f"[{i+1}/{len(names)}]",
+        })
+    return jobs
+
+def run_hosts(hosts, ledger_path, jobs, client, cache, transcribe_delay):
+    """
+    每台機器各自開一條管線，都送入全部的單集；回傳 (每台機器的轉錄次數, 經過時間, 失敗的階段)
+    """
+    pipelines = []
+    models = []
+    for _ in range(hosts):
+        model = CountingModel(delay=transcribe_delay, num_segments=20)
+        ledger = JobLedger(ledger_path)
+        models.append(model)
+        pipelines.append(dl_podcast.build_pipeline(client=client, get_model=lambda m=model: m, cache=cache, ledger=ledger).start())
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=lambda p=p: [p.submit(dict(job)) for job in jobs]) for p in pipelines]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    failures = []
+    for pipeline in pipelines:
+        failures.extend(pipeline.close()[1])
+    return [m.calls for m in models], time.perf_counter() - start, failures
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--episodes", type=int, default=8)
+    parser.add_argument("--hosts", type=int, default=2)
+    parser.add_argument("--transcribe-delay", type=float, default=0.5)
+    args = parser.parse_args()
+
+    # summarize.py 以相對路徑讀取 prompt_template.md
+    os.chdir(ROOT)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        audio_dir = os.path.join(tmp, "audio")
+        out_dir = os.path.join(tmp, "podcasts")
+        os.makedirs(out_dir)
+        names = make_audio_files(audio_dir, args.episodes)
+        ledger_path = os.path.join(tmp, "jobs.sqlite3")
+
+        with FileServer(audio_dir) as files, FakeGeminiServer(latency=0.05) as gemini:
+            client = create_client(api_key="benchmark", base_url=gemini.url)
+            jobs = register(JobLedger(ledger_path), files.url, names, out_dir)
+            filenames = {job["filename"] for job in jobs}
+
+            results = []
+            for name in ("第一次執行", "重新執行"):
+                # 空的回應快取，LLM 請求數反映實際重做的工作
+                cache = ResponseCache(os.path.join(tmp, f"{name}.sqlite3"))
+                before = gemini.requests
+                calls, elapsed, failures = run_hosts(args.hosts, ledger_path, jobs, client, cache, args.transcribe_delay)
+                results.append((name, calls, gemini.requests - before, elapsed, failures))
+
+            # 修改一份文字稿：只有這一集的校正與摘要需要重做
+            transcript = os.path.splitext(jobs[0]["filename"])[0] + ".txt"
+            with open(transcript, "a", encoding="utf-8") as f:
+                f.write("[999.00s -> 999.50s] 追加的一行\n")
+            cache = ResponseCache(os.path.join(tmp, "modified.sqlite3"))
+            before = gemini.requests
+            calls, elapsed, failures = run_hosts(args.hosts, ledger_path, jobs, client, cache, args.transcribe_delay)
+            results.append(("修改一份文字稿後", calls, gemini.requests - before, elapsed, failures))
+
+            summaries = [f for f in os.listdir(out_dir) if f.endswith("_summary.md")]
+            counts, _ = JobLedger(ledger_path).stats()
+
+    print()
+    print(f"{args.episodes} 集 ({len(filenames)} 個不同檔名), {args.hosts} 台機器")
+    ok = len(filenames) == args.episodes and len(summaries) == args.episodes
+    for name, calls, requests, elapsed, failures in results:
+        print(f"{name:>8}: 轉錄 {sum(calls)} 次 (各機器 {calls}), LLM 請求 {requests} 次, {elapsed:.2f} 秒, {len(failures)} 個失敗")
+        ok = ok and not failures
+    print(f"帳本: {counts}")
+    first, rerun, modified = results
+    ok = ok and sum(first[1]) == args.episodes and sum(rerun[1]) == 0 and rerun[2] == 0
+    ok = ok and sum(modified[1]) == 0 and 0 < modified[2] < first[2]
+    print(f"每集只處理一次、重跑時全部沿用、只重做修改過的單集: {ok}")
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
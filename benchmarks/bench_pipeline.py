@@ -0,0 +1,95 @@
+"""
+比較「逐集循序處理」與「多階段管線」的處理時間
+
+下載使用本機檔案伺服器、轉錄使用 FakeWhisperModel、LLM 使用本機的假 Gemini 伺服器，
+因此不需要網路、API Key 或 GPU。
+
+使用方式 (在專案根目錄執行):
+    python benchmarks/bench_pipeline.py --episodes 6 --transcribe-delay 1.0 --llm-latency 0.5
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+# 假音檔無法解碼，不使用音訊快取
+os.environ["WHISPER_AUDIO_CACHE"] = "0"
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from stand_ins import FakeGeminiServer, FakeWhisperModel, FileServer, make_audio_files
+import dl_podcast
+from gemini_api import create_client
+from gemini_cache import ResponseCache
+
+def make_jobs(server_url, names, out_dir):
+    return [
+        {
+            "title": name,
+            "audio_url": f"{server_url}/{name}",
+            "filename": os.path.join(out_dir, name),
+            "progress": f"[{i+1}/{len(names)}]",
+        }
+        for i, name in enumerate(names)
+    ]
+
+def run_sequential(pipeline, jobs):
+    """
+    不使用佇列，逐集依序執行每個階段 (等同原本的處理方式)
+    """
+    for job in jobs:
+        for stage in pipeline.stages:
+            job = stage.func(job)
+            if job is None:
+                break
+
+def run_pipelined(pipeline, jobs):
+    pipeline.start()
+    for job in jobs:
+        pipeline.submit(job)
+    return pipeline.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--episodes", type=int, default=6)
+    parser.add_argument("--transcribe-delay", type=float, default=1.0, help="每集的假轉錄時間 (秒)")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="每個 Gemini 請求的延遲 (秒)")
+    parser.add_argument("--download-latency", type=float, default=0.2, help="每個下載請求的延遲 (秒)")
+    parser.add_argument("--correct-workers", type=int, default=2)
+    parser.add_argument("--summarize-workers", type=int, default=2)
+    args = parser.parse_args()
+
+    # summarize.py 以相對路徑讀取 prompt_template.md
+    os.chdir(ROOT)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        audio_dir = os.path.join(tmp, "audio")
+        names = make_audio_files(audio_dir, args.episodes)
+
+        with FileServer(audio_dir, latency=args.download_latency) as files, \
+             FakeGeminiServer(latency=args.llm_latency) as gemini:
+            client = create_client(api_key="benchmark", base_url=gemini.url)
+            model = FakeWhisperModel(delay=args.transcribe_delay)
+            workers = {"correct": args.correct_workers, "summarize": args.summarize_workers}
+
+            results = {}
+            for mode, runner in (("sequential", run_sequential), ("pipelined", run_pipelined)):
+                out_dir = os.path.join(tmp, mode)
+                os.makedirs(out_dir)
+                # 每種模式使用各自的空快取，避免後執行的模式直接命中前一次的回應
+                cache = ResponseCache(path=os.path.join(tmp, f"{mode}.sqlite3"))
+                pipeline = dl_podcast.build_pipeline(client=client, get_model=lambda: model, workers=workers, cache=cache)
+                start = time.time()
+                runner(pipeline, make_jobs(files.url, names, out_dir))
+                results[mode] = time.time() - start
+
+    print()
+    print(f"Episodes: {args.episodes}")
+    for mode, elapsed in results.items():
+        print(f"{mode:>10}: {elapsed:.2f} s ({args.episodes / elapsed * 3600:.0f} episodes/hour)")
+    print(f"Speedup: {results['sequential'] / results['pipelined']:.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+量測全文檢索索引 (transcript_index.py) 在大型封存資料上的建立、查詢與增量更新時間
+
+產生 --episodes 集合成的逐字稿 (每集 --segments 段 [start -> end] text，分散在 --shows 個節目資料夾，
+一部分附上摘要)，並在 --planted 集的隨機時間點放入一個罕見的詞。接著量測：
+- 第一次建立索引的時間與索引大小
+- 各種查詢 (罕見詞、常見詞、英文、多個詞) 的延遲中位數，以及逐檔掃描 (相當於 grep) 的時間
+- 罕見詞的結果是否正好是放入的那些 (單集, 毫秒)
+- 修改、新增與刪除少數檔案後的增量更新時間
+
+使用方式 (在專案根目錄執行):
+    python benchmarks/bench_search.py --episodes 10000 --segments 200
+    python benchmarks/bench_search.py --rank-window 10000    # 只排序最新的 1 萬段符合的段落
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import transcript_index
+from transcript_index import TranscriptIndex
+
+WORDS = [
+    "今天", "我們", "來聊", "經濟", "市場", "投資", "科技", "產業", "政策", "利率", "通膨", "央行", "美國", "中國",
+    "台灣", "日本", "歐洲", "半導體", "晶片", "供應鏈", "消費", "就業", "房價", "股市", "債券", "美元", "匯率",
+    "能源", "石油", "電動車", "人工智慧", "模型", "資料", "雲端", "軟體", "平台", "創業", "公司", "管理", "策略",
+    "其實", "所以", "因為", "但是", "然後", "就是", "這個", "那個", "非常", "可能", "應該", "大家", "朋友", "觀點",
+]
+ENGLISH = ["AI", "GPU", "NVIDIA", "Apple", "Tesla", "OpenAI", "ETF", "GDP", "CPI", "Fed"]
+PLANTED = "量子糾纏"
+
+def make_line(rng):
+    words = rng.choices(WORDS, k=rng.randint(6, 14))
+    if rng.random() < 0.1:
+        words.insert(rng.randrange(len(words)), f" {rng.choice(ENGLISH)} ")
+    return "".join(words)
+
+def make_archive(root, episodes, segments, shows, planted, seed=0):
+    """
+    回傳放入罕見詞的 {(逐字稿路徑, start_ms)}
+    """
+    rng = random.Random(seed)
+    planted_at = set()
+    planted_episodes = set(rng.sample(range(episodes), planted))
+    for i in range(episodes):
+        directory = os.path.join(root, f"show{i % shows:02d}")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"episode{i:05d}.txt")
+        target = rng.randrange(segments) if i in planted_episodes else -1
+        lines = []
+        for j in range(segments):
+            text = make_line(rng)
+            if j == target:
+                text += f"，談到{PLANTED}的應用"
+                planted_at.add((path, j * 5000))
+            lines.append(f"[{j * 5.0:.2f}s -> {j * 5.0 + 4.5:.2f}s] {text}\n")
+        with open(path, "w", encoding="utf-8") as f:
+            f.writelines(lines)
+        if i % 4 == 0:
+            with open(os.path.join(directory, f"episode{i:05d}_summary.md"), "w", encoding="utf-8") as f:
+                f.write("# 摘要\n\n" + "\n\n".join(make_line(rng) for _ in range(10)) + "\n")
+    return planted_at
+
+def scan(root, word):
+    """
+    逐檔讀取並以子字串比對 (相當於 grep -r)，回傳符合的行數
+    """
+    count = 0
+    for directory, _, filenames in os.walk(root):
+        for name in filenames:
+            with open(os.path.join(directory, name), encoding="utf-8") as f:
+                count += sum(1 for line in f if word in line)
+    return count
+
+def timed(func, repeat=1):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return result, statistics.median(times)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--episodes", type=int, default=10000)
+    parser.add_argument("--segments", type=int, default=200, help="每集的段數")
+    parser.add_argument("--shows", type=int, default=20)
+    parser.add_argument("--planted", type=int, default=25, help="放入罕見詞的集數")
+    parser.add_argument("--repeat", type=int, default=20, help="每個查詢執行的次數 (取中位數)")
+    parser.add_argument("--rank-window", type=int, default=transcript_index.RANK_WINDOW, help="只排序最新的這麼多段符合的段落 (0 為全部排序)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = os.path.join(tmp, "podcasts")
+        (planted_at, generate_time) = timed(lambda: make_archive(root, args.episodes, args.segments, args.shows, args.planted))
+        index_path = os.path.join(tmp, "transcripts.sqlite3")
+        index = TranscriptIndex(index_path)
+        (build, build_time) = timed(lambda: index.update(root))
+        stats = index.stats()
+        size = sum(os.path.getsize(index_path + suffix) for suffix in ("", "-wal") if os.path.exists(index_path + suffix))
+        print(f"封存: {args.episodes} 集, {stats['files']} 個檔案, {stats['segments']} 段 (產生 {generate_time:.1f} 秒)")
+        print(f"建立索引: {build_time:.1f} 秒 ({stats['segments'] / build_time:.0f} 段/秒), 索引 {size / 1024 / 1024:.0f} MB")
+
+        queries = [
+            (PLANTED, {}), ("半導體", {}), ("晶片", {}), ("nvidia", {}), ("央行 利率", {}), ("電動車 供應鏈 投資", {}),
+            ("半導體", {"podcast": "show03"}), ("晶片", {"kinds": ["summary"]}),
+        ]
+        window = f"符合超過 {args.rank_window} 段時只排序最新的段落" if args.rank_window else "為所有符合的段落排序"
+        print(f"查詢 (前 20 筆, 中位數; {window}):")
+        for query, filters in queries:
+            hits, elapsed = timed(lambda: index.search(query, rank_window=args.rank_window, **filters), repeat=args.repeat)
+            label = query + "".join(f" [{value if isinstance(value, str) else ','.join(value)}]" for value in filters.values())
+            print(f"  {label:<22} {elapsed * 1000:7.2f} ms  {len(hits)} 筆")
+        found = {(hit["path"], hit["start_ms"]) for hit in index.search(PLANTED, limit=args.planted * 10)}
+        matches, scan_time = timed(lambda: scan(root, PLANTED))
+        print(f"逐檔掃描 '{PLANTED}': {scan_time * 1000:.0f} ms ({matches} 行)")
+        recall_ok = found == planted_at
+        print(f"'{PLANTED}' 的結果與放入的位置相同 ({len(found)}/{len(planted_at)}): {recall_ok}")
+
+        # 增量更新：修改 10 個檔案、新增 5 集、刪除 2 集
+        rng = random.Random(1)
+        names = sorted(os.path.join(d, n) for d, _, fs in os.walk(root) for n in fs if n.endswith(".txt"))
+        chosen = rng.sample(names, 12)
+        for path in chosen[:10]:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write("[9999.00s -> 9999.50s] 追加的一段\n")
+        for i in range(5):
+            with open(os.path.join(root, "show00", f"new{i}.txt"), "w", encoding="utf-8") as f:
+                f.write("[0.00s -> 4.50s] 新的一集\n")
+        for path in chosen[10:]:
+            os.remove(path)
+        (incremental, incremental_time) = timed(lambda: index.update(root))
+        indexed, removed, unchanged = incremental
+        print(f"增量更新: 重新索引 {indexed} 個, 移除 {removed} 個, {unchanged} 個沒有變動 ({incremental_time:.2f} 秒)")
+        added_ok = len(index.search("追加的一段", limit=100)) == 10 and len(index.search("新的一集", limit=100)) == 5
+        index.close()
+
+    ok = recall_ok and added_ok and build[0] == stats["files"] and indexed == 15 and removed == 2
+    print(f"結果正確且增量更新只處理變動的檔案: {ok}")
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+驗證 Gemini 串流與逐片段提交的 partial 檔 (correct.py / summarize.py)
+
+以本機的假 Gemini 伺服器 (支援 streamGenerateContent 的 SSE 串流) 執行：
+1. 摘要的第一段輸出時間：串流與不串流各執行一次，比較摘要的第一段寫入 .partial 的時間與完成時間
+2. 校正中斷後續傳：讓最後一個片段持續回傳 400，第一次執行失敗後檢查 partial 檔中已提交的片段，
+   恢復伺服器後重新執行，確認只重送失敗的片段且輸出維持原本的順序
+3. 分段摘要 (map-reduce) 中斷後續傳：同上，讓最後一段的筆記失敗
+
+使用方式 (在專案根目錄執行):
+    python benchmarks/bench_streaming.py --lines 2000 --chunk-size 4000 --stream-interval 0.02
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import correct
+import gemini_api
+import metrics
+import summarize
+from gemini_cache import ResponseCache
+from partial_output import ChunkJournal
+from stand_ins import FakeGeminiServer
+
+def make_transcript(path, lines):
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(lines):
+            f.write(f"[{i * 5.0:.2f}s -> {i * 5.0 + 4.5:.2f}s] 第 {i} 行測試逐字稿內容\n")
+
+def first_output_events(path, stage):
+    metrics._default_metrics.close()
+    return [e for e in metrics.load_events(path) if e["event"] == "first_output" and e.get("stage") == stage]
+
+def measure_summary(tmp, client, lines, stream):
+    """
+    回傳 (第一段寫入 .partial 的秒數, 完成的秒數)
+    """
+    gemini_api.STREAM = stream
+    path = os.path.join(tmp, f"summary_{'stream' if stream else 'plain'}.txt")
+    make_transcript(path, lines)
+    start = time.perf_counter()
+    output = summarize.summarize_transcript(path, client=client, cache=ResponseCache(os.path.join(tmp, "summary.sqlite3"), bypass=True), map_reduce=False)
+    elapsed = time.perf_counter() - start
+    events = first_output_events(metrics._default_metrics.path, "summarize")
+    return (events[-1].get("seconds") if events else None), elapsed, output is not None
+
+def resume_correct(tmp, client, gemini, lines):
+    """
+    回傳 (片段數, 第一次執行後 partial 檔中的片段數, 第二次執行送出的請求數, 輸出是否完整且順序正確)
+    """
+    path = os.path.join(tmp, "correct.txt")
+    make_transcript(path, lines)
+    chunks = len(correct.split_text_by_lines(open(path, encoding="utf-8").read(), max_chars=correct.CHUNK_SIZE))
+    cache = ResponseCache(os.path.join(tmp, "correct.sqlite3"), bypass=True)
+    last_line = f"第 {lines - 1} 行"
+    gemini.fail_when = lambda prompt: last_line in prompt
+    failed = correct.correct_transcript(path, client=client, cache=cache, precorrect=False, compact=False)
+    partial_path = os.path.splitext(path)[0] + "_corrected.txt.partial"
+    committed = len(ChunkJournal(partial_path)) if os.path.exists(partial_path) else 0
+
+    gemini.fail_when = None
+    requests = gemini.requests
+    output = correct.correct_transcript(path, client=client, cache=cache, precorrect=False, compact=False)
+    resent = gemini.requests - requests
+    ok = failed is None and output is not None and not os.path.exists(partial_path)
+    if ok:
+        with open(path, encoding="utf-8") as f:
+            expected = [line for line in f.read().split("\n") if line]
+        with open(output, encoding="utf-8") as f:
+            ok = [line for line in f.read().split("\n") if line] == expected
+    return chunks, committed, resent, ok
+
+def resume_sections(tmp, client, gemini, lines):
+    """
+    回傳 (段數, 第一次執行後 partial 檔中的段數, 第二次執行送出的分段請求數, 是否完成)
+    """
+    path = os.path.join(tmp, "sections.txt")
+    make_transcript(path, lines)
+    sections = len(correct.split_text_by_lines(open(path, encoding="utf-8").read(), max_chars=summarize.SECTION_SIZE))
+    cache = ResponseCache(os.path.join(tmp, "sections.sqlite3"), bypass=True)
+    last_line = f"第 {lines - 1} 行"
+    gemini.fail_when = lambda prompt: "請為這一段寫出詳細的重點筆記" in prompt and last_line in prompt
+    failed = summarize.summarize_transcript(path, client=client, cache=cache, map_reduce=True)
+    partial_path = os.path.splitext(path)[0] + "_summary.md.sections.partial"
+    committed = len(ChunkJournal(partial_path)) if os.path.exists(partial_path) else 0
+
+    # 第二次執行只計算分段筆記的請求 (不含範本選擇與最後整合的摘要)
+    resent = []
+    gemini.fail_when = lambda prompt: "請為這一段寫出詳細的重點筆記" in prompt and resent.append(prompt) is not None
+    output = summarize.summarize_transcript(path, client=client, cache=cache, map_reduce=True)
+    gemini.fail_when = None
+    return sections, committed, len(resent), failed is None and output is not None and not os.path.exists(partial_path)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, default=2000)
+    parser.add_argument("--chunk-size", type=int, default=4000, help="覆寫 correct.CHUNK_SIZE 與 summarize.SECTION_SIZE 以產生較多片段")
+    parser.add_argument("--latency", type=float, default=0.3, help="收到第一段回應前的延遲 (秒)")
+    parser.add_argument("--stream-chunk-chars", type=int, default=500)
+    parser.add_argument("--stream-interval", type=float, default=0.02, help="產生每一段回覆所需的秒數")
+    parser.add_argument("--verbose", action="store_true", help="印出校正與摘要的輸出")
+    args = parser.parse_args()
+
+    correct.CHUNK_SIZE = args.chunk_size
+    summarize.SECTION_SIZE = args.chunk_size
+    summarize.PROMPT_TEMPLATE_PATH = os.path.join(ROOT, "prompt_template.md")
+    gemini_api.RETRY_BASE_DELAY = 0.1
+
+    with tempfile.TemporaryDirectory() as tmp, \
+         FakeGeminiServer(latency=args.latency, error_status=400, stream_chunk_chars=args.stream_chunk_chars,
+                          stream_interval=args.stream_interval) as gemini:
+        metrics._default_metrics = metrics.Metrics(path=os.path.join(tmp, "metrics.jsonl"), textfile=None, enabled=True)
+        client = gemini_api.create_client(api_key="benchmark", base_url=gemini.url)
+        if not args.verbose:
+            devnull = open(os.devnull, "w")
+            real_stdout, sys.stdout = sys.stdout, devnull
+        try:
+            summaries = {stream: measure_summary(tmp, client, args.lines, stream) for stream in (False, True)}
+            gemini_api.STREAM = True
+            correct_result = resume_correct(tmp, client, gemini, args.lines)
+            sections_result = resume_sections(tmp, client, gemini, args.lines)
+            correct_events = first_output_events(metrics._default_metrics.path, "correct")
+        finally:
+            if not args.verbose:
+                sys.stdout = real_stdout
+                devnull.close()
+        streamed = gemini.streamed
+
+    print(f"假伺服器: 第一段延遲 {args.latency:g} 秒, 每 {args.stream_chunk_chars} 字一段, 每段 {args.stream_interval:g} 秒 (串流請求 {streamed} 個)")
+    for stream, (first, elapsed, done) in summaries.items():
+        first_text = "無" if first is None else f"{first:.2f} 秒"
+        print(f"摘要 ({'串流' if stream else '不串流'}): 第一段寫入 {first_text}, 完成 {elapsed:.2f} 秒")
+    chunks, committed, resent, correct_ok = correct_result
+    print(f"校正續傳: {chunks} 個片段, 失敗時已提交 {committed} 個, 重新執行只送出 {resent} 個請求, 輸出完整且順序正確: {correct_ok}")
+    if correct_events and correct_events[-1].get("seconds") is not None:
+        print(f"校正的第一個片段寫入: {correct_events[-1]['seconds']:.2f} 秒 (沿用 {correct_events[-1].get('reused', 0)} 個片段)")
+    sections, committed_sections, resent_sections, sections_ok = sections_result
+    print(f"分段摘要續傳: {sections} 段, 失敗時已提交 {committed_sections} 段, 重新執行重送 {resent_sections} 段, 完成: {sections_ok}")
+
+    plain_first, stream_first = summaries[False][0], summaries[True][0]
+    ok = all(done for _, _, done in summaries.values()) and correct_ok and sections_ok
+    ok = ok and committed == chunks - 1 and resent == 1 and committed_sections == sections - 1 and resent_sections == 1
+    ok = ok and stream_first is not None and plain_first is not None and stream_first < plain_first
+    print(f"串流縮短第一段輸出時間、失敗後只重送未完成的片段: {ok}")
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+比較長篇逐字稿以單一請求摘要與 map-reduce 分段摘要 (summarize.py) 的延遲分布
+
+假的 Gemini 伺服器的延遲與 prompt 長度成正比，並乘上 lognormal 的隨機倍數 (模擬長尾)；
+分段摘要的回應約為輸入的 --note-ratio，範本摘要則回傳固定的短文。每種模式各執行 --trials 次，
+回報 p50 / p95 / 最大延遲。最後以 --context-limit 模擬 context 上限：超過時單一請求會失敗，
+map-reduce 則不受影響。
+
+使用方式 (在專案根目錄執行):
+    python benchmarks/bench_summarize.py --hours 3 --trials 20
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import summarize
+from gemini_api import create_client
+from gemini_cache import ResponseCache
+from stand_ins import FakeGeminiServer
+
+SENTENCES = [
+    "今天我們來聊聊最近的經濟情勢",
+    "這個觀點其實很有意思，我們可以從歷史的角度來看",
+    "我覺得市場還會再觀察一段時間",
+    "很多新創公司在這一波裡面募到了很多錢",
+    "我們先休息一下，馬上回來",
+]
+
+def make_transcript(hours, seed=0):
+    """
+    產生約 hours 小時的逐字稿 (每 5 秒一行)
+    """
+    rng = random.Random(seed)
+    lines = []
+    for i in range(int(hours * 3600 / 5)):
+        lines.append(f"[{i * 5.0:.2f}s -> {i * 5.0 + 4.5:.2f}s] {rng.choice(SENTENCES)}")
+    return "\n".join(lines) + "\n"
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+def run(path, client, map_reduce, tmp):
+    output = os.path.splitext(path)[0] + "_summary.md"
+    if os.path.exists(output):
+        os.remove(output)
+    # 每次都實際送出請求 (bypass 時不讀取快取)
+    cache = ResponseCache(os.path.join(tmp, "cache.sqlite3"), bypass=True)
+    start = time.perf_counter()
+    result = summarize.summarize_transcript(path, client=client, cache=cache, map_reduce=map_reduce)
+    elapsed = time.perf_counter() - start
+    cache.close()
+    return elapsed, result is not None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hours", type=float, default=3)
+    parser.add_argument("--trials", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.3, help="每個請求的基本延遲 (秒)")
+    parser.add_argument("--per-char", type=float, default=2e-5, help="每個 prompt 字元增加的延遲 (秒)")
+    parser.add_argument("--jitter", type=float, default=0.5, help="延遲的 lognormal 標準差")
+    parser.add_argument("--note-ratio", type=float, default=0.08, help="分段筆記長度 / 段落長度")
+    parser.add_argument("--context-limit", type=int, default=80000, help="假伺服器可接受的 prompt 字數上限")
+    args = parser.parse_args()
+
+    summarize.PROMPT_TEMPLATE_PATH = os.path.join(ROOT, "prompt_template.md")
+
+    def reply(prompt):
+        if "請為這一段寫出詳細的重點筆記" in prompt:
+            text = prompt.split("# Input Text\n", 1)[1]
+            return text[:max(1, int(len(text) * args.note_ratio))]
+        return "# 摘要\n這是一段假的摘要。"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "episode.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(make_transcript(args.hours))
+        print(f"逐字稿: {args.hours:g} 小時, {os.path.getsize(path) / 1024:.0f} KB")
+
+        results = {}
+        with FakeGeminiServer(latency=args.latency, per_char_latency=args.per_char, jitter=args.jitter, reply=reply) as server:
+            client = create_client(api_key="fake", base_url=server.url)
+            for name, map_reduce in (("單一請求", False), ("map-reduce", True)):
+                results[name] = [run(path, client, map_reduce, tmp)[0] for _ in range(args.trials)]
+
+        with FakeGeminiServer(latency=args.latency, per_char_latency=args.per_char, reply=reply,
+                              max_prompt_chars=args.context_limit) as server:
+            client = create_client(api_key="fake", base_url=server.url)
+            limited = {name: run(path, client, map_reduce, tmp)[1] for name, map_reduce in (("單一請求", False), ("map-reduce", True))}
+
+    print()
+    for name, times in results.items():
+        print(f"{name:>10}: p50 {statistics.median(times):6.2f} 秒, p95 {percentile(times, 95):6.2f} 秒, 最大 {max(times):6.2f} 秒")
+    single, mapped = results.values()
+    print(f"p95 延遲降低 {100 * (1 - percentile(mapped, 95) / percentile(single, 95)):.0f}%")
+    print(f"context 上限 {args.context_limit} 字: " + ", ".join(f"{name} {'成功' if ok else '失敗'}" for name, ok in limited.items()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+比較轉錄 worker pool (transcribe_pool.py) 在不同 worker 數量與排程方式下處理一批音檔的總時間
+
+使用假的 Whisper 模型 (轉錄時間與檔案大小成正比)，只需要 CPU，不需要 GPU 或真正的模型。
+
+使用方式 (在專案根目錄執行):
+    python benchmarks/bench_transcribe_pool.py --files 12 --workers 4
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import wave
+
+# 假模型不需要解碼後的音訊，不使用音訊快取 (worker process 會繼承這個環境變數)
+os.environ["WHISPER_AUDIO_CACHE"] = "0"
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stand_ins import FakeWhisperModel
+from transcribe_pool import TranscribePool, WorkerSpec
+
+# 假模型每 MB 音檔的轉錄時間 (秒)
+SECONDS_PER_MB = 1.0
+
+def fake_model(spec, model_size, profile=None):
+    # worker process 中執行，必須是模組層級的函式才能傳給 spawn 出來的 process
+    return FakeWhisperModel(delay=0.0, num_segments=20, seconds_per_mb=SECONDS_PER_MB)
+
+def make_backlog(directory, count, seed=0):
+    """
+    建立 count 個長短不一的 WAV 檔 (一集很長，其餘是短集數)，最長的一集排在檔名順序的最後
+    """
+    rng = random.Random(seed)
+    os.makedirs(directory)
+    sizes = sorted(rng.uniform(0.2, 0.6) for _ in range(count - 1)) + [3.0]
+    paths = []
+    for i, size_mb in enumerate(sizes):
+        path = os.path.join(directory, f"episode{i:03d}.wav")
+        # 16 kHz 16-bit mono，音檔長度與檔案大小成正比 (1 MB 約 33 秒)
+        with wave.open(path, "wb") as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(16000)
+            f.writeframes(bytes(int(size_mb * 1024 * 1024) // 2 * 2))
+        paths.append(path)
+    return paths
+
+def run(paths, workers, longest_first, work_dir):
+    os.makedirs(work_dir)
+    copies = []
+    for path in paths:
+        copy = os.path.join(work_dir, os.path.basename(path))
+        shutil.copyfile(path, copy)
+        copies.append(copy)
+
+    specs = [WorkerSpec(f"cpu{n}", "cpu", cpu_threads=1) for n in range(workers)]
+    pool = TranscribePool(specs, model_factory=fake_model, longest_first=longest_first, verbose=False)
+    start = time.perf_counter()
+    transcripts, errors = pool.run(copies)
+    return time.perf_counter() - start, len(transcripts), len(errors)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=12)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = make_backlog(os.path.join(tmp, "audio"), args.files)
+        total = sum(os.path.getsize(p) for p in paths) / 1024 / 1024 * SECONDS_PER_MB
+        longest = max(os.path.getsize(p) for p in paths) / 1024 / 1024 * SECONDS_PER_MB
+        print(f"{args.files} 個音檔, 總轉錄時間 {total:.1f} 秒, 最長 {longest:.1f} 秒")
+        print(f"{args.workers} 個 worker 的理想時間: {max(total / args.workers, longest):.1f} 秒 (另加每個 process 的啟動時間)")
+
+        results = {}
+        for name, workers, longest_first in (
+            ("1 worker", 1, True),
+            (f"{args.workers} workers, 檔名順序", args.workers, False),
+            (f"{args.workers} workers, 最長優先", args.workers, True),
+        ):
+            elapsed, done, failed = run(paths, workers, longest_first, os.path.join(tmp, f"run{len(results)}"))
+            results[name] = elapsed
+            print(f"{name:>24}: {elapsed:6.2f} 秒, {done} 個完成, {failed} 個失敗")
+            if done != args.files or failed:
+                sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+評估 fwhisper.py 各個解碼設定 (fwhisper.PROFILES) 的速度與正確率
+
+讀取參考音檔資料夾：每個音檔 (mp3 / m4a / wav / flac) 旁邊放一份人工校對過的逐字稿 <檔名>.ref.txt
+(純文字，或與 fwhisper.py 相同的 [start -> end] text 格式)。每個解碼設定各載入一次模型並轉錄所有音檔，回報：
+- 模型載入時間
+- 即時倍率 (RTF，處理時間 / 音檔長度，越低越快)
+- 字元錯誤率 (CER，編輯距離 / 參考逐字稿字數；比較前去掉時間軸、空白與標點，英文轉小寫)
+並以量測到的 RTF 計算 --backlog-hours 小時的待轉錄音檔在 --deadline-hours 小時內完成時，
+fwhisper.choose_profile 會選擇哪個設定。結果存成 JSON (預設 benchmarks/results/profiles-<時間>.json)。
+
+使用音訊快取時，每個音檔在計時前先解碼並計算各設定的 VAD 區段，各設定只比較解碼 (轉錄) 本身的時間。
+
+使用方式 (在專案根目錄執行):
+    python benchmarks/eval_profiles.py clips/
+    python benchmarks/eval_profiles.py clips/ --profiles archive-fast,default --device cpu --backlog-hours 200
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+import unicodedata
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import fwhisper
+from transcribe_pool import audio_duration
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+AUDIO_EXTENSIONS = (".mp3", ".m4a", ".wav", ".flac")
+_TIMESTAMP = re.compile(r"^\[[^\]]*\]\s*", re.MULTILINE)
+
+def load_clips(directory):
+    """
+    回傳 [(音檔路徑, 參考逐字稿), ...]，沒有參考逐字稿的音檔略過
+    """
+    clips = []
+    for name in sorted(os.listdir(directory)):
+        if not name.lower().endswith(AUDIO_EXTENSIONS):
+            continue
+        path = os.path.join(directory, name)
+        reference = os.path.splitext(path)[0] + ".ref.txt"
+        if not os.path.exists(reference):
+            print(f"略過 {name} (沒有 {os.path.basename(reference)})")
+            continue
+        with open(reference, "r", encoding="utf-8") as f:
+            clips.append((path, f.read()))
+    return clips
+
+def normalize(text):
+    """
+    去掉時間軸、空白與標點，只留下文字與數字 (英文轉小寫)
+    """
+    text = unicodedata.normalize("NFKC", _TIMESTAMP.sub("", text)).lower()
+    return "".join(ch for ch in text if unicodedata.category(ch)[0] in "LN")
+
+def edit_distance(reference, hypothesis):
+    previous = list(range(len(hypothesis) + 1))
+    for i, r in enumerate(reference, 1):
+        current = [i]
+        for j, h in enumerate(hypothesis, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (r != h)))
+        previous = current
+    return previous[-1]
+
+def warm_audio_cache(clips, profiles):
+    if not fwhisper.USE_AUDIO_CACHE:
+        return
+    from audio_cache import get_default_cache
+
+    cache = get_default_cache()
+    for path, _ in clips:
+        cache.load(path)
+        for name in profiles:
+            cache.speech_spans(path, fwhisper.PROFILES[name]["vad_parameters"])
+
+def evaluate(name, clips, work_dir, device, model_size=None):
+    """
+    以一個解碼設定轉錄所有音檔，回傳結果 dict
+    """
+    start = time.perf_counter()
+    model = fwhisper.load_model(model_size, device=device, profile=name)
+    load_seconds = time.perf_counter() - start
+
+    profile_dir = os.path.join(work_dir, name)
+    os.makedirs(profile_dir)
+    clip_results = []
+    for path, reference in clips:
+        # 每個設定在自己的資料夾轉錄，不會沿用其他設定的逐字稿
+        target = os.path.join(profile_dir, os.path.basename(path))
+        os.symlink(os.path.abspath(path), target)
+        start = time.perf_counter()
+        transcript = fwhisper.transcribe_file(target, model, profile=name)
+        seconds = time.perf_counter() - start
+        with open(transcript, "r", encoding="utf-8") as f:
+            hypothesis = normalize(f.read())
+        reference = normalize(reference)
+        duration = audio_duration(path)
+        clip_results.append({
+            "clip": os.path.basename(path),
+            "audio_seconds": duration,
+            "seconds": round(seconds, 3),
+            "rtf": round(seconds / duration, 4) if duration else None,
+            "errors": edit_distance(reference, hypothesis),
+            "reference_chars": len(reference),
+        })
+    del model
+
+    audio = sum(c["audio_seconds"] or 0 for c in clip_results)
+    seconds = sum(c["seconds"] for c in clip_results)
+    chars = sum(c["reference_chars"] for c in clip_results)
+    return {
+        "profile": name,
+        "model": model_size or fwhisper.PROFILES[name]["model"],
+        "load_seconds": round(load_seconds, 2),
+        "audio_seconds": round(audio, 2),
+        "seconds": round(seconds, 2),
+        "rtf": round(seconds / audio, 4) if audio else None,
+        "cer": round(sum(c["errors"] for c in clip_results) / chars, 4) if chars else None,
+        "clips": clip_results,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("clips", help="參考音檔與 <檔名>.ref.txt 所在的資料夾")
+    parser.add_argument("--profiles", default=",".join(fwhisper.PROFILES), help="要評估的解碼設定 (以逗號分隔)")
+    parser.add_argument("--device", default=fwhisper.DEVICE)
+    parser.add_argument("--model", help="所有設定都改用這個模型 (例如在 CPU 上以 tiny 快速檢查)")
+    parser.add_argument("--backlog-hours", type=float, default=100, help="以量測到的 RTF 為這麼多小時的待轉錄音檔選擇設定")
+    parser.add_argument("--deadline-hours", type=float, default=fwhisper.DEADLINE_HOURS)
+    parser.add_argument("--workers", type=int, default=1, help="同時轉錄的模型數")
+    parser.add_argument("--output", help="結果 JSON 的路徑 (預設 benchmarks/results/profiles-<時間>.json)")
+    args = parser.parse_args()
+
+    profiles = [name.strip() for name in args.profiles.split(",") if name.strip()]
+    for name in profiles:
+        fwhisper.get_profile(name)
+    clips = load_clips(args.clips)
+    if not clips:
+        parser.error(f"{args.clips} 中沒有附 .ref.txt 的音檔")
+
+    warm_audio_cache(clips, profiles)
+    with tempfile.TemporaryDirectory() as tmp:
+        results = [evaluate(name, clips, tmp, args.device, args.model) for name in profiles]
+
+    device = fwhisper.resolve_device(args.device)
+    rtfs = {r["profile"]: r["rtf"] for r in results if r["rtf"]}
+    candidates = [name for name in fwhisper.AUTO_PROFILES if name in rtfs] or list(rtfs)
+    choice = fwhisper.choose_profile(args.backlog_hours * 3600, args.deadline_hours * 3600, workers=args.workers,
+                                     candidates=candidates, rtfs=rtfs) if rtfs else None
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "device": device,
+        "clips": len(clips),
+        "results": results,
+        "choice": {"backlog_hours": args.backlog_hours, "deadline_hours": args.deadline_hours,
+                   "workers": args.workers, "candidates": candidates, "profile": choice},
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"profiles-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print()
+    print(f"{len(clips)} 個參考音檔 ({results[0]['audio_seconds'] / 60:.1f} 分鐘), 裝置: {device}")
+    print(f"{'設定':<14} {'模型':<44} {'載入':>7} {'RTF':>8} {'CER':>8}")
+    for r in results:
+        rtf = f"{r['rtf']:.3f}" if r["rtf"] is not None else "-"
+        cer = f"{r['cer'] * 100:.2f}%" if r["cer"] is not None else "-"
+        print(f"{r['profile']:<14} {r['model']:<44} {r['load_seconds']:>6.1f}s {rtf:>8} {cer:>8}")
+    if choice:
+        hours = {name: args.backlog_hours * rtfs[name] / max(1, args.workers) for name in candidates}
+        estimates = ", ".join(f"{name} {value:.1f} 小時" for name, value in hours.items())
+        print(f"{args.backlog_hours:g} 小時的待轉錄音檔 ({args.workers} 個模型): {estimates}; "
+              f"期限 {args.deadline_hours:g} 小時 -> {choice}")
+    print(f"結果: {output}")
+
+if __name__ == "__main__":
+    main()
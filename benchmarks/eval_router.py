@@ -0,0 +1,111 @@
+"""
+評估本地範本路由 (template_router.py) 與 Gemini 路由 (summarize.determine_best_template) 的一致程度
+
+讀取有標記的樣本 (JSONL，每行 {"label": "01", "text": "..."} 或 {"label": "01", "path": "文字稿路徑"})，回報：
+- 本地路由的正確率與每個樣本的分類時間、索引的載入時間 (冷啟動 / 從快取載入)
+- 不同信心值門檻下，本地處理的比例與其正確率
+- 加上 --llm 時，也以 Gemini 選擇範本 (需要 GEMINI_API_KEY，回應會被快取)，回報 Gemini 的正確率、
+  與本地路由的一致率，以及「本地信心值足夠時用本地，否則用 Gemini」的整體正確率
+
+使用方式 (在專案根目錄執行):
+    python benchmarks/eval_router.py
+    python benchmarks/eval_router.py --samples my_samples.jsonl --llm
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import template_router
+from template_router import load_template_index
+
+def load_samples(path):
+    samples = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if "text" not in record:
+                with open(os.path.join(os.path.dirname(path), record["path"]), "r", encoding="utf-8") as t:
+                    record["text"] = t.read()
+            samples.append(record)
+    return samples
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "router_samples.jsonl"))
+    parser.add_argument("--templates", default=os.path.join(ROOT, "prompt_template.md"))
+    parser.add_argument("--llm", action="store_true", help="同時以 Gemini 選擇範本並比較")
+    parser.add_argument("--thresholds", default="0,0.1,0.2,0.3,0.5")
+    args = parser.parse_args()
+
+    samples = load_samples(args.samples)
+    labels = [s["label"] for s in samples]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_path = os.path.join(tmp, "template_index.json")
+        start = time.perf_counter()
+        load_template_index(args.templates, cache_path=cache_path)
+        cold = time.perf_counter() - start
+        # 清掉 process 內的索引，量測從磁碟快取載入的時間
+        template_router._indexes.clear()
+        start = time.perf_counter()
+        index = load_template_index(args.templates, cache_path=cache_path)
+        warm = time.perf_counter() - start
+
+    local = []
+    start = time.perf_counter()
+    for sample in samples:
+        template_id, confidence, _ = index.route(sample["text"])
+        local.append((template_id, confidence))
+    route_ms = (time.perf_counter() - start) * 1000 / len(samples)
+
+    print(f"{len(samples)} 個樣本, 範本索引: 解析 + 建立 {cold * 1000:.1f} ms, 從快取載入 {warm * 1000:.1f} ms, 分類 {route_ms:.2f} ms/樣本")
+    correct = sum(tid == label for (tid, _), label in zip(local, labels))
+    print(f"本地路由正確率: {correct}/{len(samples)} ({100 * correct / len(samples):.0f}%)")
+    for sample, (tid, confidence) in zip(samples, local):
+        if tid != sample["label"]:
+            print(f"  錯誤: 標記 {sample['label']}, 本地 {tid} (信心值 {confidence:.2f}): {sample['text'][:40]}...")
+
+    llm = None
+    if args.llm:
+        import summarize
+        from gemini_api import create_client
+        from gemini_cache import get_default_cache
+
+        client = create_client()
+        cache = get_default_cache()
+        llm = []
+        start = time.perf_counter()
+        for sample in samples:
+            llm.append(summarize.determine_best_template(client, sample["text"], index.descriptions, cache=cache))
+        llm_ms = (time.perf_counter() - start) * 1000 / len(samples)
+        llm_correct = sum(tid == label for tid, label in zip(llm, labels))
+        agree = sum(tid == l_tid for (tid, _), l_tid in zip(local, llm))
+        print(f"Gemini 路由正確率: {llm_correct}/{len(samples)} ({100 * llm_correct / len(samples):.0f}%), {llm_ms:.0f} ms/樣本 (含快取命中)")
+        print(f"本地與 Gemini 一致: {agree}/{len(samples)} ({100 * agree / len(samples):.0f}%)")
+
+    print()
+    print("信心值門檻   本地處理   本地正確率" + ("   整體正確率" if llm else ""))
+    for threshold in (float(t) for t in args.thresholds.split(",")):
+        handled = [i for i, (_, confidence) in enumerate(local) if confidence >= threshold]
+        handled_correct = sum(local[i][0] == labels[i] for i in handled)
+        line = f"{threshold:>10.2f}   {len(handled):>3}/{len(samples):<3}   "
+        line += f"{100 * handled_correct / len(handled):>9.0f}%" if handled else f"{'-':>10}"
+        if llm:
+            combined = sum(
+                (local[i][0] if local[i][1] >= threshold else llm[i]) == labels[i] for i in range(len(samples))
+            )
+            line += f"   {100 * combined / len(samples):>9.0f}%"
+        if threshold == template_router.ROUTER_MIN_CONFIDENCE:
+            line += "   <- ROUTER_MIN_CONFIDENCE"
+        print(line)
+
+if __name__ == "__main__":
+    main()
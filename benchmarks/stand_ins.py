@@ -0,0 +1,386 @@
+"""
+本機替身 (stand-ins)：讓 benchmark 不需要連到 Gemini、Podcast CDN 或 GPU 也能執行
+
+- FakeGeminiServer: 模擬 Gemini generateContent API，可設定延遲與錯誤
+- FileServer: 提供本機目錄中的檔案 (模擬 Podcast CDN，可切換是否支援 Range、限制頻寬或中途斷線)
+- FakeWhisperModel: 模擬 faster-whisper 的 WhisperModel.transcribe
+- make_audio_files / make_feed: 產生假的音檔與 RSS feed
+"""
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import namedtuple
+from functools import partial
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler, SimpleHTTPRequestHandler
+
+class _QuietHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # 用戶端中斷連線 (例如測試斷線續傳) 時不印出 traceback
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+class _ServerThread:
+    """
+    在背景 thread 執行的 HTTP server，可搭配 with 使用
+    """
+    def __init__(self, handler):
+        self.httpd = _QuietHTTPServer(("127.0.0.1", 0), handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.httpd.server_port}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+def fake_reply(prompt):
+    """
+    產生假的模型回應：範本選擇回傳範本編號，其餘則回傳 prompt 中的輸入內容 (echo)
+    """
+    if "Return ONLY the template number" in prompt:
+        return "01"
+    for marker in ("# Input Text\n", "# Input Data\n"):
+        if marker in prompt:
+            return prompt.split(marker, 1)[1].strip("\n")
+    return prompt
+
+class FakeGeminiServer(_ServerThread):
+    """
+    模擬 Gemini API 的本機伺服器
+
+    latency: 每個請求的基本延遲 (秒)；per_char_latency: 依 prompt 長度額外增加的延遲
+    error_rate: 以此機率回傳 error_status (例如 429 或 503)
+    max_concurrent: 同時處理中的請求超過此數量時回傳 429 (模擬 API 限流)
+    jitter: 延遲乘上 lognormal(0, jitter) 的隨機倍數 (模擬延遲的長尾)
+    max_prompt_chars: prompt 超過此字數時回傳 400 (模擬超過 context 上限)
+    fail_when: 對 prompt 回傳 True 時該請求一律回傳 error_status (模擬特定片段持續失敗)
+
+    回覆依 stream_chunk_chars 字切段，每段需要 stream_interval 秒產生 (模擬模型逐段輸出)：
+    串流請求 (streamGenerateContent) 在 latency 後送出第一段，之後每產生一段就送出 (SSE 格式)；
+    一般請求則等全部產生完才回傳
+    """
+    def __init__(self, latency=0.5, per_char_latency=0.0, error_rate=0.0, error_status=429, max_concurrent=None, reply=fake_reply,
+                 jitter=0.0, max_prompt_chars=None, fail_when=None, stream_chunk_chars=200, stream_interval=0.0):
+        self.latency = latency
+        self.fail_when = fail_when
+        self.stream_chunk_chars = stream_chunk_chars
+        self.stream_interval = stream_interval
+        self.streamed = 0
+        self.per_char_latency = per_char_latency
+        self.jitter = jitter
+        self.max_prompt_chars = max_prompt_chars
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.max_concurrent = max_concurrent
+        self.reply = reply
+        self.requests = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        super().__init__(partial(_FakeGeminiHandler, self))
+
+class _FakeGeminiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def __init__(self, server_state, *args, **kwargs):
+        self.state = server_state
+        super().__init__(*args, **kwargs)
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error_json(self, status):
+        self._send_json(status, {"error": {
+            "code": status,
+            "message": "injected error",
+            "status": "RESOURCE_EXHAUSTED" if status == 429 else "UNAVAILABLE",
+        }})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        match = re.search(r"/models/([^:/]+):(\w+)", self.path)
+        if not match:
+            self._send_json(404, {"error": {"code": 404, "message": "not found", "status": "NOT_FOUND"}})
+            return
+
+        prompt = "".join(
+            part.get("text", "")
+            for content in request.get("contents", [])
+            for part in content.get("parts", [])
+        )
+
+        state = self.state
+        with state._lock:
+            state.requests += 1
+            if state.max_concurrent is not None and state.in_flight >= state.max_concurrent:
+                state.rate_limited += 1
+                rate_limited = True
+            else:
+                rate_limited = False
+                state.in_flight += 1
+            fail = not rate_limited and (random.random() < state.error_rate or (state.fail_when is not None and state.fail_when(prompt)))
+            if fail:
+                state.errors += 1
+
+        if rate_limited:
+            self._send_error_json(429)
+            return
+
+        if state.max_prompt_chars is not None and len(prompt) > state.max_prompt_chars:
+            with state._lock:
+                state.in_flight -= 1
+            self._send_json(400, {"error": {
+                "code": 400,
+                "message": "The input token count exceeds the maximum number of tokens allowed.",
+                "status": "INVALID_ARGUMENT",
+            }})
+            return
+
+        try:
+            delay = state.latency + state.per_char_latency * len(prompt)
+            if state.jitter:
+                delay *= random.lognormvariate(0, state.jitter)
+            time.sleep(delay)
+        finally:
+            with state._lock:
+                state.in_flight -= 1
+
+        if fail:
+            self._send_error_json(state.error_status)
+            return
+
+        reply = state.reply(prompt)
+        pieces = self._split_reply(reply)
+        if match.group(2) == "streamGenerateContent":
+            self._send_stream(pieces, len(prompt))
+            return
+        time.sleep(state.stream_interval * (len(pieces) - 1))
+        self._send_json(200, {
+            "candidates": [{
+                "content": {"role": "model", "parts": [{"text": reply}]},
+                "finishReason": "STOP",
+            }],
+            "usageMetadata": {"promptTokenCount": len(prompt)},
+        })
+
+    def _split_reply(self, reply):
+        size = max(1, self.state.stream_chunk_chars)
+        return [reply[i:i + size] for i in range(0, len(reply), size)] or [""]
+
+    def _send_stream(self, pieces, prompt_tokens):
+        state = self.state
+        with state._lock:
+            state.streamed += 1
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        for index, piece in enumerate(pieces):
+            if index:
+                time.sleep(state.stream_interval)
+            last = index == len(pieces) - 1
+            event = {"candidates": [{"content": {"role": "model", "parts": [{"text": piece}]}}]}
+            if last:
+                event["candidates"][0]["finishReason"] = "STOP"
+                event["usageMetadata"] = {"promptTokenCount": prompt_tokens, "candidatesTokenCount": sum(len(piece) for piece in pieces)}
+            self.wfile.write(b"data: " + json.dumps(event).encode("utf-8") + b"\r\n\r\n")
+            self.wfile.flush()
+
+class FileServer(_ServerThread):
+    """
+    提供 directory 中檔案的本機 HTTP 伺服器 (模擬 Podcast CDN)
+
+    latency: 每個請求的延遲 (秒)
+    support_range: 是否支援 Range 請求 (False 時一律回傳完整檔案與 200)
+    bandwidth: 每個連線的傳輸速度上限 (bytes/sec)，None 表示不限制
+    fail_after: 每個回應傳送超過此位元組數後中斷連線 (模擬下載中斷)
+    支援 ETag / Last-Modified 條件式 GET (回傳 304)
+    """
+    def __init__(self, directory, latency=0.0, support_range=True, bandwidth=None, fail_after=None):
+        self.latency = latency
+        self.support_range = support_range
+        self.bandwidth = bandwidth
+        self.fail_after = fail_after
+        self.requests = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        super().__init__(partial(_FileHandler, self, directory=directory))
+
+class _FileHandler(SimpleHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    block_size = 64 * 1024
+
+    def __init__(self, server_state, *args, **kwargs):
+        self.state = server_state
+        super().__init__(*args, **kwargs)
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        state = self.state
+        with state._lock:
+            state.requests += 1
+        time.sleep(state.latency)
+
+        path = self.translate_path(self.path)
+        if not os.path.isfile(path):
+            self.send_error(404)
+            return
+
+        stat = os.stat(path)
+        size = stat.st_size
+        etag = f'"{stat.st_mtime_ns:x}-{size:x}"'
+        last_modified = self.date_time_string(int(stat.st_mtime))
+
+        if self.headers.get("If-None-Match") == etag or (
+            not self.headers.get("If-None-Match") and self.headers.get("If-Modified-Since") == last_modified
+        ):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        start, end, status = 0, size - 1, 200
+        range_header = self.headers.get("Range")
+        if range_header and state.support_range:
+            match = re.match(r"bytes=(\d*)-(\d*)$", range_header.strip())
+            if match:
+                if match.group(1):
+                    start = int(match.group(1))
+                    if match.group(2):
+                        end = min(int(match.group(2)), size - 1)
+                elif match.group(2):
+                    start = max(0, size - int(match.group(2)))
+                if start >= size:
+                    self.send_response(416)
+                    self.send_header("Content-Range", f"bytes */{size}")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                status = 206
+
+        length = end - start + 1
+        self.send_response(status)
+        self.send_header("Content-Type", self.guess_type(path))
+        self.send_header("Content-Length", str(length))
+        self.send_header("Accept-Ranges", "bytes" if state.support_range else "none")
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", last_modified)
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.end_headers()
+
+        sent = 0
+        with open(path, "rb") as f:
+            f.seek(start)
+            while sent < length:
+                block = f.read(min(self.block_size, length - sent))
+                if not block:
+                    break
+                if state.fail_after is not None and sent + len(block) > state.fail_after:
+                    # 傳送到一半中斷連線
+                    self.wfile.write(block[:max(0, state.fail_after - sent)])
+                    self.close_connection = True
+                    return
+                self.wfile.write(block)
+                sent += len(block)
+                with state._lock:
+                    state.bytes_sent += len(block)
+                if state.bandwidth:
+                    time.sleep(len(block) / state.bandwidth)
+
+Segment = namedtuple("Segment", ["start", "end", "text"])
+TranscriptionInfo = namedtuple("TranscriptionInfo", ["language", "duration"])
+
+class FakeWhisperModel:
+    """
+    模擬 WhisperModel：每次 transcribe 佔用 delay 秒，再加上音檔每 MB seconds_per_mb 秒 (同一時間只處理一個檔案，如同單一 GPU)
+    並產生 num_segments 段假的文字 (包含音檔名稱，讓不同單集的內容不同)
+    """
+    def __init__(self, delay=1.0, num_segments=200, text="這是一段用來測試的假逐字稿內容。", seconds_per_mb=0.0):
+        self.delay = delay
+        self.seconds_per_mb = seconds_per_mb
+        self.num_segments = num_segments
+        self.text = text
+        self._lock = threading.Lock()
+
+    def transcribe(self, audio, **kwargs):
+        delay = self.delay
+        if self.seconds_per_mb and isinstance(audio, str):
+            delay += os.path.getsize(audio) / 1024 / 1024 * self.seconds_per_mb
+        with self._lock:
+            time.sleep(delay)
+        name = os.path.basename(audio) if isinstance(audio, str) else "audio"
+        segments = [
+            Segment(i * 5.0, i * 5.0 + 4.5, f"{self.text} ({name} #{i})")
+            for i in range(self.num_segments)
+        ]
+        return iter(segments), TranscriptionInfo("zh", self.num_segments * 5.0)
+
+def make_audio_files(directory, count, size=256 * 1024, prefix="episode"):
+    """
+    在 directory 中建立 count 個假的音檔，回傳檔名列表
+    """
+    os.makedirs(directory, exist_ok=True)
+    names = []
+    for i in range(count):
+        name = f"{prefix}{i:03d}.mp3"
+        with open(os.path.join(directory, name), "wb") as f:
+            f.write(os.urandom(size))
+        names.append(name)
+    return names
+
+def make_feed(directory, base_url, name, audio_names, start=None, interval=86400):
+    """
+    在 directory 中寫入 <name>.xml：每個音檔一集 (audio_names 由舊到新)，
+    pubDate 從 start (預設為現在往前推) 起每 interval 秒一集；RSS 中最新的一集在最前面。回傳 feed 的網址
+    """
+    from email.utils import formatdate
+
+    if start is None:
+        start = time.time() - interval * len(audio_names)
+    items = []
+    for i, audio in enumerate(audio_names):
+        items.append(
+            f"<item><title>{name} ep{i}</title><guid>{name}-{i}</guid>"
+            f"<pubDate>{formatdate(start + i * interval)}</pubDate>"
+            f"<enclosure url=\"{base_url}/{audio}\" type=\"audio/mpeg\"/></item>"
+        )
+    path = os.path.join(directory, f"{name}.xml")
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(f"<?xml version='1.0'?><rss version='2.0'><channel><title>{name}</title>{''.join(reversed(items))}</channel></rss>")
+    os.replace(path + ".tmp", path)
+    return f"{base_url}/{name}.xml"
@@ -1,18 +1,24 @@
+import json
 import os
+import re
 import sys
-from google import genai
-from google.genai import types
+import time
+from concurrent.futures import ThreadPoolExecutor
+from gemini_api import AdaptiveLimiter, create_client, generate_text, has_api_key
+from fwhisper import segments_path
+from gemini_cache import cache_key, get_default_cache
+from hotwords import HOTWORDS, NOISE_THRESHOLD, get_corrector
+from metrics import record
+from partial_output import ChunkJournal
 
 # --- Configuration ---
-# 請在此填入您的 API Key，或是設定環境變數 GEMINI_API_KEY
-API_KEY = os.getenv("GEMINI_API_KEY") or "your_api_key"
+# API Key 請在 gemini_api.py 中設定，或是設定環境變數 GEMINI_API_KEY
+MODEL = "gemini-2.5-pro"
 
+# 專有名詞列表在 hotwords.py 中設定 (與 fwhisper.py 共用)
 # 請在此填入您的提示詞 (Prompt)
-HOTWORDS = [
-    "陳鳳馨", "郝哥"
-]
-
-PROMPT = f"""
+# {line_rule} 依送出的格式替換：帶時間軸的原文 (PROMPT) 或只有編號的文字行 (LINES_PROMPT)
+PROMPT_TEMPLATE = f"""
 # Role
 你是一位精通繁體中文（台灣用語）的專業編輯，擅長校對語音轉錄的文字稿。
 
@@ -24,7 +30,7 @@ PROMPT = f"""
 如果你在文中發現與這些 Hotwords 發音相似或意思相近的詞（例如同音錯字），**必須**將其修正為列表中的正確寫法。
 
 Hotwords 列表：
-{{', '.join(HOTWORDS)}}
+{', '.join(HOTWORDS)}
 
 # Examples of Corrections
 - 錯字：「陳鳳心」 -> 修正：「陳鳳馨」 (因為 "陳鳳馨" 在 Hotwords 列表中)
@@ -32,18 +38,46 @@ Hotwords 列表：
 
 # Constraints
 1. **保持原意**：不要刪減或改寫內容，僅修正錯字。
-2. **保留時間軸**：如果原文有時間軸（例如 [00:00.00]），請務必保留。
+2. {{line_rule}}
 3. **輸出格式**：直接輸出修正後的全文，不需要任何開場白或結語。
 
 # Input Text
 """
 
+PROMPT = PROMPT_TEMPLATE.format(
+    line_rule="**保留時間軸**：如果原文有時間軸（例如 [00:00.00]），請務必保留。"
+)
+LINES_PROMPT = PROMPT_TEMPLATE.format(
+    line_rule="**保留行號**：每一行開頭的行號（例如 [12]）必須原樣保留；不可合併、拆分、新增或刪除任何一行，輸出的行數必須與輸入相同。"
+)
+
 # Max characters per chunk (approx 30k-40k tokens depending on language, setting safe limit)
 # User mentioned 50k tokens limit. 
 # For Chinese, 1 char ~ 1 token. For English 1 token ~ 4 chars.
 # 30,000 chars should be safe for < 50k tokens including prompt.
 CHUNK_SIZE = 30000
 
+# 同時送出的校正請求上限；遇到 429/5xx 時會自動降低並行數，之後再慢慢恢復
+MAX_CONCURRENCY = 4
+
+# 只把加上行號的文字送給 LLM，校正後再依行號接回原本的時間軸 (省下時間軸佔用的 token)
+# 行號對不上時該片段改用本地校正的結果；False 則照舊送出帶時間軸的原文
+COMPACT_LINES = True
+
+# fwhisper.py 寫出的文字稿行：[123.45s -> 127.80s] text
+TRANSCRIPT_LINE = re.compile(r"^\[(\d+(?:\.\d+)?)s -> (\d+(?:\.\d+)?)s\] ?(.*)$")
+# 送給 LLM 的編號行：[12] text
+NUMBERED_LINE = re.compile(r"^\s*\[(\d+)\] ?(.*)$")
+
+# 送出 LLM 前先在本地以讀音比對修正 hotword (hotwords.py)；只有 Whisper 對每一段都有信心、本地沒有改寫
+# 也沒有疑似錯誤的片段才略過 LLM
+PRECORRECT = True
+
+# Whisper 信心值 (.segments.jsonl 的 avg_logprob / no_speech_prob)：低於 MIN_AVG_LOGPROB 或高於 MAX_NO_SPEECH_PROB
+# 的段落 (或沒有信心值的段落) 所在的片段一定送給 LLM
+MIN_AVG_LOGPROB = -0.5
+MAX_NO_SPEECH_PROB = 0.5
+
 def split_text_by_lines(text, max_chars=CHUNK_SIZE):
     """
     Splits text into chunks by lines, ensuring each chunk is under max_chars.
@@ -69,13 +103,150 @@ def split_text_by_lines(text, max_chars=CHUNK_SIZE):
     
     return chunks
 
-def correct_transcript(file_path):
+def load_segments(file_path, content):
+    """
+    讀取逐字稿的 (start, end, text) 列表：優先使用 fwhisper.py 寫在旁邊的 .segments.jsonl，
+    沒有 (或與文字稿行數不符) 時從文字稿的時間軸解析。不是 fwhisper.py 格式的文字稿回傳 None。
+    text 去掉前後空白 (Whisper 的片段以空白開頭)，與 align_lines 對 LLM 回傳的行做相同處理，
+    送出與沒送出 LLM 的行寫回時格式一致。
+    """
+    lines = [line for line in content.split("\n") if line.strip()]
+    try:
+        with open(segments_path(file_path), "r", encoding="utf-8") as f:
+            segments = [json.loads(line) for line in f if line.strip()]
+        if len(segments) == len(lines):
+            return [(s["start"], s["end"], s["text"].strip()) for s in segments]
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    segments = []
+    for line in lines:
+        match = TRANSCRIPT_LINE.match(line)
+        if not match:
+            return None
+        segments.append((float(match.group(1)), float(match.group(2)), match.group(3).strip()))
+    return segments or None
+
+def confident_lines(file_path, count):
+    """
+    回傳每一行 Whisper 是否有信心的 bool 列表 (依 .segments.jsonl 的 avg_logprob / no_speech_prob)，
+    沒有 .segments.jsonl 或行數不符時回傳 None
+    """
+    try:
+        with open(segments_path(file_path), "r", encoding="utf-8") as f:
+            segments = [json.loads(line) for line in f if line.strip()]
+    except (OSError, ValueError):
+        return None
+    if len(segments) != count:
+        return None
+    return [
+        isinstance(s, dict)
+        and s.get("avg_logprob") is not None and s["avg_logprob"] >= MIN_AVG_LOGPROB
+        and s.get("no_speech_prob") is not None and s["no_speech_prob"] <= MAX_NO_SPEECH_PROB
+        for s in segments
+    ]
+
+def llm_chunks(chunks, original_chunks, corrector, confident=None, ranges=None):
+    """
+    回傳需要送給 LLM 的片段索引：本地校正改過的、仍有疑似錯誤的，以及含有 Whisper 沒有信心的行的片段。
+    confident 是每一行的信心 (confident_lines)，ranges 是每個片段的 (第一行, 最後一行 + 1)；
+    沒有信心值時所有片段都送出。
+    """
+    pending = []
+    for i, chunk in enumerate(chunks):
+        if (
+            confident is None
+            or not all(confident[ranges[i][0]:ranges[i][1]])
+            or chunk != original_chunks[i]
+            or corrector.noise_score(chunk) > NOISE_THRESHOLD
+        ):
+            pending.append(i)
+    return pending
+
+def number_lines(texts, first=1):
+    """
+    將文字行加上行號 ([n] text)，行號從 first 開始
+    """
+    return "\n".join(f"[{first + i}] {text}" for i, text in enumerate(texts))
+
+def split_numbered(texts, max_chars=CHUNK_SIZE):
+    """
+    依加上行號後的長度切分，回傳 [(第一行的索引, 片段文字)]
+    """
+    chunks = []
+    start = 0
+    length = 0
+    for i, text in enumerate(texts):
+        line_len = len(f"[{i + 1}] {text}") + 1
+        if length + line_len > max_chars and i > start:
+            chunks.append((start, number_lines(texts[start:i], start + 1)))
+            start = i
+            length = 0
+        length += line_len
+    if start < len(texts):
+        chunks.append((start, number_lines(texts[start:], start + 1)))
+    return chunks
+
+def align_lines(response, first, count):
+    """
+    將 LLM 回傳的編號行對回原本的行：行號完全相符時依行號，行號有誤但行數相同時依順序，
+    都不符合時回傳 None (由呼叫端保留原文)
+    """
+    lines = [line for line in response.strip().split("\n") if line.strip()]
+    expected = list(range(first + 1, first + count + 1))
+    matches = [NUMBERED_LINE.match(line) for line in lines]
+    if all(matches) and [int(m.group(1)) for m in matches] == expected:
+        return [m.group(2).strip() for m in matches]
+    if len(lines) == count:
+        return [m.group(2).strip() if m else line.strip() for m, line in zip(matches, lines)]
+    return None
+
+def correct_chunks(client, chunks, max_concurrency=MAX_CONCURRENCY, limiter=None, cache=None, prompt=PROMPT, journal=None):
+    """
+    Corrects the chunks concurrently and returns the results in the original chunk order.
+    Chunks already answered in the response cache are not sent again.
+    With a journal (partial_output.ChunkJournal), every finished chunk is committed to disk as soon as it
+    completes, and chunks committed by an earlier, interrupted run are reused.
+    """
+    if limiter is None:
+        limiter = AdaptiveLimiter(max_concurrency)
+
+    def correct_one(index):
+        chunk = chunks[index]
+        # 組合 Prompt 與內容
+        full_prompt = prompt + "\n" + chunk
+        key = cache_key(MODEL, 0.3, full_prompt)
+        if journal is not None:
+            text = journal.get(key)
+            if text is not None:
+                print(f"  片段 {index+1}/{len(chunks)} 已在上次執行完成，沿用")
+                return text
+        print(f"  正在處理片段 {index+1}/{len(chunks)} ({len(chunk)} chars)...")
+        text = generate_text(client, full_prompt, model=MODEL, temperature=0.3, limiter=limiter, cache=cache)
+        if journal is not None:
+            journal.commit(key, text, chunk=index)
+        print(f"  片段 {index+1}/{len(chunks)} 完成")
+        return text
+
+    # limiter 控制實際的並行請求數，thread 數量只是上限
+    with ThreadPoolExecutor(max_workers=max(1, min(limiter.max_concurrency, len(chunks)))) as executor:
+        # map 會依照輸入順序回傳結果
+        return list(executor.map(correct_one, range(len(chunks))))
+
+def correct_transcript(file_path, client=None, max_concurrency=MAX_CONCURRENCY, limiter=None, cache=None, precorrect=PRECORRECT, compact=COMPACT_LINES):
     """
     Corrects typos in the transcript file using the Gemini API.
+    Pass a shared client (and limiter) to reuse them across several transcripts.
+    Responses are cached per chunk (default: gemini_cache.get_default_cache()).
+    With precorrect, hotwords are fixed locally first; chunks are only skipped when Whisper was confident
+    about every line (see confident_lines) and nothing in them was rewritten or still looks suspicious.
+    With compact, only numbered text lines are sent and the timestamps are re-attached afterwards.
+    Finished chunks are committed to <output>.partial as they complete, so a failed run resumes with
+    the chunks that are still missing instead of starting over.
     """
     # Check if API key is set
-    if not API_KEY or API_KEY == "your_api_key":
-        print("Error: API Key not set. Please set API_KEY in correct.py or as an environment variable GEMINI_API_KEY")
+    if client is None and not has_api_key():
+        print("Error: API Key not set. Please set API_KEY in gemini_api.py or as an environment variable GEMINI_API_KEY")
         return
 
     base_name = os.path.splitext(file_path)[0]
@@ -94,51 +265,125 @@ def correct_transcript(file_path):
         return None
 
     print("正在呼叫 Gemini API 進行校正...")
+    start = time.perf_counter()
+    journal = ChunkJournal(output_file + ".partial", start=start)
+    if len(journal):
+        print(f"  [續傳] 找到上次執行完成的 {len(journal)} 個片段")
+    pending = []
     try:
-        client = genai.Client(api_key=API_KEY)
-        
-        chunks = split_text_by_lines(content)
-        corrected_chunks = []
-        
+        if client is None:
+            client = create_client()
+        if cache is None:
+            cache = get_default_cache()
+
+        segments = load_segments(file_path, content) if compact else None
+        if segments is not None:
+            # 只校正文字，時間軸留在本地
+            content = "\n".join(text for _, _, text in segments)
+
+        uncorrected = content
+        corrector = get_corrector() if precorrect else None
+        if corrector is not None:
+            content, replacements = corrector.correct(content)
+            for (original, word), count in replacements.items():
+                print(f"  [本地校正] {original} -> {word} ({count} 處)")
+
+        if segments is not None:
+            texts = content.split("\n")
+            numbered = split_numbered(texts, max_chars=CHUNK_SIZE)
+            starts = [first for first, _ in numbered]
+            chunks = [chunk for _, chunk in numbered]
+            ranges = list(zip(starts, starts[1:] + [len(texts)]))
+            timestamp_chars = sum(len(f"[{start:.2f}s -> {end:.2f}s] ") for start, end, _ in segments)
+            print(f"  [精簡格式] 只送出編號文字行: {sum(len(c) for c in chunks)} 字 (含時間軸的原文 {len(content) + timestamp_chars} 字)")
+        else:
+            chunks = split_text_by_lines(content, max_chars=CHUNK_SIZE)
+
         print(f"內容過長，將分為 {len(chunks)} 個片段處理...")
 
-        for i, chunk in enumerate(chunks):
-            print(f"  正在處理片段 {i+1}/{len(chunks)} ({len(chunk)} chars)...")
-            
-            # 組合 Prompt 與內容
-            full_prompt = PROMPT + "\n" + chunk
-            
-            response = client.models.generate_content(
-                model='gemini-2.5-pro',
-                contents=full_prompt,
-                config=types.GenerateContentConfig(
-                    temperature=0.3
-                )
+        if corrector is not None:
+            if segments is not None:
+                original_texts = uncorrected.split("\n")
+                original_chunks = [number_lines(original_texts[first:end], first + 1) for first, end in ranges]
+                confident = confident_lines(file_path, len(texts))
+            else:
+                # 沒有每一行的信心值 (保留時間軸或不是 fwhisper.py 的文字稿)，所有片段都送出
+                original_chunks = split_text_by_lines(uncorrected, max_chars=CHUNK_SIZE)
+                confident = ranges = None
+            pending = llm_chunks(chunks, original_chunks, corrector, confident, ranges)
+            skipped = set(range(len(chunks))) - set(pending)
+            saved_chars = sum(len(chunks[i]) for i in skipped)
+            print(f"  [本地校正] 修正 {sum(replacements.values())} 處，省下 {len(skipped)}/{len(chunks)} 個片段 ({saved_chars}/{sum(len(c) for c in chunks)} 字) 的 LLM 校正")
+        else:
+            pending = list(range(len(chunks)))
+
+        if pending:
+            corrected = correct_chunks(
+                client, [chunks[i] for i in pending], max_concurrency=max_concurrency, limiter=limiter, cache=cache,
+                prompt=LINES_PROMPT if segments is not None else PROMPT, journal=journal,
             )
-            
-            corrected_chunks.append(response.text)
-        
-        corrected_text = "\n".join(corrected_chunks)
+            for i, text in zip(pending, corrected):
+                if segments is None:
+                    chunks[i] = text
+                    continue
+                first, end = ranges[i]
+                count = end - first
+                aligned = align_lines(text, first, count)
+                if aligned is None:
+                    print(f"  [警告] 片段 {i+1}/{len(chunks)} 回傳的行數不符 (應為 {count} 行)，保留原文")
+                else:
+                    texts[first:first + count] = aligned
+
+        if segments is not None:
+            corrected_text = "\n".join(
+                f"[{start:.2f}s -> {end:.2f}s] {text}" for (start, end, _), text in zip(segments, texts)
+            ) + "\n"
+        else:
+            corrected_text = "\n".join(chunks)
         
         # 儲存校正後的文字稿
-        with open(output_file, "w", encoding="utf-8") as f:
+        # 先寫入暫存檔再改名，中斷時不會留下不完整的校正稿
+        with open(output_file + ".tmp", "w", encoding="utf-8") as f:
             f.write(corrected_text)
+        os.replace(output_file + ".tmp", output_file)
+        journal.close(remove=True)
+        _record_first_output(journal, len(pending))
             
         print(f"校正完成: {output_file}")
         return output_file
 
     except Exception as e:
+        journal.close()
+        _record_first_output(journal, len(pending))
         print(f"Gemini API 呼叫失敗: {e}")
         return None
 
+def _record_first_output(journal, chunks):
+    """
+    記錄第一個片段提交到 partial 檔的時間 (下游可以從那時開始讀取)，以及沿用上次結果的片段數
+    """
+    values = {"chunks": chunks, "reused": journal.reused}
+    if journal.first_output is not None:
+        values["seconds"] = round(journal.first_output, 4)
+        print(f"  第一個片段在 {journal.first_output:.2f} 秒後寫入")
+    record("first_output", {"stage": "correct"}, **values)
+
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python correct.py <transcript_file>")
+    args = [arg for arg in sys.argv[1:] if arg not in ("--no-cache", "--no-precorrect", "--keep-timestamps")]
+    if not args:
+        print("Usage: python correct.py [--no-cache] [--no-precorrect] [--keep-timestamps] <transcript_file>")
         sys.exit(1)
 
-    file_path = sys.argv[1]
+    if "--no-cache" in sys.argv:
+        get_default_cache().bypass = True
+
+    file_path = args[0]
     if not os.path.exists(file_path):
         print(f"File not found: {file_path}")
         sys.exit(1)
 
-    correct_transcript(file_path)
+    correct_transcript(
+        file_path,
+        precorrect="--no-precorrect" not in sys.argv,
+        compact="--keep-timestamps" not in sys.argv,
+    )
@@ -1,14 +1,88 @@
-import requests
 import feedparser
+import hashlib
+import json
 import os
 import re
-import subprocess
 import sys
+import threading
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+import fwhisper
+import transcribe_pool
+import transcribe_server
+import transcript_index
+from downloader import connection_slot, download_file, get_session
+from episode_index import get_default_index, link_artifacts
+from pipeline import Stage, StagedPipeline
+from podcast_log import captured_output, print_block
+from correct import MAX_CONCURRENCY, correct_transcript
+from summarize import summarize_transcript
+from gemini_api import AdaptiveLimiter, create_client
+from gemini_cache import get_default_cache
+from feed_state import DONE, PENDING, SEEN, FeedState
+from feed_stream import find_episodes
+from job_ledger import BUSY, CLAIMED, DONE as STAGE_DONE, SKIP, JobLedger
+from metrics import record
 
-def get_itunes_feed_url(term):
+# 每個階段的 worker 數量與佇列上限
+# 轉錄通常受限於單一 GPU，下載與 LLM 階段主要在等待網路回應，可以開多一點
+STAGE_WORKERS = {
+    "download": 8,
+    "transcribe": 1,
+    "correct": 2,
+    "summarize": 2,
+}
+# 0 = 不設上限：已下載的單集只是磁碟上的檔案，轉錄忙碌時不該卡住其他節目的下載
+QUEUE_SIZES = {
+    "download": 4,
+    "transcribe": 0,
+    "correct": 4,
+    "summarize": 4,
+}
+
+# 同時搜尋 / 解析 RSS 的節目數 (連線數另外受 downloader.MAX_CONNECTIONS 限制)
+FEED_WORKERS = 8
+
+# 節目設定檔 (JSON，格式見 podcasts.example.json)；以 --config 指定，常駐模式見 podcast_daemon.py
+PODCASTS_CONFIG = "podcasts.json"
+# 設定檔中沒有指定時的輪詢間隔 (分鐘) 與隨機抖動比例 (避免所有 feed 同時輪詢)
+DEFAULT_POLL_MINUTES = 60
+DEFAULT_JITTER = 0.1
+
+# 整個執行期間共用的 Whisper 模型 (第一次需要轉錄時才載入)
+_whisper_model = None
+_whisper_profile = None
+_whisper_model_lock = threading.Lock()
+
+def get_whisper_model(profile=None):
+    """
+    取得共用的 Whisper 模型，每次執行只載入一次
+    指定與目前不同的解碼設定 (fwhisper.PROFILES) 時改載入該設定的模型，同一時間只保留一個模型
+    """
+    global _whisper_model, _whisper_profile
+    profile = fwhisper.get_profile(profile)["name"]
+    with _whisper_model_lock:
+        if _whisper_model is None or _whisper_profile != profile:
+            print(f"     -> 載入 Whisper 模型 ({profile})...")
+            # 先釋放舊的模型，避免兩個模型同時佔用 GPU 記憶體
+            _whisper_model = None
+            _whisper_model = fwhisper.load_model(profile=profile)
+            _whisper_profile = profile
+    return _whisper_model
+
+def get_itunes_feed_url(term, state=None):
     """
     利用 iTunes Search API 搜尋 Podcast 並取得 RSS Feed URL
+    有 state 時會優先使用先前的搜尋結果
     """
+    if state is not None:
+        cached = state.get_feed_url(term)
+        if cached:
+            feed_url, collection_name = cached
+            print(f"找到節目 (快取): {collection_name}")
+            return feed_url
+
     search_url = "https://itunes.apple.com/search"
     params = {
         "term": term,
@@ -18,7 +92,8 @@ def get_itunes_feed_url(term):
     }
     
     try:
-        response = requests.get(search_url, params=params)
+        with connection_slot(search_url):
+            response = get_session().get(search_url, params=params, timeout=60)
         response.raise_for_status()
         data = response.json()
         
@@ -30,6 +105,8 @@ def get_itunes_feed_url(term):
         feed_url = data["results"][0]["feedUrl"]
         collection_name = data["results"][0]["collectionName"]
         print(f"找到節目: {collection_name}")
+        if state is not None:
+            state.set_feed_url(term, feed_url, collection_name)
         return feed_url
     except Exception as e:
         print(f"搜尋錯誤: {e}")
@@ -41,31 +118,51 @@ def sanitize_filename(filename):
     """
     return re.sub(r'[\\/*?:"<>|]', "", filename)
 
-def download_latest_episodes(feed_url, num_episodes=3, save_dir="downloads", keyword=None, target_weekday=None):
+def get_episode_guid(ep):
     """
-    解析 RSS 並下載最新 N 集
+    取得單集的唯一識別 (RSS guid，沒有時改用音檔連結或標題)
     """
-    if not feed_url:
-        return
+    if ep.get("id"):
+        return ep.id
+    for link in ep.get("enclosures", []):
+        if link.get("href"):
+            return link.href
+    return ep.title
 
-    # 解析 RSS
-    print(f"正在解析 RSS: {feed_url} ...")
-    feed = feedparser.parse(feed_url)
-    
-    # 建立儲存資料夾
-    if not os.path.exists(save_dir):
-        os.makedirs(save_dir)
+def open_feed(feed_url, state=None):
+    """
+    以串流方式下載 RSS；有 state 時會送出 If-None-Match / If-Modified-Since
+    伺服器回傳 304 (沒有更新) 時回傳 None
+    """
+    headers = {}
+    if state is not None:
+        etag, last_modified = state.get_validators(feed_url)
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+    response = get_session().get(feed_url, headers=headers, stream=True, timeout=60)
+    if response.status_code == 304:
+        response.close()
+        return None
+    response.raise_for_status()
+    # 讓 response.raw 自動解開 gzip / deflate
+    response.raw.decode_content = True
+    return response
 
-    # 取得最新 N 集 (feed.entries 通常是按時間排序的，最新的在最前面)
-    all_episodes = feed.entries
-    episodes_to_process = all_episodes
+def select_episodes(entries, num_episodes, keyword=None, target_weekday=None):
+    """
+    依關鍵字與星期篩選單集，回傳最新 N 集
+    """
+    episodes_to_process = entries
 
     if keyword:
         print(f"正在篩選包含關鍵字 '{keyword}' 的單集...")
         episodes_to_process = [ep for ep in episodes_to_process if keyword in ep.title]
         if not episodes_to_process:
             print(f"  [提示] 找不到包含關鍵字 '{keyword}' 的單集")
-            return
+            return []
 
     if target_weekday is not None:
         print(f"正在篩選星期 {target_weekday} (0=週一) 的單集...")
@@ -73,9 +170,287 @@ def download_latest_episodes(feed_url, num_episodes=3, save_dir="downloads", key
         episodes_to_process = [ep for ep in episodes_to_process if ep.get('published_parsed') and ep.published_parsed.tm_wday == target_weekday]
         if not episodes_to_process:
             print(f"  [提示] 找不到符合星期 {target_weekday} 的單集")
+            return []
+
+    return episodes_to_process[:num_episodes]
+
+def poll_feed(feed_url, num_episodes, keyword=None, target_weekday=None, state=None):
+    """
+    下載並串流解析 RSS，回傳 (符合條件的新單集, 看過但未被選中的新單集)
+    RSS 沒有更新 (304) 時回傳 None
+    """
+    start = time.perf_counter()
+    with connection_slot(feed_url):
+        response = open_feed(feed_url, state=state)
+        if response is None:
+            record("feed_poll", feed=feed_url, seconds=round(time.perf_counter() - start, 4), not_modified=1)
+            return None
+
+        # 只有沒看過的單集才需要篩選
+        known = state.known_guids(feed_url) if state is not None else None
+
+        # 邊下載邊解析 (feed 通常是按時間排序的，最新的在最前面)，讀到最新 N 集後立即停止
+        print(f"正在篩選單集 (關鍵字: {keyword}, 星期: {target_weekday}, 0=週一)...")
+        try:
+            with response:
+                episodes, passed, scanned = find_episodes(
+                    response.raw, num_episodes, keyword=keyword, target_weekday=target_weekday,
+                    skip=known, get_guid=get_episode_guid,
+                )
+            print(f"  讀取 {scanned} 集後找到 {len(episodes)} 集符合條件的新單集")
+        except ET.ParseError as e:
+            # 格式不標準的 RSS 改用較寬鬆的 feedparser 解析整份 feed
+            print(f"  [提示] 串流解析失敗 ({e})，改用 feedparser 解析")
+            feed = feedparser.parse(feed_url)
+            # 與串流解析相同：已處理過的單集也算在最新 N 集之內，其他沒看過的單集都記為已看過
+            window = {get_episode_guid(ep) for ep in select_episodes(feed.entries, num_episodes, keyword=keyword, target_weekday=target_weekday)}
+            new_episodes = [ep for ep in feed.entries if not known or get_episode_guid(ep) not in known]
+            episodes = [ep for ep in new_episodes if get_episode_guid(ep) in window]
+            passed = [ep for ep in new_episodes if get_episode_guid(ep) not in window]
+            scanned = len(feed.entries)
+
+    record("feed_poll", feed=feed_url, seconds=round(time.perf_counter() - start, 4), not_modified=0,
+           scanned=scanned, episodes=len(episodes))
+    if state is not None:
+        state.set_validators(feed_url, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+    return episodes, passed
+
+# 每個階段的輸入與輸出檔案 (由 job 推算)，工作帳本以這兩個檔案的雜湊判斷階段是否需要重做
+STAGE_FILES = {
+    "download": (lambda job: None, lambda job: job["filename"]),
+    "transcribe": (lambda job: job["filename"], lambda job: os.path.splitext(job["filename"])[0] + ".txt"),
+    "correct": (lambda job: job["transcript"], lambda job: os.path.splitext(job["transcript"])[0] + "_corrected.txt"),
+    "summarize": (lambda job: job["transcript"], lambda job: os.path.splitext(job["transcript"])[0] + "_summary.md"),
+}
+
+def ledger_stage(ledger, name, func, result_key):
+    """
+    以工作帳本包裝一個階段：先認領，已完成 (輸入輸出都沒變) 時直接沿用結果，
+    其他 worker 正在處理或已失敗太多次時不往下傳遞；執行結果記錄回帳本
+    """
+    input_of, output_of = STAGE_FILES[name]
+
+    def run(job):
+        input_path = input_of(job)
+        output_path = output_of(job)
+        outcome, previous = ledger.claim(job["episode_id"], name, input_path=input_path, output_path=output_path)
+        if outcome == SKIP:
+            print(f"     -> {name} 已完成，沿用: {output_path}")
+            if result_key:
+                job[result_key] = output_path
+            return job
+        if outcome != CLAIMED:
+            print(f"     -> {name} 略過 ({'其他 worker 正在處理' if outcome == BUSY else '失敗次數過多'}): {job['title']}")
+            if outcome == BUSY:
+                # 其他 worker 的租約過期後，之後的 resume_jobs() 可以再接手
+                ledger.release(job["episode_id"])
+            return None
+        if previous == STAGE_DONE and os.path.exists(output_path):
+            # 輸入在完成後改變了，舊的輸出不再可信 (不移除的話階段函式會以為已經完成)
+            os.remove(output_path)
+        lost = f"     -> {name} 的租約已被其他 worker 接手，不記錄這次的結果: {job['title']}"
+        try:
+            job = func(job)
+        except Exception as e:
+            if not ledger.fail(job["episode_id"], name, e):
+                print(lost)
+            # 長時間執行時，之後的 resume_jobs() 會再把這一集送進管線重試
+            ledger.release(job["episode_id"])
+            raise
+        produced = job.get(result_key) if result_key else output_path
+        if produced == output_path and os.path.exists(output_path):
+            if not ledger.finish(job["episode_id"], name, input_path=input_path, output_path=output_path):
+                print(lost)
+        else:
+            # 例如校正失敗時改用原始文字稿繼續摘要，之後會再試一次
+            if not ledger.fail(job["episode_id"], name, "沒有產生輸出檔案"):
+                print(lost)
+            ledger.release(job["episode_id"])
+        return job
+
+    return run
+
+def build_pipeline(client=None, get_model=get_whisper_model, workers=None, queue_sizes=None, cache=None, state=None, ledger=None, use_server=None, index=None, search_index=None, keep_results=None):
+    """
+    建立 下載 -> 轉錄 -> 校正 -> 摘要 的多階段管線
+    每個階段有自己的有界佇列與 worker 數量 (預設見 STAGE_WORKERS)
+    若提供 state，下載完成的單集會記錄在 feed 狀態中
+    若提供 ledger (job_ledger.JobLedger)，每個階段都會先向帳本認領，由帳本決定是否略過
+    use_server=True 時，轉錄交給執行中的 transcribe_server.py (沒有執行時才在本程序載入模型)；
+    預設只在使用內建模型 (get_whisper_model) 時啟用
+    使用內建模型且 WHISPER_PROFILE=auto 時，每一集依當時待轉錄的音檔總長度與期限選擇解碼設定
+    若提供 index (episode_index.EpisodeIndex)，與先前處理過的單集相同 (GUID / 音檔網址 / 內容雜湊 / 音訊指紋) 時，
+    直接連結既有的音檔、逐字稿、校正稿與摘要，之後的階段看到輸出已存在就不會重做
+    若提供 search_index (transcript_index.TranscriptIndex)，摘要階段結束時把這一集的逐字稿與摘要加入全文檢索索引
+    keep_results 為數字時管線只保留最近的這麼多筆結果與失敗 (常駐執行，見 pipeline.StagedPipeline)
+    """
+    if use_server is None:
+        use_server = get_model is get_whisper_model
+    # WHISPER_PROFILE=auto 時依已下載、尚未轉錄的音檔總長度選擇解碼設定 (fwhisper.choose_profile)
+    auto_profile = get_model is get_whisper_model and fwhisper.PROFILE == "auto"
+    backlog = {}
+    backlog_lock = threading.Lock()
+    workers = dict(STAGE_WORKERS, **(workers or {}))
+    queue_sizes = dict(QUEUE_SIZES, **(queue_sizes or {}))
+    # 所有校正 worker 共用同一個並行上限，避免同時處理多集時超過 API 限流
+    correct_limiter = AdaptiveLimiter(MAX_CONCURRENCY)
+
+    def download_stage(job):
+        print(f"  [{job.get('podcast') or job.get('feed_url', '')}] {job['progress']} 下載中: {job['title']}")
+        if index is None:
+            download_file(job["audio_url"], job["filename"])
+        elif not reuse_episode(job):
+            digest = hashlib.sha256()
+            download_file(job["audio_url"], job["filename"], digest=digest)
+            match = index.register(job["filename"], feed_url=job["feed_url"], guid=job.get("guid"),
+                                   audio_url=job["audio_url"], sha256=digest.hexdigest())
+            if match:
+                source, method, distance = match
+                linked = link_artifacts(source["filename"], job["filename"])
+                print(f"     -> 與先前的單集相同 ({'內容雜湊' if method == 'sha256' else f'音訊指紋，位元錯誤率 {distance:.3f}'})，"
+                      f"沿用 {len(linked)} 個檔案: {source['filename']}")
+                record("dedup", {"method": method}, linked=len(linked), distance=round(distance, 4))
+        if state is not None and job.get("guid"):
+            state.mark(job["feed_url"], job["guid"], DONE)
+        if auto_profile and not os.path.exists(fwhisper.transcript_path(job["filename"])):
+            seconds = transcribe_pool.backlog_seconds([job["filename"]])
+            with backlog_lock:
+                backlog[job["filename"]] = seconds
+        return job
+
+    def reuse_episode(job):
+        """
+        同一個 feed 的 GUID 或音檔網址先前已經下載過 (例如標題改了而換了檔名) 時，
+        直接連結既有的音檔與產出，不再下載；回傳是否沿用
+        """
+        if os.path.exists(job["filename"]):
+            return False
+        source = index.find_source(job["feed_url"], job.get("guid"), job["audio_url"], exclude=job["filename"])
+        if source is None:
+            return False
+        linked = link_artifacts(source["filename"], job["filename"], include_audio=True)
+        if not os.path.exists(job["filename"]):
+            return False
+        index.add(job["filename"], feed_url=job["feed_url"], guid=job.get("guid"), audio_url=job["audio_url"],
+                  sha256=source["sha256"], size=source["size"], duration=source["duration"],
+                  fingerprint=source["fingerprint"], duplicate_of=source["filename"])
+        print(f"     -> 先前已下載過同一集，沿用 {len(linked)} 個檔案: {source['filename']}")
+        record("dedup", {"method": "source"}, linked=len(linked), distance=0.0)
+        return True
+
+    def transcribe_stage(job):
+        print(f"     -> 開始轉錄: {job['filename']}")
+        txt_filename = None
+        if use_server and transcribe_server.is_running():
+            try:
+                txt_filename = transcribe_server.transcribe(job["filename"])
+            except transcribe_server.Unavailable as e:
+                print(f"     -> 轉錄伺服器無法使用 ({e})，改在本程序轉錄")
+        if txt_filename is None and auto_profile:
+            with backlog_lock:
+                # 其他 worker 已經轉錄完成 (或帳本略過) 的單集不算在待轉錄的量中
+                for filename in [f for f in backlog if f != job["filename"] and os.path.exists(fwhisper.transcript_path(f))]:
+                    del backlog[filename]
+                seconds = sum(backlog.values())
+            profile = fwhisper.choose_profile(seconds, workers=workers["transcribe"])
+            print(f"     -> 待轉錄 {seconds / 3600:.1f} 小時的音檔，使用解碼設定: {profile}")
+            try:
+                txt_filename = fwhisper.transcribe_file(job["filename"], get_whisper_model(profile), profile=profile)
+            finally:
+                with backlog_lock:
+                    backlog.pop(job["filename"], None)
+        elif txt_filename is None:
+            txt_filename = fwhisper.transcribe_file(job["filename"], get_model())
+        if not txt_filename:
+            raise RuntimeError("找不到輸出檔案")
+        print(f"     -> 轉錄完成: {txt_filename}")
+        job["transcript"] = txt_filename
+        return job
+
+    def correct_stage(job):
+        print(f"     -> 開始校正: {job['transcript']}")
+        corrected_filename = correct_transcript(job["transcript"], client=client, limiter=correct_limiter, cache=cache)
+        if corrected_filename:
+            print(f"     -> 校正完成: {corrected_filename}")
+            # 如果校正成功，使用校正後的檔案進行摘要
+            job["transcript"] = corrected_filename
+        else:
+            print(f"     -> 校正失敗，使用原始文字稿進行摘要: {job['transcript']}")
+        return job
+
+    def summarize_stage(job):
+        print(f"     -> 開始摘要: {job['transcript']}")
+        try:
+            summary_filename = summarize_transcript(job["transcript"], client=client, cache=cache)
+            if not summary_filename:
+                raise RuntimeError(job["transcript"])
+            print(f"     -> 摘要完成: {summary_filename}")
+            job["summary"] = summary_filename
+        finally:
+            # 摘要失敗時逐字稿仍可搜尋
+            if search_index is not None:
+                update_search_index(job)
+        return job
+
+    def update_search_index(job):
+        try:
+            indexed, removed, _ = search_index.index_episode(job["filename"])
+        except Exception as e:
+            print(f"     -> 更新全文檢索索引失敗: {e}")
             return
+        if indexed or removed:
+            print(f"     -> 全文檢索索引: 更新 {indexed} 個檔案")
 
-    episodes = episodes_to_process[:num_episodes]
+    if ledger is not None:
+        download_stage = ledger_stage(ledger, "download", download_stage, None)
+        transcribe_stage = ledger_stage(ledger, "transcribe", transcribe_stage, "transcript")
+        correct_stage = ledger_stage(ledger, "correct", correct_stage, "transcript")
+        summarize_stage = ledger_stage(ledger, "summarize", summarize_stage, "summary")
+
+    return StagedPipeline([
+        Stage("download", download_stage, label="下載", workers=workers["download"], queue_size=queue_sizes["download"], buffered=True),
+        Stage("transcribe", transcribe_stage, label="轉錄", workers=workers["transcribe"], queue_size=queue_sizes["transcribe"]),
+        Stage("correct", correct_stage, label="校正", workers=workers["correct"], queue_size=queue_sizes["correct"]),
+        Stage("summarize", summarize_stage, label="摘要", workers=workers["summarize"], queue_size=queue_sizes["summarize"]),
+    ], keep_results=keep_results)
+
+def download_latest_episodes(feed_url, num_episodes=3, save_dir="downloads", keyword=None, target_weekday=None, pipeline=None, client=None, state=None, podcast=None, ledger=None):
+    """
+    串流解析 RSS 並將最新 N 集送進處理管線 (下載 -> 轉錄 -> 校正 -> 摘要)
+    若未提供 pipeline，會建立一條新的管線並等待所有單集處理完成
+    若提供 state (feed_state.FeedState)，只會處理先前沒看過的單集
+    若提供 ledger (job_ledger.JobLedger)，單集會登記在工作帳本中 (標題相同的單集使用不同檔名)
+    """
+    if not feed_url:
+        return
+
+    # 下載 RSS (有 state 時使用條件式 GET，沒有更新就直接結束)
+    print(f"正在解析 RSS: {feed_url} ...")
+    try:
+        result = poll_feed(feed_url, num_episodes, keyword=keyword, target_weekday=target_weekday, state=state)
+    except Exception as e:
+        print(f"  [錯誤] RSS 下載失敗: {e}")
+        return
+    if result is None:
+        print(f"  [提示] RSS 沒有更新 (304)，跳過")
+        return
+    episodes, passed = result
+
+    if state is not None:
+        # 沒被選中的新單集記為已看過，下次輪詢時不再處理
+        state.mark(feed_url, [get_episode_guid(ep) for ep in passed], SEEN)
+
+    # 建立儲存資料夾
+    if not os.path.exists(save_dir):
+        os.makedirs(save_dir)
+
+    if not episodes:
+        print(f"  [提示] 找不到符合條件的新單集")
+        return
+
+    own_pipeline = pipeline is None
+    if own_pipeline:
+        pipeline = build_pipeline(client=client, state=state, ledger=ledger).start()
 
     for i, ep in enumerate(episodes):
         title = ep.title
@@ -90,6 +465,8 @@ def download_latest_episodes(feed_url, num_episodes=3, save_dir="downloads", key
         
         if not audio_url:
             print(f"  [跳過] 找不到音檔連結: {title}")
+            if state is not None:
+                state.mark(feed_url, get_episode_guid(ep), SEEN)
             continue
 
         # 決定副檔名 (通常是 mp3 或 m4a)
@@ -98,87 +475,93 @@ def download_latest_episodes(feed_url, num_episodes=3, save_dir="downloads", key
             ext = "m4a"
             
         filename = f"{save_dir}/{safe_title}.{ext}"
-        
-        # 檢查是否已存在部分檔案
-        resume_header = {}
-        mode = 'wb'
-        existing_size = 0
-        
-        if os.path.exists(filename):
-            existing_size = os.path.getsize(filename)
-            if existing_size > 0:
-                resume_header = {'Range': f'bytes={existing_size}-'}
-                print(f"  [續傳] 偵測到既有檔案 ({existing_size} bytes)，嘗試續傳...")
-
-        # 開始下載
-        print(f"  [{i+1}/{num_episodes}] 下載中: {title}")
+
+        guid = get_episode_guid(ep)
+        if state is not None:
+            # 下載完成前都維持 pending，失敗時下次輪詢會再試一次
+            state.mark(feed_url, guid, PENDING)
+
+        job = {
+            "feed_url": feed_url,
+            "guid": guid,
+            "title": title,
+            "audio_url": audio_url,
+            "filename": filename,
+            "progress": f"[{i+1}/{num_episodes}]",
+            "podcast": podcast or "",
+        }
+        if ledger is not None:
+            job["episode_id"], job["filename"] = ledger.add_episode(feed_url, guid, audio_url, title, filename, podcast=podcast)
+        pipeline.submit(job)
+
+    if own_pipeline:
+        pipeline.close()
+
+def load_podcasts(path):
+    """
+    讀取節目設定檔，回傳 [{"name", "keyword", "weekday", "num_episodes", "interval" (秒), "jitter"}]
+    podcasts 中的項目可以是節目名稱或物件，沒有指定的欄位使用 defaults 中的值
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+
+    defaults = {"keyword": None, "weekday": None, "num_episodes": 1, "interval_minutes": DEFAULT_POLL_MINUTES, "jitter": DEFAULT_JITTER}
+    defaults.update(config.get("defaults", {}))
+    podcasts = []
+    for entry in config.get("podcasts", []):
+        if isinstance(entry, str):
+            entry = {"name": entry}
+        if not entry.get("name"):
+            raise ValueError(f"節目設定缺少 name: {entry}")
+        merged = dict(defaults, **entry)
+        podcasts.append({
+            "name": merged["name"],
+            "keyword": merged["keyword"],
+            "weekday": merged["weekday"],
+            "num_episodes": int(merged["num_episodes"]),
+            "interval": float(merged["interval_minutes"]) * 60,
+            "jitter": float(merged["jitter"]),
+        })
+    return podcasts
+
+def discover_podcast(item, num_episodes=1, pipeline=None, state=None, ledger=None):
+    """
+    處理 target_podcasts 中的一個項目：搜尋節目、解析 RSS 並將新單集送進管線
+    item 可以是節目名稱、(名稱, 關鍵字) / (名稱, 關鍵字, 星期)，或 load_podcasts() 回傳的設定
+    回傳這個節目的完整輸出文字 (多個節目同時處理時不會交錯)
+    """
+    keyword = None
+    target_weekday = None
+
+    if isinstance(item, dict):
+        podcast_name, keyword, target_weekday = item["name"], item.get("keyword"), item.get("weekday")
+        num_episodes = item.get("num_episodes", num_episodes)
+    elif isinstance(item, tuple):
+        if len(item) == 2:
+            podcast_name, keyword = item
+        elif len(item) == 3:
+            podcast_name, keyword, target_weekday = item
+    else:
+        podcast_name = item
+
+    with captured_output() as output:
+        print(f"\n=== 處理 Podcast: {podcast_name} (關鍵字: {keyword}, 星期: {target_weekday}) ===")
+
         try:
-            with requests.get(audio_url, headers=resume_header, stream=True) as r:
-                # 處理 416 Range Not Satisfiable (通常代表已下載完成)
-                if r.status_code == 416:
-                    print(f"     -> 檔案似乎已完整下載，跳過下載步驟。")
-                
-                else:
-                    # 檢查是否支援續傳 (206 Partial Content)
-                    if r.status_code == 206:
-                        mode = 'ab'
-                        print(f"     -> 伺服器支援續傳，從 {existing_size} bytes 開始")
-                    elif r.status_code == 200:
-                        # 如果伺服器不支援續傳 (回傳 200)，則必須重頭下載
-                        if existing_size > 0:
-                            print(f"     -> 伺服器不支援續傳 (回傳 200)，重新下載")
-                        mode = 'wb'
-                    else:
-                        r.raise_for_status()
-
-                    with open(filename, mode) as f:
-                        for chunk in r.iter_content(chunk_size=8192):
-                            f.write(chunk)
-                    print(f"     -> 下載完成")
-
-            # 呼叫 fwhisper.py 進行轉錄
-            fwhisper_script = "fwhisper.py"
-            if os.path.exists(fwhisper_script):
-                print(f"     -> 開始轉錄: {filename}")
-                try:
-                    subprocess.run([sys.executable, fwhisper_script, filename], check=True)
-                    print(f"     -> 轉錄完成")
-                    
-                    txt_filename = os.path.splitext(filename)[0] + ".txt"
-
-                    # 呼叫 correct.py 進行校正
-                    correct_script = "correct.py"
-                    corrected_filename = os.path.splitext(filename)[0] + "_corrected.txt"
-                    
-                    if os.path.exists(correct_script) and os.path.exists(txt_filename):
-                        print(f"     -> 開始校正: {txt_filename}")
-                        try:
-                            subprocess.run([sys.executable, correct_script, txt_filename], check=True)
-                            print(f"     -> 校正完成")
-                            # 如果校正成功，使用校正後的檔案進行摘要
-                            if os.path.exists(corrected_filename):
-                                txt_filename = corrected_filename
-                        except subprocess.CalledProcessError as e:
-                            print(f"     -> 校正失敗: {e}")
-
-                    # 呼叫 summarize.py 進行摘要
-                    summarize_script = "summarize.py"
-                    
-                    if os.path.exists(summarize_script) and os.path.exists(txt_filename):
-                        print(f"     -> 開始摘要: {txt_filename}")
-                        try:
-                            subprocess.run([sys.executable, summarize_script, txt_filename], check=True)
-                            print(f"     -> 摘要完成")
-                        except subprocess.CalledProcessError as e:
-                            print(f"     -> 摘要失敗: {e}")
-                    
-                except subprocess.CalledProcessError as e:
-                    print(f"     -> 轉錄失敗: {e}")
-            else:
-                print(f"     -> 找不到 {fwhisper_script}，跳過轉錄")
+            # 搜尋 Podcast
+            feed_url = get_itunes_feed_url(podcast_name, state=state)
 
+            if feed_url:
+                # 下載最新單集
+                # 建立專屬資料夾
+                # Use sanitize_filename for the directory name to avoid issues with special characters
+                save_dir = f"podcasts/{sanitize_filename(podcast_name)}"
+                download_latest_episodes(feed_url, num_episodes=num_episodes, save_dir=save_dir, keyword=keyword, target_weekday=target_weekday, pipeline=pipeline, state=state, podcast=podcast_name, ledger=ledger)
         except Exception as e:
-            print(f"     -> 下載失敗: {e}")
+            print(f"  [錯誤] 處理 {podcast_name} 時發生錯誤: {e}")
+
+        print("\n" + "="*30 + "\n")
+    return output.getvalue()
 
 # --- 主程式執行區 ---
 if __name__ == "__main__":
@@ -192,29 +575,36 @@ if __name__ == "__main__":
         ("馨天地", "經濟學人"),
         # ("馨天地", "醒醒腦！科學")
     ]
+    if "--config" in sys.argv:
+        # 從設定檔讀取節目列表 (與常駐模式 podcast_daemon.py 相同的格式)
+        index = sys.argv.index("--config")
+        target_podcasts = load_podcasts(sys.argv[index + 1] if index + 1 < len(sys.argv) else PODCASTS_CONFIG)
 
-    for item in target_podcasts:
-        keyword = None
-        target_weekday = None
-        
-        if isinstance(item, tuple):
-            if len(item) == 2:
-                podcast_name, keyword = item
-            elif len(item) == 3:
-                podcast_name, keyword, target_weekday = item
-        else:
-            podcast_name = item
+    client = create_client()
+    state = FeedState()
+    ledger = JobLedger()
+    pipeline = build_pipeline(client=client, state=state, ledger=ledger, index=get_default_index(),
+                              search_index=transcript_index.get_default_index()).start()
 
-        print(f"\n=== 處理 Podcast: {podcast_name} (關鍵字: {keyword}, 星期: {target_weekday}) ===")
-        
-        # 搜尋 Podcast
-        feed_url = get_itunes_feed_url(podcast_name)
-        
-        if feed_url:
-            # 下載最新單集
-            # 建立專屬資料夾
-            # Use sanitize_filename for the directory name to avoid issues with special characters
-            save_dir = f"podcasts/{sanitize_filename(podcast_name)}"
-            download_latest_episodes(feed_url, num_episodes=1, save_dir=save_dir, keyword=keyword, target_weekday=target_weekday)
-        
-        print("\n" + "="*30 + "\n")
\ No newline at end of file
+    # 各節目的搜尋與 RSS 解析同時進行，輸出依 target_podcasts 的順序整段印出
+    with ThreadPoolExecutor(max_workers=FEED_WORKERS) as executor:
+        futures = [executor.submit(discover_podcast, item, pipeline=pipeline, state=state, ledger=ledger) for item in target_podcasts]
+        for future in futures:
+            print_block(future.result())
+
+    # 先前中斷或由其他機器登記、尚未處理完的單集
+    resumed = ledger.resume_jobs()
+    if resumed:
+        print(f"繼續處理工作帳本中 {len(resumed)} 集未完成的單集")
+    for job in resumed:
+        pipeline.submit(job)
+
+    # 等待所有單集處理完成
+    print("等待處理管線完成...")
+    completed, failures = pipeline.close()
+    print(f"處理完成: {len(completed)} 集成功，{len(failures)} 個階段失敗")
+    for stage_name, job, error in failures:
+        print(f"  [失敗] {stage_name}: {job['title']} ({error})")
+
+    cache_stats = get_default_cache().stats()
+    print(f"Gemini 快取: 命中 {cache_stats['hits']} 次，未命中 {cache_stats['misses']} 次")
@@ -0,0 +1,268 @@
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from metrics import record
+
+# --- Configuration ---
+# 檔案大於 SEGMENT_MIN_SIZE 且伺服器支援 Range 時，分成 SEGMENTS 段同時下載
+SEGMENTS = 4
+SEGMENT_MIN_SIZE = 8 * 1024 * 1024
+# 每次讀取 / 寫入的區塊大小
+CHUNK_SIZE = 1024 * 1024
+# 每下載多少位元組更新一次 manifest (中斷後從這裡續傳)
+MANIFEST_INTERVAL = 8 * 1024 * 1024
+# 整個 process 同時進行的連線上限，以及每個 host 的連線上限
+MAX_CONNECTIONS = 16
+MAX_CONNECTIONS_PER_HOST = 4
+# 每個 host 保留在連線池中的連線數
+POOL_SIZE = 16
+TIMEOUT = (10, 60)
+
+class IncompleteDownload(Exception):
+    """
+    下載的大小與 Content-Length 不符
+    """
+
+# 整個 process 共用的 Session，讓同一個 host 的請求重用連線
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+    return _session
+
+_slots_lock = threading.Lock()
+_global_slots = None
+_host_slots = {}
+
+@contextmanager
+def connection_slot(url):
+    """
+    取得一個連線名額 (同時受 MAX_CONNECTIONS 與 MAX_CONNECTIONS_PER_HOST 限制)
+    所有 HTTP 請求都應該在這個區塊中進行
+    """
+    global _global_slots
+    host = urlsplit(url).netloc
+    with _slots_lock:
+        if _global_slots is None:
+            _global_slots = threading.BoundedSemaphore(MAX_CONNECTIONS)
+        if host not in _host_slots:
+            _host_slots[host] = threading.BoundedSemaphore(MAX_CONNECTIONS_PER_HOST)
+        host_slots = _host_slots[host]
+
+    # 固定先取 host 再取全域名額，避免互相等待
+    with host_slots:
+        with _global_slots:
+            yield
+
+def probe(url, session=None):
+    """
+    以 Range: bytes=0-0 探測檔案大小、是否支援 Range 與驗證用的 ETag / Last-Modified
+    回傳 dict(url=最終網址, size=總大小或 None, ranges=bool, validator=str 或 None)
+    """
+    session = session or get_session()
+    with connection_slot(url), session.get(url, headers={"Range": "bytes=0-0"}, stream=True, timeout=TIMEOUT) as r:
+        r.raise_for_status()
+        info = {
+            "url": r.url,
+            "size": None,
+            "ranges": False,
+            "validator": r.headers.get("ETag") or r.headers.get("Last-Modified"),
+        }
+        if r.status_code == 206:
+            match = re.match(r"bytes\s+\d+-\d+/(\d+)", r.headers.get("Content-Range", ""))
+            if match:
+                info["size"] = int(match.group(1))
+                info["ranges"] = True
+        elif r.headers.get("Content-Length"):
+            info["size"] = int(r.headers["Content-Length"])
+    return info
+
+def _manifest_path(part_path):
+    return part_path + ".json"
+
+def _load_manifest(part_path):
+    try:
+        with open(_manifest_path(part_path), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _save_manifest(part_path, manifest):
+    tmp = _manifest_path(part_path) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, _manifest_path(part_path))
+
+def _plan_segments(size, segments):
+    if not size or segments <= 1 or size < SEGMENT_MIN_SIZE:
+        return [{"start": 0, "end": (size - 1) if size else None, "done": 0}]
+    step = -(-size // segments)
+    return [
+        {"start": start, "end": min(start + step, size) - 1, "done": 0}
+        for start in range(0, size, step)
+    ]
+
+def _hash_file(path, digest):
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+
+def _download_segment(session, url, part_path, segment, manifest, lock, digest=None):
+    start = segment["start"] + segment["done"]
+    end = segment["end"]
+    if end is not None and start > end:
+        return
+
+    headers = {}
+    # 從頭下載整個檔案時不送 Range，不支援 Range 的伺服器也能正常下載
+    whole_file = end is None or end == (manifest["size"] or 0) - 1
+    if start > 0 or not whole_file:
+        headers["Range"] = f"bytes={start}-{'' if end is None else end}"
+
+    with connection_slot(url), session.get(url, headers=headers, stream=True, timeout=TIMEOUT) as r:
+        r.raise_for_status()
+        if headers and r.status_code != 206:
+            raise IncompleteDownload(f"伺服器不接受 Range 請求 (回傳 {r.status_code})")
+
+        base = segment["done"]
+        written = 0
+        unsaved = 0
+        with open(part_path, "r+b", buffering=CHUNK_SIZE) as f:
+            f.seek(start)
+            for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+                f.write(chunk)
+                if digest is not None:
+                    digest.update(chunk)
+                written += len(chunk)
+                unsaved += len(chunk)
+                if unsaved >= MANIFEST_INTERVAL:
+                    # manifest 只記錄已寫入磁碟的進度
+                    f.flush()
+                    os.fsync(f.fileno())
+                    with lock:
+                        segment["done"] = base + written
+                        _save_manifest(part_path, manifest)
+                    unsaved = 0
+            f.flush()
+            os.fsync(f.fileno())
+    with lock:
+        segment["done"] = base + written
+        _save_manifest(part_path, manifest)
+
+def download_file(url, filename, segments=SEGMENTS, session=None, digest=None):
+    """
+    下載 url 到 filename
+
+    - 下載中的檔案寫在 filename.part，進度記錄在 filename.part.json，中斷後可從各段的進度續傳
+    - 伺服器支援 Range 且檔案夠大時，分段同時下載
+    - 完成後檢查大小是否與 Content-Length 相符，才改名為 filename
+    - 若提供 digest (例如 hashlib.sha256())，會以完整的檔案內容更新：從頭單段下載時邊下載邊計算，
+      分段、續傳或檔案已存在時在完成後讀取檔案計算
+    回傳 True 表示有下載，False 表示檔案已完整存在
+    """
+    session = session or get_session()
+    part_path = filename + ".part"
+    info = probe(url, session=session)
+    size = info["size"]
+
+    if os.path.exists(filename):
+        existing = os.path.getsize(filename)
+        if size is None or existing == size:
+            print(f"     -> 檔案已完整下載 ({existing} bytes)，跳過下載步驟。")
+            if digest is not None:
+                _hash_file(filename, digest)
+            return False
+        if existing < size and info["ranges"] and not os.path.exists(part_path):
+            # 舊版直接寫入最終檔名的未完成檔案，改成 .part 續傳
+            print(f"  [續傳] 偵測到未完成的檔案 ({existing}/{size} bytes)")
+            os.replace(filename, part_path)
+            _save_manifest(part_path, {
+                "url": url, "size": size, "validator": info["validator"],
+                "segments": [{"start": 0, "end": size - 1, "done": existing}],
+            })
+        else:
+            print(f"     -> 既有檔案大小不符 ({existing}/{size} bytes)，重新下載")
+            os.remove(filename)
+
+    manifest = _load_manifest(part_path) if os.path.exists(part_path) else None
+    if manifest and (
+        manifest.get("url") != url
+        or manifest.get("size") != size
+        or manifest.get("validator") != info["validator"]
+        or not info["ranges"]
+    ):
+        print(f"     -> 遠端檔案已變更或不支援續傳，重新下載")
+        manifest = None
+
+    if manifest:
+        done = sum(s["done"] for s in manifest["segments"])
+        print(f"  [續傳] 從 {done}/{size} bytes 繼續 ({len(manifest['segments'])} 段)")
+    else:
+        manifest = {
+            "url": url,
+            "size": size,
+            "validator": info["validator"],
+            "segments": _plan_segments(size, segments if info["ranges"] else 1),
+        }
+        with open(part_path, "wb") as f:
+            if size:
+                # 預先配置檔案大小，讓各段可以直接寫入自己的位置
+                f.truncate(size)
+        _save_manifest(part_path, manifest)
+
+    lock = threading.Lock()
+    resumed = sum(s["done"] for s in manifest["segments"])
+    start = time.perf_counter()
+    pending = [s for s in manifest["segments"] if s["end"] is None or s["start"] + s["done"] <= s["end"]]
+    streamed = False
+    if len(pending) > 1:
+        print(f"     -> 分 {len(pending)} 段同時下載 ({size} bytes)")
+        errors = []
+
+        def run(segment):
+            try:
+                _download_segment(session, url, part_path, segment, manifest, lock)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=run, args=(s,)) for s in pending]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        if errors:
+            raise errors[0]
+    elif pending:
+        # 從檔案開頭依序寫入時，直接以下載的資料計算雜湊，不需要再讀一次檔案
+        streamed = digest is not None and len(manifest["segments"]) == 1 and pending[0]["done"] == 0
+        _download_segment(session, url, part_path, pending[0], manifest, lock, digest=digest if streamed else None)
+
+    actual = os.path.getsize(part_path)
+    expected = size if size is not None else sum(s["done"] for s in manifest["segments"])
+    if actual != expected or (size is not None and sum(s["done"] for s in manifest["segments"]) != size):
+        raise IncompleteDownload(f"檔案大小不符: {actual}/{expected} bytes")
+
+    if digest is not None and not streamed:
+        _hash_file(part_path, digest)
+    os.replace(part_path, filename)
+    os.remove(_manifest_path(part_path))
+    elapsed = time.perf_counter() - start
+    transferred = actual - resumed
+    record("download", {"server": urlsplit(url).netloc}, bytes=transferred, resumed_bytes=resumed, segments=len(pending),
+           seconds=round(elapsed, 4), bytes_per_sec=round(transferred / elapsed) if elapsed > 0 else 0)
+    print(f"     -> 下載完成 ({actual} bytes)")
+    return True
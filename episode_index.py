@@ -0,0 +1,336 @@
+import os
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+
+# --- Configuration ---
+# 去重索引：每一集音檔的 feed GUID、音檔網址、內容的 SHA-256 與音訊指紋
+EPISODE_INDEX_PATH = os.getenv("EPISODE_INDEX_PATH") or ".cache/episodes.sqlite3"
+# 設定 PODCAST_DEDUP=0 時不比對，每一集都重新下載與處理
+DEDUP_ENABLED = os.getenv("PODCAST_DEDUP", "1") != "0"
+
+# 指紋只解碼音檔開頭的 FINGERPRINT_SECONDS 秒 (降取樣成 FINGERPRINT_RATE Hz 單聲道)
+FINGERPRINT_SECONDS = 120
+FINGERPRINT_RATE = 8000
+FRAME_SIZE = 2048
+HOP_SIZE = 512
+# 每個 frame 在 MIN_FREQ - MAX_FREQ 之間以對數間隔切成 BANDS 個頻帶，
+# 以相鄰頻帶能量差在時間上的變化產生 BANDS - 1 = 32 bits (Haitsma & Kalker 的作法)
+BANDS = 33
+MIN_FREQ = 300
+MAX_FREQ = 2000
+# 位元錯誤率低於 MATCH_THRESHOLD 視為同一段音訊 (不同編碼通常在 0.1 以下，無關的音訊約 0.5)
+MATCH_THRESHOLD = 0.2
+# 比對時容許兩個音檔的開頭偏移幾秒 (例如前面多了一小段靜音)
+MAX_OFFSET_SECONDS = 10
+# 同一個節目的不同單集常有相同的片頭與業配，開頭相符後還要比對片頭之後 (音檔中段) 的 CONFIRM_SECONDS 秒；
+# 片頭之後剩不到 MIN_CONFIRM_SECONDS 秒的短音檔，開頭的指紋已經涵蓋整集
+CONFIRM_SECONDS = 60
+MIN_CONFIRM_SECONDS = 15
+# 只比對長度相近的音檔：相差不超過 DURATION_TOLERANCE 比例或 DURATION_SLACK 秒
+DURATION_TOLERANCE = 0.02
+DURATION_SLACK = 5.0
+
+# 轉錄、校正與摘要的產出 (音檔去掉副檔名 + 後綴)；找到相同的單集時連結到新單集的檔名
+ARTIFACT_SUFFIXES = (".txt", ".segments.jsonl", "_corrected.txt", "_summary.md", "_corrected_summary.md")
+
+def audio_fingerprint(path, seconds=FINGERPRINT_SECONDS, start=0.0):
+    """
+    回傳 (指紋, 音檔長度秒數)：指紋是每個 frame 一個 uint32 的 numpy 陣列，只解碼從 start 秒開始的 seconds 秒
+    沒有 PyAV / numpy 或無法解碼時指紋為 None
+    """
+    try:
+        import av
+        import numpy as np
+    except ImportError:
+        return None, None
+
+    duration = None
+    chunks = []
+    total = 0
+    limit = FINGERPRINT_RATE * seconds
+    try:
+        with av.open(path) as container:
+            if container.duration:
+                duration = container.duration / 1000000
+            resampler = av.AudioResampler(format="s16", layout="mono", rate=FINGERPRINT_RATE)
+            if start > 0:
+                # 跳到 start 之前最近的關鍵 frame，再略過 start 之前的 frame
+                container.seek(int(start * 1000000))
+            for frame in container.decode(audio=0):
+                if start > 0 and frame.time is not None and frame.time + frame.samples / frame.sample_rate <= start:
+                    continue
+                for resampled in resampler.resample(frame):
+                    samples = resampled.to_ndarray().reshape(-1)
+                    chunks.append(samples)
+                    total += len(samples)
+                if total >= limit:
+                    break
+    except Exception:
+        return None, duration
+
+    if total < FRAME_SIZE * 3:
+        return None, duration
+    audio = np.concatenate(chunks)[:limit].astype(np.float32)
+    frames = np.lib.stride_tricks.sliding_window_view(audio, FRAME_SIZE)[::HOP_SIZE]
+    window = np.hanning(FRAME_SIZE).astype(np.float32)
+    edges = (np.geomspace(MIN_FREQ, MAX_FREQ, BANDS + 1) * FRAME_SIZE / FINGERPRINT_RATE).astype(int)
+    energies = np.empty((len(frames), BANDS), dtype=np.float64)
+    # 分批計算 FFT，120 秒的音訊也只需要幾 MB 記憶體
+    for start in range(0, len(frames), 256):
+        power = np.abs(np.fft.rfft(frames[start:start + 256] * window, axis=1)) ** 2
+        cumulative = np.cumsum(power, axis=1)
+        energies[start:start + 256] = cumulative[:, edges[1:]] - cumulative[:, edges[:-1]]
+    band_diff = energies[:, :-1] - energies[:, 1:]
+    bits = (band_diff[1:] - band_diff[:-1]) > 0
+    fingerprint = np.packbits(bits, axis=1, bitorder="little").view("<u4").reshape(-1)
+    return fingerprint, duration
+
+def fingerprint_alignment(a, b, max_offset=None):
+    """
+    回傳 (位元錯誤率, 偏移秒數)：取 ±max_offset 個 frame 的偏移中位元錯誤率最小的，
+    偏移為正時 a 的內容比 b 晚這麼多秒出現
+    """
+    import numpy as np
+
+    if max_offset is None:
+        max_offset = int(MAX_OFFSET_SECONDS * FINGERPRINT_RATE / HOP_SIZE)
+    min_overlap = max(1, min(len(a), len(b)) // 2)
+    best = (1.0, 0.0)
+    for offset in range(-max_offset, max_offset + 1):
+        x = a[max(0, offset):]
+        y = b[max(0, -offset):]
+        n = min(len(x), len(y))
+        if n < min_overlap:
+            continue
+        errors = int(np.unpackbits(np.bitwise_xor(x[:n], y[:n]).view(np.uint8)).sum())
+        if errors / (n * 32) < best[0]:
+            best = (errors / (n * 32), offset * HOP_SIZE / FINGERPRINT_RATE)
+    return best
+
+def fingerprint_distance(a, b, max_offset=None):
+    """
+    兩個指紋的位元錯誤率 (0 = 相同，約 0.5 = 無關)，取 ±max_offset 個 frame 的偏移中最小的值
+    """
+    return fingerprint_alignment(a, b, max_offset)[0]
+
+def confirm_match(path, duration, source_path, offset):
+    """
+    開頭的指紋相符後，比對片頭之後 (音檔中段) 的一段音訊，回傳位元錯誤率
+    offset 是開頭比對得到的偏移秒數 (path 的內容比 source_path 晚出現的秒數)；
+    音檔太短、片頭之後沒有足夠的音訊時回傳 0.0 (開頭的指紋已經涵蓋整集)，無法解碼或不知道長度時回傳 1.0
+    """
+    if not duration:
+        return 1.0
+    start = max(FINGERPRINT_SECONDS, duration / 2 - CONFIRM_SECONDS / 2)
+    seconds = min(CONFIRM_SECONDS, duration - start)
+    if seconds < MIN_CONFIRM_SECONDS:
+        return 0.0
+    fingerprint, _ = audio_fingerprint(path, seconds, start=start)
+    source, _ = audio_fingerprint(source_path, seconds, start=max(0.0, start - offset))
+    if fingerprint is None or source is None:
+        return 1.0
+    return fingerprint_distance(fingerprint, source)
+
+def _fingerprint_bytes(fingerprint):
+    return None if fingerprint is None else fingerprint.astype("<u4").tobytes()
+
+def _fingerprint_array(data):
+    import numpy as np
+
+    return np.frombuffer(data, dtype="<u4")
+
+def artifact_paths(audio_path):
+    base = os.path.splitext(audio_path)[0]
+    return [base + suffix for suffix in ARTIFACT_SUFFIXES]
+
+def link_artifacts(source_audio, target_audio, include_audio=False):
+    """
+    把 source_audio 已經產生的逐字稿、校正稿與摘要連結 (hard link，不支援時複製) 到 target_audio 的檔名，
+    target 已經存在的檔案不會被覆蓋；回傳連結的目標路徑
+    各階段都以寫入暫存檔再改名的方式更新輸出，之後重新產生其中一份時不會影響另一份
+    """
+    pairs = list(zip(artifact_paths(source_audio), artifact_paths(target_audio)))
+    if include_audio:
+        pairs.insert(0, (source_audio, target_audio))
+    linked = []
+    for source, target in pairs:
+        if source == target or not os.path.exists(source) or os.path.exists(target):
+            continue
+        directory = os.path.dirname(target)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        try:
+            os.link(source, target)
+        except OSError:
+            shutil.copy2(source, target)
+        linked.append(target)
+    return linked
+
+class EpisodeIndex:
+    """
+    以 SQLite 儲存的單集去重索引，可在多個 thread 之間共用
+
+    每個下載的音檔記錄 feed GUID、音檔網址、內容的 SHA-256 與開頭一段的音訊指紋。
+    find_source() 在下載前以 GUID / 音檔網址找出已經下載過的同一集；
+    find_duplicate() 在下載後以 SHA-256 (完全相同的檔案) 或指紋 (重新編碼、轉貼到其他 feed) 比對；
+    開頭的指紋相符時還要確認片頭之後的音訊也相同 (confirm_match)，共用片頭的不同單集不會被當成同一集。
+    """
+    def __init__(self, path=EPISODE_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS episodes (
+                filename TEXT PRIMARY KEY,
+                feed_url TEXT,
+                guid TEXT,
+                audio_url TEXT,
+                sha256 TEXT,
+                size INTEGER,
+                duration REAL,
+                fingerprint BLOB,
+                duplicate_of TEXT,
+                created REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_episodes_sha256 ON episodes (sha256);
+            CREATE INDEX IF NOT EXISTS idx_episodes_audio_url ON episodes (audio_url);
+            CREATE INDEX IF NOT EXISTS idx_episodes_guid ON episodes (feed_url, guid);
+        """)
+        self._conn.commit()
+
+    def find_source(self, feed_url, guid, audio_url, exclude=None):
+        """
+        回傳同一個 feed 中 GUID 相同、或音檔網址相同且音檔仍在磁碟上的單集記錄 (dict)，沒有時回傳 None
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM episodes WHERE ((feed_url = ? AND guid = ?) OR audio_url = ?) AND filename != ? ORDER BY created",
+                (feed_url, guid, audio_url, exclude or ""),
+            ).fetchall()
+        for row in rows:
+            entry = dict(row)
+            if os.path.exists(entry["filename"]):
+                return entry
+        return None
+
+    def find_duplicate(self, filename, sha256=None, fingerprint=None, duration=None):
+        """
+        回傳 (相同單集的記錄, 比對方式 "sha256" / "fingerprint", 位元錯誤率)，沒有時回傳 None
+        只考慮音檔仍在磁碟上的單集；filename 是新音檔的路徑 (以指紋比對時用來確認中段)
+        """
+        with self._lock:
+            if sha256:
+                rows = self._conn.execute(
+                    "SELECT * FROM episodes WHERE sha256 = ? AND filename != ? ORDER BY created", (sha256, filename),
+                ).fetchall()
+                for row in rows:
+                    entry = dict(row)
+                    if os.path.exists(entry["filename"]):
+                        return entry, "sha256", 0.0
+            if fingerprint is None:
+                return None
+            if duration:
+                rows = self._conn.execute(
+                    "SELECT * FROM episodes WHERE fingerprint IS NOT NULL AND filename != ? AND "
+                    "(duration IS NULL OR ABS(duration - ?) <= MAX(?, ? * ?)) ORDER BY created",
+                    (filename, duration, DURATION_SLACK, duration, DURATION_TOLERANCE),
+                ).fetchall()
+            else:
+                rows = self._conn.execute(
+                    "SELECT * FROM episodes WHERE fingerprint IS NOT NULL AND filename != ? ORDER BY created", (filename,),
+                ).fetchall()
+
+        candidates = []
+        for row in rows:
+            entry = dict(row)
+            if not os.path.exists(entry["filename"]):
+                continue
+            distance, offset = fingerprint_alignment(fingerprint, _fingerprint_array(entry["fingerprint"]))
+            if distance < MATCH_THRESHOLD:
+                candidates.append((distance, offset, entry))
+        # 開頭最相近的先確認，第一個中段也相符的就是同一集
+        for distance, offset, entry in sorted(candidates, key=lambda c: c[0]):
+            confirm = confirm_match(filename, duration, entry["filename"], offset)
+            if confirm < MATCH_THRESHOLD:
+                return entry, "fingerprint", max(distance, confirm)
+        return None
+
+    def add(self, filename, feed_url=None, guid=None, audio_url=None, sha256=None, size=None, duration=None,
+            fingerprint=None, duplicate_of=None):
+        """
+        記錄 (或更新) 一個音檔；fingerprint 可以是 audio_fingerprint() 回傳的陣列或已序列化的 bytes
+        更新時保留原本的 created (比對時以最早記錄的單集為來源)
+        """
+        if fingerprint is not None and not isinstance(fingerprint, bytes):
+            fingerprint = _fingerprint_bytes(fingerprint)
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO episodes (filename, feed_url, guid, audio_url, sha256, size, duration, fingerprint, duplicate_of, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (filename) DO UPDATE SET feed_url = excluded.feed_url, guid = excluded.guid, "
+                "audio_url = excluded.audio_url, sha256 = excluded.sha256, size = excluded.size, duration = excluded.duration, "
+                "fingerprint = excluded.fingerprint, duplicate_of = excluded.duplicate_of",
+                (filename, feed_url, guid, audio_url, sha256, size, duration, fingerprint, duplicate_of, time.time()),
+            )
+            self._conn.commit()
+
+    def register(self, filename, feed_url=None, guid=None, audio_url=None, sha256=None):
+        """
+        計算剛下載完成的音檔的指紋並記錄，回傳 find_duplicate() 的結果 (沒有相同的單集時為 None)
+        """
+        fingerprint, duration = audio_fingerprint(filename)
+        match = self.find_duplicate(filename, sha256=sha256, fingerprint=fingerprint, duration=duration)
+        self.add(filename, feed_url=feed_url, guid=guid, audio_url=audio_url, sha256=sha256,
+                 size=os.path.getsize(filename), duration=duration, fingerprint=fingerprint,
+                 duplicate_of=match[0]["filename"] if match else None)
+        return match
+
+    def stats(self):
+        with self._lock:
+            count, duplicates, fingerprinted = self._conn.execute(
+                "SELECT COUNT(*), COUNT(duplicate_of), COUNT(fingerprint) FROM episodes"
+            ).fetchone()
+        return {"episodes": count, "duplicates": duplicates, "fingerprinted": fingerprinted}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+def get_default_index():
+    """
+    回傳預設路徑的去重索引 (PODCAST_DEDUP=0 時回傳 None)
+    """
+    return EpisodeIndex() if DEDUP_ENABLED else None
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in ("stats", "match"):
+        print("Usage: python episode_index.py stats | match <音檔>...")
+        sys.exit(1)
+
+    index = EpisodeIndex()
+    if sys.argv[1] == "stats":
+        stats = index.stats()
+        print(f"單集: {stats['episodes']}，其中與先前單集相同: {stats['duplicates']}，有指紋: {stats['fingerprinted']}")
+    else:
+        for path in sys.argv[2:]:
+            start = time.perf_counter()
+            fingerprint, duration = audio_fingerprint(path)
+            elapsed = time.perf_counter() - start
+            if fingerprint is None:
+                print(f"{path}: 無法計算指紋")
+                continue
+            match = index.find_duplicate(path, fingerprint=fingerprint, duration=duration)
+            print(f"{path}: {len(fingerprint)} frames ({elapsed:.2f} 秒)")
+            if match:
+                print(f"  與 {match[0]['filename']} 相同 (位元錯誤率 {match[2]:.3f})")
+            else:
+                print("  沒有相同的單集")
@@ -0,0 +1,125 @@
+import os
+import sqlite3
+import threading
+import time
+
+# --- Configuration ---
+# 記錄 iTunes 搜尋結果、RSS 的 ETag / Last-Modified 以及已看過的單集
+FEED_STATE_PATH = os.getenv("FEED_STATE_PATH") or ".cache/feed_state.sqlite3"
+# iTunes 搜尋結果 (節目名稱 -> feedUrl) 的保存秒數
+SEARCH_CACHE_TTL = 7 * 24 * 3600
+
+# 單集狀態：seen = 已看過但不處理 (不符合篩選條件或超過 N 集)，
+# pending = 已送進處理管線但尚未下載完成，done = 已下載完成
+SEEN = "seen"
+PENDING = "pending"
+DONE = "done"
+
+class FeedState:
+    """
+    以 SQLite 儲存的 RSS 輪詢狀態，可在多個 thread 之間共用
+    """
+    def __init__(self, path=FEED_STATE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS search_results (
+                term TEXT PRIMARY KEY,
+                feed_url TEXT NOT NULL,
+                collection_name TEXT,
+                updated REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS feeds (
+                feed_url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                last_polled REAL
+            );
+            CREATE TABLE IF NOT EXISTS entries (
+                feed_url TEXT NOT NULL,
+                guid TEXT NOT NULL,
+                status TEXT NOT NULL,
+                updated REAL NOT NULL,
+                PRIMARY KEY (feed_url, guid)
+            );
+        """)
+        self._conn.commit()
+
+    # --- iTunes 搜尋結果 ---
+
+    def get_feed_url(self, term, max_age=SEARCH_CACHE_TTL):
+        """
+        回傳快取的 (feed_url, collection_name)，沒有或已過期時回傳 None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT feed_url, collection_name FROM search_results WHERE term = ? AND updated >= ?",
+                (term, time.time() - max_age),
+            ).fetchone()
+        return row
+
+    def set_feed_url(self, term, feed_url, collection_name=None):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO search_results (term, feed_url, collection_name, updated) VALUES (?, ?, ?, ?)",
+                (term, feed_url, collection_name, time.time()),
+            )
+            self._conn.commit()
+
+    # --- 條件式 GET ---
+
+    def get_validators(self, feed_url):
+        """
+        回傳 (etag, last_modified)；若此 feed 仍有尚未下載完成的單集，回傳 (None, None) 強制重新抓取
+        """
+        with self._lock:
+            pending = self._conn.execute(
+                "SELECT 1 FROM entries WHERE feed_url = ? AND status = ? LIMIT 1", (feed_url, PENDING)
+            ).fetchone()
+            if pending:
+                return None, None
+            row = self._conn.execute(
+                "SELECT etag, last_modified FROM feeds WHERE feed_url = ?", (feed_url,)
+            ).fetchone()
+        return row if row else (None, None)
+
+    def set_validators(self, feed_url, etag, last_modified):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO feeds (feed_url, etag, last_modified, last_polled) VALUES (?, ?, ?, ?)",
+                (feed_url, etag, last_modified, time.time()),
+            )
+            self._conn.commit()
+
+    # --- 單集 GUID ---
+
+    def known_guids(self, feed_url):
+        """
+        回傳已處理過的 GUID 集合；尚未下載完成 (pending) 的單集不算，仍視為新單集
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT guid FROM entries WHERE feed_url = ? AND status != ?", (feed_url, PENDING)
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def mark(self, feed_url, guids, status):
+        if isinstance(guids, str):
+            guids = [guids]
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO entries (feed_url, guid, status, updated) VALUES (?, ?, ?, ?)",
+                [(feed_url, guid, status, now) for guid in guids],
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,127 @@
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+ATOM_NS = "{http://www.w3.org/2005/Atom}"
+
+class FeedEntry(dict):
+    """
+    單集資料，與 feedparser 的 entry 一樣可以用 ep.title 或 ep.get("title") 取值
+    """
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+def _local_name(tag):
+    return tag.rsplit("}", 1)[-1]
+
+def _parse_date(text):
+    """
+    將 RSS (RFC 822) 或 Atom (ISO 8601) 的日期轉成 UTC 的 time.struct_time，與 feedparser 的 published_parsed 相同
+    """
+    if not text:
+        return None
+    text = text.strip()
+    try:
+        dt = parsedate_to_datetime(text)
+    except (TypeError, ValueError, IndexError):
+        try:
+            dt = datetime.fromisoformat(text.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc).timetuple()
+
+def _build_entry(elem):
+    """
+    從 <item> (RSS) 或 <entry> (Atom) 取出目前流程會用到的欄位
+    """
+    entry = FeedEntry(title="", enclosures=[])
+    published = None
+    updated = None
+
+    for child in elem:
+        name = _local_name(child.tag)
+        is_atom = child.tag.startswith(ATOM_NS)
+        if name == "title" and child.tag in ("title", ATOM_NS + "title"):
+            entry["title"] = (child.text or "").strip()
+        elif name in ("guid", "id") and child.tag in ("guid", ATOM_NS + "id"):
+            entry["id"] = (child.text or "").strip()
+        elif name == "enclosure" and not is_atom:
+            entry["enclosures"].append(FeedEntry(
+                href=child.get("url", ""),
+                type=child.get("type", ""),
+                length=child.get("length", ""),
+            ))
+        elif name == "link" and is_atom and child.get("rel") == "enclosure":
+            entry["enclosures"].append(FeedEntry(
+                href=child.get("href", ""),
+                type=child.get("type", ""),
+                length=child.get("length", ""),
+            ))
+        elif name == "pubDate" or (is_atom and name == "published"):
+            published = child.text
+        elif is_atom and name == "updated":
+            updated = child.text
+
+    published_parsed = _parse_date(published or updated)
+    if published_parsed is not None:
+        entry["published_parsed"] = published_parsed
+    return entry
+
+def iter_entries(source):
+    """
+    以 iterparse 逐一產生單集 (source 可以是檔案路徑或 file-like 物件)
+    處理完的元素會立即釋放，記憶體用量不會隨 feed 大小成長
+    """
+    stack = []
+    for event, elem in ET.iterparse(source, events=("start", "end")):
+        if event == "start":
+            stack.append(elem)
+            continue
+        stack.pop()
+        if elem.tag in ("item", ATOM_NS + "entry"):
+            yield _build_entry(elem)
+            # 從父元素移除已處理的單集，避免整棵樹留在記憶體中
+            elem.clear()
+            if stack:
+                stack[-1].remove(elem)
+
+def matches(ep, keyword=None, target_weekday=None):
+    if keyword and keyword not in ep.title:
+        return False
+    if target_weekday is not None:
+        # published_parsed is a time.struct_time, tm_wday is 0-6 (Monday is 0)
+        if not ep.get("published_parsed") or ep.published_parsed.tm_wday != target_weekday:
+            return False
+    return True
+
+def find_episodes(source, num_episodes, keyword=None, target_weekday=None, skip=None, get_guid=None):
+    """
+    邊解析邊篩選，讀到最新的 num_episodes 集符合條件的單集後立即停止
+
+    skip: 已處理過的 GUID 集合，需搭配 get_guid 使用；已處理過的單集仍算在最新 num_episodes 集之內，
+    只是不會被選中 (沒有新單集時不會往下選到更舊的單集)
+    回傳 (最新 num_episodes 集中還沒處理過的單集, 讀到但未被選中的新單集, 已讀取的單集總數)
+    """
+    selected = []
+    passed = []
+    scanned = 0
+    window = 0
+    for ep in iter_entries(source):
+        scanned += 1
+        matched = matches(ep, keyword, target_weekday)
+        if skip and get_guid(ep) in skip:
+            pass
+        elif matched:
+            selected.append(ep)
+        else:
+            passed.append(ep)
+        if matched:
+            window += 1
+            if window >= num_episodes:
+                break
+    return selected, passed, scanned
@@ -1,11 +1,86 @@
+import json
 import os
+import sqlite3
+import sys
+import threading
 import time
-start_time = time.time()
+from hotwords import HOTWORDS
+from metrics import record
+
+# Named decoding profiles: the model, compute types, beam search and VAD parameters used together.
+# "default" is the long-standing large-v2 setup; "archive-fast" uses the turbo model with greedy decoding
+# to catch up on a back catalogue; "high-accuracy" decodes in float32 with a more patient beam search
+# and keeps shorter pauses. rtf is a rough real-time factor (processing time / audio length) per device,
+# used by choose_profile until transcriptions with the profile have been measured on the device (RTF_PATH).
+# benchmarks/eval_profiles.py measures the real-time factor and character error rate of each profile.
+PROFILES = {
+    "archive-fast": dict(
+        model="deepdml/faster-whisper-large-v3-turbo-ct2",
+        gpu_compute_type="int8_float16",
+        cpu_compute_type="int8",
+        beam_size=1,
+        repetition_penalty=1.0,
+        vad_parameters=dict(min_silence_duration_ms=1000, min_speech_duration_ms=250, max_speech_duration_s=30),
+        rtf={"cuda": 0.02, "cpu": 0.4},
+    ),
+    "default": dict(
+        model="large-v2",
+        gpu_compute_type="float16",
+        cpu_compute_type="int8",
+        beam_size=10,
+        repetition_penalty=1.1,
+        vad_parameters=dict(min_silence_duration_ms=500, min_speech_duration_ms=150, max_speech_duration_s=15),
+        rtf={"cuda": 0.1, "cpu": 2.0},
+    ),
+    "high-accuracy": dict(
+        model="large-v2",
+        gpu_compute_type="float32",
+        cpu_compute_type="float32",
+        beam_size=10,
+        patience=2.0,
+        repetition_penalty=1.1,
+        vad_parameters=dict(min_silence_duration_ms=300, min_speech_duration_ms=100, max_speech_duration_s=15, speech_pad_ms=600),
+        rtf={"cuda": 0.3, "cpu": 6.0},
+    ),
+}
+# A profile name, or "auto" to pick one of AUTO_PROFILES from the backlog size (see choose_profile)
+PROFILE = os.environ.get("WHISPER_PROFILE", "default")
+# Candidates for "auto", from preferred to fastest; the first one that clears the backlog before the deadline wins
+AUTO_PROFILES = ("default", "archive-fast")
+DEADLINE_HOURS = float(os.environ.get("WHISPER_DEADLINE_HOURS", "24"))
+# Measured real-time factors, kept per profile, device and compute type for every process sharing the cache
+RTF_PATH = os.environ.get("WHISPER_RTF_PATH") or ".cache/rtf.sqlite3"
+# Recorded transcriptions used to measure a profile's real-time factor (older ones are deleted)
+RTF_HISTORY = 50
+
+PROMPT = "播客內容"
+
+# The hotword list is shared with correct.py (see hotwords.py)
+HWORDS = ", ".join(HOTWORDS)
+
+# "auto" uses CUDA when a GPU is visible and falls back to the CPU otherwise; "cuda" / "cpu" force one
+DEVICE = os.environ.get("WHISPER_DEVICE", "auto")
+# 0 lets CTranslate2 pick the number of threads; num_workers > 1 allows concurrent transcribe() calls
+CPU_THREADS = int(os.environ.get("WHISPER_CPU_THREADS", "0"))
+NUM_WORKERS = int(os.environ.get("WHISPER_NUM_WORKERS", "1"))
+# Batched inference (BatchedInferencePipeline) decodes several VAD chunks at once; 0 keeps sequential decoding
+GPU_BATCH_SIZE = 0
+CPU_BATCH_SIZE = 8
 
-import pynvml
+# Transcripts are written to <name>.txt.partial and renamed to <name>.txt only when complete.
+# Every CHECKPOINT_INTERVAL seconds the partial file is fsynced and <name>.txt.partial.json records
+# the end time of the last written segment, so an interrupted run resumes decoding from there.
+CHECKPOINT_INTERVAL = 30.0
+SAMPLE_RATE = 16000
+
+VAD_PARAMETERS = PROFILES["default"]["vad_parameters"]
+# Read decoded PCM and VAD speech spans from audio_cache instead of decoding every run (WHISPER_AUDIO_CACHE=0 disables)
+USE_AUDIO_CACHE = os.environ.get("WHISPER_AUDIO_CACHE", "1") != "0"
 
 def get_optimal_device():
     try:
+        import pynvml
+
         pynvml.nvmlInit()
         device_count = pynvml.nvmlDeviceGetCount()
         best_device_index = 0
@@ -22,7 +97,7 @@ def get_optimal_device():
             if free_memory_mb > max_free_memory:
                 max_free_memory = free_memory_mb
                 best_device_index = i
-        
+
         pynvml.nvmlShutdown()
         print(f"Selected GPU {best_device_index} with {max_free_memory:.2f} MB free memory.")
         return best_device_index
@@ -30,59 +105,396 @@ def get_optimal_device():
         print(f"Error detecting GPU memory: {e}. Defaulting to GPU 0.")
         return 0
 
-from faster_whisper import WhisperModel
+def cuda_device_count():
+    try:
+        import ctranslate2
+        return ctranslate2.get_cuda_device_count()
+    except Exception:
+        return 0
 
-model_size = "large-v2"
-# model_size = "deepdml/faster-whisper-large-v3-turbo-ct2"
-device_index = get_optimal_device()
-model = WhisperModel(model_size, device="cuda", device_index=device_index, compute_type="float16")
-# model = WhisperModel(model_size, device="cuda", compute_type="int8_float16")
-# model = WhisperModel(model_size, device="cuda", device_index=1, compute_type="float32")
+def resolve_device(device=DEVICE):
+    """
+    Returns "cuda" or "cpu" for the requested device ("auto" picks CUDA only when a GPU is available).
+    """
+    if device == "auto":
+        return "cuda" if cuda_device_count() > 0 else "cpu"
+    return device
 
-prompt = "播客內容"
+def get_profile(name=None):
+    """
+    Returns the settings of a decoding profile (default: PROFILE) as a dict that includes its "name".
+    "auto" resolves to the preferred profile for an empty backlog; use choose_profile when the backlog is known.
+    """
+    name = name or PROFILE
+    if name == "auto":
+        name = choose_profile(0)
+    if name not in PROFILES:
+        raise ValueError(f"unknown profile {name!r} (choose from {', '.join(PROFILES)} or auto)")
+    return dict(PROFILES[name], name=name)
 
-words = [
-    "伯樂"
-]
-hwords = ", ".join(words)
+_rtf_conn = None
+_rtf_lock = threading.Lock()
 
-import sys
+def _rtf_db():
+    global _rtf_conn
+    if _rtf_conn is None:
+        directory = os.path.dirname(RTF_PATH)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(RTF_PATH, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS rtf (
+                id INTEGER PRIMARY KEY,
+                profile TEXT NOT NULL,
+                device TEXT NOT NULL,
+                compute_type TEXT NOT NULL,
+                rtf REAL NOT NULL,
+                recorded REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_rtf_key ON rtf (profile, device, compute_type, id);
+        """)
+        _rtf_conn = conn
+    return _rtf_conn
+
+def compute_type_for(profile, device):
+    """
+    The compute type a profile loads models with on "cuda" or "cpu"
+    """
+    return PROFILES[profile]["gpu_compute_type" if device == "cuda" else "cpu_compute_type"]
+
+def model_device(model):
+    """
+    "cuda" or "cpu" for a model from load_model (also when batched), or the configured device for stand-ins
+    """
+    for _ in range(3):
+        # The ctranslate2 model under WhisperModel reports its device and compute type
+        if isinstance(getattr(model, "compute_type", None), str) and getattr(model, "device", None) in ("cuda", "cpu"):
+            return model.device
+        model = getattr(model, "model", None)
+    return resolve_device(DEVICE)
+
+def note_rtf(profile, device, rtf):
+    """
+    Stores a measured real-time factor, keeping the last RTF_HISTORY for the profile on this device
+    """
+    key = (profile, device, compute_type_for(profile, device))
+    try:
+        with _rtf_lock:
+            conn = _rtf_db()
+            with conn:
+                conn.execute("INSERT INTO rtf (profile, device, compute_type, rtf, recorded) VALUES (?, ?, ?, ?, ?)",
+                             key + (rtf, time.time()))
+                conn.execute(
+                    "DELETE FROM rtf WHERE profile = ? AND device = ? AND compute_type = ? AND id NOT IN "
+                    "(SELECT id FROM rtf WHERE profile = ? AND device = ? AND compute_type = ? ORDER BY id DESC LIMIT ?)",
+                    key + key + (RTF_HISTORY,),
+                )
+    except (sqlite3.Error, OSError) as e:
+        print(f"Could not store the real-time factor in {RTF_PATH}: {e}")
+
+def profile_rtf(name, device=None):
+    """
+    Real-time factor of a profile on a device: the median of the last RTF_HISTORY transcriptions measured
+    with it (by any process sharing RTF_PATH), or the profile's estimate for the device when there are none
+    """
+    device = resolve_device(device or DEVICE)
+    try:
+        with _rtf_lock:
+            rows = _rtf_db().execute(
+                "SELECT rtf FROM rtf WHERE profile = ? AND device = ? AND compute_type = ? ORDER BY id DESC LIMIT ?",
+                (name, device, compute_type_for(name, device), RTF_HISTORY),
+            ).fetchall()
+    except (sqlite3.Error, OSError):
+        rows = []
+    values = sorted(row[0] for row in rows)
+    if values:
+        return values[len(values) // 2]
+    return PROFILES[name]["rtf"][device]
+
+def choose_profile(backlog_seconds, deadline_seconds=None, workers=1, candidates=AUTO_PROFILES, rtfs=None, device=None):
+    """
+    Picks the first of candidates (ordered from preferred to fastest) that transcribes backlog_seconds of audio
+    with `workers` models in parallel within deadline_seconds (default DEADLINE_HOURS), or the fastest candidate
+    when none does. rtfs maps profile names to real-time factors and defaults to profile_rtf().
+    """
+    if deadline_seconds is None:
+        deadline_seconds = DEADLINE_HOURS * 3600
+    for name in candidates:
+        rtf = rtfs[name] if rtfs and name in rtfs else profile_rtf(name, device)
+        if backlog_seconds * rtf / max(1, workers) <= deadline_seconds:
+            return name
+    return candidates[-1]
+
+class BatchedModel:
+    """
+    Wraps faster-whisper's BatchedInferencePipeline so transcribe() uses the configured batch size.
+    """
+    def __init__(self, model, batch_size):
+        from faster_whisper import BatchedInferencePipeline
+
+        self.model = model
+        self.pipeline = BatchedInferencePipeline(model=model)
+        self.batch_size = batch_size
+
+    def transcribe(self, audio, **kwargs):
+        kwargs.setdefault("batch_size", self.batch_size)
+        return self.pipeline.transcribe(audio, **kwargs)
+
+def load_model(model_size=None, device_index=None, device=DEVICE, cpu_threads=CPU_THREADS, num_workers=NUM_WORKERS, batch_size=None, profile=None):
+    """
+    Loads the Whisper model once so it can be shared by every transcription in the run.
+    The model and compute type come from the decoding profile (default: PROFILE); model_size overrides the model.
+    Uses CUDA when a GPU is available, otherwise the CPU.
+    batch_size > 0 returns a batched model (defaults: GPU_BATCH_SIZE / CPU_BATCH_SIZE).
+    """
+    from faster_whisper import WhisperModel
+
+    profile = get_profile(profile)
+    model_size = model_size or profile["model"]
+    device = resolve_device(device)
+    if device == "cuda":
+        if device_index is None:
+            device_index = get_optimal_device()
+        compute_type = profile["gpu_compute_type"]
+        if batch_size is None:
+            batch_size = GPU_BATCH_SIZE
+    else:
+        device_index = 0
+        compute_type = profile["cpu_compute_type"]
+        if batch_size is None:
+            batch_size = CPU_BATCH_SIZE
+
+    load_start_time = time.time()
+    model = WhisperModel(
+        model_size,
+        device=device,
+        device_index=device_index,
+        compute_type=compute_type,
+        cpu_threads=cpu_threads,
+        num_workers=num_workers,
+    )
+    # model = WhisperModel(model_size, device="cuda", compute_type="int8_float16")
+    # model = WhisperModel(model_size, device="cuda", device_index=1, compute_type="float32")
+    load_time = time.time() - load_start_time
+    print(f"Model load time: {load_time:.2f} seconds ({model_size}, {device}, {compute_type}, batch size {batch_size or 1}, profile {profile['name']})")
+    record("model_load", {"device": device, "model": model_size, "profile": profile["name"]}, seconds=round(load_time, 3), batch_size=batch_size or 1)
+    if batch_size and batch_size > 1:
+        return BatchedModel(model, batch_size)
+    return model
+
+def _checkpoint_path(partial_path):
+    return partial_path + ".json"
+
+def _load_checkpoint(partial_path):
+    try:
+        with open(_checkpoint_path(partial_path), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _save_checkpoint(partial_path, checkpoint):
+    tmp = _checkpoint_path(partial_path) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp, _checkpoint_path(partial_path))
+
+def segments_path(txt_path):
+    """
+    Path of the structured transcript written next to a .txt transcript: one JSON object
+    {"start", "end", "text"} per line, in the same order as the .txt lines, plus Whisper's
+    "avg_logprob" and "no_speech_prob" when the model reports them
+    """
+    return os.path.splitext(txt_path)[0] + ".segments.jsonl"
+
+def _resume_point(file_path, partial_path, segments_partial):
+    """
+    Returns (seconds, txt bytes, segments bytes) already written to the partial files, or (0.0, 0, 0) to start over.
+    """
+    checkpoint = _load_checkpoint(partial_path)
+    if (
+        not checkpoint
+        or "segments_bytes" not in checkpoint
+        or not os.path.exists(partial_path)
+        or not os.path.exists(segments_partial)
+        or checkpoint.get("audio_size") != os.path.getsize(file_path)
+        or os.path.getsize(partial_path) < checkpoint.get("bytes", 0)
+        or os.path.getsize(segments_partial) < checkpoint["segments_bytes"]
+    ):
+        return 0.0, 0, 0
+    return checkpoint["end"], checkpoint["bytes"], checkpoint["segments_bytes"]
 
-def transcribe_file(file_path, model, prompt, hwords):
+def _decode_segments(file_path, model, offset, prompt, hwords, stats=None, profile=None):
+    """
+    Transcribes file_path from offset seconds on, yielding (start, end, text, scores) in seconds from the start of the file.
+    scores holds the segment's avg_logprob and no_speech_prob (empty when the model does not report them).
+    Beam search and VAD parameters come from the decoding profile (a get_profile() dict).
+    If stats is a dict, the decoded audio length and the speech length kept by VAD (seconds) are stored in it.
+    """
+    stats = {} if stats is None else stats
+    profile = profile or get_profile()
+    vad_parameters = profile["vad_parameters"]
+    options = dict(
+        # language="zh",
+        # multilingual=True,
+        initial_prompt=prompt,
+        temperature=0.0,
+        repetition_penalty=profile["repetition_penalty"],
+        beam_size=profile["beam_size"],
+        hotwords=hwords
+    )
+    if "patience" in profile:
+        options["patience"] = profile["patience"]
+
+    audio = file_path
+    if USE_AUDIO_CACHE:
+        from audio_cache import gather_spans, get_default_cache, to_float32
+
+        cache = get_default_cache()
+        pcm = cache.load(file_path)
+        if not isinstance(model, BatchedModel):
+            # Sequential decoding: the same speech-only audio faster-whisper's VAD filter would build,
+            # from spans computed once per file
+            from faster_whisper.vad import SpeechTimestampsMap
+
+            start_sample = int(offset * SAMPLE_RATE)
+            spans = [
+                {"start": max(span["start"], start_sample), "end": span["end"]}
+                for span in cache.speech_spans(file_path, vad_parameters)
+                if span["end"] > start_sample
+            ]
+            stats["audio_seconds"] = max(0.0, len(pcm) / SAMPLE_RATE - offset)
+            stats["speech_seconds"] = sum(span["end"] - span["start"] for span in spans) / SAMPLE_RATE
+            if not spans:
+                return
+            # Only the speech is read from the int16 memory map and converted, span by span
+            speech = gather_spans(pcm, spans)
+            segments, info = model.transcribe(speech, vad_filter=False, **options)
+            timestamps = SpeechTimestampsMap(spans, SAMPLE_RATE)
+            for segment in segments:
+                yield (timestamps.get_original_time(segment.start), timestamps.get_original_time(segment.end, is_end=True),
+                       segment.text, _segment_scores(segment))
+            return
+        # Batched decoding runs VAD itself on float32 audio: convert from the resume point on
+        audio = to_float32(pcm[int(offset * SAMPLE_RATE):])
+    elif offset > 0:
+        from faster_whisper import decode_audio
+
+        audio = decode_audio(file_path, sampling_rate=SAMPLE_RATE)[int(offset * SAMPLE_RATE):]
+
+    # Batched decoding (or no cache): faster-whisper runs VAD itself. When resuming, audio starts at the last
+    # checkpointed segment and the timestamps are shifted back by offset
+    if not isinstance(audio, str) and not len(audio):
+        return
+    segments, info = model.transcribe(audio, vad_filter=True, vad_parameters=vad_parameters, **options)
+    stats["audio_seconds"] = info.duration
+    stats["speech_seconds"] = getattr(info, "duration_after_vad", None)
+    for segment in segments:
+        yield segment.start + offset, segment.end + offset, segment.text, _segment_scores(segment)
+
+def _segment_scores(segment):
+    return {
+        name: round(getattr(segment, name), 4)
+        for name in ("avg_logprob", "no_speech_prob")
+        if getattr(segment, name, None) is not None
+    }
+
+def transcript_path(file_path):
+    """
+    Path of the finished transcript for an audio file (<name>.txt)
+    """
+    return os.path.splitext(file_path)[0] + ".txt"
+
+def transcribe_file(file_path, model, prompt=PROMPT, hwords=HWORDS, progress=None, profile=None):
+    """
+    Transcribes one audio file with an already loaded model, using the decoding settings of profile
+    (default: PROFILE; it should be the profile the model was loaded with).
+    Returns the path of the .txt transcript, or None if the audio file is missing.
+    The same segments are also written to <name>.segments.jsonl (see segments_path) for correct.py.
+    An interrupted transcription resumes from its last checkpoint instead of starting over.
+    progress(end_seconds, audio_seconds) is called after every segment; an exception raised from it
+    stops the transcription after checkpointing what was written, so a later call resumes from there.
+    """
     if not os.path.exists(file_path):
         print(f"File not found: {file_path}")
-        return
+        return None
+
+    txt_filename = transcript_path(file_path)
 
-    txt_filename = os.path.splitext(file_path)[0] + ".txt"
-    
     # Check if the corresponding .txt file already exists
     if os.path.exists(txt_filename):
         print(f"Skipping {file_path} (corresponding .txt file already exists)\r\n")
         print(f"Output file: {txt_filename}")
-        return
+        return txt_filename
 
     trans_start_time = time.time()
 
-    segments, info = model.transcribe(
-        file_path,
-        # language="zh",
-        # multilingual=True,
-        initial_prompt=prompt,
-        temperature=0.0,
-        vad_filter=True,
-        vad_parameters = dict(min_silence_duration_ms=500, min_speech_duration_ms=150, max_speech_duration_s=15),
-        repetition_penalty=1.1,
-        beam_size=10,
-        hotwords=hwords
-    )
+    partial_path = txt_filename + ".partial"
+    segments_filename = segments_path(txt_filename)
+    segments_partial = segments_filename + ".partial"
+    offset, resume_bytes, resume_segments_bytes = _resume_point(file_path, partial_path, segments_partial)
+    if not resume_bytes and os.path.exists(_checkpoint_path(partial_path)):
+        # A checkpoint that does not match this audio or partial file is stale
+        os.remove(_checkpoint_path(partial_path))
+    if offset > 0:
+        print(f"Resuming {file_path} from {offset:.2f}s")
+
+    profile = get_profile(profile)
+    stats = {}
+    segments = _decode_segments(file_path, model, offset, prompt, hwords, stats=stats, profile=profile)
 
     print(f"File: {file_path}")
-    # print(info)
 
-    with open(txt_filename, "w", encoding="utf-8") as txt_file:
-        for segment in segments:
-            # print(f"[{segment.start:.2f}s -> {segment.end:.2f}s] {segment.text}")
-            txt_file.write(f"[{segment.start:.2f}s -> {segment.end:.2f}s] {segment.text}\n")
+    checkpoint = {
+        "audio_size": os.path.getsize(file_path),
+        "end": offset,
+        "bytes": resume_bytes,
+        "segments_bytes": resume_segments_bytes,
+    }
+    with open(partial_path, "r+b" if resume_bytes else "wb") as txt_file, \
+            open(segments_partial, "r+b" if resume_bytes else "wb") as segments_file:
+        # Drop anything written after the last checkpoint; it is decoded again
+        for f, position in ((txt_file, resume_bytes), (segments_file, resume_segments_bytes)):
+            f.truncate(position)
+            f.seek(position)
+
+        def save_checkpoint(end):
+            # The checkpoint only ever points at data that is already on disk
+            for f in (txt_file, segments_file):
+                f.flush()
+                os.fsync(f.fileno())
+            checkpoint["end"] = end
+            checkpoint["bytes"] = txt_file.tell()
+            checkpoint["segments_bytes"] = segments_file.tell()
+            _save_checkpoint(partial_path, checkpoint)
+
+        last_checkpoint = time.time()
+        last_end = offset
+        for start, end, text, scores in segments:
+            # print(f"[{start:.2f}s -> {end:.2f}s] {text}")
+            txt_file.write(f"[{start:.2f}s -> {end:.2f}s] {text}\n".encode("utf-8"))
+            row = {"start": round(start, 2), "end": round(end, 2), "text": text, **scores}
+            segments_file.write((json.dumps(row, ensure_ascii=False) + "\n").encode("utf-8"))
+            last_end = end
+            if time.time() - last_checkpoint >= CHECKPOINT_INTERVAL:
+                save_checkpoint(end)
+                last_checkpoint = time.time()
+            if progress is not None:
+                try:
+                    progress(end, stats.get("audio_seconds"))
+                except BaseException:
+                    save_checkpoint(last_end)
+                    raise
+        for f in (txt_file, segments_file):
+            f.flush()
+            os.fsync(f.fileno())
+
+    # Only a complete transcript gets the .txt name that correct.py and later runs look for,
+    # so the segments file is renamed first
+    os.replace(segments_partial, segments_filename)
+    os.replace(partial_path, txt_filename)
+    if os.path.exists(_checkpoint_path(partial_path)):
+        os.remove(_checkpoint_path(partial_path))
 
     print()  # Print an empty line for better readability
 
@@ -90,22 +502,86 @@ def transcribe_file(file_path, model, prompt, hwords):
     trans_execution_time = trans_end_time - trans_start_time
     print(f"Transcribe time: {trans_execution_time:.2f} seconds\r\n")
     print(f"Output file: {txt_filename}")
+    _record_transcription(trans_execution_time, offset, stats, profile["name"], model_device(model))
+    return txt_filename
+
+def _record_transcription(seconds, offset, stats, profile, device):
+    """
+    Records the real-time factor (processing time / decoded audio length, lower is faster) and the VAD speech ratio.
+    """
+    audio_seconds = stats.get("audio_seconds")
+    speech_seconds = stats.get("speech_seconds")
+    values = {"seconds": round(seconds, 3), "resumed_from": round(offset, 2)}
+    if audio_seconds:
+        values["audio_seconds"] = round(audio_seconds, 2)
+        values["rtf"] = round(seconds / audio_seconds, 4)
+        if speech_seconds is not None:
+            values["speech_seconds"] = round(speech_seconds, 2)
+            values["speech_ratio"] = round(speech_seconds / audio_seconds, 4)
+        note_rtf(profile, device, values["rtf"])
+    record("transcribe", {"profile": profile}, **values)
 
 # Specify the directory containing the mp3 files
 directory = "."
 extensions = (".m4a", ".mp3")
 
-if len(sys.argv) > 1:
-    target_file = sys.argv[1]
-    transcribe_file(target_file, model, prompt, hwords)
-else:
-    # Loop through all files in the directory
-    for filename in os.listdir(directory):
-        # Check if the file has the mp3 extension
-        if filename.endswith(extensions):
-            file_path = os.path.join(directory, filename)
-            transcribe_file(file_path, model, prompt, hwords)
-
-end_time = time.time()
-execution_time = end_time - start_time
-print(f"Total execution time: {execution_time:.2f} seconds\r\n")
\ No newline at end of file
+if __name__ == "__main__":
+    start_time = time.time()
+
+    # A running transcribe_server.py already has the model loaded; otherwise load it in this process.
+    # Finished transcripts are skipped before either, so a rerun costs no model load at all.
+    import transcribe_server
+
+    if len(sys.argv) > 1:
+        target_file = sys.argv[1]
+        if os.path.exists(transcript_path(target_file)):
+            print(f"Skipping {target_file} (corresponding .txt file already exists)\r\n")
+        else:
+            transcript = None
+            if transcribe_server.is_running():
+                print(f"Sending {target_file} to the transcription server at {transcribe_server.SERVER_ADDRESS}")
+                try:
+                    transcript = transcribe_server.transcribe(target_file, on_progress=transcribe_server.print_progress)
+                    print(f"Output file: {transcript}")
+                except transcribe_server.Unavailable as e:
+                    print(f"Transcription server unavailable ({e}); transcribing in this process")
+            if transcript is None:
+                transcribe_file(target_file, load_model())
+    else:
+        files = [os.path.join(directory, filename) for filename in os.listdir(directory) if filename.endswith(extensions)]
+        files = [path for path in files if not os.path.exists(transcript_path(path))]
+        transcripts, errors = {}, []
+        if files and transcribe_server.is_running():
+            print(f"Sending {len(files)} files to the transcription server at {transcribe_server.SERVER_ADDRESS}")
+            jobs = [transcribe_server.submit(path) for path in files]
+            files = []
+            for job in jobs:
+                try:
+                    job = transcribe_server.wait(job["id"])
+                except transcribe_server.Unavailable as e:
+                    print(f"Transcription server unavailable ({e}); transcribing {job['path']} in this process")
+                    try:
+                        transcribe_server.cancel(job["id"])
+                    except OSError:
+                        pass
+                    job = dict(job, status="unavailable")
+                if job["status"] == "done":
+                    transcripts[job["path"]] = job["transcript"]
+                elif job["status"] == "unavailable":
+                    files.append(job["path"])
+                else:
+                    errors.append((job["path"], job["error"] or job["status"]))
+        if files:
+            # Transcribe every audio file in the directory with a pool of worker processes
+            from transcribe_pool import transcribe_files
+
+            local_transcripts, local_errors = transcribe_files(files)
+            transcripts.update(local_transcripts)
+            errors.extend(local_errors)
+        print(f"Transcribed {len(transcripts)} files, {len(errors)} failed")
+        for file_path, error in errors:
+            print(f"Failed: {file_path} ({error})")
+
+    end_time = time.time()
+    execution_time = end_time - start_time
+    print(f"Total execution time: {execution_time:.2f} seconds\r\n")
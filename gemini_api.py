@@ -0,0 +1,191 @@
+import os
+import random
+import threading
+import time
+from google import genai
+from google.genai import errors, types
+from gemini_cache import cache_key
+from metrics import record
+
+# --- Configuration ---
+# 請在此填入您的 API Key，或是設定環境變數 GEMINI_API_KEY
+API_KEY = os.getenv("GEMINI_API_KEY") or "your_api_key"
+# 可選：改用其他 API 端點 (例如本機的測試伺服器)
+BASE_URL = os.getenv("GEMINI_BASE_URL")
+DEFAULT_MODEL = "gemini-2.5-pro"
+
+# 遇到 429 (rate limit) 或 5xx 時的重試設定 (指數退避 + jitter)
+MAX_RETRIES = 5
+RETRY_BASE_DELAY = 2.0
+RETRY_MAX_DELAY = 60.0
+
+# 以串流方式接收回應 (streamGenerateContent)：可以邊產生邊寫出，並量測第一段輸出的時間；GEMINI_STREAM=0 停用
+STREAM = os.getenv("GEMINI_STREAM", "1") != "0"
+
+def has_api_key():
+    """
+    檢查是否已設定 API Key
+    """
+    return bool(API_KEY) and API_KEY != "your_api_key"
+
+def create_client(api_key=None, base_url=None):
+    """
+    建立 Gemini client，可在校正與摘要等多個階段之間共用
+    """
+    base_url = base_url or BASE_URL
+    http_options = types.HttpOptions(base_url=base_url) if base_url else None
+    return genai.Client(api_key=api_key or API_KEY, http_options=http_options)
+
+class AdaptiveLimiter:
+    """
+    可動態調整上限的並行控制 (AIMD)
+    被限流時上限減半，連續成功 increase_after 次後上限加一，最多回到 max_concurrency
+    同一波同時失敗的請求只會減半一次 (兩次減半至少間隔 decrease_interval 秒)
+    """
+    def __init__(self, max_concurrency, increase_after=4, decrease_interval=1.0):
+        self.max_concurrency = max(1, max_concurrency)
+        self.limit = self.max_concurrency
+        self.increase_after = increase_after
+        self.decrease_interval = decrease_interval
+        self._last_decrease = 0.0
+        self.active = 0
+        self.successes = 0
+        self.throttles = 0
+        self._streak = 0
+        self._cond = threading.Condition()
+
+    def __enter__(self):
+        with self._cond:
+            while self.active >= self.limit:
+                self._cond.wait()
+            self.active += 1
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+        return False
+
+    def on_success(self):
+        with self._cond:
+            self.successes += 1
+            self._streak += 1
+            if self._streak >= self.increase_after and self.limit < self.max_concurrency:
+                self.limit += 1
+                self._streak = 0
+                self._cond.notify_all()
+
+    def on_throttle(self):
+        with self._cond:
+            self.throttles += 1
+            self._streak = 0
+            now = time.monotonic()
+            if now - self._last_decrease >= self.decrease_interval:
+                self.limit = max(1, self.limit // 2)
+                self._last_decrease = now
+
+def is_retryable(error):
+    """
+    429 與 5xx 錯誤可以重試，其他錯誤 (例如 400 或 API Key 錯誤) 直接拋出
+    """
+    return isinstance(error, errors.APIError) and (error.code == 429 or (error.code or 0) >= 500)
+
+def backoff_delay(attempt):
+    """
+    第 attempt 次重試前的等待秒數 (full jitter)
+    """
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** attempt)))
+
+def generate_text(client, prompt, model=DEFAULT_MODEL, temperature=0.3, limiter=None, max_retries=MAX_RETRIES, cache=None,
+                  stream=None, on_text=None):
+    """
+    呼叫 Gemini 產生文字並回傳結果
+    遇到 429 或 5xx 時以指數退避重試；若提供 limiter，請求會受其並行上限控制並回報限流狀態
+    若提供 cache (gemini_cache.ResponseCache)，相同的模型、設定與 prompt 會直接使用快取的回應
+    stream (預設見 STREAM) 時以串流方式接收，每收到一段就以目前為止的全文呼叫 on_text；
+    重試會從頭重新產生，因此 on_text 收到的全文可能比上一次短。不串流 (或使用快取) 時只在最後呼叫一次
+    """
+    if stream is None:
+        stream = STREAM
+    key = None
+    if cache is not None:
+        key = cache_key(model, temperature, prompt)
+        cached = cache.get(key)
+        if cached is not None:
+            record("gemini_cache_hit", {"model": model}, input_chars=len(prompt), output_chars=len(cached))
+            if on_text is not None:
+                on_text(cached)
+            return cached
+
+    text = _generate_with_retry(client, prompt, model, temperature, limiter, max_retries, stream, on_text)
+
+    if cache is not None:
+        cache.put(key, text, model)
+    return text
+
+def _generate_with_retry(client, prompt, model, temperature, limiter, max_retries, stream=False, on_text=None):
+    attempt = 0
+    start = time.perf_counter()
+    while True:
+        attempt_start = time.perf_counter()
+        try:
+            if limiter is None:
+                text, usage, first_output = _generate_once(client, prompt, model, temperature, stream, on_text)
+            else:
+                with limiter:
+                    text, usage, first_output = _generate_once(client, prompt, model, temperature, stream, on_text)
+                limiter.on_success()
+            break
+        except Exception as e:
+            if not is_retryable(e) or attempt >= max_retries:
+                record("gemini_request", {"model": model}, failed=1, error=str(getattr(e, "code", None) or type(e).__name__),
+                       seconds=round(time.perf_counter() - start, 4), input_chars=len(prompt), retries=attempt)
+                raise
+            if limiter is not None:
+                limiter.on_throttle()
+            delay = backoff_delay(attempt)
+            attempt += 1
+            print(f"  [重試] Gemini 回傳 {e.code}，{delay:.1f} 秒後重試 ({attempt}/{max_retries})")
+            time.sleep(delay)
+
+    values = {}
+    if usage is not None:
+        for field, name in (("prompt_token_count", "input_tokens"), ("candidates_token_count", "output_tokens")):
+            if getattr(usage, field, None) is not None:
+                values[name] = getattr(usage, field)
+    # seconds 包含重試與退避的等待時間，latency 與 first_output (收到第一段的時間) 只計最後一次 (成功的) 請求
+    record("gemini_request", {"model": model}, failed=0, seconds=round(time.perf_counter() - start, 4),
+           latency=round(time.perf_counter() - attempt_start, 4), first_output=round(first_output, 4),
+           streamed=int(bool(stream)), input_chars=len(prompt), output_chars=len(text or ""), retries=attempt, **values)
+    return text
+
+def _generate_once(client, prompt, model, temperature, stream=False, on_text=None):
+    """
+    送出一次請求，回傳 (全文, usage_metadata, 收到第一段回應的秒數)
+    """
+    start = time.perf_counter()
+    config = types.GenerateContentConfig(temperature=temperature)
+    if not stream:
+        response = client.models.generate_content(model=model, contents=prompt, config=config)
+        first_output = time.perf_counter() - start
+        if on_text is not None:
+            on_text(response.text or "")
+        return response.text, getattr(response, "usage_metadata", None), first_output
+
+    text = ""
+    usage = None
+    first_output = None
+    for chunk in client.models.generate_content_stream(model=model, contents=prompt, config=config):
+        if getattr(chunk, "usage_metadata", None) is not None:
+            usage = chunk.usage_metadata
+        if not chunk.text:
+            continue
+        if first_output is None:
+            first_output = time.perf_counter() - start
+        text += chunk.text
+        if on_text is not None:
+            on_text(text)
+    if first_output is None:
+        first_output = time.perf_counter() - start
+    return text, usage, first_output
@@ -0,0 +1,165 @@
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+# --- Configuration ---
+# Gemini 回應的本機快取，以 (模型, 生成設定, 完整 prompt) 的雜湊值為 key
+CACHE_PATH = os.getenv("GEMINI_CACHE_PATH") or ".cache/gemini_responses.sqlite3"
+CACHE_MAX_BYTES = 512 * 1024 * 1024  # 超過此大小時，先淘汰最久沒用到的項目
+CACHE_MAX_AGE = 30 * 24 * 3600  # 超過此秒數的項目視為過期
+# 設定 GEMINI_CACHE_BYPASS=1 時不讀取快取 (仍會寫入新的回應)
+CACHE_BYPASS = os.getenv("GEMINI_CACHE_BYPASS") == "1"
+
+# 每寫入幾筆檢查一次是否需要淘汰
+EVICT_EVERY = 50
+
+def cache_key(model, temperature, prompt):
+    """
+    以模型名稱、生成設定與完整 prompt 計算快取 key
+    """
+    payload = json.dumps({"model": model, "temperature": temperature}, sort_keys=True)
+    h = hashlib.sha256()
+    h.update(payload.encode("utf-8"))
+    h.update(b"\0")
+    h.update(prompt.encode("utf-8"))
+    return h.hexdigest()
+
+class ResponseCache:
+    """
+    以 SQLite 儲存的 Gemini 回應快取，可在多個 thread 之間共用
+    """
+    def __init__(self, path=CACHE_PATH, max_bytes=CACHE_MAX_BYTES, max_age=CACHE_MAX_AGE, bypass=CACHE_BYPASS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.bypass = bypass
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses (last_access)")
+        self._conn.commit()
+        self.evict()
+
+    def get(self, key):
+        """
+        回傳快取中的回應，沒有 (或 bypass) 時回傳 None
+        """
+        if self.bypass:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response FROM responses WHERE key = ? AND created >= ?",
+                (key, now - self.max_age),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, response, model=None):
+        if response is None:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, size, created, last_access) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, response, len(response.encode("utf-8")), now, now),
+            )
+            self._conn.commit()
+            self._puts += 1
+            should_evict = self._puts % EVICT_EVERY == 0
+        if should_evict:
+            self.evict()
+
+    def evict(self):
+        """
+        刪除過期項目，並在總大小超過上限時依最後使用時間淘汰 (LRU)
+        回傳刪除的筆數
+        """
+        with self._lock:
+            removed = self._conn.execute(
+                "DELETE FROM responses WHERE created < ?", (time.time() - self.max_age,)
+            ).rowcount
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                rows = self._conn.execute("SELECT key, size FROM responses ORDER BY last_access").fetchall()
+                stale = []
+                for key, size in rows:
+                    if total <= self.max_bytes:
+                        break
+                    stale.append((key,))
+                    total -= size
+                self._conn.executemany("DELETE FROM responses WHERE key = ?", stale)
+                removed += len(stale)
+            self._conn.commit()
+        return removed
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entries, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        return {"entries": entries, "bytes": total, "hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+# 同一個 process 中共用的快取 (第一次使用時才開啟)
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def get_default_cache():
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ResponseCache()
+    return _default_cache
+
+if __name__ == "__main__":
+    commands = ("stats", "evict", "clear")
+    if len(sys.argv) < 2 or sys.argv[1] not in commands:
+        print(f"Usage: python gemini_cache.py <{'|'.join(commands)}>")
+        sys.exit(1)
+
+    cache = ResponseCache(bypass=False)
+    if sys.argv[1] == "evict":
+        print(f"已刪除 {cache.evict()} 筆快取")
+    elif sys.argv[1] == "clear":
+        cache.clear()
+        print("已清除所有快取")
+    stats = cache.stats()
+    print(f"快取: {cache.path} ({stats['entries']} 筆, {stats['bytes'] / 1024 / 1024:.2f} MB)")
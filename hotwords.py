@@ -0,0 +1,209 @@
+import re
+import threading
+from collections import deque
+
+# 專有名詞列表 (fwhisper.py 轉錄時的 hotwords 與 correct.py 的校正都使用這份列表)
+HOTWORDS = [
+    "陳鳳馨", "郝哥", "伯樂"
+]
+
+# 片段中疑似錯誤的數量超過此值才送給 LLM 校正
+NOISE_THRESHOLD = 0
+# 連續幾行內容完全相同時視為 Whisper 重複輸出 (偶爾重複一次的短句很常見，不算)
+REPEAT_RUN = 3
+# 至少幾個字的 hotword 才會在本地直接改寫；較短的同音詞 (例如「好歌」之於「郝哥」) 太常見，只標記為疑似錯誤交給 LLM
+MIN_REWRITE_LENGTH = 3
+
+_TIMESTAMP = re.compile(r"^\[[^\]]*\]\s*")
+
+def _is_cjk(char):
+    return "㐀" <= char <= "鿿" or "豈" <= char <= "﫿"
+
+class _Matcher:
+    """
+    以讀音 key 序列為 pattern 的 Aho-Corasick 自動機，key(char) 決定每個字元的讀音
+    """
+    def __init__(self, key):
+        self._key = key
+        self._symbols = {}
+        # 自動機的狀態：轉移表、失敗連結、在此狀態結束的 pattern
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+
+    def _symbol(self, key):
+        symbol = self._symbols.get(key)
+        if symbol is None:
+            symbol = self._symbols[key] = len(self._symbols)
+        return symbol
+
+    def add(self, keys, pattern):
+        state = 0
+        for symbol in (self._symbol(key) for key in keys):
+            if symbol not in self._goto[state]:
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[state][symbol] = len(self._goto) - 1
+            state = self._goto[state][symbol]
+        self._output[state].append(pattern)
+
+    def build(self):
+        # 以 BFS 建立失敗連結，並把失敗狀態的輸出合併進來
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for symbol, child in self._goto[state].items():
+                fail = self._fail[state]
+                while fail and symbol not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(symbol, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+                queue.append(child)
+
+    def scan(self, text):
+        """
+        回傳 [(起點, 終點, pattern), ...]
+        """
+        matches = []
+        state = 0
+        for position, char in enumerate(text):
+            # 沒出現在任何 hotword 中的讀音不會有轉移，直接回到起點
+            symbol = self._symbols.get(self._key(char), -1)
+            while state and symbol not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(symbol, 0)
+            for pattern in self._output[state]:
+                matches.append((position + 1 - pattern[1], position + 1, pattern))
+        return matches
+
+class HotwordCorrector:
+    """
+    以讀音比對的 hotword 校正器
+
+    每個中文字轉成拼音 (其他字元維持原樣、不分大小寫)，再以 Aho-Corasick 自動機一次掃過整份文字稿，
+    時間複雜度與文字稿長度成正比，和 hotword 數量無關。
+    - 改寫：含聲調的讀音與 MIN_REWRITE_LENGTH 字以上的 hotword 完全相同但寫法不同的片段 (例如「陳鳳心」) 直接改成 hotword
+    - 疑似錯誤：不含聲調的讀音與 hotword 相同或只對一部分 (例如「好歌」、「陳風」)，不改寫，由 noise_score 交給 LLM 判斷
+    """
+    def __init__(self, hotwords=HOTWORDS):
+        from pypinyin import Style, lazy_pinyin, pinyin
+
+        self._pinyin = pinyin
+        self._lazy_pinyin = lazy_pinyin
+        self._keys = {}
+        self.hotwords = [word for word in hotwords if len(word) >= 2]
+        # 改寫用含聲調的讀音 (輕聲記為 5，「了」與「樂」不同)，疑似錯誤用不含聲調的讀音
+        self._exact = _Matcher(lambda char: self._key(char, Style.TONE3))
+        self._loose = _Matcher(lambda char: self._key(char, Style.NORMAL))
+
+        for index, word in enumerate(self.hotwords):
+            for reading in self._readings(word, Style.TONE3):
+                if len(word) >= MIN_REWRITE_LENGTH:
+                    self._exact.add(reading, (index, len(word), False))
+            for reading in self._readings(word, Style.NORMAL):
+                self._loose.add(reading, (index, len(word), False))
+                # 三個字以上的 hotword：相鄰兩個字的讀音也是 pattern，用來找出只對了一部分的疑似錯字
+                if len(reading) >= 3:
+                    for i in range(len(reading) - 1):
+                        self._loose.add(reading[i:i + 2], (index, 2, True))
+        self._exact.build()
+        self._loose.build()
+
+    def _readings(self, word, style):
+        readings = {
+            # 依上下文判斷的讀音 (例如「伯樂」的「樂」讀 le)，以及每個字最常見的讀音
+            tuple(self._lazy_pinyin(word, style=style, neutral_tone_with_five=True)) if all(_is_cjk(c) for c in word) else None,
+            tuple(self._key(c, style) for c in word),
+        }
+        return [reading for reading in readings if reading is not None and len(reading) == len(word)]
+
+    def _key(self, char, style):
+        """
+        單一字元的讀音 key：中文字取最常見讀音的拼音，其他字元取小寫
+        """
+        key = self._keys.get((char, style))
+        if key is None:
+            if _is_cjk(char):
+                readings = self._pinyin(char, style=style, heteronym=True, neutral_tone_with_five=True)
+                key = readings[0][0] if readings and readings[0] else char
+            else:
+                key = char.lower()
+            self._keys[(char, style)] = key
+        return key
+
+    def correct(self, text):
+        """
+        將含聲調的讀音與 hotword 相同但寫法不同的片段改成 hotword (改寫後的文字長度不變)
+        回傳 (校正後的文字, {(原文, hotword): 次數})
+        """
+        full = self._exact.scan(text)
+        # 重疊時保留最先開始、最長的相符片段
+        full.sort(key=lambda m: (m[0], -(m[1] - m[0])))
+        parts = []
+        replacements = {}
+        last = 0
+        for start, end, (index, _, _) in full:
+            if start < last:
+                continue
+            word = self.hotwords[index]
+            original = text[start:end]
+            if original != word:
+                parts.append(text[last:start])
+                parts.append(word)
+                replacements[(original, word)] = replacements.get((original, word), 0) + 1
+                last = end
+        parts.append(text[last:])
+        return "".join(parts), replacements
+
+    def noise_score(self, text):
+        """
+        疑似錯誤的數量，用來判斷片段是否還需要 LLM 校正：
+        - 不含聲調的讀音與 hotword 相同但寫法不同、沒有在本地改寫的片段 (例如「好歌」、「陳風心」)
+        - 只有部分讀音與 hotword 相符的片段 (例如「陳風」、「鳳新」)
+        - 連續 REPEAT_RUN 行以上內容完全相同 (Whisper 重複輸出)
+        - 無法解碼的字元 (U+FFFD)
+        """
+        suspicious = 0
+        covered = set()
+        matches = self._loose.scan(text)
+        for start, end, (index, _, is_partial) in matches:
+            if not is_partial:
+                covered.update(range(start, end))
+                if text[start:end] != self.hotwords[index]:
+                    suspicious += 1
+        suspicious += sum(
+            1 for start, end, (_, _, is_partial) in matches
+            if is_partial and (start not in covered or end - 1 not in covered)
+        )
+
+        previous = None
+        run = 0
+        for line in text.split("\n"):
+            content = _TIMESTAMP.sub("", line).strip()
+            run = run + 1 if content and content == previous else 1
+            if run >= REPEAT_RUN:
+                suspicious += 1
+            previous = content
+
+        suspicious += text.count("\ufffd")
+        return suspicious
+
+# 同一個 process 共用的校正器；沒有安裝 pypinyin 時為 None
+_corrector = None
+_corrector_loaded = False
+_corrector_lock = threading.Lock()
+
+def get_corrector():
+    """
+    回傳共用的 HotwordCorrector，沒有安裝 pypinyin 時回傳 None (不做本地校正)
+    """
+    global _corrector, _corrector_loaded
+    with _corrector_lock:
+        if not _corrector_loaded:
+            _corrector_loaded = True
+            try:
+                _corrector = HotwordCorrector()
+            except ImportError:
+                print("[提示] 未安裝 pypinyin，略過本地 hotword 校正 (pip install pypinyin)")
+    return _corrector
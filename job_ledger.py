@@ -0,0 +1,359 @@
+import hashlib
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+
+# --- Configuration ---
+# 每一集在每個階段的處理狀態 (可由多個 process 或多台機器共用同一個檔案)
+JOB_LEDGER_PATH = os.getenv("JOB_LEDGER_PATH") or ".cache/jobs.sqlite3"
+# 認領後超過此秒數仍未完成的工作 (例如其他機器上的 worker 當掉) 可以被其他 worker 重新認領；
+# 同一台主機上的持有者 process 已經不存在時不必等到期限
+LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS") or 6 * 3600)
+# 同一個階段最多嘗試的次數，超過後需要以 `python job_ledger.py retry` 重設
+MAX_ATTEMPTS = 3
+HASH_CHUNK_SIZE = 1024 * 1024
+
+STAGES = ("download", "transcribe", "correct", "summarize")
+
+# 階段狀態
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# claim() 的結果：CLAIMED = 由呼叫者執行，SKIP = 已完成且輸入輸出都沒有變，
+# BUSY = 其他 worker 正在處理，EXHAUSTED = 失敗次數已達 MAX_ATTEMPTS
+CLAIMED = "claimed"
+SKIP = "skip"
+BUSY = "busy"
+EXHAUSTED = "exhausted"
+
+def worker_id():
+    """
+    目前 thread 的識別 (主機名稱:pid:thread)，同一個 process 中的不同 worker 也不會互相搶到同一個工作
+    """
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+def owner_dead(owner):
+    """
+    持有者 (worker_id()) 是這台主機上另一個已經不存在的 process 時為 True (例如當掉或被 kill 的執行)；
+    其他主機、同一個 process 或無法判斷時為 False
+    """
+    try:
+        host, pid, _ = owner.rsplit(":", 2)
+        pid = int(pid)
+    except (AttributeError, ValueError):
+        return False
+    # Windows 的 os.kill 會結束 process，不能拿來檢查
+    if os.name == "nt" or host != socket.gethostname() or pid == os.getpid():
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except OSError:
+        # 例如 PermissionError：process 存在但屬於其他使用者
+        return False
+    return False
+
+class JobLedger:
+    """
+    以 SQLite (WAL) 記錄每一集在 下載 -> 轉錄 -> 校正 -> 摘要 各階段狀態的工作帳本
+
+    單集以 (feed_url, RSS guid, 音檔網址) 識別，同名的不同單集不會共用檔案。每個階段記錄狀態、
+    嘗試次數、認領者與期限、開始 / 完成時間、輸入與輸出檔案的 SHA-256 以及最後一次的錯誤。
+    worker 以 claim() 原子性地認領工作，多個 worker 或多台機器可以共同處理同一批待處理的單集。
+    """
+    def __init__(self, path=JOB_LEDGER_PATH, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._hashes = {}
+        self._queued = set()
+        # (單集, 階段, 認領者) -> 認領時的嘗試次數，完成或失敗時用來確認租約沒有被其他 worker 接手
+        self._leases = {}
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # 其他 process 寫入時最多等待 30 秒
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS episodes (
+                id INTEGER PRIMARY KEY,
+                feed_url TEXT NOT NULL,
+                guid TEXT NOT NULL,
+                audio_url TEXT NOT NULL,
+                title TEXT,
+                podcast TEXT,
+                filename TEXT NOT NULL,
+                created REAL NOT NULL,
+                UNIQUE (feed_url, guid, audio_url)
+            );
+            CREATE TABLE IF NOT EXISTS stages (
+                episode_id INTEGER NOT NULL REFERENCES episodes(id),
+                stage TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                owner TEXT,
+                lease_until REAL,
+                started REAL,
+                finished REAL,
+                duration REAL,
+                input_path TEXT,
+                input_hash TEXT,
+                output_path TEXT,
+                output_hash TEXT,
+                error TEXT,
+                PRIMARY KEY (episode_id, stage)
+            );
+            CREATE INDEX IF NOT EXISTS stages_status ON stages (stage, status);
+        """)
+        self._conn.commit()
+
+    def file_hash(self, path):
+        """
+        檔案內容的 SHA-256，依 (路徑, 大小, 修改時間) 記住，沒有變動的檔案只計算一次；檔案不存在時回傳 None
+        """
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        memo_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+        with self._lock:
+            if memo_key in self._hashes:
+                return self._hashes[memo_key]
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        with self._lock:
+            self._hashes[memo_key] = digest
+        return digest
+
+    # --- 單集 ---
+
+    def add_episode(self, feed_url, guid, audio_url, title, filename, podcast=None):
+        """
+        登記一集並回傳 (episode_id, filename)；已登記過時回傳原本的 id 與檔名。
+        filename 已被其他單集使用時 (例如標題相同)，在檔名後加上識別碼。
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, filename FROM episodes WHERE feed_url = ? AND guid = ? AND audio_url = ?",
+                (feed_url, guid, audio_url),
+            ).fetchone()
+            if row:
+                self._queued.add(row[0])
+                return row
+            if self._conn.execute("SELECT 1 FROM episodes WHERE filename = ?", (filename,)).fetchone():
+                base, ext = os.path.splitext(filename)
+                suffix = hashlib.sha1(f"{feed_url}\n{guid}\n{audio_url}".encode("utf-8")).hexdigest()[:8]
+                filename = f"{base} [{suffix}]{ext}"
+            cursor = self._conn.execute(
+                "INSERT INTO episodes (feed_url, guid, audio_url, title, podcast, filename, created) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (feed_url, guid, audio_url, title, podcast, filename, time.time()),
+            )
+            episode_id = cursor.lastrowid
+            self._conn.executemany(
+                "INSERT INTO stages (episode_id, stage, status) VALUES (?, ?, ?)",
+                [(episode_id, stage, PENDING) for stage in STAGES],
+            )
+            self._conn.commit()
+            self._queued.add(episode_id)
+        return episode_id, filename
+
+    def resume_jobs(self):
+        """
+        回傳先前 (或其他機器) 還沒處理完、這個 process 也還沒送進管線的單集，格式與 dl_podcast 的 job 相同
+        """
+        with self._lock:
+            rows = self._conn.execute("""
+                SELECT e.id, e.feed_url, e.guid, e.audio_url, e.title, e.podcast, e.filename
+                FROM episodes e
+                WHERE EXISTS (SELECT 1 FROM stages s WHERE s.episode_id = e.id AND s.status != ?)
+                AND NOT EXISTS (SELECT 1 FROM stages s WHERE s.episode_id = e.id AND s.status = ? AND s.attempts >= ?)
+                ORDER BY e.id
+            """, (DONE, FAILED, self.max_attempts)).fetchall()
+            rows = [row for row in rows if row[0] not in self._queued]
+            self._queued.update(row[0] for row in rows)
+        return [{
+            "episode_id": episode_id,
+            "feed_url": feed_url,
+            "guid": guid,
+            "audio_url": audio_url,
+            "title": title,
+            "podcast": podcast or "",
+            "filename": filename,
+            "progress": "[續]",
+        } for episode_id, feed_url, guid, audio_url, title, podcast, filename in rows]
+
+    def release(self, episode_id):
+        """
+        讓 resume_jobs() 可以再次回傳這一集 (例如某個階段失敗、已離開處理管線時)
+        """
+        with self._lock:
+            self._queued.discard(episode_id)
+
+    # --- 階段 ---
+
+    def _stage(self, episode_id, stage):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT status, attempts, input_hash, output_path, output_hash, owner FROM stages "
+                "WHERE episode_id = ? AND stage = ?",
+                (episode_id, stage),
+            ).fetchone()
+
+    def claim(self, episode_id, stage, input_path=None, output_path=None, owner=None):
+        """
+        認領一集的某個階段，回傳 (結果, 先前的狀態)；結果為 CLAIMED / SKIP / BUSY / EXHAUSTED。
+        執行中的階段在期限過後、或持有者是這台主機上已經不存在的 process 時 (owner_dead) 可以重新認領。
+        已完成的階段在輸入檔案的雜湊沒有變、輸出檔案仍在原本的路徑時會略過 (SKIP)；
+        輸出在完成後被修改過 (例如手動編輯過的文字稿) 時視為新的結果，下游階段會因輸入改變而重做。
+        """
+        owner = owner or worker_id()
+        row = self._stage(episode_id, stage)
+        if row is None:
+            raise KeyError(f"episode {episode_id} has no stage {stage}")
+        status, attempts, input_hash, done_output, output_hash, holder = row
+
+        if (
+            status == DONE
+            and done_output
+            and (output_path is None or output_path == done_output)
+            and (input_path is None or self.file_hash(input_path) == input_hash)
+        ):
+            current = self.file_hash(done_output)
+            if current is not None:
+                if current != output_hash:
+                    with self._lock:
+                        self._conn.execute(
+                            "UPDATE stages SET output_hash = ? WHERE episode_id = ? AND stage = ?",
+                            (current, episode_id, stage),
+                        )
+                        self._conn.commit()
+                return SKIP, status
+        if status == FAILED and attempts >= self.max_attempts:
+            return EXHAUSTED, status
+
+        # 持有者已經不存在時，只要仍是同一個持有者就可以接手 (None 不會與任何 owner 相等)
+        stale = holder if status == RUNNING and holder != owner and owner_dead(holder) else None
+        now = time.time()
+        with self._lock:
+            # 比較後再設定 (compare-and-set)：只有狀態和讀取時相同、且沒有被其他 worker 持有時才會成功
+            cursor = self._conn.execute(
+                "UPDATE stages SET status = ?, attempts = attempts + 1, owner = ?, lease_until = ?, started = ?, "
+                "finished = NULL, duration = NULL, error = NULL "
+                "WHERE episode_id = ? AND stage = ? AND status = ? AND attempts = ? "
+                "AND (status != ? OR lease_until < ? OR owner = ? OR owner = ?)",
+                (RUNNING, owner, now + self.lease_seconds, now, episode_id, stage, status, attempts, RUNNING, now, owner, stale),
+            )
+            self._conn.commit()
+            if cursor.rowcount == 1:
+                self._leases[(episode_id, stage, owner)] = attempts + 1
+        return (CLAIMED if cursor.rowcount == 1 else BUSY), status
+
+    def _release_lease(self, episode_id, stage, owner, values, assignments):
+        """
+        只有仍持有租約 (同一個認領者與同一次認領) 時才更新階段，回傳是否更新
+        """
+        token = self._leases.pop((episode_id, stage, owner), None)
+        cursor = self._conn.execute(
+            f"UPDATE stages SET {assignments} "
+            "WHERE episode_id = ? AND stage = ? AND status = ? AND owner = ? AND (? IS NULL OR attempts = ?)",
+            values + (episode_id, stage, RUNNING, owner, token, token),
+        )
+        self._conn.commit()
+        return cursor.rowcount == 1
+
+    def finish(self, episode_id, stage, input_path=None, output_path=None, owner=None):
+        """
+        記錄階段完成，以及輸入與輸出檔案的雜湊 (之後用來判斷是否需要重做)
+        租約已經被其他 worker 接手時 (例如期限已過) 不會覆蓋對方的狀態，回傳 False
+        """
+        owner = owner or worker_id()
+        input_hash = self.file_hash(input_path) if input_path else None
+        output_hash = self.file_hash(output_path) if output_path else None
+        now = time.time()
+        with self._lock:
+            return self._release_lease(
+                episode_id, stage, owner, (DONE, now, now, input_path, input_hash, output_path, output_hash),
+                "status = ?, finished = ?, duration = ? - started, lease_until = NULL, "
+                "input_path = ?, input_hash = ?, output_path = ?, output_hash = ?, error = NULL",
+            )
+
+    def fail(self, episode_id, stage, error, owner=None):
+        """
+        記錄階段失敗；與 finish() 相同，租約已經被其他 worker 接手時回傳 False
+        """
+        owner = owner or worker_id()
+        now = time.time()
+        with self._lock:
+            return self._release_lease(
+                episode_id, stage, owner, (FAILED, now, now, str(error)[:2000]),
+                "status = ?, finished = ?, duration = ? - started, lease_until = NULL, error = ?",
+            )
+
+    def retry(self, stage=None):
+        """
+        將失敗的階段重設為待處理 (嘗試次數歸零)，回傳重設的數量
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE stages SET status = ?, attempts = 0, error = NULL WHERE status = ?"
+                + (" AND stage = ?" if stage else ""),
+                (PENDING, FAILED) + ((stage,) if stage else ()),
+            )
+            self._conn.commit()
+        return cursor.rowcount
+
+    def stats(self):
+        """
+        回傳 {階段: {狀態: 數量}} 以及每個階段完成時的平均耗時 (秒)
+        """
+        with self._lock:
+            counts = self._conn.execute("SELECT stage, status, COUNT(*) FROM stages GROUP BY stage, status").fetchall()
+            durations = self._conn.execute(
+                "SELECT stage, AVG(duration) FROM stages WHERE status = ? GROUP BY stage", (DONE,)
+            ).fetchall()
+        result = {stage: {} for stage in STAGES}
+        for stage, status, count in counts:
+            result.setdefault(stage, {})[status] = count
+        return result, dict(durations)
+
+    def failures(self):
+        with self._lock:
+            return self._conn.execute("""
+                SELECT e.title, s.stage, s.attempts, s.error FROM stages s JOIN episodes e ON e.id = s.episode_id
+                WHERE s.status = ? ORDER BY s.finished
+            """, (FAILED,)).fetchall()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+if __name__ == "__main__":
+    commands = ("status", "failed", "retry")
+    if len(sys.argv) < 2 or sys.argv[1] not in commands:
+        print(f"Usage: python job_ledger.py <{'|'.join(commands)}> [stage for retry]")
+        sys.exit(1)
+
+    ledger = JobLedger()
+    if sys.argv[1] == "failed":
+        for title, stage, attempts, error in ledger.failures():
+            print(f"[{stage}] {title} (嘗試 {attempts} 次): {error}")
+    elif sys.argv[1] == "retry":
+        print(f"已重設 {ledger.retry(sys.argv[2] if len(sys.argv) > 2 else None)} 個失敗的階段")
+    counts, durations = ledger.stats()
+    print(f"工作帳本: {ledger.path}")
+    for stage in STAGES:
+        summary = ", ".join(f"{status} {count}" for status, count in sorted(counts.get(stage, {}).items())) or "-"
+        average = f" (平均 {durations[stage]:.1f} 秒)" if durations.get(stage) else ""
+        print(f"  {stage:>10}: {summary}{average}")
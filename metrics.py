@@ -0,0 +1,433 @@
+import atexit
+import itertools
+import json
+import os
+import re
+import socket
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# --- Configuration ---
+# 每個階段的量測以 JSON lines 附加到此檔案 (PODCAST_METRICS=0 停用)；
+# 與其他快取一樣在 .cache 之下，路徑在建立 Metrics 時固定，之後切換工作目錄不會寫到別的地方
+METRICS_PATH = os.getenv("PODCAST_METRICS_PATH") or ".cache/metrics.jsonl"
+METRICS_ENABLED = os.getenv("PODCAST_METRICS", "1") != "0"
+# 記錄超過此大小時改名為 <路徑>.1 (取代更舊的一份) 後重新開始，最多佔用約兩倍的空間 (0 不限制)
+METRICS_MAX_BYTES = int(os.getenv("PODCAST_METRICS_MAX_BYTES") or 64 * 1024 * 1024)
+# 每寫入這麼多行檢查一次檔案大小
+ROTATE_CHECK_LINES = 1000
+# 可選：Prometheus 格式的輸出 (node_exporter 的 textfile collector 或 HTTP 的 /metrics)
+PROMETHEUS_TEXTFILE = os.getenv("PODCAST_METRICS_TEXTFILE")
+PROMETHEUS_PORT = int(os.getenv("PODCAST_METRICS_PORT") or 0)
+# textfile 最多每幾秒重寫一次 (結束時一定會寫入)
+TEXTFILE_INTERVAL = 15.0
+METRIC_PREFIX = "podcast_"
+# 從 JSON lines 重建 Prometheus 累計值時，沒有 labels 欄位的舊記錄當作 label 的欄位
+LABEL_FIELDS = ("stage", "server", "model", "device", "profile", "status", "worker", "method")
+
+# 可選：對指定的階段 (逗號分隔，或 all) 執行 cProfile，結果存成 <PROFILE_DIR>/<階段>-<時間>.prof
+PROFILE_STAGES = {s.strip() for s in os.getenv("PODCAST_PROFILE", "").split(",") if s.strip()}
+# PODCAST_PROFILE_MEMORY=1 時同時以 tracemalloc 記錄記憶體高峰與配置最多的位置
+PROFILE_MEMORY = os.getenv("PODCAST_PROFILE_MEMORY") == "1"
+PROFILE_DIR = os.getenv("PODCAST_PROFILE_DIR") or ".cache/profiles"
+PROFILE_TOP_ALLOCATIONS = 20
+
+def _metric_name(*parts):
+    return METRIC_PREFIX + re.sub(r"[^a-zA-Z0-9_]", "_", "_".join(parts))
+
+def _format_labels(labels):
+    """
+    labels 為 ((名稱, 值), ...)
+    """
+    if not labels:
+        return ""
+    escape = lambda v: str(v).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+    return "{" + ",".join(f"{k}=\"{escape(v)}\"" for k, v in labels) + "}"
+
+class Metrics:
+    """
+    結構化的量測記錄：每筆事件寫成一行 JSON，數值欄位同時累計成 Prometheus 的 summary
+
+    record("download", {"server": host}, bytes=..., seconds=...) 會寫入
+    {"ts": ..., "event": "download", "server": ..., "labels": ["server"], "bytes": ..., "seconds": ...}，
+    並累計 podcast_download_bytes / podcast_download_seconds 的 count、sum 與 max。
+    labels 會成為 Prometheus 的 label (應該只放種類有限的值)；其他字串欄位只寫進 JSON。
+    labels 的名稱記在 JSON 的 labels 欄位，由記錄重建累計值 (rebuild_metrics) 時使用。
+    """
+    def __init__(self, path=METRICS_PATH, textfile=PROMETHEUS_TEXTFILE, enabled=METRICS_ENABLED, max_bytes=METRICS_MAX_BYTES):
+        self.path = os.path.abspath(path) if path else None
+        self.textfile = textfile
+        self.enabled = enabled
+        self.max_bytes = max_bytes
+        self._unchecked_lines = 0
+        self._summaries = {}
+        self._gauges = {}
+        self._file = None
+        self._lock = threading.Lock()
+        self._last_textfile = 0.0
+        self._server = None
+        self._host = socket.gethostname()
+
+    def record(self, event, labels=None, **values):
+        """
+        記錄一筆事件
+        """
+        if not self.enabled:
+            return
+        labels = dict(labels or {})
+        entry = {"ts": round(time.time(), 3), "event": event, "hostname": self._host, "pid": os.getpid()}
+        entry.update(labels)
+        if labels:
+            entry["labels"] = sorted(labels)
+        entry.update(values)
+        line = json.dumps(entry, ensure_ascii=False, default=str) + "\n"
+        key_labels = tuple(sorted(labels.items()))
+        with self._lock:
+            for field, value in values.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                summary = self._summaries.setdefault((event, field), {}).setdefault(key_labels, [0, 0.0, value])
+                summary[0] += 1
+                summary[1] += value
+                summary[2] = max(summary[2], value)
+            self._write_line(line)
+        self._maybe_write_textfile()
+
+    def gauge(self, name, value, **labels):
+        """
+        設定目前的值 (例如佇列長度)；不寫入 JSON lines
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._gauges.setdefault(name, {})[tuple(sorted(labels.items()))] = value
+        self._maybe_write_textfile()
+
+    @contextmanager
+    def timed(self, event, labels=None, **values):
+        """
+        量測區塊的執行時間，結束時以 seconds 欄位記錄 (區塊中可以修改 yield 出來的 values)
+        """
+        start = time.perf_counter()
+        try:
+            yield values
+        finally:
+            self.record(event, labels, seconds=round(time.perf_counter() - start, 4), **values)
+
+    def _write_line(self, line):
+        if not self.path:
+            return
+        try:
+            if self._file is None:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                # 以 append 模式開啟，多個 process (例如轉錄 worker) 可以寫入同一個檔案
+                self._file = open(self.path, "a", encoding="utf-8", buffering=1)
+                self._unchecked_lines = ROTATE_CHECK_LINES
+            if self.max_bytes and self._unchecked_lines >= ROTATE_CHECK_LINES:
+                self._unchecked_lines = 0
+                self._maybe_rotate()
+            self._file.write(line)
+            self._unchecked_lines += 1
+        except OSError as e:
+            print(f"  [提示] 無法寫入量測記錄 {self.path}: {e}")
+            self.path = None
+
+    def _maybe_rotate(self):
+        """
+        記錄超過 max_bytes 時改名為 <路徑>.1 並重新開啟；其他 process 已經改名時 (路徑不再是開啟中的檔案) 也重新開啟
+        """
+        try:
+            current = os.stat(self.path)
+        except FileNotFoundError:
+            current = None
+        opened = os.fstat(self._file.fileno())
+        if current is not None and (current.st_ino, current.st_dev) == (opened.st_ino, opened.st_dev):
+            if current.st_size < self.max_bytes:
+                return
+            try:
+                os.replace(self.path, self.path + ".1")
+            except OSError as e:
+                # 例如 Windows 上其他 process 還開著這個檔案
+                print(f"  [提示] 無法輪替量測記錄 {self.path}: {e}")
+                self.max_bytes = 0
+                return
+        self._file.close()
+        self._file = open(self.path, "a", encoding="utf-8", buffering=1)
+
+    # --- Prometheus ---
+
+    def render_prometheus(self):
+        """
+        以 Prometheus text exposition 格式輸出目前累計的值
+        """
+        lines = []
+        with self._lock:
+            for (event, field), series in sorted(self._summaries.items()):
+                name = _metric_name(event, field)
+                lines.append(f"# TYPE {name} summary")
+                for labels, (count, total, _) in sorted(series.items()):
+                    lines.append(f"{name}_count{_format_labels(labels)} {count}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {total:g}")
+                lines.append(f"# TYPE {name}_max gauge")
+                for labels, (_, _, maximum) in sorted(series.items()):
+                    lines.append(f"{name}_max{_format_labels(labels)} {maximum:g}")
+            for gauge, series in sorted(self._gauges.items()):
+                name = _metric_name(gauge)
+                lines.append(f"# TYPE {name} gauge")
+                for labels, value in sorted(series.items()):
+                    lines.append(f"{name}{_format_labels(labels)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path=None):
+        """
+        寫入 node_exporter textfile collector 讀取的 .prom 檔案 (先寫暫存檔再改名)
+        """
+        path = path or self.textfile
+        if not path:
+            return
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp, path)
+        self._last_textfile = time.monotonic()
+
+    def _maybe_write_textfile(self):
+        if self.textfile and time.monotonic() - self._last_textfile >= TEXTFILE_INTERVAL:
+            try:
+                self.write_textfile()
+            except OSError as e:
+                print(f"  [提示] 無法寫入 Prometheus textfile {self.textfile}: {e}")
+                self.textfile = None
+
+    def serve(self, port=PROMETHEUS_PORT, host="0.0.0.0"):
+        """
+        在背景 thread 以 HTTP 提供 /metrics，回傳實際使用的 port
+        """
+        if self._server is None:
+            metrics = self
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.split("?")[0] not in ("/", "/metrics"):
+                        self.send_error(404)
+                        return
+                    body = metrics.render_prometheus().encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, format, *args):
+                    pass
+
+            self._server = ThreadingHTTPServer((host, port), Handler)
+            self._server.daemon_threads = True
+            threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        return self._server.server_port
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        if self.textfile:
+            try:
+                self.write_textfile()
+            except OSError:
+                pass
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+# 整個 process 共用的量測記錄
+_default_metrics = None
+_default_lock = threading.Lock()
+
+def get_default_metrics():
+    global _default_metrics
+    with _default_lock:
+        if _default_metrics is None:
+            _default_metrics = Metrics()
+            if PROMETHEUS_PORT and _default_metrics.enabled:
+                _default_metrics.serve(PROMETHEUS_PORT)
+            atexit.register(_default_metrics.close)
+    return _default_metrics
+
+def record(event, labels=None, **values):
+    get_default_metrics().record(event, labels, **values)
+
+def gauge(name, value, **labels):
+    get_default_metrics().gauge(name, value, **labels)
+
+def timed(event, labels=None, **values):
+    return get_default_metrics().timed(event, labels, **values)
+
+# --- 剖析 (opt-in) ---
+
+def should_profile(stage):
+    return "all" in PROFILE_STAGES or stage in PROFILE_STAGES
+
+# 同時在剖析的階段數 (tracemalloc 是整個 process 共用的，最後一個結束時才停止)
+_tracing_users = 0
+_profile_lock = threading.Lock()
+_profile_ids = itertools.count(1)
+
+def _start_tracing():
+    global _tracing_users
+    import tracemalloc
+
+    with _profile_lock:
+        if _tracing_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        _tracing_users += 1
+        # reset_peak 需要 Python 3.9+；更舊的版本記錄的是開始追蹤以來的高峰
+        if hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+        return tracemalloc.take_snapshot()
+
+def _stop_tracing(before, path):
+    global _tracing_users
+    import tracemalloc
+
+    with _profile_lock:
+        _, peak = tracemalloc.get_traced_memory()
+        diff = tracemalloc.take_snapshot().compare_to(before, "lineno")
+        _tracing_users -= 1
+        if _tracing_users == 0:
+            tracemalloc.stop()
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"peak: {peak} bytes\n")
+        for stat in diff[:PROFILE_TOP_ALLOCATIONS]:
+            f.write(f"{stat}\n")
+    return peak
+
+@contextmanager
+def profile_stage(stage):
+    """
+    對這個階段 (在目前的 thread 中) 執行 cProfile，並可選擇以 tracemalloc 記錄記憶體
+    沒有在 PODCAST_PROFILE 中指定的階段不做任何事；剖析本身的錯誤只會印出提示，不會讓階段失敗
+    tracemalloc 是整個 process 共用的，多個階段同時執行時記憶體高峰只是近似值
+    """
+    if not should_profile(stage):
+        yield
+        return
+
+    import cProfile
+
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    base = os.path.join(PROFILE_DIR, f"{stage}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_profile_ids)}")
+    before = _start_tracing() if PROFILE_MEMORY else None
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        try:
+            values = {"seconds": round(time.perf_counter() - start, 4), "profile": base + ".prof"}
+            profiler.dump_stats(base + ".prof")
+            if before is not None:
+                values.update(peak_bytes=_stop_tracing(before, base + ".memory.txt"), memory_report=base + ".memory.txt")
+            record("profile", {"stage": stage}, **values)
+        except Exception as e:
+            print(f"  [提示] 無法儲存 {stage} 的剖析結果: {e}")
+
+# --- 讀取 JSON lines ---
+
+def load_events(path=METRICS_PATH, since=None):
+    """
+    讀取記錄 (包括輪替後的 <路徑>.1)，since 為只讀取此時間之後的事件
+    """
+    events = []
+    paths = [path + ".1", path] if os.path.exists(path + ".1") else [path]
+    for name in paths:
+        with open(name, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # 寫到一半的最後一行
+                    continue
+                if since is None or entry.get("ts", 0) >= since:
+                    events.append(entry)
+    return events
+
+def rebuild_metrics(events):
+    """
+    以記錄重建累計值 (例如給沒有常駐的排程執行使用)，回傳 Metrics
+    label 依每筆記錄的 labels 欄位，沒有的舊記錄使用 LABEL_FIELDS
+    """
+    metrics = Metrics(path=None, textfile=None)
+    for entry in events:
+        names = entry.get("labels", LABEL_FIELDS)
+        labels = {k: entry[k] for k in names if k in entry}
+        values = {k: v for k, v in entry.items() if k not in ("ts", "event", "hostname", "pid", "labels") and k not in labels}
+        metrics.record(entry["event"], labels, **values)
+    return metrics
+
+def _percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+def summarize_events(events, group_by=("event",)):
+    """
+    依 group_by 的欄位分組，回傳 {分組: {欄位: (次數, 平均, p50, p95, 最大)}}
+    """
+    groups = {}
+    for entry in events:
+        key = tuple(str(entry.get(field, "")) for field in group_by)
+        fields = groups.setdefault(key, {})
+        for field, value in entry.items():
+            if field in ("ts", "pid") or isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            fields.setdefault(field, []).append(value)
+    return {
+        key: {
+            field: (len(values), sum(values) / len(values), _percentile(values, 50), _percentile(values, 95), max(values))
+            for field, values in fields.items()
+        }
+        for key, fields in groups.items()
+    }
+
+if __name__ == "__main__":
+    usage = "用法: python metrics.py summary [--hours N] [--by event,stage] [metrics.jsonl] | python metrics.py prometheus [metrics.jsonl]"
+    if len(sys.argv) < 2 or sys.argv[1] not in ("summary", "prometheus"):
+        print(usage)
+        sys.exit(1)
+    args = sys.argv[2:]
+    since = None
+    group_by = ("event", "stage")
+    if "--hours" in args:
+        index = args.index("--hours")
+        since = time.time() - float(args[index + 1]) * 3600
+        del args[index:index + 2]
+    if "--by" in args:
+        index = args.index("--by")
+        group_by = tuple(args[index + 1].split(","))
+        del args[index:index + 2]
+    path = args[0] if args else METRICS_PATH
+    if not os.path.exists(path):
+        print(f"找不到量測記錄: {path}")
+        sys.exit(1)
+    events = load_events(path, since=since)
+
+    if sys.argv[1] == "prometheus":
+        print(rebuild_metrics(events).render_prometheus(), end="")
+        sys.exit(0)
+
+    print(f"{len(events)} 筆記錄 ({path})")
+    for key, fields in sorted(summarize_events(events, group_by).items()):
+        print(f"\n[{' / '.join(k for k in key if k)}]")
+        for field, (count, mean, p50, p95, maximum) in sorted(fields.items()):
+            print(f"  {field:<20} n={count:<6} 平均 {mean:<12.4g} p50 {p50:<12.4g} p95 {p95:<12.4g} 最大 {maximum:.4g}")
@@ -0,0 +1,129 @@
+import json
+import os
+import threading
+import time
+
+# correct.py 與 summarize.py 共用：逐片段提交的 partial 檔，以及邊收邊寫的串流輸出檔
+
+class ChunkJournal:
+    """
+    逐片段提交的 partial 檔：每完成一個片段就附加一行 JSON 並 fsync，
+    重新執行時已完成的片段直接沿用，只重新產生尚未完成的片段
+
+    片段以 key (例如 gemini_cache.cache_key) 比對，prompt 或內容改變的片段會重新產生
+    first_output 是第一個片段提交時距離 start (預設為建立時) 的秒數
+    """
+    def __init__(self, path, start=None):
+        self.path = path
+        self.done = {}
+        self.reused = 0
+        self.first_output = None
+        self._start = start if start is not None else time.perf_counter()
+        self._file = None
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r+b") as f:
+            data = f.read()
+            # 中斷在寫入一行的途中時，捨棄不完整的最後一行，之後附加的內容才不會接在它後面
+            end = data.rfind(b"\n") + 1
+            if end < len(data):
+                f.truncate(end)
+        for line in data[:end].splitlines():
+            try:
+                entry = json.loads(line)
+                self.done[entry["key"]] = entry["text"]
+            except (ValueError, KeyError, TypeError):
+                continue
+
+    def __len__(self):
+        return len(self.done)
+
+    def get(self, key):
+        """
+        回傳已提交的片段結果，沒有時回傳 None
+        """
+        with self._lock:
+            text = self.done.get(key)
+            if text is not None:
+                self.reused += 1
+            return text
+
+    def commit(self, key, text, **fields):
+        """
+        寫入一個完成的片段；回傳時資料已在磁碟上
+        """
+        line = json.dumps(dict(fields, key=key, text=text), ensure_ascii=False) + "\n"
+        with self._lock:
+            if self._file is None:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self.done[key] = text
+            if self.first_output is None:
+                self.first_output = time.perf_counter() - self._start
+
+    def close(self, remove=False):
+        """
+        關閉 partial 檔；remove=True (整個輸出已完成) 時一併刪除
+        """
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if remove and os.path.exists(self.path):
+                os.remove(self.path)
+
+class StreamWriter:
+    """
+    把串流中的回應邊收邊寫到 <path>.partial (可直接作為 generate_text 的 on_text)，
+    finish() 時 fsync 後改名為 path，因此 path 只會是完整的輸出
+
+    收到的全文不是上一次的延伸時 (重試從頭產生) 從頭重寫
+    first_output 是第一次寫出內容時距離 start (預設為建立時) 的秒數
+    """
+    def __init__(self, path, start=None):
+        self.path = path
+        self.partial_path = path + ".partial"
+        self.first_output = None
+        self._start = start if start is not None else time.perf_counter()
+        self._written = ""
+        self._file = open(self.partial_path, "w", encoding="utf-8")
+
+    def __call__(self, text):
+        if text.startswith(self._written):
+            self._file.write(text[len(self._written):])
+        else:
+            self._file.seek(0)
+            self._file.truncate()
+            self._file.write(text)
+        self._file.flush()
+        self._written = text
+        if text and self.first_output is None:
+            self.first_output = time.perf_counter() - self._start
+
+    def finish(self, text=None):
+        """
+        寫完 (text 與已寫出的內容不同時以 text 為準) 並改名為正式的檔名
+        """
+        if text is not None and text != self._written:
+            self(text)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self.partial_path, self.path)
+        return self.path
+
+    def abort(self):
+        """
+        失敗時關閉檔案；已寫出的部分留在 .partial，下次執行會覆寫
+        """
+        if not self._file.closed:
+            self._file.close()
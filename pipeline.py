@@ -0,0 +1,142 @@
+import queue
+import threading
+import time
+from collections import deque
+from metrics import gauge, profile_stage, record
+from podcast_log import captured_output, print_block
+
+# 放進佇列中代表「沒有更多工作」的標記
+_STOP = object()
+# 階段函式拋出例外時的回傳值
+_FAILED = object()
+
+class Stage:
+    """
+    管線中的一個階段：處理函式、顯示名稱、worker 數量與佇列上限
+
+    queue_size 為 0 或 None 時佇列不設上限 (上游不會因為這個階段忙碌而被卡住)
+    buffered=True 時，每個工作的輸出會在完成後一次印出，不與其他 worker 交錯
+    """
+    def __init__(self, name, func, label=None, workers=1, queue_size=4, buffered=False):
+        self.name = name
+        self.func = func
+        self.label = label or name
+        self.workers = max(1, workers)
+        self.queue = queue.Queue(maxsize=queue_size or 0)
+        self.buffered = buffered
+        self.threads = []
+
+class StagedPipeline:
+    """
+    多階段 producer/consumer 管線
+
+    每個階段都有自己的有界佇列與 worker，上一個階段的輸出會直接放進下一個階段的佇列，
+    因此下載、轉錄與 LLM 階段可以同時處理不同的單集。
+    階段函式回傳 None 代表此工作不需要再往下傳遞；拋出例外則記錄為該階段的失敗。
+
+    keep_results 為 None 時保留所有完成的結果與失敗 (一次性的執行)；常駐執行時設為數字，
+    只保留最近的這麼多筆 (失敗已記錄在工作帳本與量測記錄中)，completed_count / failure_count 仍是總數
+    """
+    def __init__(self, stages, keep_results=None):
+        self.stages = stages
+        self.failures = [] if keep_results is None else deque(maxlen=keep_results)
+        self.completed = [] if keep_results is None else deque(maxlen=keep_results)
+        self.completed_count = 0
+        self.failure_count = 0
+        self.discarded = []
+        self._lock = threading.Lock()
+        self._started = False
+        self._discarding = False
+
+    def start(self):
+        for index, stage in enumerate(self.stages):
+            for n in range(stage.workers):
+                t = threading.Thread(target=self._worker, args=(index,), name=f"{stage.name}-{n}", daemon=True)
+                t.start()
+                stage.threads.append(t)
+        self._started = True
+        return self
+
+    def submit(self, item):
+        """
+        將工作放入第一個階段；佇列已滿時會阻塞 (背壓)
+        """
+        if not self._started:
+            self.start()
+        self.stages[0].queue.put(item)
+        self._report_depth(self.stages[0])
+
+    def queue_depths(self):
+        return {stage.name: stage.queue.qsize() for stage in self.stages}
+
+    def _report_depth(self, stage):
+        gauge("queue_depth", stage.queue.qsize(), stage=stage.name)
+
+    def _worker(self, index):
+        stage = self.stages[index]
+        next_stage = self.stages[index + 1] if index + 1 < len(self.stages) else None
+
+        while True:
+            item = stage.queue.get()
+            if item is _STOP:
+                break
+            self._report_depth(stage)
+            if self._discarding:
+                # 關閉中：不再開始新的工作
+                with self._lock:
+                    self.discarded.append((stage.name, item))
+                continue
+            if stage.buffered:
+                with captured_output() as output:
+                    result = self._run(stage, item)
+                print_block(output.getvalue())
+            else:
+                result = self._run(stage, item)
+            if result is None or result is _FAILED:
+                continue
+            if next_stage is not None:
+                next_stage.queue.put(result)
+                self._report_depth(next_stage)
+            else:
+                with self._lock:
+                    self.completed.append(result)
+                    self.completed_count += 1
+
+    def _run(self, stage, item):
+        start = time.perf_counter()
+        try:
+            with profile_stage(stage.name):
+                result = stage.func(item)
+        except Exception as e:
+            print(f"     -> {stage.label}失敗: {e}")
+            with self._lock:
+                self.failures.append((stage.name, item, e))
+                self.failure_count += 1
+            record("stage", {"stage": stage.name}, seconds=round(time.perf_counter() - start, 4), failed=1, error=str(e))
+            return _FAILED
+        record("stage", {"stage": stage.name}, seconds=round(time.perf_counter() - start, 4), failed=0, dropped=int(result is None))
+        return result
+
+    def close(self, drain=True):
+        """
+        不再接受新工作，依序等待每個階段處理完佇列中的工作後結束
+        drain=False 時只完成正在執行的工作，尚未開始的工作 (包括剛完成上一個階段的工作) 記錄在 discarded 中後捨棄
+        """
+        if not self._started:
+            self.start()
+        if not drain:
+            self._discarding = True
+        # 上游階段全部結束後才通知下游，確保進行中的工作都會被處理完
+        for stage in self.stages:
+            for _ in stage.threads:
+                stage.queue.put(_STOP)
+            for t in stage.threads:
+                t.join()
+        return self.completed, self.failures
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
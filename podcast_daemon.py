@@ -0,0 +1,209 @@
+import os
+import random
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import transcribe_server
+import transcript_index
+from dl_podcast import (
+    FEED_WORKERS, PODCASTS_CONFIG, build_pipeline, discover_podcast, get_whisper_model, load_podcasts,
+)
+from episode_index import get_default_index
+from feed_state import FeedState
+from gemini_api import create_client
+from gemini_cache import get_default_cache
+from job_ledger import JobLedger
+from podcast_log import print_block
+
+# --- Configuration ---
+# 每隔幾秒檢查一次設定檔是否被修改 (收到 SIGHUP 時立即重新讀取)
+CONFIG_CHECK_INTERVAL = 10
+# 每隔幾秒把工作帳本中失敗或中斷的單集重新送進管線
+RESUME_INTERVAL = 15 * 60
+# 啟動或新增節目時，第一次輪詢在此秒數內隨機分散，避免所有 feed 同時送出請求
+STARTUP_SPREAD = 30
+# 啟動時先在背景載入 Whisper 模型，第一集新單集不必等待模型載入
+PRELOAD_MODEL = True
+# 管線只保留最近的這麼多筆完成的結果與失敗，長時間執行時記憶體用量不會持續成長
+KEEP_RESULTS = 100
+
+def preload_model():
+    try:
+        get_whisper_model()
+    except Exception as e:
+        # 轉錄階段會再次嘗試載入並記錄失敗
+        print(f"[常駐] 預先載入 Whisper 模型失敗: {e}")
+
+def feed_key(entry):
+    return (entry["name"], entry.get("keyword"), entry.get("weekday"))
+
+class PodcastDaemon:
+    """
+    常駐模式：依設定檔中每個節目自己的間隔 (加上隨機抖動) 輪詢 RSS，新單集送進常駐的處理管線
+
+    設定檔被修改 (或呼叫 reload()) 時不需重新啟動即可套用；stop() 之後不再開始新的輪詢，
+    run() 等待進行中的輪詢結束後返回，由呼叫者關閉處理管線。
+    """
+    def __init__(self, config_path, pipeline, state=None, ledger=None, discover=discover_podcast, feed_workers=FEED_WORKERS):
+        self.config_path = config_path
+        self.pipeline = pipeline
+        self.state = state
+        self.ledger = ledger
+        self.discover = discover
+        self.feed_workers = feed_workers
+        self.polls = 0
+        self._entries = {}
+        self._due = {}
+        self._running = set()
+        self._config_mtime = None
+        self._reload_requested = False
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+
+    def _next_interval(self, entry):
+        jitter = max(0.0, min(entry["jitter"], 0.9))
+        return max(1.0, entry["interval"] * random.uniform(1 - jitter, 1 + jitter))
+
+    def reload(self, force=False):
+        """
+        設定檔的修改時間改變 (或 force) 時重新讀取；讀取失敗時保留目前的設定
+        """
+        try:
+            mtime = os.stat(self.config_path).st_mtime_ns
+        except OSError as e:
+            if self._config_mtime is None:
+                raise
+            print(f"[常駐] 無法讀取設定檔，沿用目前的設定: {e}")
+            return
+        if not force and mtime == self._config_mtime:
+            return
+        try:
+            podcasts = load_podcasts(self.config_path)
+        except (OSError, ValueError, TypeError) as e:
+            if self._config_mtime is None:
+                raise
+            # 記下修改時間，下次存檔後再重新讀取
+            self._config_mtime = mtime
+            print(f"[常駐] 設定檔格式錯誤，沿用目前的設定: {e}")
+            return
+        self._config_mtime = mtime
+
+        now = time.time()
+        with self._lock:
+            entries = {feed_key(entry): entry for entry in podcasts}
+            for key in set(self._entries) - set(entries):
+                self._due.pop(key, None)
+                print(f"[常駐] 移除節目: {key[0]} (關鍵字: {key[1]})")
+            for key, entry in entries.items():
+                old = self._entries.get(key)
+                if old is None:
+                    self._due[key] = now + random.uniform(0, min(STARTUP_SPREAD, entry["interval"]))
+                    print(f"[常駐] 新增節目: {key[0]} (關鍵字: {key[1]}, 每 {entry['interval'] / 60:g} 分鐘)")
+                elif old["interval"] != entry["interval"] and key in self._due:
+                    # 間隔縮短時提早下一次輪詢
+                    self._due[key] = min(self._due[key], now + self._next_interval(entry))
+            self._entries = entries
+        print(f"[常駐] 已載入設定檔 {self.config_path} ({len(self._entries)} 個節目)")
+
+    def request_reload(self):
+        self._reload_requested = True
+        self._wake.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def _resume(self):
+        if self.ledger is None:
+            return
+        jobs = self.ledger.resume_jobs()
+        if jobs:
+            print(f"[常駐] 繼續處理工作帳本中 {len(jobs)} 集未完成的單集")
+        for job in jobs:
+            self.pipeline.submit(job)
+
+    def _poll(self, key, entry):
+        try:
+            print_block(self.discover(entry, pipeline=self.pipeline, state=self.state, ledger=self.ledger))
+        except Exception as e:
+            print(f"[常駐] 輪詢 {key[0]} 失敗: {e}")
+        finally:
+            with self._lock:
+                self.polls += 1
+                self._running.discard(key)
+                if key in self._entries:
+                    self._due[key] = time.time() + self._next_interval(self._entries[key])
+
+    def run(self):
+        """
+        執行排程直到 stop()；返回前會等待進行中的輪詢結束
+        """
+        self.reload(force=True)
+        self._resume()
+        next_config_check = time.time() + CONFIG_CHECK_INTERVAL
+        next_resume = time.time() + RESUME_INTERVAL
+
+        with ThreadPoolExecutor(max_workers=self.feed_workers) as executor:
+            while not self._stop.is_set():
+                now = time.time()
+                if self._reload_requested or now >= next_config_check:
+                    self.reload(force=self._reload_requested)
+                    self._reload_requested = False
+                    next_config_check = now + CONFIG_CHECK_INTERVAL
+                if now >= next_resume:
+                    self._resume()
+                    next_resume = now + RESUME_INTERVAL
+
+                with self._lock:
+                    for key, entry in self._entries.items():
+                        if key not in self._running and self._due.get(key, now) <= now:
+                            self._running.add(key)
+                            executor.submit(self._poll, key, entry)
+                    upcoming = [due for key, due in self._due.items() if key not in self._running]
+
+                wake = min([next_config_check, next_resume] + upcoming)
+                self._wake.wait(max(0.05, wake - time.time()))
+                self._wake.clear()
+            print("[常駐] 停止排程，等待進行中的 RSS 輪詢...")
+
+def main():
+    config_path = sys.argv[1] if len(sys.argv) > 1 else PODCASTS_CONFIG
+    if not os.path.exists(config_path):
+        print(f"找不到設定檔: {config_path} (可參考 podcasts.example.json)")
+        sys.exit(1)
+
+    client = create_client()
+    state = FeedState()
+    ledger = JobLedger()
+    pipeline = build_pipeline(client=client, state=state, ledger=ledger, index=get_default_index(),
+                              search_index=transcript_index.get_default_index(), keep_results=KEEP_RESULTS).start()
+    # 轉錄伺服器已經載入模型時不需要在本程序再載入一份
+    if PRELOAD_MODEL and not transcribe_server.is_running():
+        threading.Thread(target=preload_model, name="preload-model", daemon=True).start()
+    daemon = PodcastDaemon(config_path, pipeline, state=state, ledger=ledger)
+
+    def handle_stop(signum, frame):
+        print(f"[常駐] 收到 {signal.Signals(signum).name}，完成進行中的階段後結束 (再按一次強制結束)")
+        daemon.stop()
+        # 第二次收到訊號時使用預設行為，立即結束
+        signal.signal(signum, signal.SIG_DFL)
+
+    signal.signal(signal.SIGTERM, handle_stop)
+    signal.signal(signal.SIGINT, handle_stop)
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, lambda signum, frame: daemon.request_reload())
+
+    print(f"[常駐] 啟動 (pid {os.getpid()})，修改 {config_path} 或送出 SIGHUP 即可重新載入設定")
+    daemon.run()
+
+    pipeline.close(drain=False)
+    print(f"[常駐] 已結束: 輪詢 {daemon.polls} 次，{pipeline.completed_count} 集完成，{pipeline.failure_count} 個階段失敗，"
+          f"{len(pipeline.discarded)} 個尚未開始的工作留在工作帳本中，下次啟動時繼續")
+    cache_stats = get_default_cache().stats()
+    print(f"Gemini 快取: 命中 {cache_stats['hits']} 次，未命中 {cache_stats['misses']} 次")
+
+if __name__ == "__main__":
+    main()
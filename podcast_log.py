@@ -0,0 +1,60 @@
+import io
+import sys
+import threading
+from contextlib import contextmanager
+
+# 多個 thread 同時處理不同節目時，各自的 print 輸出先收集起來，
+# 完成後再一次印出，避免不同節目的訊息交錯在一起
+
+_local = threading.local()
+_print_lock = threading.Lock()
+
+class _ThreadRoutedStdout:
+    """
+    取代 sys.stdout：若目前 thread 正在收集輸出就寫入它的緩衝區，否則寫到原本的 stdout
+    """
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, text):
+        buffer = getattr(_local, "buffer", None)
+        if buffer is not None:
+            return buffer.write(text)
+        with _print_lock:
+            return self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+def _install():
+    with _print_lock:
+        if not isinstance(sys.stdout, _ThreadRoutedStdout):
+            sys.stdout = _ThreadRoutedStdout(sys.stdout)
+
+@contextmanager
+def captured_output():
+    """
+    收集目前 thread 在 with 區塊中 print 的內容，yield 一個 StringIO
+    """
+    _install()
+    previous = getattr(_local, "buffer", None)
+    buffer = io.StringIO()
+    _local.buffer = buffer
+    try:
+        yield buffer
+    finally:
+        _local.buffer = previous
+
+def print_block(text):
+    """
+    一次印出整段文字，不會與其他 thread 的輸出交錯
+    """
+    if not text:
+        return
+    stream = sys.stdout.stream if isinstance(sys.stdout, _ThreadRoutedStdout) else sys.stdout
+    with _print_lock:
+        stream.write(text if text.endswith("\n") else text + "\n")
+        stream.flush()
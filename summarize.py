@@ -1,57 +1,49 @@
 import os
 import sys
 import re
-from google import genai
-from google.genai import types
+import time
+from concurrent.futures import ThreadPoolExecutor
+from correct import TRANSCRIPT_LINE, split_text_by_lines
+from gemini_api import AdaptiveLimiter, create_client, generate_text, has_api_key
+from gemini_cache import cache_key, get_default_cache
+from metrics import record
+from partial_output import ChunkJournal, StreamWriter
+from template_router import ROUTER_MIN_CONFIDENCE, load_template_index
 
 # --- Configuration ---
-# 請在此填入您的 API Key，或是設定環境變數 GEMINI_API_KEY
-API_KEY = os.getenv("GEMINI_API_KEY") or "your_api_key"
+# API Key 請在 gemini_api.py 中設定，或是設定環境變數 GEMINI_API_KEY
+MODEL = "gemini-2.5-pro"
 PROMPT_TEMPLATE_PATH = "prompt_template.md"
+# 先以本地的 TF-IDF 路由 (template_router.py) 選擇範本，信心值不足時才呼叫 Gemini；False 則一律由 Gemini 選擇
+LOCAL_ROUTER = True
 
-def parse_templates(file_path):
-    """
-    Parses the prompt_template.md file to extract template descriptions and contents.
-    """
-    if not os.path.exists(file_path):
-        print(f"Warning: Prompt template file not found at {file_path}")
-        return {}, {}
-
-    with open(file_path, "r", encoding="utf-8") as f:
-        content = f.read()
-
-    # 1. Extract Template Descriptions from the Table
-    # Looking for lines like: | **範本 01** | ... | ... |
-    table_pattern = re.compile(r"\|\s*\*\*範本\s*(\d+)\*\*\s*\|\s*(.*?)\s*\|\s*(.*?)\s*\|")
-    descriptions = {}
-    
-    for match in table_pattern.finditer(content):
-        template_id = match.group(1)
-        # Combine "Applicable Type" and "Core Objective" for the AI to understand
-        desc_type = match.group(2).replace("<br>", " ").strip()
-        desc_objective = match.group(3).strip()
-        descriptions[template_id] = f"{desc_type} - {desc_objective}"
-
-    # 2. Extract Template Prompts
-    # Looking for sections like: #### 範本 01：... ```markdown ... ```
-    prompts = {}
-    # Split by "#### 範本" to separate sections
-    sections = re.split(r"#### 範本\s*(\d+)[：:]", content)
-    
-    # The first element is before the first template, so skip it.
-    # Then we have pairs of (id, content)
-    for i in range(1, len(sections), 2):
-        template_id = sections[i]
-        section_content = sections[i+1]
-        
-        # Extract the code block
-        code_block_match = re.search(r"```markdown\s*(.*?)\s*```", section_content, re.DOTALL)
-        if code_block_match:
-            prompts[template_id] = code_block_match.group(1)
+# 文字稿超過此字數時改用 map-reduce：先同時摘要各段，再以選定的範本整合各段的重點筆記
+MAP_REDUCE_THRESHOLD = 60000
+# 每一段的字數上限 (依行切分，不會切斷逐字稿的片段)
+SECTION_SIZE = 20000
+# 同時送出的分段摘要請求上限；遇到 429/5xx 時會自動降低並行數
+MAX_CONCURRENCY = 8
+
+SECTION_PROMPT = """
+# Role
+你是一位專業的 Podcast 內容編輯，擅長從冗長的口語對話中整理出完整的重點筆記。
 
-    return descriptions, prompts
+# Task
+以下是一集長篇 Podcast 逐字稿 (或其分段筆記) 的第 {index}/{total} 段{span}。請為這一段寫出詳細的重點筆記，
+之後會與其他段落的筆記依序合併，再整理成完整的分析摘要。
 
-def determine_best_template(client, content, descriptions):
+# Constraints
+1. **依序條列**：依內容出現的順序條列重點，保留重要的論點、例子、數據、人名、公司名與專有名詞。
+2. **保留觀點**：保留講者的關鍵原話與獨特觀點，不要加入逐字稿以外的資訊。
+3. **輸出格式**：直接輸出筆記，不需要任何開場白或結語。
+
+# Input Text
+"""
+
+# 分段筆記的標題：## 第 1 段 (0:00:00 - 0:20:00)
+_SECTION_HEADER = re.compile(r"^## 第 \d+ 段 \((\d+:\d\d:\d\d) - (\d+:\d\d:\d\d)\)", re.MULTILINE)
+
+def determine_best_template(client, content, descriptions, cache=None):
     """
     Uses Gemini to analyze the content and select the best template.
     """
@@ -76,14 +68,8 @@ You are an expert content classifier. Your task is to analyze the provided podca
 3. Return ONLY the template number (e.g., "01", "07"). Do not output any other text.
 """
     try:
-        response = client.models.generate_content(
-            model='gemini-2.5-pro',
-            contents=selection_prompt,
-            config=types.GenerateContentConfig(
-                temperature=0.1 # Low temperature for deterministic selection
-            )
-        )
-        selected_id = response.text.strip()
+        # Low temperature for deterministic selection
+        selected_id = generate_text(client, selection_prompt, model=MODEL, temperature=0.1, cache=cache).strip()
         # Handle potential extra text like "Template 01"
         match = re.search(r"(\d+)", selected_id)
         if match:
@@ -93,13 +79,107 @@ You are an expert content classifier. Your task is to analyze the provided podca
         print(f"Error selecting template: {e}")
         return "01" # Default fallback
 
-def summarize_transcript(file_path):
+def select_template(client, content, index, cache=None, local_router=LOCAL_ROUTER):
+    """
+    Picks the template for content: the local router when it is confident enough, Gemini otherwise.
+    """
+    if local_router:
+        start = time.perf_counter()
+        template_id, confidence, _ = index.route(content)
+        elapsed = (time.perf_counter() - start) * 1000
+        if template_id is not None and confidence >= ROUTER_MIN_CONFIDENCE:
+            print(f"本地路由選擇範本 {template_id} (信心值 {confidence:.2f}, {elapsed:.1f} ms)")
+            return template_id
+        print(f"本地路由信心值不足 ({template_id}, {confidence:.2f} < {ROUTER_MIN_CONFIDENCE})，改由 Gemini 選擇...")
+    return determine_best_template(client, content, index.descriptions, cache=cache)
+
+def _format_time(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+def section_span(text):
+    """
+    段落涵蓋的時間範圍 (開始, 結束)：逐字稿取第一行與最後一行的時間軸，分段筆記取標題中的範圍；都沒有時回傳 None
+    """
+    lines = [line for line in text.split("\n") if line.strip()]
+    first = TRANSCRIPT_LINE.match(lines[0]) if lines else None
+    last = TRANSCRIPT_LINE.match(lines[-1]) if lines else None
+    if first and last:
+        return _format_time(float(first.group(1))), _format_time(float(last.group(2)))
+    headers = _SECTION_HEADER.findall(text)
+    if headers:
+        return headers[0][0], headers[-1][1]
+    return None
+
+def summarize_sections(client, content, cache=None, max_concurrency=MAX_CONCURRENCY, limiter=None, journal=None):
+    """
+    Map step: splits content on line boundaries and summarizes the sections concurrently.
+    Returns the section notes joined in the original order, each under a "## 第 n 段" header.
+    With a journal (partial_output.ChunkJournal), each finished note is committed as soon as it completes
+    and notes committed by an interrupted run are reused.
+    """
+    if limiter is None:
+        limiter = AdaptiveLimiter(max_concurrency)
+    sections = split_text_by_lines(content, max_chars=SECTION_SIZE)
+    spans = [section_span(section) for section in sections]
+
+    def summarize_one(index):
+        span = f" (時間 {spans[index][0]} - {spans[index][1]})" if spans[index] else ""
+        prompt = SECTION_PROMPT.format(index=index + 1, total=len(sections), span=span) + "\n" + sections[index]
+        key = cache_key(MODEL, 0.3, prompt)
+        if journal is not None:
+            note = journal.get(key)
+            if note is not None:
+                print(f"  第 {index+1}/{len(sections)} 段已在上次執行完成，沿用")
+                return note
+        print(f"  正在摘要第 {index+1}/{len(sections)} 段 ({len(sections[index])} chars)...")
+        note = generate_text(client, prompt, model=MODEL, temperature=0.3, limiter=limiter, cache=cache).strip()
+        if journal is not None:
+            journal.commit(key, note, section=index)
+        return note
+
+    with ThreadPoolExecutor(max_workers=max(1, min(limiter.max_concurrency, len(sections)))) as executor:
+        notes = list(executor.map(summarize_one, range(len(sections))))
+
+    parts = []
+    for index, note in enumerate(notes):
+        header = f"## 第 {index + 1} 段" + (f" ({spans[index][0]} - {spans[index][1]})" if spans[index] else "")
+        parts.append(f"{header}\n{note}")
+    return "\n\n".join(parts)
+
+def condense_transcript(client, content, cache=None, max_concurrency=MAX_CONCURRENCY, threshold=MAP_REDUCE_THRESHOLD, journal=None):
+    """
+    Runs the map step once, and again on the notes while they are still longer than threshold
+    (one level is enough for most episodes).
+    """
+    level = 0
+    while level == 0 or len(content) > threshold:
+        level += 1
+        print(f"內容共 {len(content)} 字，進行第 {level} 層分段摘要...")
+        condensed = summarize_sections(client, content, cache=cache, max_concurrency=max_concurrency, journal=journal)
+        if len(condensed) >= len(content):
+            print("警告: 分段摘要沒有縮短內容，停止分段")
+            break
+        content = condensed
+    return content
+
+def summarize_transcript(file_path, client=None, cache=None, local_router=LOCAL_ROUTER, map_reduce=None):
+    """
+    Summarizes the transcript file with the best matching template.
+    Pass a shared client to reuse it across several transcripts.
+    Template selection and the summary are cached (default: gemini_cache.get_default_cache()).
+    Transcripts longer than MAP_REDUCE_THRESHOLD (or any, with map_reduce=True) are summarized
+    section by section first, and the template runs over the combined section notes.
+    Section notes are committed to <output>.sections.partial as they finish, and the summary is written
+    to <output>.partial while it streams in; the final name only ever holds a complete summary.
+    Returns the summary file path, or None on failure.
+    """
     if not os.path.exists(file_path):
         print(f"找不到檔案: {file_path}")
         return
 
-    if API_KEY == "YOUR_API_KEY_HERE":
-        print("錯誤: 請先設定 API Key (在 summarize.py 中設定或是環境變數 GEMINI_API_KEY)")
+    if client is None and not has_api_key():
+        print("錯誤: 請先設定 API Key (在 gemini_api.py 中設定或是環境變數 GEMINI_API_KEY)")
         return
 
     base_name = os.path.splitext(file_path)[0]
@@ -107,12 +187,13 @@ def summarize_transcript(file_path):
 
     if os.path.exists(output_file):
         print(f"摘要檔案已存在，跳過: {output_file}")
-        return
+        return output_file
 
     # Load Templates
     print(f"正在讀取 Prompt 範本: {PROMPT_TEMPLATE_PATH} ...")
-    descriptions, prompts = parse_templates(PROMPT_TEMPLATE_PATH)
-    
+    index = load_template_index(PROMPT_TEMPLATE_PATH)
+    descriptions, prompts = (index.descriptions, index.prompts) if index else ({}, {})
+
     if not prompts:
         print("錯誤: 無法讀取任何 Prompt 範本，請檢查 prompt_template.md")
         return
@@ -126,12 +207,18 @@ def summarize_transcript(file_path):
         return
 
     print("正在呼叫 Gemini API 進行摘要...")
+    start = time.perf_counter()
+    journal = ChunkJournal(output_file + ".sections.partial", start=start)
+    writer = None
     try:
-        client = genai.Client(api_key=API_KEY)
-        
+        if client is None:
+            client = create_client()
+        if cache is None:
+            cache = get_default_cache()
+
         # Smart Routing / Dynamic Selection
         print("正在分析內容以選擇最佳範本...")
-        selected_template_id = determine_best_template(client, content, descriptions)
+        selected_template_id = select_template(client, content, index, cache=cache, local_router=local_router)
         
         if selected_template_id not in prompts:
             print(f"警告: 選擇的範本 {selected_template_id} 不存在，使用預設範本 01")
@@ -140,31 +227,51 @@ def summarize_transcript(file_path):
         selected_prompt = prompts[selected_template_id]
         print(f"已選擇範本: {selected_template_id} ({descriptions.get(selected_template_id, 'Unknown')})")
 
+        if map_reduce is None:
+            map_reduce = len(content) > MAP_REDUCE_THRESHOLD
+        if map_reduce:
+            if len(journal):
+                print(f"  [續傳] 找到上次執行完成的 {len(journal)} 段筆記")
+            content = condense_transcript(client, content, cache=cache, journal=journal)
+            selected_prompt += "\n\n(注意：原始逐字稿過長，以下輸入是依時間順序分段整理的重點筆記，請將其視為整集內容進行分析。)"
+
         # 組合 Prompt 與內容
         full_prompt = selected_prompt + "\n\n# Input Data\n" + content
         
-        response = client.models.generate_content(
-            model='gemini-2.5-pro',
-            contents=full_prompt,
-            config=types.GenerateContentConfig(
-                temperature=0.3
-            )
-        )
-        
-        summary = response.text
-        
-        # 儲存摘要
-        with open(output_file, "w", encoding="utf-8") as f:
-            f.write(summary)
+        # 串流時邊收邊寫到 .partial，完成後才改名，中斷時不會留下不完整的摘要
+        writer = StreamWriter(output_file, start=start)
+        summary = generate_text(client, full_prompt, model=MODEL, temperature=0.3, cache=cache, on_text=writer)
+        writer.finish(summary)
+        journal.close(remove=True)
+        _record_first_output(writer, journal)
             
         print(f"摘要完成! 已儲存至: {output_file}")
-        
+        return output_file
+
     except Exception as e:
+        if writer is not None:
+            writer.abort()
+        journal.close()
         print(f"摘要產生失敗: {e}")
 
+def _record_first_output(writer, journal):
+    """
+    記錄摘要的第一段寫入 .partial 的時間 (從讀取文字稿之後開始計算)，以及沿用上次結果的分段筆記數
+    """
+    values = {"reused": journal.reused}
+    if writer.first_output is not None:
+        values["seconds"] = round(writer.first_output, 4)
+        print(f"摘要的第一段在 {writer.first_output:.2f} 秒後寫入")
+    record("first_output", {"stage": "summarize"}, **values)
+
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("使用方式: python3 summarize.py <transcript_file>")
+    flags = ("--no-cache", "--llm-router", "--map-reduce", "--no-map-reduce")
+    args = [arg for arg in sys.argv[1:] if arg not in flags]
+    if not args:
+        print("使用方式: python3 summarize.py [--no-cache] [--llm-router] [--map-reduce | --no-map-reduce] <transcript_file>")
     else:
-        target_file = sys.argv[1]
-        summarize_transcript(target_file)
+        if "--no-cache" in sys.argv:
+            get_default_cache().bypass = True
+        target_file = args[0]
+        map_reduce = True if "--map-reduce" in sys.argv else False if "--no-map-reduce" in sys.argv else None
+        summarize_transcript(target_file, local_router="--llm-router" not in sys.argv, map_reduce=map_reduce)
@@ -0,0 +1,228 @@
+import json
+import math
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+# --- Configuration ---
+# 解析過的範本與 TF-IDF 索引的快取，prompt_template.md 的修改時間或大小改變時自動重建
+INDEX_CACHE_PATH = os.getenv("TEMPLATE_INDEX_PATH") or ".cache/template_index.json"
+INDEX_VERSION = 1
+
+# 本地路由的信心值 (第一名與第二名相似度的差距比例) 低於此值時改由 Gemini 選擇範本
+ROUTER_MIN_CONFIDENCE = 0.2
+# 分類時只看文字稿開頭的字數 (太長的文字稿不會讓結果更準，只會變慢)
+ROUTER_MAX_CHARS = 20000
+# 關鍵字在範本特徵中的權重 (相對於範本說明與 Prompt 內文)
+KEYWORD_WEIGHT = 3
+
+# 每個範本的關鍵字特徵，補足範本說明與 Prompt 中沒有的、節目內容常出現的詞
+TEMPLATE_KEYWORDS = {
+    "01": "技術 趨勢 未來 科技 發展 預測 產業 AI 人工智慧 模型 訪談 觀點 晶片 軟體",
+    "02": "創業 投資 創投 募資 估值 商業模式 營收 獲利 護城河 新創 投資人 市場 用戶 成長 startup VC",
+    "03": "哲學 思維 人生 決策 心智模型 價值觀 意義 自由 財富 幸福 原則 思考 槓桿 判斷",
+    "04": "論文 架構 實驗 數據 訓練 參數 演算法 準確率 基準 研究 資料集 神經網路 Transformer benchmark",
+    "05": "開箱 體驗 遊戲 手機 產品 評測 好用 缺點 價格 推薦 耳機 相機 電腦 App 玩",
+    "06": "國際 戰爭 選舉 總統 經濟 通膨 利率 關稅 地緣政治 中國 美國 歐洲 俄羅斯 烏克蘭 氣候 政府",
+    "07": "歷史 產業 週期 戰略 帝國 工業革命 蒸汽機 企業 競爭 商業 鐵路 石油 壟斷 創辦人",
+    "08": "大腦 睡眠 健康 心理 壓力 運動 飲食 荷爾蒙 多巴胺 焦慮 醫學 科學家 身體 習慣 神經",
+}
+
+_TOKEN = re.compile(r"[A-Za-z][A-Za-z0-9+\-]*|[㐀-鿿豈-﫿]+")
+_TIMESTAMP = re.compile(r"^\[[^\]]*\]\s*", re.MULTILINE)
+
+def parse_templates(file_path):
+    """
+    Parses the prompt_template.md file to extract template descriptions and contents.
+    """
+    if not os.path.exists(file_path):
+        print(f"Warning: Prompt template file not found at {file_path}")
+        return {}, {}
+
+    with open(file_path, "r", encoding="utf-8") as f:
+        content = f.read()
+
+    # 1. Extract Template Descriptions from the Table
+    # Looking for lines like: | **範本 01** | ... | ... |
+    table_pattern = re.compile(r"\|\s*\*\*範本\s*(\d+)\*\*\s*\|\s*(.*?)\s*\|\s*(.*?)\s*\|")
+    descriptions = {}
+
+    for match in table_pattern.finditer(content):
+        template_id = match.group(1)
+        # Combine "Applicable Type" and "Core Objective" for the AI to understand
+        desc_type = match.group(2).replace("<br>", " ").strip()
+        desc_objective = match.group(3).strip()
+        descriptions[template_id] = f"{desc_type} - {desc_objective}"
+
+    # 2. Extract Template Prompts
+    # Looking for sections like: #### 範本 01：... ```markdown ... ```
+    prompts = {}
+    # Split by "#### 範本" to separate sections
+    sections = re.split(r"#### 範本\s*(\d+)[：:]", content)
+
+    # The first element is before the first template, so skip it.
+    # Then we have pairs of (id, content)
+    for i in range(1, len(sections), 2):
+        template_id = sections[i]
+        section_content = sections[i+1]
+
+        # Extract the code block
+        code_block_match = re.search(r"```markdown\s*(.*?)\s*```", section_content, re.DOTALL)
+        if code_block_match:
+            prompts[template_id] = code_block_match.group(1)
+
+    return descriptions, prompts
+
+def features(text):
+    """
+    文字的特徵計數：中文取相鄰兩字 (單字成詞時取單字)，英文取小寫單字
+    """
+    counts = Counter()
+    for token in _TOKEN.findall(text):
+        if token.isascii():
+            counts[token.lower()] += 1
+        elif len(token) == 1:
+            counts[token] += 1
+        else:
+            counts.update(token[i:i + 2] for i in range(len(token) - 1))
+    return counts
+
+def _normalize(vector):
+    norm = math.sqrt(sum(v * v for v in vector.values()))
+    return {term: v / norm for term, v in vector.items()} if norm else {}
+
+class TemplateIndex:
+    """
+    範本的 TF-IDF 索引
+
+    每個範本的特徵來自總表中的說明、範本段落 (標題與 Prompt) 以及 TEMPLATE_KEYWORDS，
+    文字稿以相同的特徵與 IDF 轉成向量後，以 cosine 相似度選出最接近的範本。
+    """
+    def __init__(self, descriptions, prompts, idf=None, vectors=None):
+        self.descriptions = descriptions
+        self.prompts = prompts
+        if idf is None or vectors is None:
+            idf, vectors = self._build()
+        self.idf = idf
+        self.vectors = vectors
+
+    def _build(self):
+        profiles = {}
+        for tid, prompt in self.prompts.items():
+            if tid == "00":
+                continue
+            profile = features(self.descriptions.get(tid, "")) + features(prompt)
+            for term, count in features(TEMPLATE_KEYWORDS.get(tid, "")).items():
+                profile[term] += KEYWORD_WEIGHT * count
+            profiles[tid] = profile
+
+        df = Counter(term for profile in profiles.values() for term in profile)
+        n = len(profiles)
+        idf = {term: math.log((1 + n) / (1 + count)) + 1 for term, count in df.items()}
+        vectors = {
+            tid: _normalize({term: (1 + math.log(count)) * idf[term] for term, count in profile.items()})
+            for tid, profile in profiles.items()
+        }
+        return idf, vectors
+
+    def scores(self, content):
+        """
+        回傳 {範本編號: cosine 相似度}
+        """
+        text = _TIMESTAMP.sub("", content[:ROUTER_MAX_CHARS])
+        query = _normalize({
+            term: (1 + math.log(count)) * self.idf[term]
+            for term, count in features(text).items() if term in self.idf
+        })
+        return {
+            tid: sum(weight * vector.get(term, 0.0) for term, weight in query.items())
+            for tid, vector in self.vectors.items()
+        }
+
+    def route(self, content):
+        """
+        回傳 (範本編號, 信心值 0~1, 各範本分數)；信心值是第一名與第二名分數的差距比例
+        """
+        scores = self.scores(content)
+        if not scores:
+            return None, 0.0, scores
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        best, top = ranked[0]
+        second = ranked[1][1] if len(ranked) > 1 else 0.0
+        confidence = (top - second) / top if top > 0 else 0.0
+        return best, confidence, scores
+
+    def to_dict(self):
+        return {"descriptions": self.descriptions, "prompts": self.prompts, "idf": self.idf, "vectors": self.vectors}
+
+# 同一個 process 中已載入的索引：{絕對路徑: (修改時間, 大小, TemplateIndex)}
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def load_template_index(file_path, cache_path=INDEX_CACHE_PATH):
+    """
+    回傳 file_path 的 TemplateIndex：依序使用 process 內已載入的索引、磁碟上的快取，
+    都沒有或 prompt_template.md 已修改時才重新解析並寫回快取。找不到範本檔時回傳 None。
+    """
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        print(f"Warning: Prompt template file not found at {file_path}")
+        return None
+    source = os.path.abspath(file_path)
+    stamp = (st.st_mtime_ns, st.st_size)
+
+    with _indexes_lock:
+        loaded = _indexes.get(source)
+        if loaded and loaded[:2] == stamp:
+            return loaded[2]
+
+        index = None
+        try:
+            with open(cache_path, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            if (
+                cached.get("version") == INDEX_VERSION
+                and cached.get("source") == source
+                and (cached.get("mtime_ns"), cached.get("size")) == stamp
+            ):
+                index = TemplateIndex(cached["descriptions"], cached["prompts"], cached["idf"], cached["vectors"])
+        except (OSError, ValueError, KeyError):
+            pass
+
+        if index is None:
+            index = TemplateIndex(*parse_templates(file_path))
+            try:
+                os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+                tmp = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(
+                        dict(index.to_dict(), version=INDEX_VERSION, source=source, mtime_ns=stamp[0], size=stamp[1]),
+                        f, ensure_ascii=False,
+                    )
+                os.replace(tmp, cache_path)
+            except OSError as e:
+                print(f"[提示] 無法寫入範本索引快取: {e}")
+
+        _indexes[source] = stamp + (index,)
+        return index
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("使用方式: python template_router.py <transcript_file> [prompt_template.md]")
+        sys.exit(1)
+
+    with open(sys.argv[1], "r", encoding="utf-8") as f:
+        content = f.read()
+    start = time.perf_counter()
+    index = load_template_index(sys.argv[2] if len(sys.argv) > 2 else "prompt_template.md")
+    loaded = time.perf_counter()
+    template_id, confidence, scores = index.route(content)
+    routed = time.perf_counter()
+    for tid, score in sorted(scores.items(), key=lambda item: item[1], reverse=True):
+        print(f"  範本 {tid}: {score:.3f}  {index.descriptions.get(tid, '')}")
+    print(f"選擇範本 {template_id} (信心值 {confidence:.2f}，門檻 {ROUTER_MIN_CONFIDENCE})")
+    print(f"載入索引 {(loaded - start) * 1000:.1f} ms，分類 {(routed - loaded) * 1000:.1f} ms")
@@ -0,0 +1,15 @@
+import os
+import shutil
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Metrics and measured real-time factors go to a scratch directory, not the checkout's .cache
+_scratch = tempfile.mkdtemp(prefix="podcast-tests-")
+os.environ["PODCAST_METRICS_PATH"] = os.path.join(_scratch, "metrics.jsonl")
+os.environ["WHISPER_RTF_PATH"] = os.path.join(_scratch, "rtf.sqlite3")
+
+def pytest_unconfigure(config):
+    shutil.rmtree(_scratch, ignore_errors=True)
@@ -0,0 +1,48 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+av = pytest.importorskip("av")
+pytest.importorskip("faster_whisper")
+
+from audio_cache import SAMPLE_RATE, AudioCache, gather_spans, to_float32, to_int16
+
+@pytest.fixture
+def wav(tmp_path):
+    rng = np.random.default_rng(0)
+    samples = (rng.uniform(-0.5, 0.5, SAMPLE_RATE * 3) * 32767).astype(np.int16)
+    path = str(tmp_path / "episode.wav")
+    with av.open(path, "w") as container:
+        stream = container.add_stream("pcm_s16le", rate=SAMPLE_RATE)
+        stream.layout = "mono"
+        frame = av.AudioFrame.from_ndarray(samples[None, :], format="s16", layout="mono")
+        frame.sample_rate = SAMPLE_RATE
+        for packet in stream.encode(frame):
+            container.mux(packet)
+        for packet in stream.encode(None):
+            container.mux(packet)
+    return path
+
+def test_conversion_round_trip_is_lossless():
+    pcm = np.array([-32768, -1, 0, 1, 12345, 32767], dtype=np.int16)
+    audio = to_float32(pcm)
+    assert audio.dtype == np.float32
+    assert np.array_equal(audio, pcm.astype(np.float32) / 32768.0)
+    assert np.array_equal(to_int16(audio), pcm)
+
+def test_gather_spans_matches_concatenation():
+    pcm = np.arange(-5000, 5000, dtype=np.int16)
+    spans = [{"start": 10, "end": 200}, {"start": 4000, "end": 4001}, {"start": 9000, "end": 10000}]
+    expected = np.concatenate([pcm[s["start"]:s["end"]] for s in spans]).astype(np.float32) / 32768.0
+    assert np.array_equal(gather_spans(pcm, spans), expected)
+
+def test_cache_stores_int16_and_redecodes_float32_entries(tmp_path, wav):
+    from faster_whisper import decode_audio
+
+    cache = AudioCache(str(tmp_path / "cache"))
+    pcm = cache.load(wav)
+    assert pcm.dtype == np.int16
+    assert np.array_equal(to_float32(pcm), decode_audio(wav, sampling_rate=SAMPLE_RATE))
+    # An entry written by an older version (float32) is decoded again
+    np.save(cache._pcm_path(cache.key(wav)), to_float32(pcm))
+    assert cache.load(wav).dtype == np.int16
+    assert (cache.hits, cache.misses) == (0, 2)
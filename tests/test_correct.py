@@ -0,0 +1,37 @@
+import json
+
+import correct
+
+def test_align_lines_by_number_or_order():
+    assert correct.align_lines("[3]  甲 \n[4] 乙", 2, 2) == ["甲", "乙"]
+    assert correct.align_lines("[9] 甲\n乙", 2, 2) == ["甲", "乙"]
+    assert correct.align_lines("[3] 甲", 2, 2) is None
+
+def test_skipped_and_corrected_lines_are_written_the_same_way(tmp_path, monkeypatch):
+    # Whisper segments start with a space; fwhisper.py writes "[start -> end]  text"
+    lines = [" 今天天氣很好", " 我們來聊經濟", " 這個觀點很有意思"]
+    path = tmp_path / "episode.txt"
+    path.write_text("".join(f"[{i}.00s -> {i}.50s] {text}\n" for i, text in enumerate(lines)), encoding="utf-8")
+    segments = [{"start": i, "end": i + 0.5, "text": text, "avg_logprob": -0.1, "no_speech_prob": 0.01}
+                for i, text in enumerate(lines)]
+    segments[2]["avg_logprob"] = -1.5
+    (tmp_path / "episode.segments.jsonl").write_text(
+        "".join(json.dumps(s, ensure_ascii=False) + "\n" for s in segments), encoding="utf-8")
+
+    sent = []
+    def fake_generate_text(client, prompt, **kwargs):
+        chunk = prompt.split("\n")[-1]
+        sent.append(chunk)
+        return chunk
+
+    monkeypatch.setattr(correct, "generate_text", fake_generate_text)
+    monkeypatch.setattr(correct, "CHUNK_SIZE", 20)
+    output = correct.correct_transcript(str(path), client=object(), cache=object())
+
+    assert sent == ["[3] 這個觀點很有意思"]
+    with open(output, encoding="utf-8") as f:
+        assert f.read().split("\n")[:3] == [
+            "[0.00s -> 0.50s] 今天天氣很好",
+            "[1.00s -> 1.50s] 我們來聊經濟",
+            "[2.00s -> 2.50s] 這個觀點很有意思",
+        ]
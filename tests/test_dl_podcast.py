@@ -0,0 +1,66 @@
+import io
+
+import feedparser
+import pytest
+
+import dl_podcast
+from feed_state import DONE, FeedState
+
+FEED = "https://example.com/feed.xml"
+
+def make_feed(names, broken=False):
+    items = "".join(
+        f"<item><title>Ep {name}</title><guid>ep-{name}</guid>"
+        f"<enclosure url=\"https://example.com/{name}.mp3\" type=\"audio/mpeg\"/></item>"
+        for name in names
+    )
+    # An unescaped & breaks the streaming parser, feedparser still reads it
+    return f"<rss><channel><title>Show{' & co' if broken else ''}</title>{items}</channel></rss>".encode("utf-8")
+
+class FakeResponse:
+    def __init__(self, data):
+        self.raw = io.BytesIO(data)
+        self.headers = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+class FakePipeline:
+    def __init__(self, state):
+        self.state = state
+        self.jobs = []
+
+    def submit(self, job):
+        # Stands in for the download stage finishing
+        self.jobs.append(job["title"])
+        self.state.mark(job["feed_url"], job["guid"], DONE)
+
+@pytest.mark.parametrize("broken", [False, True])
+def test_repeated_poll_downloads_nothing_new(tmp_path, monkeypatch, broken):
+    feed = {"data": make_feed(range(10), broken=broken)}
+    parse = feedparser.parse
+    # Every poll returns 200 (no validators)
+    monkeypatch.setattr(dl_podcast, "open_feed", lambda url, state=None: FakeResponse(feed["data"]))
+    monkeypatch.setattr(dl_podcast.feedparser, "parse", lambda url: parse(feed["data"]))
+    monkeypatch.setattr(dl_podcast, "record", lambda *args, **kwargs: None)
+    state = FeedState(str(tmp_path / "state.sqlite3"))
+    pipeline = FakePipeline(state)
+
+    def poll():
+        dl_podcast.download_latest_episodes(FEED, num_episodes=2, save_dir=str(tmp_path / "downloads"),
+                                            pipeline=pipeline, state=state)
+
+    poll()
+    assert pipeline.jobs == ["Ep 0", "Ep 1"]
+    poll()
+    poll()
+    assert pipeline.jobs == ["Ep 0", "Ep 1"]
+
+    # A new episode at the top is the only one picked up
+    feed["data"] = make_feed(["new"] + list(range(10)), broken=broken)
+    poll()
+    assert pipeline.jobs == ["Ep 0", "Ep 1", "Ep new"]
+    state.close()
@@ -0,0 +1,81 @@
+import pytest
+
+av = pytest.importorskip("av")
+np = pytest.importorskip("numpy")
+
+import episode_index
+from episode_index import EpisodeIndex
+
+RATE = 16000
+
+def speech_like(seed, seconds):
+    """
+    每 0.25 秒換一組音高的多個音調，乘上音節般的起伏
+    """
+    rng = np.random.default_rng(seed)
+    length = int(seconds * RATE)
+    steps = -(-length // (RATE // 4))
+    signal = np.zeros(length)
+    for _ in range(6):
+        freq = np.repeat(rng.uniform(150, 1800, size=steps), RATE // 4)[:length]
+        signal += np.sin(np.cumsum(2 * np.pi * freq / RATE)) * rng.uniform(0.2, 1.0)
+    t = np.arange(length) / RATE
+    signal *= np.abs(np.sin(2 * np.pi * rng.uniform(2, 5) * t))
+    return (signal / np.abs(signal).max() * 0.8).astype(np.float32)
+
+def write_audio(path, samples):
+    with av.open(str(path), "w") as container:
+        stream = container.add_stream("pcm_s16le", rate=RATE)
+        stream.layout = "mono"
+        frame = av.AudioFrame.from_ndarray((samples * 32767).astype(np.int16)[None, :], format="s16", layout="mono")
+        frame.sample_rate = RATE
+        for packet in stream.encode(frame):
+            container.mux(packet)
+        for packet in stream.encode(None):
+            container.mux(packet)
+    return str(path)
+
+@pytest.fixture(scope="module")
+def episodes(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("audio")
+    intro = speech_like(0, 130)
+    first = np.concatenate([intro, speech_like(1, 170)])
+    return {
+        "first": write_audio(directory / "first.wav", first),
+        # 同一個片頭與業配，之後是不同的內容
+        "second": write_audio(directory / "second.wav", np.concatenate([intro, speech_like(2, 170)])),
+        # 同一集，前面多了兩秒靜音、音量不同
+        "reupload": write_audio(directory / "reupload.wav", np.concatenate([np.zeros(2 * RATE, np.float32), first * 0.6])),
+    }
+
+def register(index, path):
+    return index.register(path, feed_url="https://example.com/feed.xml", guid=path, audio_url=path)
+
+def test_shared_intro_is_not_a_duplicate(tmp_path, episodes):
+    index = EpisodeIndex(str(tmp_path / "episodes.sqlite3"))
+    assert register(index, episodes["first"]) is None
+    # 開頭的指紋完全相同，但中段不同
+    intro_distance = episode_index.fingerprint_distance(
+        episode_index.audio_fingerprint(episodes["first"])[0], episode_index.audio_fingerprint(episodes["second"])[0])
+    assert intro_distance < episode_index.MATCH_THRESHOLD
+    assert register(index, episodes["second"]) is None
+    index.close()
+
+def test_reupload_with_leading_silence_is_a_duplicate(tmp_path, episodes):
+    index = EpisodeIndex(str(tmp_path / "episodes.sqlite3"))
+    register(index, episodes["first"])
+    match = register(index, episodes["reupload"])
+    assert match is not None
+    entry, method, distance = match
+    assert (entry["filename"], method) == (episodes["first"], "fingerprint")
+    assert distance < episode_index.MATCH_THRESHOLD
+    index.close()
+
+def test_reindexing_keeps_the_creation_time(tmp_path):
+    index = EpisodeIndex(str(tmp_path / "episodes.sqlite3"))
+    index.add("a.mp3", sha256="old")
+    created = index._conn.execute("SELECT created FROM episodes WHERE filename = 'a.mp3'").fetchone()[0]
+    index.add("a.mp3", sha256="new", duplicate_of="b.mp3")
+    row = index._conn.execute("SELECT sha256, duplicate_of, created FROM episodes WHERE filename = 'a.mp3'").fetchone()
+    assert tuple(row) == ("new", "b.mp3", created)
+    index.close()
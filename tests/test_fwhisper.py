@@ -0,0 +1,42 @@
+import pytest
+
+import fwhisper
+
+@pytest.fixture
+def rtf_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(fwhisper, "RTF_PATH", str(tmp_path / "rtf.sqlite3"))
+    monkeypatch.setattr(fwhisper, "_rtf_conn", None)
+    monkeypatch.setattr(fwhisper, "record", lambda *args, **kwargs: None)
+    yield
+    if fwhisper._rtf_conn is not None:
+        fwhisper._rtf_conn.close()
+
+def test_profile_rtf_uses_measurements_from_the_same_device(rtf_store):
+    assert fwhisper.profile_rtf("default", "cpu") == fwhisper.PROFILES["default"]["rtf"]["cpu"]
+    for rtf in (0.5, 0.6, 0.7):
+        fwhisper.note_rtf("default", "cpu", rtf)
+    fwhisper.note_rtf("default", "cuda", 0.05)
+    assert fwhisper.profile_rtf("default", "cpu") == 0.6
+    assert fwhisper.profile_rtf("default", "cuda") == 0.05
+    assert fwhisper.profile_rtf("archive-fast", "cpu") == fwhisper.PROFILES["archive-fast"]["rtf"]["cpu"]
+
+def test_profile_rtf_keeps_only_recent_transcriptions(rtf_store, monkeypatch):
+    monkeypatch.setattr(fwhisper, "RTF_HISTORY", 3)
+    fwhisper.note_rtf("default", "cpu", 0.5)
+    for _ in range(2):
+        fwhisper._record_transcription(40.0, 0.0, {"audio_seconds": 10.0}, "default", "cpu")
+    assert fwhisper.profile_rtf("default", "cpu") == 4.0
+    fwhisper._record_transcription(40.0, 0.0, {"audio_seconds": 10.0}, "default", "cpu")
+    assert fwhisper._rtf_conn.execute("SELECT COUNT(*) FROM rtf").fetchone()[0] == 3
+
+def test_model_device_unwraps_loaded_models():
+    class Backend:
+        device = "cuda"
+        compute_type = "float16"
+
+    class Wrapper:
+        def __init__(self, model):
+            self.model = model
+
+    assert fwhisper.model_device(Wrapper(Wrapper(Backend()))) == "cuda"
+    assert fwhisper.model_device(object()) == fwhisper.resolve_device(fwhisper.DEVICE)
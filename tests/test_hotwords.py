@@ -0,0 +1,73 @@
+import json
+
+import pytest
+
+pytest.importorskip("pypinyin")
+
+import correct
+from hotwords import HotwordCorrector
+
+@pytest.fixture(scope="module")
+def corrector():
+    return HotwordCorrector(["陳鳳馨", "郝哥", "伯樂"])
+
+@pytest.mark.parametrize("text", ["他撥了電話給我", "節目播了三集", "這是一首好歌", "好個問題"])
+def test_common_words_are_not_rewritten(corrector, text):
+    assert corrector.correct(text) == (text, {})
+
+def test_two_character_homophones_are_left_to_the_llm(corrector):
+    assert corrector.correct("好哥說") == ("好哥說", {})
+    assert corrector.noise_score("好哥說") > 0
+
+def test_three_character_homophone_is_rewritten(corrector):
+    assert corrector.correct("陳鳳心說") == ("陳鳳馨說", {("陳鳳心", "陳鳳馨"): 1})
+    assert corrector.noise_score("陳鳳馨說") == 0
+
+def test_different_tone_is_not_rewritten(corrector):
+    assert corrector.correct("陳風心說") == ("陳風心說", {})
+    assert corrector.noise_score("陳風心說") > 0
+
+def test_changed_or_unconfident_chunks_go_to_the_llm(corrector):
+    original = ["[1] 今天天氣很好", "[2] 陳鳳心說", "[3] 今天天氣很好", "[4] 我們來聊經濟"]
+    chunks = [original[0], "[2] 陳鳳馨說", original[2], original[3]]
+    confident = [True, True, True, False]
+    ranges = [(0, 1), (1, 2), (2, 3), (3, 4)]
+    assert correct.llm_chunks(chunks, original, corrector, confident, ranges) == [1, 3]
+    assert correct.llm_chunks(chunks, original, corrector) == [0, 1, 2, 3]
+
+def test_confident_lines(tmp_path):
+    path = tmp_path / "episode.txt"
+    segments = [
+        {"start": 0, "end": 1, "text": "a", "avg_logprob": -0.2, "no_speech_prob": 0.01},
+        {"start": 1, "end": 2, "text": "b", "avg_logprob": -1.2, "no_speech_prob": 0.01},
+        {"start": 2, "end": 3, "text": "c", "avg_logprob": -0.1, "no_speech_prob": 0.9},
+        {"start": 3, "end": 4, "text": "d"},
+    ]
+    (tmp_path / "episode.segments.jsonl").write_text("".join(json.dumps(s) + "\n" for s in segments), encoding="utf-8")
+    assert correct.confident_lines(str(path), 4) == [True, False, False, False]
+    assert correct.confident_lines(str(path), 3) is None
+    assert correct.confident_lines(str(tmp_path / "missing.txt"), 4) is None
+
+def test_correct_transcript_sends_only_changed_or_unconfident_chunks(tmp_path, monkeypatch):
+    lines = ["今天天氣很好", "陳鳳心說今天天氣很好", "我們來聊經濟", "這個觀點很有意思"]
+    path = tmp_path / "episode.txt"
+    path.write_text("".join(f"[{i}.00s -> {i}.50s] {text}\n" for i, text in enumerate(lines)), encoding="utf-8")
+    segments = [{"start": i, "end": i + 0.5, "text": text, "avg_logprob": -0.1, "no_speech_prob": 0.01}
+                for i, text in enumerate(lines)]
+    segments[3]["avg_logprob"] = -1.5
+    (tmp_path / "episode.segments.jsonl").write_text(
+        "".join(json.dumps(s, ensure_ascii=False) + "\n" for s in segments), encoding="utf-8")
+
+    sent = []
+    def fake_generate_text(client, prompt, **kwargs):
+        chunk = prompt.split("\n")[-1]
+        sent.append(chunk)
+        return chunk
+
+    monkeypatch.setattr(correct, "generate_text", fake_generate_text)
+    monkeypatch.setattr(correct, "CHUNK_SIZE", 20)
+    output = correct.correct_transcript(str(path), client=object(), cache=object())
+
+    assert sorted(sent) == ["[2] 陳鳳馨說今天天氣很好", "[4] 這個觀點很有意思"]
+    with open(output, encoding="utf-8") as f:
+        assert f.read().split("\n")[1] == "[1.00s -> 1.50s] 陳鳳馨說今天天氣很好"
@@ -0,0 +1,63 @@
+import os
+import socket
+import subprocess
+import sys
+
+import pytest
+
+from job_ledger import BUSY, CLAIMED, DONE, RUNNING, JobLedger
+
+@pytest.fixture
+def ledger(tmp_path):
+    ledger = JobLedger(str(tmp_path / "jobs.sqlite3"))
+    yield ledger
+    ledger.close()
+
+@pytest.fixture
+def episode(ledger):
+    episode_id, _ = ledger.add_episode("https://example.com/feed.xml", "guid", "https://example.com/a.mp3", "A", "a.mp3")
+    return episode_id
+
+def exited_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+@pytest.mark.skipif(os.name == "nt", reason="process liveness is not checked on Windows")
+def test_stage_held_by_a_crashed_process_on_this_host_is_reclaimed(ledger, episode):
+    crashed = f"{socket.gethostname()}:{exited_pid()}:1"
+    assert ledger.claim(episode, "download", owner=crashed)[0] == CLAIMED
+    assert ledger.claim(episode, "download")[0] == CLAIMED
+
+def test_stage_held_by_a_live_process_stays_busy(ledger, episode):
+    alive = f"{socket.gethostname()}:{os.getppid()}:1"
+    assert ledger.claim(episode, "download", owner=alive)[0] == CLAIMED
+    assert ledger.claim(episode, "download")[0] == BUSY
+
+def test_stage_held_on_another_host_waits_for_the_lease(ledger, episode):
+    other = f"other-{socket.gethostname()}:{exited_pid()}:1"
+    assert ledger.claim(episode, "download", owner=other)[0] == CLAIMED
+    assert ledger.claim(episode, "download")[0] == BUSY
+
+def test_expired_holder_cannot_overwrite_the_new_owner(ledger, episode):
+    ledger = JobLedger(ledger.path, lease_seconds=-1)
+    assert ledger.claim(episode, "download", owner="host:1:old")[0] == CLAIMED
+    # The lease has expired, so another worker takes the stage over
+    assert ledger.claim(episode, "download", owner="host:2:new")[0] == CLAIMED
+    assert not ledger.finish(episode, "download", owner="host:1:old")
+    assert not ledger.fail(episode, "download", "late failure", owner="host:1:old")
+    assert ledger._stage(episode, "download")[0] == RUNNING
+    assert ledger.finish(episode, "download", owner="host:2:new")
+    assert ledger._stage(episode, "download")[0] == DONE
+    ledger.close()
+
+def test_same_owner_cannot_finish_an_earlier_claim(ledger, episode):
+    ledger = JobLedger(ledger.path, lease_seconds=-1)
+    assert ledger.claim(episode, "download", owner="host:1:a")[0] == CLAIMED
+    other = JobLedger(ledger.path, lease_seconds=-1)
+    # A second claim by the same owner id (e.g. a recycled thread id) starts a new lease
+    assert other.claim(episode, "download", owner="host:1:a")[0] == CLAIMED
+    assert not ledger.finish(episode, "download", owner="host:1:a")
+    assert other.finish(episode, "download", owner="host:1:a")
+    other.close()
+    ledger.close()
@@ -0,0 +1,45 @@
+import os
+
+import metrics
+
+def test_rebuild_keeps_every_label(tmp_path):
+    path = str(tmp_path / "metrics.jsonl")
+    live = metrics.Metrics(path=path, textfile=None)
+    live.record("transcribe", {"profile": "archive-fast"}, seconds=12.0, audio_seconds=600.0)
+    live.record("transcribe_job", {"worker": 1, "status": "done"}, seconds=3.0)
+    live.record("dedup", {"method": "fingerprint"}, linked=1, distance=0.05)
+    live.record("profile", {"stage": "correct"}, seconds=1.0, profile="/tmp/correct.prof")
+    live.close()
+
+    rebuilt = metrics.rebuild_metrics(metrics.load_events(path))
+    assert rebuilt.render_prometheus() == live.render_prometheus()
+    assert 'podcast_transcribe_job_seconds_count{status="done",worker="1"} 1' in rebuilt.render_prometheus()
+
+def test_rebuild_reads_entries_without_label_names():
+    events = [{"ts": 0, "event": "transcribe", "hostname": "h", "pid": 1, "profile": "default", "seconds": 5.0}]
+    text = metrics.rebuild_metrics(events).render_prometheus()
+    assert 'podcast_transcribe_seconds_sum{profile="default"} 5' in text
+
+def test_profile_stage_records_memory(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "PROFILE_STAGES", {"test"})
+    monkeypatch.setattr(metrics, "PROFILE_MEMORY", True)
+    monkeypatch.setattr(metrics, "PROFILE_DIR", str(tmp_path))
+    recorded = []
+    monkeypatch.setattr(metrics, "record", lambda event, labels=None, **values: recorded.append(values))
+    with metrics.profile_stage("test"):
+        data = [0] * 100000
+    assert recorded[0]["peak_bytes"] > 0
+
+def test_log_is_rotated_at_the_size_cap(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "ROTATE_CHECK_LINES", 10)
+    path = str(tmp_path / "metrics.jsonl")
+    log = metrics.Metrics(path=path, textfile=None, enabled=True, max_bytes=2000)
+    for i in range(200):
+        log.record("download", {"server": "example.com"}, bytes=i)
+    log.close()
+    assert os.path.getsize(path + ".1") < 4000 and os.path.getsize(path) < 4000
+    events = metrics.load_events(path)
+    assert [e["bytes"] for e in events] == list(range(200 - len(events), 200))
+
+def test_tests_do_not_write_to_the_checkout():
+    assert not metrics.METRICS_PATH.startswith(os.path.join(os.path.dirname(os.path.dirname(__file__)), ".cache"))
@@ -0,0 +1,22 @@
+from pipeline import Stage, StagedPipeline
+
+def fail_on_odd(item):
+    if item % 2:
+        raise ValueError(item)
+    return item
+
+def test_results_are_kept_for_one_shot_runs():
+    pipeline = StagedPipeline([Stage("work", fail_on_odd)])
+    for i in range(10):
+        pipeline.submit(i)
+    completed, failures = pipeline.close()
+    assert sorted(completed) == [0, 2, 4, 6, 8]
+    assert len(failures) == 5
+
+def test_daemon_pipeline_keeps_only_recent_results():
+    pipeline = StagedPipeline([Stage("work", fail_on_odd)], keep_results=3)
+    for i in range(100):
+        pipeline.submit(i)
+    completed, failures = pipeline.close()
+    assert len(completed) == 3 and len(failures) == 3
+    assert pipeline.completed_count == 50 and pipeline.failure_count == 50
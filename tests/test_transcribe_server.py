@@ -0,0 +1,104 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import pytest
+
+import fwhisper
+import transcribe_server
+from transcribe_pool import WorkerSpec
+from transcribe_server import TranscribeServer
+
+def failing_factory(release):
+    def factory(spec, model_size, profile=None):
+        release.wait(5)
+        raise RuntimeError("out of memory")
+    return factory
+
+@pytest.fixture
+def audio(tmp_path):
+    path = tmp_path / "episode.mp3"
+    path.write_bytes(b"\0" * 1024)
+    return str(path)
+
+@pytest.fixture
+def serve():
+    directory = tempfile.mkdtemp()
+    servers = []
+
+    def start(transcriber):
+        address = "unix:" + os.path.join(directory, "server.sock")
+        httpd = transcribe_server.create_http_server(transcriber, address)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        servers.append(httpd)
+        transcriber.start()
+        return address
+
+    yield start
+    for httpd in servers:
+        httpd.shutdown()
+        httpd.server_close()
+    shutil.rmtree(directory)
+
+def test_failed_model_load_fails_queued_and_new_jobs(audio):
+    release = threading.Event()
+    server = TranscribeServer([WorkerSpec("cpu0", "cpu")], model_factory=failing_factory(release)).start()
+    job, _ = server.submit(audio)
+    assert job.status == "queued"
+    release.set()
+    assert server.get(job.id, wait=5).status == "unavailable"
+    assert "out of memory" in job.error
+    assert server.status()["ready_workers"] == 0
+    assert server.submit(audio)[0].status == "unavailable"
+
+def test_client_sees_unavailable_server(audio, serve):
+    release = threading.Event()
+    release.set()
+    address = serve(TranscribeServer([WorkerSpec("cpu0", "cpu")], model_factory=failing_factory(release)))
+    assert transcribe_server.is_running(address, ready=False)
+    assert not transcribe_server.is_running(address)
+    with pytest.raises(transcribe_server.Unavailable):
+        transcribe_server.transcribe(audio, address=address)
+
+def test_wait_times_out_when_the_job_makes_no_progress(audio, serve, monkeypatch):
+    # The model never finishes loading, so the job stays queued
+    release = threading.Event()
+    monkeypatch.setattr(transcribe_server, "WAIT_POLL", 0.05)
+    address = serve(TranscribeServer([WorkerSpec("cpu0", "cpu")], model_factory=failing_factory(release)))
+    with pytest.raises(transcribe_server.Unavailable):
+        transcribe_server.transcribe(audio, address=address, timeout=0.3)
+    assert transcribe_server.request("GET", "/jobs/1", address=address)[1]["status"] == "cancelled"
+    release.set()
+
+def test_ready_worker_and_malformed_wait(serve):
+    address = serve(TranscribeServer([WorkerSpec("cpu0", "cpu")], model_factory=lambda spec, model_size, profile=None: object()))
+    deadline = time.monotonic() + 5
+    while not transcribe_server.is_running(address) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert transcribe_server.is_running(address)
+    code, response = transcribe_server.request("GET", "/jobs/1?wait=abc", address=address)
+    assert code == 400 and "bad request" in response["error"]
+
+def test_job_queued_behind_a_slow_job_keeps_waiting(tmp_path, serve, monkeypatch):
+    # Each job decodes 20 segments of 0.05s; the second job's own state does not change for about 1s
+    def slow_transcribe(path, model, progress=None, profile=None):
+        for i in range(20):
+            time.sleep(0.05)
+            progress(i + 1, 20)
+        transcript = fwhisper.transcript_path(path)
+        with open(transcript, "w", encoding="utf-8") as f:
+            f.write("[0.00s -> 1.00s] text\n")
+        return transcript
+
+    monkeypatch.setattr(fwhisper, "transcribe_file", slow_transcribe)
+    monkeypatch.setattr(transcribe_server, "WAIT_POLL", 0.05)
+    paths = []
+    for name in ("first.mp3", "second.mp3"):
+        paths.append(str(tmp_path / name))
+        (tmp_path / name).write_bytes(b"\0" * 1024)
+    address = serve(TranscribeServer([WorkerSpec("cpu0", "cpu")], model_factory=lambda spec, model_size, profile=None: object()))
+    first = transcribe_server.submit(paths[0], address=address)
+    assert transcribe_server.transcribe(paths[1], address=address, timeout=0.5) == fwhisper.transcript_path(paths[1])
+    assert transcribe_server.wait(first["id"], address=address)["status"] == "done"
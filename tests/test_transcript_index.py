@@ -0,0 +1,53 @@
+import os
+import sqlite3
+
+import transcript_index
+from transcript_index import TranscriptIndex
+
+def write_episode(root, name, lines):
+    os.makedirs(os.path.join(root, "show"), exist_ok=True)
+    with open(os.path.join(root, "show", name), "w", encoding="utf-8") as f:
+        f.writelines(f"[{i}.00s -> {i}.50s] {text}\n" for i, text in enumerate(lines))
+
+def test_single_character_matches_the_end_of_a_run(tmp_path):
+    root = str(tmp_path / "podcasts")
+    write_episode(root, "ep.txt", ["今天的來賓是陳鳳馨", "馨天地開播了", "無關的一段"])
+    index = TranscriptIndex(str(tmp_path / "index.sqlite3"))
+    index.update(root)
+    assert sorted(hit["start_ms"] for hit in index.search("馨")) == [0, 1000]
+    assert [hit["start_ms"] for hit in index.search("播")] == [1000]
+    assert [hit["start_ms"] for hit in index.search("陳鳳馨")] == [0]
+    index.close()
+
+def test_rank_window_is_opt_in(tmp_path):
+    root = str(tmp_path / "podcasts")
+    # The best match is indexed first, so a window over the newest segments drops it
+    write_episode(root, "a.txt", ["晶片 晶片 晶片"])
+    write_episode(root, "b.txt", [f"今天談到晶片與其他很多很多很多很多的話題 {i}" for i in range(5)])
+    index = TranscriptIndex(str(tmp_path / "index.sqlite3"))
+    index.update(root)
+    assert transcript_index.RANK_WINDOW == 0
+    assert index.search("晶片", limit=1)[0]["path"].endswith("a.txt")
+    assert index.search("晶片", limit=1, rank_window=2)[0]["path"].endswith("b.txt")
+    index.close()
+
+def test_old_index_is_rebuilt(tmp_path):
+    path = str(tmp_path / "index.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE files (path TEXT PRIMARY KEY, episode TEXT NOT NULL, podcast TEXT, kind TEXT NOT NULL,
+                            mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL, segments INTEGER NOT NULL, indexed REAL NOT NULL);
+        CREATE TABLE segments (id INTEGER PRIMARY KEY, path TEXT NOT NULL, start_ms INTEGER, end_ms INTEGER, text TEXT NOT NULL);
+        CREATE VIRTUAL TABLE segments_fts USING fts5(tokens, podcast, kind, content='', tokenize='unicode61');
+        INSERT INTO files VALUES ('x.txt', 'x', 'show', 'transcript', 0, 0, 1, 0);
+        INSERT INTO segments VALUES (1, 'x.txt', 0, 500, '陳鳳馨');
+    """)
+    conn.close()
+
+    root = str(tmp_path / "podcasts")
+    write_episode(root, "ep.txt", ["陳鳳馨"])
+    index = TranscriptIndex(path)
+    assert index.stats()["files"] == 0
+    assert index.update(root) == (1, 0, 0)
+    assert len(index.search("馨")) == 1
+    index.close()
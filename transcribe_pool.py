@@ -0,0 +1,252 @@
+import contextlib
+import io
+import multiprocessing
+import os
+import queue
+import sys
+import time
+import fwhisper
+
+# Threads given to each CPU worker; the pool runs cpu_count // CPU_THREADS_PER_WORKER CPU workers
+CPU_THREADS_PER_WORKER = 4
+# Worker processes per GPU (each one loads its own copy of the model)
+WORKERS_PER_GPU = 1
+# How often the pool checks that its workers are still alive while waiting for results
+POLL_INTERVAL = 1.0
+
+class WorkerSpec:
+    """
+    Where one worker process runs: a GPU index, or a set of CPU cores
+    """
+    def __init__(self, name, device, device_index=0, cpu_threads=0, cores=None):
+        self.name = name
+        self.device = device
+        self.device_index = device_index
+        self.cpu_threads = cpu_threads
+        self.cores = cores
+
+    def __repr__(self):
+        if self.device == "cuda":
+            return f"{self.name} (cuda:{self.device_index})"
+        cores = f", cores {min(self.cores)}-{max(self.cores)}" if self.cores else ""
+        return f"{self.name} (cpu, {self.cpu_threads} threads{cores})"
+
+def _available_cores():
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+def plan_workers(num_workers=None, device=fwhisper.DEVICE, threads_per_worker=CPU_THREADS_PER_WORKER):
+    """
+    Builds one WorkerSpec per worker process.
+    With GPUs: WORKERS_PER_GPU workers on every GPU. Without: the CPU cores are split into
+    disjoint sets of threads_per_worker cores, one per worker.
+    """
+    device = fwhisper.resolve_device(device)
+    if device == "cuda":
+        gpus = fwhisper.cuda_device_count() or 1
+        specs = [
+            WorkerSpec(f"gpu{index}-{n}", "cuda", device_index=index)
+            for n in range(WORKERS_PER_GPU)
+            for index in range(gpus)
+        ]
+        return specs[:num_workers] if num_workers else specs
+
+    cores = _available_cores()
+    if not num_workers:
+        num_workers = max(1, len(cores) // max(1, threads_per_worker))
+    per_worker = max(1, len(cores) // num_workers)
+    specs = []
+    for n in range(num_workers):
+        worker_cores = cores[n * per_worker:(n + 1) * per_worker] or cores
+        specs.append(WorkerSpec(f"cpu{n}", "cpu", cpu_threads=len(worker_cores), cores=set(worker_cores)))
+    return specs
+
+def audio_duration(path):
+    """
+    Audio length in seconds from the container header (no decoding), or None if it cannot be read
+    """
+    try:
+        import av
+
+        with av.open(path) as container:
+            if container.duration:
+                return container.duration / 1000000
+    except Exception:
+        pass
+    return None
+
+def backlog_seconds(paths):
+    """
+    Total audio length in seconds; files whose length cannot be read are estimated from their size at 128 kbps
+    """
+    total = 0.0
+    for path in paths:
+        duration = audio_duration(path)
+        if duration is None:
+            duration = os.path.getsize(path) * 8 / 128000 if os.path.exists(path) else 0.0
+        total += duration
+    return total
+
+def longest_first(paths):
+    """
+    Orders paths by audio length, longest first. If any length is unknown, every file is ranked by
+    its size instead so seconds and bytes are never compared.
+    """
+    durations = [audio_duration(path) for path in paths]
+    if None in durations:
+        durations = [os.path.getsize(path) for path in paths]
+    return [path for _, path in sorted(zip(durations, paths), key=lambda item: item[0], reverse=True)]
+
+def load_worker_model(spec, model_size, profile=None):
+    return fwhisper.load_model(
+        model_size,
+        device=spec.device,
+        device_index=spec.device_index,
+        cpu_threads=spec.cpu_threads,
+        profile=profile,
+    )
+
+def _worker_main(spec, model_size, model_factory, jobs, results, profile=None):
+    """
+    Worker process: load the model once, then transcribe jobs until the None sentinel.
+    Everything printed for a job is sent back with its result so the pool can print it as one block.
+    """
+    if spec.cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, spec.cores)
+
+    output = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(output):
+            model = model_factory(spec, model_size, profile)
+    except Exception as e:
+        results.put(("worker", spec.name, None, None, f"model load failed: {e}", 0.0, output.getvalue()))
+        return
+    results.put(("ready", spec.name, None, None, None, 0.0, output.getvalue()))
+
+    while True:
+        path = jobs.get()
+        if path is None:
+            break
+        output = io.StringIO()
+        start = time.time()
+        try:
+            with contextlib.redirect_stdout(output):
+                txt_filename = fwhisper.transcribe_file(path, model, profile=profile)
+            error = None if txt_filename else "no transcript written"
+        except Exception as e:
+            txt_filename = None
+            error = f"{type(e).__name__}: {e}"
+        results.put(("done", spec.name, path, txt_filename, error, time.time() - start, output.getvalue()))
+
+class TranscribePool:
+    """
+    Pool of transcription worker processes, each with its own loaded model bound to one device.
+
+    Jobs are queued longest audio first and pulled by whichever worker is free, which keeps the
+    longest file from starting last. Results and errors are collected in the parent process.
+    """
+    def __init__(self, specs=None, model_size=None, model_factory=load_worker_model, longest_first=True, verbose=True, profile=None):
+        self.specs = specs or plan_workers()
+        # Every worker loads and decodes with the same profile ("auto" resolves to the preferred one)
+        self.profile = fwhisper.get_profile(profile)["name"]
+        self.longest_first = longest_first
+        self.model_size = model_size
+        self.model_factory = model_factory
+        self.verbose = verbose
+        # spawn: CUDA cannot be used in forked children, and each worker loads its own model anyway
+        self._context = multiprocessing.get_context("spawn")
+
+    def _print(self, text):
+        if self.verbose and text:
+            sys.stdout.write(text if text.endswith("\n") else text + "\n")
+            sys.stdout.flush()
+
+    def run(self, paths):
+        """
+        Transcribes every path. Returns (transcripts, errors):
+        transcripts maps each audio path to its .txt path, errors is a list of (path, message)
+        """
+        transcripts = {}
+        errors = []
+        pending = []
+        for path in paths:
+            if os.path.exists(os.path.splitext(path)[0] + ".txt"):
+                transcripts[path] = os.path.splitext(path)[0] + ".txt"
+            elif not os.path.exists(path):
+                errors.append((path, "file not found"))
+            else:
+                pending.append(path)
+        if not pending:
+            return transcripts, errors
+
+        specs = self.specs[:len(pending)]
+        jobs = self._context.Queue()
+        results = self._context.Queue()
+
+        self._print(f"Transcribing {len(pending)} files with {len(specs)} workers (profile {self.profile}): {', '.join(map(repr, specs))}")
+        processes = [
+            self._context.Process(
+                target=_worker_main,
+                args=(spec, self.model_size, self.model_factory, jobs, results, self.profile),
+                name=f"transcribe-{spec.name}",
+                daemon=True,
+            )
+            for spec in specs
+        ]
+        for p in processes:
+            p.start()
+
+        # Queue the jobs while the workers load their models
+        if self.longest_first:
+            # Longest processing time first: the longest files start first, short ones fill the gaps
+            pending = longest_first(pending)
+        for path in pending:
+            jobs.put(path)
+        for _ in specs:
+            jobs.put(None)
+
+        remaining = set(pending)
+        while remaining:
+            try:
+                kind, worker, path, txt_filename, error, elapsed, output = results.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                if not any(p.is_alive() for p in processes):
+                    # Every worker has exited (crashed or failed to load) with jobs still queued
+                    for path in sorted(remaining):
+                        errors.append((path, "no worker left to transcribe it"))
+                    break
+                continue
+
+            self._print(output)
+            if kind == "worker":
+                self._print(f"[{worker}] {error}")
+            elif kind == "done":
+                remaining.discard(path)
+                if error is None:
+                    transcripts[path] = txt_filename
+                    self._print(f"[{worker}] done in {elapsed:.2f} s ({len(remaining)} left): {path}")
+                else:
+                    errors.append((path, error))
+                    self._print(f"[{worker}] failed: {path} ({error})")
+
+        for p in processes:
+            p.join(timeout=POLL_INTERVAL if remaining else None)
+            if p.is_alive():
+                p.terminate()
+        return transcripts, errors
+
+def transcribe_files(paths, num_workers=None, device=fwhisper.DEVICE, model_size=None, profile=None):
+    """
+    Transcribes a backlog of audio files with a worker pool sized for this machine.
+    With the "auto" profile, the profile is chosen from the total audio length and the number of workers
+    (fwhisper.choose_profile).
+    """
+    specs = plan_workers(num_workers, device=device)
+    if (profile or fwhisper.PROFILE) == "auto":
+        backlog = backlog_seconds(paths)
+        profile = fwhisper.choose_profile(backlog, workers=len(specs), device=device)
+        print(f"Backlog: {backlog / 3600:.1f} hours of audio for {len(specs)} workers, "
+              f"deadline {fwhisper.DEADLINE_HOURS:g} hours -> profile {profile}")
+    pool = TranscribePool(specs, model_size=model_size, profile=profile)
+    return pool.run(paths)
@@ -0,0 +1,566 @@
+import argparse
+import heapq
+import http.client
+import itertools
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+import fwhisper
+from metrics import record
+from podcast_log import captured_output, print_block
+from transcribe_pool import load_worker_model, plan_workers
+
+# Where the server listens and clients connect: "unix:<path>" or "http://host:port" (TRANSCRIBE_SERVER overrides).
+# The default socket lives in the temp directory and is private to the current user.
+DEFAULT_ADDRESS = "unix:" + os.path.join(tempfile.gettempdir(), f"podcast-transcribe-{os.getuid() if hasattr(os, 'getuid') else 0}.sock")
+SERVER_ADDRESS = os.environ.get("TRANSCRIBE_SERVER", DEFAULT_ADDRESS)
+# Timeout for connecting to the server; a missing server is detected within this time
+CONNECT_TIMEOUT = 2.0
+# How long one status request waits for a job to finish before answering with its progress
+WAIT_POLL = 5.0
+# Finished jobs are kept for status requests for this many seconds
+JOB_RETENTION = 3600
+# A client stops waiting when the server has made no progress on any job (no segment decoded, no job started or
+# finished) for this many seconds and transcribes in its own process instead (TRANSCRIBE_SERVER_TIMEOUT overrides,
+# 0 waits forever). A job queued behind a long one keeps waiting as long as the running job advances.
+STALL_TIMEOUT = float(os.environ.get("TRANSCRIBE_SERVER_TIMEOUT", 1800))
+
+class Cancelled(Exception):
+    pass
+
+class Unavailable(RuntimeError):
+    """
+    The server cannot transcribe the job (no worker has a model loaded, or the job stopped making progress);
+    callers transcribe the file in their own process instead.
+    """
+
+class Job:
+    """
+    One transcription request. Progress is the decoded position over the audio length.
+    """
+    def __init__(self, job_id, path, priority):
+        self.id = job_id
+        self.path = path
+        self.priority = priority
+        self.status = "queued"
+        self.transcript = None
+        self.error = None
+        self.worker = None
+        self.decoded_seconds = 0.0
+        self.audio_seconds = None
+        self.output = ""
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.cancel_requested = False
+        self.done = threading.Event()
+
+    def to_dict(self, position=None):
+        progress = None
+        if self.status == "done":
+            progress = 1.0
+        elif self.audio_seconds:
+            progress = round(min(1.0, self.decoded_seconds / self.audio_seconds), 4)
+        return {
+            "id": self.id, "path": self.path, "priority": self.priority, "status": self.status,
+            "position": position, "progress": progress, "decoded_seconds": round(self.decoded_seconds, 2),
+            "audio_seconds": self.audio_seconds, "transcript": self.transcript, "error": self.error,
+            "worker": self.worker, "submitted": self.submitted, "started": self.started, "finished": self.finished,
+            "output": self.output,
+        }
+
+class TranscribeServer:
+    """
+    Keeps one loaded model per worker thread and transcribes queued jobs, highest priority first
+    (then in submission order). Submitting a file that is already queued or running returns that job.
+
+    Cancelling a queued job removes it; cancelling a running job stops it after the current segment,
+    keeping its checkpoint so the next request for the file resumes from there.
+    When every worker fails to load its model, queued and new jobs end as "unavailable" with the load errors.
+    """
+    def __init__(self, specs=None, model_size=None, model_factory=load_worker_model, profile=None):
+        self.specs = specs or plan_workers(1)
+        # Every worker loads and decodes with the same profile ("auto" resolves to the preferred one)
+        self.profile = fwhisper.get_profile(profile)["name"]
+        self.model_size = model_size or fwhisper.get_profile(self.profile)["model"]
+        self.model_factory = model_factory
+        self.jobs = {}
+        self.ready = []
+        self.load_errors = {}
+        self.started = time.time()
+        # Counts decoded segments and job starts/finishes; clients treat a change as a sign of life
+        self.activity = 0
+        self._heap = []
+        self._seq = itertools.count()
+        self._ids = itertools.count(1)
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._threads = []
+
+    def start(self):
+        for spec in self.specs:
+            t = threading.Thread(target=self._worker, args=(spec,), name=f"transcribe-{spec.name}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def submit(self, path, priority=0):
+        """
+        Queues a file and returns (job, created). A finished transcript is returned as a done job right away.
+        """
+        path = os.path.abspath(path)
+        with self._cond:
+            self._expire()
+            for job in self.jobs.values():
+                if job.path == path and job.status in ("queued", "running"):
+                    if priority > job.priority and job.status == "queued":
+                        # The old heap entry is skipped when popped because its priority no longer matches
+                        job.priority = priority
+                        heapq.heappush(self._heap, (-priority, next(self._seq), job))
+                        self._cond.notify()
+                    return job, False
+            job = Job(str(next(self._ids)), path, priority)
+            self.jobs[job.id] = job
+            if os.path.exists(fwhisper.transcript_path(path)):
+                self._finish(job, "done", transcript=fwhisper.transcript_path(path))
+            elif not os.path.exists(path):
+                self._finish(job, "failed", error=f"File not found: {path}")
+            elif self._unavailable():
+                self._finish(job, "unavailable", error=self._unavailable())
+            else:
+                heapq.heappush(self._heap, (-priority, next(self._seq), job))
+                self._cond.notify()
+            return job, True
+
+    def cancel(self, job_id):
+        with self._cond:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            if job.status == "queued":
+                self._finish(job, "cancelled")
+            elif job.status == "running":
+                job.cancel_requested = True
+            return job
+
+    def get(self, job_id, wait=0):
+        job = self.jobs.get(job_id)
+        if job is not None and wait:
+            job.done.wait(wait)
+        return job
+
+    def list_jobs(self):
+        with self._cond:
+            return list(self.jobs.values())
+
+    def position(self, job):
+        """
+        Number of queued jobs that run before this one (None once it has left the queue)
+        """
+        with self._cond:
+            if job.status != "queued":
+                return None
+            return sum(1 for other in self.jobs.values() if other.status == "queued" and (-other.priority, other.submitted) < (-job.priority, job.submitted))
+
+    def status(self):
+        with self._cond:
+            counts = {}
+            for job in self.jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return {
+                "pid": os.getpid(), "model": self.model_size, "profile": self.profile, "uptime": round(time.time() - self.started, 1),
+                "workers": [repr(spec) for spec in self.specs], "ready": list(self.ready), "ready_workers": len(self.ready),
+                "loading": len(self.specs) - len(self.ready) - len(self.load_errors),
+                "load_errors": dict(self.load_errors), "jobs": counts, "activity": self.activity,
+                "running": [job.to_dict() for job in self.jobs.values() if job.status == "running"],
+            }
+
+    def stop(self):
+        """
+        Stops taking jobs: queued jobs are cancelled and running jobs finish their current segment.
+        """
+        with self._cond:
+            self._stopping = True
+            for job in self.jobs.values():
+                if job.status == "queued":
+                    self._finish(job, "cancelled")
+                elif job.status == "running":
+                    job.cancel_requested = True
+            self._cond.notify_all()
+        for t in self._threads:
+            t.join()
+
+    def _finish(self, job, status, transcript=None, error=None):
+        job.status = status
+        job.transcript = transcript
+        job.error = error
+        job.finished = time.time()
+        self.activity += 1
+        job.done.set()
+
+    def _unavailable(self):
+        """
+        The load errors once every worker has failed to load its model, else None
+        """
+        if self.ready or len(self.load_errors) < len(self.specs):
+            return None
+        return "no worker could load a model: " + "; ".join(f"{name}: {error}" for name, error in self.load_errors.items())
+
+    def _expire(self):
+        cutoff = time.time() - JOB_RETENTION
+        for job_id in [job.id for job in self.jobs.values() if job.finished and job.finished < cutoff]:
+            del self.jobs[job_id]
+
+    def _next_job(self):
+        with self._cond:
+            while True:
+                if self._stopping:
+                    return None
+                while self._heap:
+                    neg_priority, _, job = heapq.heappop(self._heap)
+                    if job.status == "queued" and -neg_priority == job.priority:
+                        job.status = "running"
+                        job.started = time.time()
+                        self.activity += 1
+                        return job
+                self._cond.wait()
+
+    def _worker(self, spec):
+        with captured_output() as output:
+            try:
+                model = self.model_factory(spec, self.model_size, self.profile)
+                error = None
+            except Exception as e:
+                model = None
+                error = f"{type(e).__name__}: {e}"
+        print_block(output.getvalue())
+        if model is None:
+            print_block(f"Model load failed on {spec!r}: {error}")
+            with self._cond:
+                self.load_errors[spec.name] = error
+                unavailable = self._unavailable()
+                if unavailable:
+                    # Nothing will ever run the queue; fail it so clients fall back instead of waiting
+                    for job in self.jobs.values():
+                        if job.status == "queued":
+                            self._finish(job, "unavailable", error=unavailable)
+            return
+        with self._cond:
+            self.ready.append(spec.name)
+        print_block(f"Worker {spec!r} ready")
+
+        while True:
+            job = self._next_job()
+            if job is None:
+                break
+            job.worker = spec.name
+            self._run(job, model)
+
+    def _run(self, job, model):
+        def progress(end, audio_seconds):
+            job.decoded_seconds = end
+            job.audio_seconds = audio_seconds and round(audio_seconds, 2)
+            with self._cond:
+                self.activity += 1
+            if job.cancel_requested:
+                raise Cancelled()
+
+        with captured_output() as output:
+            try:
+                transcript = fwhisper.transcribe_file(job.path, model, progress=progress, profile=self.profile)
+                status, error = ("done", None) if transcript else ("failed", "no transcript written")
+            except Cancelled:
+                transcript, status, error = None, "cancelled", None
+            except Exception as e:
+                transcript, status, error = None, "failed", f"{type(e).__name__}: {e}"
+        job.output = output.getvalue()
+        with self._cond:
+            self._finish(job, status, transcript=transcript, error=error)
+        record("transcribe_job", {"worker": job.worker, "status": status},
+               seconds=round(job.finished - job.started, 3), wait_seconds=round(job.started - job.submitted, 3))
+        print_block(f"[{job.worker}] {status}: {job.path}" + (f" ({error})" if error else ""))
+
+# --- HTTP API ---
+# POST   /jobs          {"path": ..., "priority": 0}  -> job (201 when newly queued)
+# GET    /jobs          all jobs
+# GET    /jobs/<id>     job status; ?wait=<seconds> waits up to that long for it to finish
+# DELETE /jobs/<id>     cancel
+# GET    /status        workers (ready_workers: models loaded), load errors and job counts
+# Job and status responses carry "activity", a server-wide counter that changes whenever any job makes progress
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "transcribe-server"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, code, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _job_id(self, path):
+        parts = path.strip("/").split("/")
+        return parts[1] if len(parts) == 2 and parts[0] == "jobs" else None
+
+    def _job(self, job):
+        return dict(job.to_dict(self.server.transcriber.position(job)), activity=self.server.transcriber.activity)
+
+    def do_GET(self):
+        transcriber = self.server.transcriber
+        url = urlsplit(self.path)
+        if url.path == "/status":
+            return self._send(200, transcriber.status())
+        if url.path.rstrip("/") == "/jobs":
+            return self._send(200, [self._job(job) for job in transcriber.list_jobs()])
+        job_id = self._job_id(url.path)
+        if job_id is None:
+            return self._send(404, {"error": "not found"})
+        try:
+            wait = min(max(float(parse_qs(url.query).get("wait", ["0"])[0]), 0), 60)
+        except ValueError as e:
+            return self._send(400, {"error": f"bad request: {e}"})
+        job = transcriber.get(job_id, wait=wait)
+        if job is None:
+            return self._send(404, {"error": f"no such job: {job_id}"})
+        self._send(200, self._job(job))
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/jobs":
+            return self._send(404, {"error": "not found"})
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+            path = request["path"]
+            priority = int(request.get("priority", 0))
+        except (ValueError, KeyError, TypeError) as e:
+            return self._send(400, {"error": f"bad request: {e}"})
+        job, created = self.server.transcriber.submit(path, priority)
+        self._send(201 if created else 200, dict(self._job(job), created=created))
+
+    def do_DELETE(self):
+        job_id = self._job_id(urlsplit(self.path).path)
+        job = self.server.transcriber.cancel(job_id) if job_id else None
+        if job is None:
+            return self._send(404, {"error": f"no such job: {job_id}"})
+        self._send(200, self._job(job))
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        request, _ = super().get_request()
+        # BaseHTTPRequestHandler expects a (host, port) client address
+        return request, ("local", 0)
+
+def parse_address(address):
+    """
+    Returns ("unix", path) or ("tcp", (host, port)) for a server address
+    """
+    if address.startswith("unix:"):
+        return "unix", address[len("unix:"):]
+    url = urlsplit(address if "://" in address else "http://" + address)
+    return "tcp", (url.hostname or "127.0.0.1", url.port or 8765)
+
+def create_http_server(transcriber, address=SERVER_ADDRESS):
+    """
+    Binds the HTTP API to a unix socket or a TCP port. A stale socket file from a crashed server is replaced,
+    but a socket that still answers means another server is running.
+    """
+    kind, target = parse_address(address)
+    if kind == "unix":
+        if os.path.exists(target):
+            if is_running(address, ready=False):
+                raise RuntimeError(f"a transcription server is already listening on {address}")
+            os.remove(target)
+        httpd = _UnixHTTPServer(target, _Handler)
+        os.chmod(target, 0o600)
+    else:
+        httpd = ThreadingHTTPServer(target, _Handler)
+        httpd.daemon_threads = True
+    httpd.transcriber = transcriber
+    return httpd
+
+def serve(transcriber, address=SERVER_ADDRESS):
+    """
+    Runs the server until interrupted, then stops the workers (running jobs keep their checkpoints).
+    """
+    httpd = create_http_server(transcriber, address)
+    if threading.current_thread() is threading.main_thread():
+        # serve_forever() must be stopped from another thread
+        signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=httpd.shutdown).start())
+    print_block(f"Transcription server listening on {address} ({len(transcriber.specs)} workers, model {transcriber.model_size}, profile {transcriber.profile})")
+    transcriber.start()
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        kind, target = parse_address(address)
+        if kind == "unix" and os.path.exists(target):
+            os.remove(target)
+        print_block("Stopping: running jobs stop after their current segment")
+        transcriber.stop()
+
+# --- Client ---
+
+class _UnixConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+def request(method, path, payload=None, address=SERVER_ADDRESS, timeout=None):
+    """
+    Sends one API request and returns (status code, decoded JSON). Raises OSError when no server is listening.
+    """
+    kind, target = parse_address(address)
+    timeout = timeout or CONNECT_TIMEOUT
+    if kind == "unix":
+        connection = _UnixConnection(target, timeout)
+    else:
+        connection = http.client.HTTPConnection(*target, timeout=timeout)
+    try:
+        body = json.dumps(payload).encode("utf-8") if payload is not None else None
+        headers = {"Content-Type": "application/json"} if body else {}
+        connection.request(method, path, body=body, headers=headers)
+        response = connection.getresponse()
+        return response.status, json.loads(response.read() or b"null")
+    finally:
+        connection.close()
+
+def is_running(address=SERVER_ADDRESS, ready=True):
+    """
+    True when a server answers on the address and at least one of its workers has a model loaded
+    (ready=False: when it answers at all). A unix socket that does not exist is checked without connecting.
+    """
+    kind, target = parse_address(address)
+    if kind == "unix" and not os.path.exists(target):
+        return False
+    try:
+        code, status = request("GET", "/status", address=address)
+        return code == 200 and (not ready or status.get("ready_workers", 0) > 0)
+    except (OSError, http.client.HTTPException, ValueError, AttributeError):
+        return False
+
+def submit(path, priority=0, address=SERVER_ADDRESS):
+    code, job = request("POST", "/jobs", {"path": os.path.abspath(path), "priority": priority}, address=address)
+    if code >= 400:
+        raise RuntimeError(job.get("error"))
+    return job
+
+def cancel(job_id, address=SERVER_ADDRESS):
+    return request("DELETE", f"/jobs/{job_id}", address=address)[1]
+
+def wait(job_id, address=SERVER_ADDRESS, on_progress=None, timeout=STALL_TIMEOUT):
+    """
+    Waits for a job to finish and returns its final status; on_progress(job) is called between polls.
+    Raises Unavailable when neither this job nor any other job on the server makes progress for timeout seconds
+    (0 or None waits forever), so a job queued behind a long transcription keeps waiting.
+    """
+    last_state, last_change = None, time.monotonic()
+    while True:
+        code, job = request("GET", f"/jobs/{job_id}?wait={WAIT_POLL}", address=address, timeout=WAIT_POLL + CONNECT_TIMEOUT)
+        if code >= 400:
+            raise RuntimeError(job.get("error"))
+        if job["status"] not in ("queued", "running"):
+            return job
+        state = (job["status"], job["position"], job["decoded_seconds"], job.get("activity"))
+        if state != last_state:
+            last_state, last_change = state, time.monotonic()
+        elif timeout and time.monotonic() - last_change >= timeout:
+            raise Unavailable(f"job {job_id} made no progress for {timeout:.0f}s")
+        if on_progress is not None:
+            on_progress(job)
+
+def print_progress(job):
+    if job["status"] == "queued":
+        print(f"  queued (position {job['position']})")
+    elif job["progress"] is not None:
+        print(f"  {job['progress']:.0%} ({job['decoded_seconds']:.0f}s / {job['audio_seconds']:.0f}s)")
+
+def transcribe(path, priority=0, address=SERVER_ADDRESS, on_progress=None, timeout=STALL_TIMEOUT):
+    """
+    Transcribes a file on the server and returns the transcript path like fwhisper.transcribe_file.
+    A job this call queued is cancelled if the wait is interrupted or times out (see wait).
+    Raises Unavailable when the server cannot run the job, so the caller can transcribe it itself,
+    and RuntimeError for other failures.
+    """
+    job = submit(path, priority, address)
+    try:
+        job = wait(job["id"], address, on_progress, timeout)
+    except BaseException:
+        if job.get("created"):
+            try:
+                cancel(job["id"], address)
+            except OSError:
+                pass
+        raise
+    if job["output"]:
+        print(job["output"], end="" if job["output"].endswith("\n") else "\n")
+    if job["status"] == "unavailable":
+        raise Unavailable(job["error"])
+    if job["status"] != "done":
+        raise RuntimeError(job["error"] or job["status"])
+    return job["transcript"]
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm Whisper transcription server and client")
+    parser.add_argument("--address", default=SERVER_ADDRESS, help="unix:<path> or http://host:port")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve_parser = commands.add_parser("serve", help="load the models and serve jobs")
+    serve_parser.add_argument("--workers", type=int, default=1, help="models kept loaded (one per worker)")
+    serve_parser.add_argument("--device", default=fwhisper.DEVICE)
+    serve_parser.add_argument("--profile", default=fwhisper.PROFILE, help=f"decoding profile ({', '.join(fwhisper.PROFILES)})")
+    serve_parser.add_argument("--model", help="override the profile's model")
+    submit_parser = commands.add_parser("submit", help="transcribe files on the server")
+    submit_parser.add_argument("files", nargs="+")
+    submit_parser.add_argument("--priority", type=int, default=0, help="higher runs first")
+    submit_parser.add_argument("--no-wait", action="store_true", help="queue the files and return")
+    status_parser = commands.add_parser("status", help="server status, or one job's status")
+    status_parser.add_argument("job", nargs="?")
+    cancel_parser = commands.add_parser("cancel", help="cancel a queued or running job")
+    cancel_parser.add_argument("job")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve(TranscribeServer(plan_workers(args.workers, args.device), model_size=args.model, profile=args.profile), args.address)
+        return
+    if not is_running(args.address, ready=False):
+        print(f"No transcription server on {args.address}")
+        sys.exit(1)
+    if args.command == "submit":
+        jobs = [submit(path, args.priority, args.address) for path in args.files]
+        for job in jobs:
+            print(f"Job {job['id']}: {job['path']} ({job['status']})")
+        if args.no_wait:
+            return
+        failed = 0
+        for job in jobs:
+            job = wait(job["id"], args.address, print_progress, timeout=None)
+            print(f"Job {job['id']}: {job['status']} {job['transcript'] or job['error'] or ''}")
+            failed += job["status"] != "done"
+        sys.exit(1 if failed else 0)
+    elif args.command == "status":
+        path = f"/jobs/{args.job}" if args.job else "/status"
+        print(json.dumps(request("GET", path, address=args.address)[1], ensure_ascii=False, indent=2))
+    elif args.command == "cancel":
+        print(json.dumps(cancel(args.job, args.address), ensure_ascii=False, indent=2))
+
+if __name__ == "__main__":
+    main()
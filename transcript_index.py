@@ -0,0 +1,373 @@
+import hashlib
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import unicodedata
+
+# --- Configuration ---
+# 全文檢索索引：逐字稿、校正稿的每一段 ([start -> end] text) 與摘要的每一段落
+TRANSCRIPT_INDEX_PATH = os.getenv("TRANSCRIPT_INDEX_PATH") or ".cache/transcripts.sqlite3"
+# 設定 PODCAST_SEARCH_INDEX=0 時處理管線不更新索引 (仍可用 python transcript_index.py update 手動更新)
+SEARCH_INDEX_ENABLED = os.getenv("PODCAST_SEARCH_INDEX", "1") != "0"
+# update 預設掃描的資料夾 (dl_podcast.py 的輸出位置)
+ARCHIVE_DIR = "podcasts"
+DEFAULT_LIMIT = 20
+# 可選：符合的段落超過 RANK_WINDOW 段時，只為最新索引的 RANK_WINDOW 段計算 BM25 排序 (較舊的最佳結果會被略過)：
+# 只比對不排序很快，查詢時間幾乎都花在為每一段符合的段落計算 BM25 (常見的詞在大型封存中有數十萬段)
+# 預設 0，一律為所有符合的段落排序 (search 的 --recent N 可在單次查詢指定)
+RANK_WINDOW = int(os.getenv("TRANSCRIPT_RANK_WINDOW") or 0)
+
+# 與 fwhisper.py 寫出的格式相同 (correct.TRANSCRIPT_LINE)
+TRANSCRIPT_LINE = re.compile(r"^\[(\d+(?:\.\d+)?)s -> (\d+(?:\.\d+)?)s\] ?(.*)$")
+# 中日韓文字以相鄰兩字 (bigram) 為一個 token，其他文字以英數字詞為 token
+_CJK = "぀-ヿ㐀-䶿一-鿿가-힯豈-﫿"
+_TOKEN = re.compile(f"[{_CJK}]+|[^\\W_{_CJK}]+")
+_CJK_RUN = re.compile(f"^[{_CJK}]+$")
+
+# 檔名後綴 -> 種類；同一集有校正稿時只索引校正稿，不索引原始逐字稿
+KINDS = (
+    ("_corrected_summary.md", "summary"),
+    ("_summary.md", "summary"),
+    ("_corrected.txt", "corrected"),
+    (".txt", "transcript"),
+)
+
+def tokenize(text):
+    """
+    把文字轉成以空白分隔的 token：中日韓文字切成重疊的 bigram (「陳鳳馨」-> 「陳鳳 鳳馨」)，
+    只有一個字時保留單字；英數字轉成小寫的整個字詞。FTS5 的 unicode61 tokenizer 再以空白切開
+    """
+    tokens = []
+    for run in _TOKEN.findall(unicodedata.normalize("NFKC", text).lower()):
+        if _CJK_RUN.match(run):
+            if len(run) == 1:
+                tokens.append(run)
+            else:
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return " ".join(tokens)
+
+def run_tails(text):
+    """
+    每一段兩字以上的中日韓文字的最後一個字，以空白分隔 (「陳鳳馨說，好」-> 「說」)
+    這個字在 bigram 中只出現在第二個位置，以前綴比對單一個字時要另外比對這個欄位
+    """
+    return " ".join(
+        run[-1] for run in _TOKEN.findall(unicodedata.normalize("NFKC", text).lower())
+        if len(run) > 1 and _CJK_RUN.match(run)
+    )
+
+def build_query(query):
+    """
+    把使用者的查詢轉成 FTS5 查詢：每個以空白分隔的詞是 tokens 欄位的一個 phrase (相鄰 token 必須連續出現)，
+    各詞之間為 AND；單一個中文字以前綴比對 tokens 與 tails 欄位 (「馨*」：以該字開頭的 bigram、單字，
+    或在一段文字最後的該字)
+    沒有可查詢的 token 時回傳 None
+    """
+    phrases = []
+    for term in query.split():
+        tokens = tokenize(term)
+        if not tokens:
+            continue
+        if " " not in tokens and len(tokens) == 1 and _CJK_RUN.match(tokens):
+            phrases.append(f'{{tokens tails}} : "{tokens}"*')
+        else:
+            phrases.append(f'tokens : "{tokens}"')
+    return " AND ".join(phrases) or None
+
+def classify(path):
+    """
+    回傳 (單集的 key, 種類)；不是逐字稿、校正稿或摘要時回傳 None
+    單集的 key 是音檔去掉副檔名的路徑 (與 episode_index.artifact_paths 相同)
+    """
+    for suffix, kind in KINDS:
+        if path.endswith(suffix):
+            return path[:-len(suffix)], kind
+    return None
+
+def parse_file(path, kind):
+    """
+    回傳 [(start_ms, end_ms, text), ...]；逐字稿與校正稿以每一行的時間軸為一段，
+    摘要以空行分隔的段落為一段 (沒有時間軸，start_ms / end_ms 為 None)
+    """
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        content = f.read()
+    segments = []
+    if kind == "summary":
+        for paragraph in re.split(r"\n\s*\n", content):
+            paragraph = paragraph.strip()
+            if paragraph:
+                segments.append((None, None, paragraph))
+        return segments
+    for line in content.split("\n"):
+        match = TRANSCRIPT_LINE.match(line.strip())
+        if match and match.group(3).strip():
+            segments.append((round(float(match.group(1)) * 1000), round(float(match.group(2)) * 1000), match.group(3).strip()))
+    return segments
+
+def podcast_token(podcast):
+    """
+    節目名稱在 FTS5 表中的 token (名稱的雜湊，避免名稱中的空白或符號被切成多個 token)
+    """
+    return "p" + hashlib.sha1((podcast or "").encode("utf-8")).hexdigest()[:16]
+
+def format_ms(ms):
+    if ms is None:
+        return "--:--:--"
+    seconds = ms // 1000
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+class TranscriptIndex:
+    """
+    以 SQLite FTS5 建立的逐字稿全文檢索索引，可在多個 thread 之間共用
+
+    segments 保存每一段的原文與時間軸 (毫秒)，FTS5 表只保存 token 與 run_tails (contentless)，
+    節目與種類也是 FTS5 表的欄位，篩選條件直接在 MATCH 中比對 (BM25 的權重為 0，不影響排序)；
+    files 記錄每個檔案索引時的修改時間與大小，update() 只重新索引有變動的檔案
+    """
+    def __init__(self, path=TRANSCRIPT_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                episode TEXT NOT NULL,
+                podcast TEXT,
+                kind TEXT NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                segments INTEGER NOT NULL,
+                indexed REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_files_episode ON files (episode);
+            CREATE TABLE IF NOT EXISTS segments (
+                id INTEGER PRIMARY KEY,
+                path TEXT NOT NULL,
+                start_ms INTEGER,
+                end_ms INTEGER,
+                text TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_segments_path ON segments (path);
+        """)
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(segments_fts)")]
+        if columns and "tails" not in columns:
+            # 舊版的索引沒有 tails 欄位：清空後由下次 update 重新索引
+            print(f"  [提示] 全文檢索索引 {path} 的格式已更新，請執行 python transcript_index.py update 重新索引")
+            self._conn.executescript("DROP TABLE segments_fts; DELETE FROM segments; DELETE FROM files;")
+        created = "tails" not in columns
+        self._conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS segments_fts USING fts5(tokens, tails, podcast, kind, content='', tokenize='unicode61')")
+        if created:
+            self._conn.execute("INSERT INTO segments_fts (segments_fts, rank) VALUES ('rank', 'bm25(1.0, 1.0, 0.0, 0.0)')")
+        self._conn.commit()
+
+    def _remove(self, path):
+        # contentless 的 FTS5 表刪除時要提供原本的 token，以保存的原文重新產生
+        file = self._conn.execute("SELECT podcast, kind FROM files WHERE path = ?", (path,)).fetchone()
+        if file is not None:
+            rows = self._conn.execute("SELECT id, text FROM segments WHERE path = ?", (path,)).fetchall()
+            self._conn.executemany(
+                "INSERT INTO segments_fts (segments_fts, rowid, tokens, tails, podcast, kind) VALUES ('delete', ?, ?, ?, ?, ?)",
+                ((row["id"], tokenize(row["text"]), run_tails(row["text"]), podcast_token(file["podcast"]), file["kind"]) for row in rows),
+            )
+        self._conn.execute("DELETE FROM segments WHERE path = ?", (path,))
+        self._conn.execute("DELETE FROM files WHERE path = ?", (path,))
+
+    def _insert(self, path, episode, kind, stat, segments):
+        self._remove(path)
+        podcast = os.path.basename(os.path.dirname(path)) or None
+        for start_ms, end_ms, text in segments:
+            cursor = self._conn.execute(
+                "INSERT INTO segments (path, start_ms, end_ms, text) VALUES (?, ?, ?, ?)", (path, start_ms, end_ms, text),
+            )
+            self._conn.execute(
+                "INSERT INTO segments_fts (rowid, tokens, tails, podcast, kind) VALUES (?, ?, ?, ?, ?)",
+                (cursor.lastrowid, tokenize(text), run_tails(text), podcast_token(podcast), kind),
+            )
+        self._conn.execute(
+            "INSERT INTO files (path, episode, podcast, kind, mtime_ns, size, segments, indexed) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (path, episode, podcast, kind, stat.st_mtime_ns, stat.st_size, len(segments), time.time()),
+        )
+
+    def _wanted(self, paths):
+        """
+        回傳 {path: (單集, 種類)}：同一集有校正稿時不包含原始逐字稿
+        """
+        found = {}
+        for path in paths:
+            info = classify(path)
+            if info:
+                found[path] = info
+        corrected = {episode for episode, kind in found.values() if kind == "corrected"}
+        return {path: info for path, info in found.items() if not (info[1] == "transcript" and info[0] in corrected)}
+
+    def _sync(self, wanted, scope=None):
+        """
+        把 wanted ({path: (單集, 種類)}) 中有變動的檔案重新索引；
+        scope (單集 key 的集合或資料夾前綴) 之內不在 wanted 中的已索引檔案會被移除
+        回傳 (重新索引的檔案數, 移除的檔案數, 沒有變動的檔案數)
+        """
+        indexed = removed = unchanged = 0
+        for path, (episode, kind) in sorted(wanted.items()):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            with self._lock:
+                row = self._conn.execute("SELECT mtime_ns, size FROM files WHERE path = ?", (path,)).fetchone()
+            if row is not None and row["mtime_ns"] == stat.st_mtime_ns and row["size"] == stat.st_size:
+                unchanged += 1
+                continue
+            segments = parse_file(path, kind)
+            with self._lock:
+                with self._conn:
+                    self._insert(path, episode, kind, stat, segments)
+            indexed += 1
+
+        if scope is not None:
+            with self._lock:
+                if isinstance(scope, str):
+                    prefix = scope.rstrip(os.sep) + os.sep
+                    rows = self._conn.execute(
+                        "SELECT path FROM files WHERE substr(path, 1, ?) = ?", (len(prefix), prefix),
+                    ).fetchall()
+                else:
+                    rows = [row for episode in scope for row in self._conn.execute(
+                        "SELECT path FROM files WHERE episode = ?", (episode,),
+                    ).fetchall()]
+                stale = [row["path"] for row in rows if row["path"] not in wanted]
+                with self._conn:
+                    for path in stale:
+                        self._remove(path)
+            removed = len(stale)
+        return indexed, removed, unchanged
+
+    def index_episode(self, audio_path):
+        """
+        索引一集 (以音檔路徑或去掉副檔名的路徑指定) 目前已有的逐字稿、校正稿與摘要
+        回傳 (重新索引的檔案數, 移除的檔案數, 沒有變動的檔案數)
+        """
+        info = classify(audio_path)
+        episode = info[0] if info else os.path.splitext(audio_path)[0]
+        candidates = [episode + suffix for suffix, _ in KINDS]
+        wanted = self._wanted([path for path in candidates if os.path.exists(path)])
+        return self._sync(wanted, scope={episode})
+
+    def update(self, root=ARCHIVE_DIR):
+        """
+        掃描 root 之下所有的逐字稿、校正稿與摘要，只重新索引新增或修改過的檔案，並移除已刪除的檔案
+        回傳 (重新索引的檔案數, 移除的檔案數, 沒有變動的檔案數)
+        """
+        paths = []
+        for directory, _, filenames in os.walk(root):
+            paths.extend(os.path.join(directory, name) for name in filenames)
+        return self._sync(self._wanted(paths), scope=root)
+
+    def search(self, query, limit=DEFAULT_LIMIT, podcast=None, kinds=None, rank_window=None):
+        """
+        回傳依 BM25 排序的結果 [{"episode", "podcast", "kind", "path", "start_ms", "end_ms", "text", "score"}, ...]
+        podcast 只搜尋該節目 (資料夾名稱)，kinds 只搜尋這些種類 ("transcript" / "corrected" / "summary")
+        rank_window (預設 RANK_WINDOW) 不為 0 且符合的段落超過 rank_window 段時，只在最新的 rank_window 段中排序
+        """
+        match = build_query(query)
+        if match is None:
+            return []
+        rank_window = RANK_WINDOW if rank_window is None else rank_window
+        match = f"({match})"
+        if podcast:
+            match += f' AND podcast : "{podcast_token(podcast)}"'
+        if kinds:
+            match += " AND kind : (" + " OR ".join(f'"{kind}"' for kind in kinds) + ")"
+        with self._lock:
+            floor = None
+            if rank_window:
+                row = self._conn.execute(
+                    "SELECT rowid FROM segments_fts WHERE segments_fts MATCH ? ORDER BY rowid DESC LIMIT 1 OFFSET ?",
+                    (match, rank_window),
+                ).fetchone()
+                floor = row[0] if row else None
+            # 先在 FTS5 表中排序取出前 limit 筆，之後才 join 原文與檔案資訊
+            sql = (
+                "SELECT f.episode, f.podcast, f.kind, s.path, s.start_ms, s.end_ms, s.text, hits.score FROM ("
+                "SELECT rowid AS id, rank AS score FROM segments_fts WHERE segments_fts MATCH ?"
+                + ("" if floor is None else " AND rowid > ?")
+                + " ORDER BY rank LIMIT ?) hits "
+                "JOIN segments s ON s.id = hits.id JOIN files f ON f.path = s.path ORDER BY hits.score"
+            )
+            params = [match] + ([] if floor is None else [floor]) + [limit]
+            return [dict(row) for row in self._conn.execute(sql, params).fetchall()]
+
+    def stats(self):
+        with self._lock:
+            files, episodes, segments = self._conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT episode), COALESCE(SUM(segments), 0) FROM files"
+            ).fetchone()
+        return {"files": files, "episodes": episodes, "segments": segments}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+def get_default_index():
+    """
+    回傳預設路徑的全文檢索索引 (PODCAST_SEARCH_INDEX=0 時回傳 None)
+    """
+    return TranscriptIndex() if SEARCH_INDEX_ENABLED else None
+
+def print_hits(hits):
+    for hit in hits:
+        position = format_ms(hit["start_ms"]) if hit["start_ms"] is not None else hit["kind"]
+        text = hit["text"] if len(hit["text"]) <= 120 else hit["text"][:117] + "..."
+        print(f"{hit['episode']}  [{position}] ({hit['start_ms']} ms)")
+        print(f"    {text}")
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in ("update", "search", "stats"):
+        print("Usage: python transcript_index.py update [資料夾] | search <關鍵字>... [--podcast 節目] [--limit N] [--recent N] | stats")
+        sys.exit(1)
+
+    index = TranscriptIndex()
+    command = sys.argv[1]
+    if command == "update":
+        root = sys.argv[2] if len(sys.argv) > 2 else ARCHIVE_DIR
+        start = time.perf_counter()
+        indexed, removed, unchanged = index.update(root)
+        print(f"重新索引 {indexed} 個檔案，移除 {removed} 個，{unchanged} 個沒有變動 ({time.perf_counter() - start:.2f} 秒)")
+    elif command == "search":
+        args = sys.argv[2:]
+        podcast = None
+        limit = DEFAULT_LIMIT
+        rank_window = RANK_WINDOW
+        if "--podcast" in args:
+            i = args.index("--podcast")
+            podcast = args[i + 1]
+            del args[i:i + 2]
+        if "--limit" in args:
+            i = args.index("--limit")
+            limit = int(args[i + 1])
+            del args[i:i + 2]
+        if "--recent" in args:
+            i = args.index("--recent")
+            rank_window = int(args[i + 1])
+            del args[i:i + 2]
+        start = time.perf_counter()
+        hits = index.search(" ".join(args), limit=limit, podcast=podcast, rank_window=rank_window)
+        elapsed = time.perf_counter() - start
+        print_hits(hits)
+        print(f"{len(hits)} 筆結果 ({elapsed * 1000:.1f} ms)")
+        if rank_window:
+            print(f"只在最新索引的 {rank_window} 段符合的段落中排序，較舊的段落即使更相關也可能不在結果中")
+    else:
+        stats = index.stats()
+        print(f"單集: {stats['episodes']}，檔案: {stats['files']}，段落: {stats['segments']}")